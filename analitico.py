@@ -0,0 +1,605 @@
+"""
+Base Analítica Local - Sistema DEKIDS
+
+Cópia local (arquivo SQLite) das tabelas de vendas e movimentações de
+estoque, sincronizada de forma incremental, para que os relatórios gerenciais
+rodem como SQL local: não disputam o limite de requisições do Supabase com
+os caixas e não baixam as mesmas linhas a cada relatório.
+
+- Opcional: ativada por DEKIDS_ANALITICO_PATH (caminho do arquivo)
+- vendas e movimentacoes: alterações por updated_at e exclusões pela tabela
+  exclusoes (sql/010_sincronizacao_analitica.sql), como o cache do catálogo
+- itens_venda e pagamentos (somente inclusão): por id, relendo os últimos
+  RELEITURA_IDS ids para pegar transações confirmadas fora de ordem
+- produtos e clientes (incremental) e usuarios (inteira, é pequena): nomes e
+  atributos usados nos filtros e listagens dos relatórios
+- Relatórios com as mesmas saídas de relatorios.py e relatorios_estoque.py,
+  que usam a base quando ela está pronta (preparar())
+- Sem a base configurada, ou antes da primeira sincronização completa, os
+  relatórios continuam consultando o banco
+
+Usa SQLite, e não DuckDB, por já fazer parte da biblioteca padrão; os
+índices por data cobrem as agregações por período dos relatórios.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from logging_config import registrar_erro, registrar_info
+
+
+# Configurações
+INTERVALO_SINCRONIZACAO = 60.0   # segundos entre sincronizações em segundo plano
+RELEITURA_IDS = 1000             # ids de itens_venda/pagamentos relidos a cada sincronização
+TAMANHO_LOTE = 1000              # linhas gravadas por transação na carga
+
+# Colunas copiadas de cada tabela
+COLUNAS: Dict[str, tuple] = {
+    "vendas": ("id", "data_hora", "valor_total", "desconto_valor", "desconto_percentual", "valor_final",
+               "status", "cliente_id", "usuario_id", "data_cancelamento", "updated_at"),
+    "itens_venda": ("id", "venda_id", "produto_id", "quantidade", "preco_unitario", "subtotal"),
+    "pagamentos": ("id", "venda_id", "forma_pagamento", "valor", "numero_parcelas"),
+    "movimentacoes": ("id", "produto_id", "tipo", "quantidade", "quantidade_anterior", "quantidade_nova",
+                      "observacao", "usuario_id", "created_at", "data_hora", "updated_at"),
+    "produtos": ("id", "descricao", "genero", "marca", "referencia", "tamanho", "quantidade", "preco"),
+    "clientes": ("id", "nome", "cpf"),
+    "usuarios": ("id", "username"),
+}
+
+# Tabelas sincronizadas por updated_at/exclusoes e por id
+TABELAS_ALTERAVEIS = ("vendas", "movimentacoes", "produtos", "clientes")
+TABELAS_INCLUSAO = ("itens_venda", "pagamentos")
+
+# Colunas de data convertidas para o formato local (ISO sem fuso, em UTC)
+_COLUNAS_INSTANTE = {"data_hora", "data_cancelamento", "created_at", "updated_at"}
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS vendas (
+    id INTEGER PRIMARY KEY,
+    data_hora TEXT,
+    valor_total REAL,
+    desconto_valor REAL,
+    desconto_percentual REAL,
+    valor_final REAL,
+    status TEXT,
+    cliente_id INTEGER,
+    usuario_id INTEGER,
+    data_cancelamento TEXT,
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS itens_venda (
+    id INTEGER PRIMARY KEY,
+    venda_id INTEGER,
+    produto_id INTEGER,
+    quantidade INTEGER,
+    preco_unitario REAL,
+    subtotal REAL
+);
+
+CREATE TABLE IF NOT EXISTS pagamentos (
+    id INTEGER PRIMARY KEY,
+    venda_id INTEGER,
+    forma_pagamento TEXT,
+    valor REAL,
+    numero_parcelas INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS movimentacoes (
+    id INTEGER PRIMARY KEY,
+    produto_id INTEGER,
+    tipo TEXT,
+    quantidade INTEGER,
+    quantidade_anterior INTEGER,
+    quantidade_nova INTEGER,
+    observacao TEXT,
+    usuario_id INTEGER,
+    created_at TEXT,
+    data_hora TEXT,
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS produtos (
+    id INTEGER PRIMARY KEY,
+    descricao TEXT,
+    genero TEXT,
+    marca TEXT,
+    referencia TEXT,
+    tamanho TEXT,
+    quantidade INTEGER,
+    preco REAL
+);
+
+CREATE TABLE IF NOT EXISTS clientes (
+    id INTEGER PRIMARY KEY,
+    nome TEXT,
+    cpf TEXT
+);
+
+CREATE TABLE IF NOT EXISTS usuarios (
+    id INTEGER PRIMARY KEY,
+    username TEXT
+);
+
+-- Marca d'água de cada tabela (updated_at ou maior id); todas presentes = carga completa
+CREATE TABLE IF NOT EXISTS marcas (
+    tabela TEXT PRIMARY KEY,
+    marca TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_vendas_data_hora ON vendas(data_hora, status);
+CREATE INDEX IF NOT EXISTS idx_vendas_usuario_data ON vendas(usuario_id, data_hora);
+CREATE INDEX IF NOT EXISTS idx_itens_venda_venda ON itens_venda(venda_id, produto_id, quantidade, subtotal);
+CREATE INDEX IF NOT EXISTS idx_pagamentos_venda ON pagamentos(venda_id, forma_pagamento, valor);
+CREATE INDEX IF NOT EXISTS idx_movimentacoes_data_hora ON movimentacoes(data_hora);
+CREATE INDEX IF NOT EXISTS idx_movimentacoes_produto_data_hora ON movimentacoes(produto_id, data_hora);
+"""
+
+
+def _instante(valor: Any) -> Any:
+    """Converte um timestamp do banco para ISO sem fuso (UTC), comparável com os filtros dos relatórios."""
+    if not isinstance(valor, str) or not valor:
+        return valor
+    try:
+        instante = datetime.fromisoformat(valor.replace("Z", "+00:00"))
+    except ValueError:
+        return valor
+    if instante.tzinfo is not None:
+        instante = instante.astimezone(timezone.utc).replace(tzinfo=None)
+    return instante.isoformat(timespec="milliseconds")
+
+
+class BaseAnalitica:
+    """Cópia local das tabelas de vendas e movimentações, com os relatórios em SQL."""
+
+    def __init__(self, caminho: Optional[str] = None):
+        self.caminho = caminho if caminho is not None else (os.getenv("DEKIDS_ANALITICO_PATH") or None)
+        self._lock = threading.RLock()
+        self._lock_sincronizacao = threading.Lock()
+        self._conexao: Optional[sqlite3.Connection] = None
+        self._sincronizador: Optional[threading.Thread] = None
+        self._parar = threading.Event()
+
+        # Contadores para monitoramento
+        self.ultima_sincronizacao: Optional[float] = None
+        self.sincronizacoes = 0
+        self.linhas_sincronizadas = 0
+        self.consultas = 0
+
+    @property
+    def ativa(self) -> bool:
+        """True se a base analítica foi configurada (DEKIDS_ANALITICO_PATH)."""
+        return bool(self.caminho)
+
+    def _obter_conexao(self) -> sqlite3.Connection:
+        """Abre (uma única vez) a conexão com o arquivo da base."""
+        with self._lock:
+            if self._conexao is None:
+                self._conexao = sqlite3.connect(self.caminho, check_same_thread=False, isolation_level=None)
+                self._conexao.row_factory = sqlite3.Row
+                if self.caminho != ":memory:":
+                    self._conexao.execute("PRAGMA journal_mode = WAL")
+                    # Cópia reconstruível: não precisa sobreviver a uma queda de energia
+                    self._conexao.execute("PRAGMA synchronous = OFF")
+                self._conexao.executescript(_ESQUEMA)
+            return self._conexao
+
+    @contextmanager
+    def _transacao(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            conexao = self._obter_conexao()
+            conexao.execute("BEGIN")
+            try:
+                yield conexao
+            except BaseException:
+                conexao.execute("ROLLBACK")
+                raise
+            else:
+                conexao.execute("COMMIT")
+
+    def _consultar(self, sql: str, parametros: Iterable[Any] = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            self.consultas += 1
+            return [dict(linha) for linha in self._obter_conexao().execute(sql, tuple(parametros)).fetchall()]
+
+    # ------------------------------------------------------------------
+    # Sincronização
+    # ------------------------------------------------------------------
+
+    def _marca(self, tabela: str) -> Optional[str]:
+        linhas = self._consultar("SELECT marca FROM marcas WHERE tabela = ?", (tabela,))
+        return linhas[0]["marca"] if linhas else None
+
+    def _gravar(self, conexao: sqlite3.Connection, tabela: str, linhas: List[Dict[str, Any]]) -> None:
+        colunas = COLUNAS[tabela]
+        conexao.executemany(
+            f"INSERT OR REPLACE INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})",
+            [
+                tuple(_instante(linha.get(coluna)) if coluna in _COLUNAS_INSTANTE else linha.get(coluna)
+                      for coluna in colunas)
+                for linha in linhas
+            ]
+        )
+
+    def _copiar(self, tabela: str, linhas: Iterable[Dict[str, Any]]) -> int:
+        """Grava as linhas em transações de TAMANHO_LOTE linhas, sem manter a carga em memória."""
+        total = 0
+        lote: List[Dict[str, Any]] = []
+        for linha in linhas:
+            lote.append(linha)
+            if len(lote) >= TAMANHO_LOTE:
+                with self._transacao() as conexao:
+                    self._gravar(conexao, tabela, lote)
+                total += len(lote)
+                lote = []
+        if lote:
+            with self._transacao() as conexao:
+                self._gravar(conexao, tabela, lote)
+            total += len(lote)
+        return total
+
+    def _sincronizar_alteracoes(self, tabela: str) -> int:
+        import database
+
+        marca = self._marca(tabela)
+        if marca is None:
+            # Carga inicial em lotes; alterações durante a carga são relidas
+            # na próxima sincronização, a partir do maior updated_at anterior a ela
+            ultima = database.executar_operacao(
+                f"sincronizar_analitico:{tabela}",
+                lambda: database.supabase.table(tabela).select("updated_at")
+                    .order("updated_at", desc=True).limit(1).execute()
+            ).data
+            total = self._copiar(tabela, database.iterar_tabela(tabela, ", ".join(COLUNAS[tabela])))
+            nova_marca = ultima[0]["updated_at"] if ultima else None
+        else:
+            alterados, excluidos, nova_marca = database.buscar_alteracoes(tabela, marca)
+            with self._transacao() as conexao:
+                self._gravar(conexao, tabela, alterados)
+                conexao.executemany(f"DELETE FROM {tabela} WHERE id = ?", [(i,) for i in excluidos])
+            total = len(alterados) + len(excluidos)
+
+        if nova_marca is not None or marca is None:
+            with self._transacao() as conexao:
+                conexao.execute(
+                    "INSERT OR REPLACE INTO marcas (tabela, marca) VALUES (?, ?)",
+                    # Tabela vazia na carga: a próxima leitura começa do início
+                    (tabela, nova_marca or "1970-01-01T00:00:00+00:00")
+                )
+        return total
+
+    def _sincronizar_inclusoes(self, tabela: str) -> int:
+        import database
+
+        ultimo = self._consultar(f"SELECT MAX(id) AS ultimo FROM {tabela}")[0]["ultimo"]
+        desde = max(ultimo - RELEITURA_IDS, 0) if ultimo is not None else None
+        total = self._copiar(tabela, database.iterar_tabela(
+            tabela,
+            ", ".join(COLUNAS[tabela]),
+            filtros=(lambda query: query.gt("id", desde)) if desde else None
+        ))
+        maior = self._consultar(f"SELECT MAX(id) AS ultimo FROM {tabela}")[0]["ultimo"]
+        with self._transacao() as conexao:
+            conexao.execute("INSERT OR REPLACE INTO marcas (tabela, marca) VALUES (?, ?)", (tabela, str(maior or 0)))
+        return total
+
+    def sincronizar(self) -> Dict[str, int]:
+        """
+        Aplica à base as alterações do banco desde a última sincronização
+        (a primeira chamada copia as tabelas inteiras).
+
+        Returns:
+            {tabela: linhas copiadas ou removidas}
+
+        Raises:
+            Exception: se uma leitura do banco falhar (a próxima retoma da última marca)
+        """
+        import database
+
+        with self._lock_sincronizacao:
+            contagens: Dict[str, int] = {}
+            for tabela in TABELAS_ALTERAVEIS:
+                contagens[tabela] = self._sincronizar_alteracoes(tabela)
+            for tabela in TABELAS_INCLUSAO:
+                contagens[tabela] = self._sincronizar_inclusoes(tabela)
+
+            usuarios = list(database.iterar_tabela("usuarios", "id, username"))
+            with self._transacao() as conexao:
+                conexao.execute("DELETE FROM usuarios")
+                self._gravar(conexao, "usuarios", usuarios)
+
+            with self._lock:
+                self.ultima_sincronizacao = time.time()
+                self.sincronizacoes += 1
+                self.linhas_sincronizadas += sum(contagens.values())
+
+        if any(contagens.values()):
+            registrar_info(
+                mensagem="Base analítica sincronizada",
+                modulo="analitico",
+                funcao="sincronizar",
+                detalhes=contagens
+            )
+        return contagens
+
+    def pronta(self) -> bool:
+        """True se a base completou ao menos uma carga de todas as tabelas."""
+        if not self.ativa:
+            return False
+        linhas = self._consultar("SELECT COUNT(*) AS total FROM marcas")
+        return linhas[0]["total"] >= len(TABELAS_ALTERAVEIS) + len(TABELAS_INCLUSAO)
+
+    def preparar(self) -> bool:
+        """
+        Verifica se os relatórios podem usar a base, sem sincronizar.
+
+        A base é mantida pela thread de sincronização (iniciada aqui, se ainda
+        não estiver rodando); o relatório nunca espera por uma sincronização.
+        Enquanto a primeira carga não termina, os relatórios consultam o banco.
+        Sem conexão a base continua sendo usada, com os dados da última
+        sincronização.
+
+        Returns:
+            True se a base está ativa e pronta
+        """
+        if not self.ativa:
+            return False
+        self.iniciar_sincronizacao()
+        return self.pronta()
+
+    def _laco_sincronizacao(self, intervalo: float) -> None:
+        from resiliencia import backend_disponivel
+
+        while not self._parar.is_set():
+            try:
+                if backend_disponivel():
+                    self.sincronizar()
+            except Exception as e:
+                registrar_erro(
+                    mensagem="Erro na sincronização da base analítica",
+                    modulo="analitico",
+                    funcao="_laco_sincronizacao",
+                    detalhes={"erro": str(e)},
+                    exc_info=True
+                )
+            self._parar.wait(intervalo)
+
+    def iniciar_sincronizacao(self, intervalo: float = INTERVALO_SINCRONIZACAO) -> None:
+        """Inicia (uma única vez) a thread que sincroniza a base a cada `intervalo` segundos."""
+        if not self.ativa:
+            return
+        with self._lock:
+            if self._sincronizador is not None and self._sincronizador.is_alive():
+                return
+            self._parar.clear()
+            self._sincronizador = threading.Thread(
+                target=self._laco_sincronizacao,
+                args=(intervalo,),
+                name="dekids-analitico",
+                daemon=True
+            )
+            self._sincronizador.start()
+
+    def parar_sincronizacao(self) -> None:
+        """Sinaliza a thread de sincronização para terminar."""
+        self._parar.set()
+
+    # ------------------------------------------------------------------
+    # Relatórios (mesmas saídas de relatorios.py e relatorios_estoque.py)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _filtro_vendas(data_inicio: str, data_fim: str, usuario_id: Optional[int],
+                       forma_pagamento: Optional[str]) -> Tuple[str, List[Any]]:
+        """Condição SQL (sobre vendas v) do período e dos filtros do relatório."""
+        condicoes = ["v.data_hora >= ?", "v.data_hora <= ?"]
+        parametros: List[Any] = [data_inicio, data_fim]
+        if usuario_id is not None:
+            condicoes.append("v.usuario_id = ?")
+            parametros.append(usuario_id)
+        if forma_pagamento:
+            condicoes.append("EXISTS (SELECT 1 FROM pagamentos f WHERE f.venda_id = v.id AND f.forma_pagamento = ?)")
+            parametros.append(forma_pagamento)
+        return " AND ".join(condicoes), parametros
+
+    def relatorio_vendas_periodo(self, data_inicio: str, data_fim: str, usuario_id: Optional[int] = None,
+                                 forma_pagamento: Optional[str] = None, incluir_vendas: bool = True) -> Dict:
+        """Equivalente de relatorios.relatorio_vendas_periodo (datas já normalizadas)."""
+        filtro, parametros = self._filtro_vendas(data_inicio, data_fim, usuario_id, forma_pagamento)
+
+        totais = self._consultar(
+            f"SELECT COUNT(*) AS numero_vendas, ROUND(COALESCE(SUM(v.valor_final), 0), 2) AS faturamento_total "
+            f"FROM vendas v WHERE {filtro} AND v.status <> 'cancelada'",
+            parametros
+        )[0]
+        faturamento_total = float(totais["faturamento_total"])
+        numero_vendas = totais["numero_vendas"]
+
+        distribuicao = self._consultar(
+            f"SELECT p.forma_pagamento, ROUND(SUM(p.valor), 2) AS valor "
+            f"FROM pagamentos p JOIN vendas v ON v.id = p.venda_id "
+            f"WHERE {filtro} AND v.status <> 'cancelada' GROUP BY p.forma_pagamento",
+            parametros
+        )
+
+        return {
+            'faturamento_total': faturamento_total,
+            'numero_vendas': numero_vendas,
+            'ticket_medio': faturamento_total / numero_vendas if numero_vendas > 0 else 0.0,
+            'distribuicao_pagamento': [
+                {
+                    'forma_pagamento': linha['forma_pagamento'],
+                    'valor': float(linha['valor']),
+                    'percentual': (linha['valor'] / faturamento_total * 100) if faturamento_total > 0 else 0.0
+                }
+                for linha in distribuicao
+            ],
+            'vendas': (self.pagina_vendas_periodo(data_inicio, data_fim, usuario_id, forma_pagamento)
+                       if incluir_vendas else [])
+        }
+
+    def pagina_vendas_periodo(self, data_inicio: str, data_fim: str, usuario_id: Optional[int] = None,
+                              forma_pagamento: Optional[str] = None, apos: Optional[Tuple[str, int]] = None,
+                              limite: int = -1) -> List[Dict]:
+        """Equivalente de relatorios.relatorio_vendas_pagina (datas já normalizadas; -1 sem limite)."""
+        filtro, parametros = self._filtro_vendas(data_inicio, data_fim, usuario_id, forma_pagamento)
+        if apos is not None:
+            filtro += " AND (v.data_hora, v.id) > (?, ?)"
+            parametros += [_instante(apos[0]), apos[1]]
+
+        vendas = self._consultar(
+            f"SELECT v.*, c.nome AS cliente_nome, u.username AS vendedor_nome FROM vendas v "
+            f"LEFT JOIN clientes c ON c.id = v.cliente_id LEFT JOIN usuarios u ON u.id = v.usuario_id "
+            f"WHERE {filtro} ORDER BY v.data_hora, v.id LIMIT ?",
+            parametros + [limite]
+        )
+
+        pagamentos_por_venda: Dict[int, List[Dict]] = {}
+        ids = [venda['id'] for venda in vendas]
+        for i in range(0, len(ids), TAMANHO_LOTE):
+            lote = ids[i:i + TAMANHO_LOTE]
+            for pag in self._consultar(
+                f"SELECT venda_id, forma_pagamento, valor, numero_parcelas FROM pagamentos "
+                f"WHERE venda_id IN ({', '.join('?' for _ in lote)}) ORDER BY id",
+                lote
+            ):
+                pagamentos_por_venda.setdefault(pag["venda_id"], []).append(pag)
+
+        return [
+            {
+                'id': venda['id'],
+                'data_hora': venda['data_hora'],
+                'valor_total': float(venda['valor_total']),
+                'desconto_valor': float(venda['desconto_valor'] or 0),
+                'desconto_percentual': float(venda['desconto_percentual'] or 0),
+                'valor_final': float(venda['valor_final']),
+                'status': venda['status'],
+                'cliente_nome': venda['cliente_nome'],
+                'vendedor_nome': venda['vendedor_nome'],
+                'pagamentos': pagamentos_por_venda.get(venda['id'], [])
+            }
+            for venda in vendas
+        ]
+
+    def relatorio_produtos_mais_vendidos(self, data_inicio: str, data_fim: str, filtros: Optional[Dict] = None,
+                                         limit: Optional[int] = None) -> List[Dict]:
+        """Equivalente de relatorios.relatorio_produtos_mais_vendidos (datas já normalizadas)."""
+        filtros = filtros or {}
+        condicoes = ["v.data_hora >= ?", "v.data_hora <= ?", "v.status <> 'cancelada'"]
+        parametros: List[Any] = [data_inicio, data_fim]
+        for campo, condicao in (("genero", "p.genero = ?"), ("marca", "p.marca = ?")):
+            if filtros.get(campo):
+                condicoes.append(condicao)
+                parametros.append(filtros[campo])
+        for campo, condicao in (("preco_min", "p.preco >= ?"), ("preco_max", "p.preco <= ?")):
+            if filtros.get(campo) is not None:
+                condicoes.append(condicao)
+                parametros.append(filtros[campo])
+        parametros.append(limit if limit is not None and limit > 0 else -1)
+
+        linhas = self._consultar(
+            "SELECT i.produto_id, p.descricao, p.marca, p.referencia, p.tamanho, "
+            "       SUM(i.quantidade) AS quantidade_vendida, SUM(i.subtotal) AS faturamento_gerado, "
+            "       SUM(SUM(i.subtotal)) OVER () AS faturamento_total "
+            "FROM itens_venda i "
+            "JOIN vendas v ON v.id = i.venda_id "
+            "JOIN produtos p ON p.id = i.produto_id "
+            f"WHERE {' AND '.join(condicoes)} "
+            "GROUP BY i.produto_id "
+            "ORDER BY quantidade_vendida DESC, i.produto_id "
+            "LIMIT ?",
+            parametros
+        )
+        return [
+            {
+                'produto_id': linha['produto_id'],
+                'descricao': linha['descricao'] or '',
+                'marca': linha['marca'] or '',
+                'referencia': linha['referencia'] or '',
+                'tamanho': linha['tamanho'] or '',
+                'quantidade_vendida': linha['quantidade_vendida'],
+                'faturamento_gerado': round(linha['faturamento_gerado'], 2),
+                'percentual_participacao': (linha['faturamento_gerado'] / linha['faturamento_total'] * 100)
+                                           if linha['faturamento_total'] > 0 else 0.0
+            }
+            for linha in linhas
+        ]
+
+    def relatorio_vendas_por_vendedor(self, data_inicio: str, data_fim: str) -> List[Dict]:
+        """Equivalente de relatorios.relatorio_vendas_por_vendedor (datas já normalizadas)."""
+        linhas = self._consultar(
+            "SELECT v.usuario_id, u.username, COUNT(*) AS numero_vendas, "
+            "       SUM(v.valor_final) AS faturamento_total, SUM(SUM(v.valor_final)) OVER () AS faturamento_geral "
+            "FROM vendas v LEFT JOIN usuarios u ON u.id = v.usuario_id "
+            "WHERE v.data_hora >= ? AND v.data_hora <= ? AND v.status <> 'cancelada' "
+            "GROUP BY v.usuario_id "
+            "ORDER BY faturamento_total DESC",
+            (data_inicio, data_fim)
+        )
+        return [
+            {
+                'usuario_id': linha['usuario_id'],
+                'nome_vendedor': linha['username'] or f"Usuário {linha['usuario_id']}",
+                'numero_vendas': linha['numero_vendas'],
+                'faturamento_total': round(linha['faturamento_total'], 2),
+                'ticket_medio': linha['faturamento_total'] / linha['numero_vendas'],
+                'percentual_participacao': (linha['faturamento_total'] / linha['faturamento_geral'] * 100)
+                                           if linha['faturamento_geral'] > 0 else 0.0
+            }
+            for linha in linhas
+        ]
+
+    def relatorio_movimentacoes(self, data_inicio: str, data_fim: str) -> List[Dict]:
+        """Equivalente de relatorios_estoque.gerar_relatorio_movimentacoes (datas já normalizadas)."""
+        return self._consultar(
+            "SELECT m.id, m.produto_id, COALESCE(p.descricao, 'Produto não encontrado') AS produto_descricao, "
+            "       m.tipo, m.quantidade, m.quantidade_anterior, m.quantidade_nova, m.data_hora, "
+            "       m.observacao, m.usuario_id "
+            "FROM movimentacoes m LEFT JOIN produtos p ON p.id = m.produto_id "
+            "WHERE m.data_hora >= ? AND m.data_hora <= ? "
+            "ORDER BY m.data_hora DESC, m.id DESC",
+            (data_inicio, data_fim)
+        )
+
+    def produtos_sem_movimentacao(self, desde: Optional[str] = None) -> List[Dict]:
+        """Equivalente de database.listar_produtos_sem_movimentacao."""
+        desde = _instante(desde)
+        return self._consultar(
+            "SELECT p.*, u.ultima_movimentacao, u.ultima_data_hora "
+            "FROM produtos p "
+            "LEFT JOIN ("
+            "    SELECT produto_id, MAX(created_at) AS ultima_movimentacao, MAX(data_hora) AS ultima_data_hora"
+            "    FROM movimentacoes GROUP BY produto_id"
+            ") u ON u.produto_id = p.id "
+            "WHERE ? IS NULL OR u.produto_id IS NULL "
+            "   OR (u.ultima_movimentacao < ? AND u.ultima_data_hora < ?) "
+            "ORDER BY p.id",
+            (desde, desde, desde)
+        )
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Estado da base para monitoramento."""
+        with self._lock:
+            return {
+                "ativa": self.ativa,
+                "caminho": self.caminho,
+                "ultima_sincronizacao": self.ultima_sincronizacao,
+                "sincronizacoes": self.sincronizacoes,
+                "linhas_sincronizadas": self.linhas_sincronizadas,
+                "consultas": self.consultas,
+                "sincronizador_ativo": bool(self._sincronizador and self._sincronizador.is_alive()),
+            }
+
+
+# Instância compartilhada pelo processo
+base_analitica = BaseAnalitica()
+
+
+def obter_estado() -> Dict[str, Any]:
+    """Retorna o estado da base analítica."""
+    return base_analitica.estatisticas()
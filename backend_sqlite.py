@@ -0,0 +1,1385 @@
+"""
+Backend SQLite - Sistema DEKIDS
+
+Implementação local, sobre sqlite3, do subconjunto da API do cliente Supabase
+usado pelo sistema:
+- table(...).select/insert/update/delete/upsert
+- Filtros eq, neq, gt, gte, lt, lte, like, ilike, is_, in_ e or_
+- order, limit, offset, range, single e contagem (count="exact", head=True)
+- Embeds de chaves estrangeiras: "*, cliente:clientes(*)", "usuarios!vendas_usuario_id_fkey(username)"
+- rpc(...) para procedimentos registrados com registrar_procedimento()
+
+Com ele uma loja pode rodar totalmente local e benchmarks podem ser executados
+sem serviço externo. A seleção do backend é feita em database.py:
+    DEKIDS_BACKEND=sqlite
+    DEKIDS_SQLITE_PATH=caminho/para/dekids.db   (opcional)
+"""
+
+import json
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from postgrest.exceptions import APIError
+
+
+# Expressão padrão para colunas de data/hora (horário local, formato ISO)
+_AGORA = "(strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'))"
+
+_ESQUEMA = f"""
+CREATE TABLE IF NOT EXISTS usuarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    senha_hash TEXT NOT NULL,
+    ativo BOOLEAN NOT NULL DEFAULT 1,
+    tentativas_login INTEGER NOT NULL DEFAULT 0,
+    bloqueado_ate TEXT,
+    ultimo_acesso TEXT,
+    created_at TEXT NOT NULL DEFAULT {_AGORA}
+);
+
+CREATE TABLE IF NOT EXISTS sessoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+    token TEXT NOT NULL UNIQUE,
+    expira_em TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT {_AGORA}
+);
+
+CREATE TABLE IF NOT EXISTS produtos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    descricao TEXT NOT NULL,
+    genero TEXT,
+    marca TEXT,
+    referencia TEXT,
+    tamanho TEXT,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    preco REAL NOT NULL DEFAULT 0,
+    codigo_barras TEXT UNIQUE,
+    estoque_minimo INTEGER NOT NULL DEFAULT 5,
+    created_at TEXT NOT NULL DEFAULT {_AGORA},
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS movimentacoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    produto_id INTEGER NOT NULL REFERENCES produtos(id) ON DELETE CASCADE,
+    tipo TEXT NOT NULL CHECK (tipo IN ('entrada', 'saida', 'ajuste')),
+    quantidade INTEGER NOT NULL,
+    quantidade_anterior INTEGER,
+    quantidade_nova INTEGER,
+    observacao TEXT,
+    usuario_id INTEGER REFERENCES usuarios(id) ON DELETE SET NULL,
+    created_at TEXT NOT NULL DEFAULT {_AGORA},
+    data_hora TEXT NOT NULL DEFAULT {_AGORA}
+);
+
+CREATE TABLE IF NOT EXISTS clientes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome TEXT NOT NULL,
+    cpf TEXT NOT NULL UNIQUE,
+    telefone TEXT,
+    email TEXT,
+    endereco_rua TEXT,
+    endereco_numero TEXT,
+    endereco_complemento TEXT,
+    endereco_bairro TEXT,
+    endereco_cidade TEXT,
+    endereco_estado TEXT,
+    endereco_cep TEXT,
+    created_at TEXT NOT NULL DEFAULT {_AGORA},
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS vendas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    data_hora TEXT NOT NULL DEFAULT {_AGORA},
+    valor_total REAL NOT NULL,
+    desconto_percentual REAL NOT NULL DEFAULT 0,
+    desconto_valor REAL NOT NULL DEFAULT 0,
+    valor_final REAL NOT NULL,
+    cliente_id INTEGER REFERENCES clientes(id) ON DELETE SET NULL,
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
+    status TEXT NOT NULL DEFAULT 'finalizada' CHECK (status IN ('finalizada', 'cancelada')),
+    data_cancelamento TEXT,
+    motivo_cancelamento TEXT,
+    usuario_cancelamento_id INTEGER REFERENCES usuarios(id),
+    chave_idempotencia TEXT
+);
+
+CREATE TABLE IF NOT EXISTS itens_venda (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    venda_id INTEGER NOT NULL REFERENCES vendas(id) ON DELETE CASCADE,
+    produto_id INTEGER NOT NULL REFERENCES produtos(id),
+    quantidade INTEGER NOT NULL CHECK (quantidade > 0),
+    preco_unitario REAL NOT NULL,
+    subtotal REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS pagamentos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    venda_id INTEGER NOT NULL REFERENCES vendas(id) ON DELETE CASCADE,
+    forma_pagamento TEXT NOT NULL,
+    valor REAL NOT NULL,
+    numero_parcelas INTEGER,
+    valor_recebido REAL,
+    troco REAL
+);
+
+CREATE INDEX IF NOT EXISTS idx_movimentacoes_produto ON movimentacoes(produto_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_movimentacoes_data_hora ON movimentacoes(data_hora);
+CREATE INDEX IF NOT EXISTS idx_movimentacoes_produto_data_hora ON movimentacoes(produto_id, data_hora);
+CREATE INDEX IF NOT EXISTS idx_vendas_data_hora ON vendas(data_hora);
+CREATE INDEX IF NOT EXISTS idx_vendas_cliente ON vendas(cliente_id);
+CREATE INDEX IF NOT EXISTS idx_itens_venda_venda ON itens_venda(venda_id);
+CREATE INDEX IF NOT EXISTS idx_pagamentos_venda ON pagamentos(venda_id);
+
+CREATE TABLE IF NOT EXISTS exclusoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tabela TEXT NOT NULL,
+    registro_id INTEGER NOT NULL,
+    excluido_em TEXT NOT NULL DEFAULT {_AGORA}
+);
+
+CREATE INDEX IF NOT EXISTS idx_exclusoes_tabela_data ON exclusoes(tabela, excluido_em);
+
+CREATE TABLE IF NOT EXISTS reservas_estoque (
+    carrinho TEXT NOT NULL,
+    produto_id INTEGER NOT NULL REFERENCES produtos(id) ON DELETE CASCADE,
+    quantidade INTEGER NOT NULL CHECK (quantidade > 0),
+    expira_em TEXT NOT NULL,
+    PRIMARY KEY (carrinho, produto_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_reservas_estoque_produto ON reservas_estoque(produto_id, expira_em);
+"""
+
+# Tabelas com sincronização incremental (sql/005_sincronizacao_incremental.sql e
+# sql/010_sincronizacao_analitica.sql): updated_at mantido por gatilhos e
+# exclusões registradas em "exclusoes". {tabela: coluna que preenche updated_at
+# nas linhas já existentes}
+TABELAS_SINCRONIZADAS = {
+    "produtos": "created_at",
+    "clientes": "created_at",
+    "vendas": "data_hora",
+    "movimentacoes": "created_at",
+}
+
+
+def _esquema_sincronizacao(tabela: str) -> str:
+    return f"""
+CREATE INDEX IF NOT EXISTS idx_{tabela}_updated_at ON {tabela}(updated_at);
+
+CREATE TRIGGER IF NOT EXISTS trg_{tabela}_updated_at_insert AFTER INSERT ON {tabela}
+FOR EACH ROW WHEN NEW.updated_at IS NULL
+BEGIN
+    UPDATE {tabela} SET updated_at = {_AGORA} WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_{tabela}_updated_at AFTER UPDATE ON {tabela}
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE {tabela} SET updated_at = {_AGORA} WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_{tabela}_exclusao AFTER DELETE ON {tabela}
+FOR EACH ROW
+BEGIN
+    INSERT INTO exclusoes (tabela, registro_id) VALUES ('{tabela}', OLD.id);
+END;
+"""
+
+# Resumos diários de vendas (sql/009_resumos_vendas.sql), mantidos por gatilhos
+_ESQUEMA_RESUMOS = """
+CREATE TABLE IF NOT EXISTS resumo_vendas_produto (
+    dia TEXT NOT NULL,
+    produto_id INTEGER NOT NULL,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    faturamento REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, produto_id)
+);
+
+CREATE TABLE IF NOT EXISTS resumo_vendas_vendedor (
+    dia TEXT NOT NULL,
+    usuario_id INTEGER NOT NULL,
+    numero_vendas INTEGER NOT NULL DEFAULT 0,
+    faturamento REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, usuario_id)
+);
+
+CREATE TABLE IF NOT EXISTS resumo_vendas_pagamento (
+    dia TEXT NOT NULL,
+    forma_pagamento TEXT NOT NULL,
+    valor REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, forma_pagamento)
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_resumo_venda_inserida AFTER INSERT ON vendas
+FOR EACH ROW WHEN NEW.status <> 'cancelada'
+BEGIN
+    INSERT INTO resumo_vendas_vendedor (dia, usuario_id, numero_vendas, faturamento)
+    VALUES (substr(NEW.data_hora, 1, 10), NEW.usuario_id, 1, NEW.valor_final)
+    ON CONFLICT (dia, usuario_id) DO UPDATE
+    SET numero_vendas = numero_vendas + 1, faturamento = faturamento + excluded.faturamento;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_resumo_item_venda AFTER INSERT ON itens_venda
+FOR EACH ROW WHEN (SELECT status FROM vendas WHERE id = NEW.venda_id) <> 'cancelada'
+BEGIN
+    INSERT INTO resumo_vendas_produto (dia, produto_id, quantidade, faturamento)
+    VALUES ((SELECT substr(data_hora, 1, 10) FROM vendas WHERE id = NEW.venda_id),
+            NEW.produto_id, NEW.quantidade, NEW.subtotal)
+    ON CONFLICT (dia, produto_id) DO UPDATE
+    SET quantidade = quantidade + excluded.quantidade, faturamento = faturamento + excluded.faturamento;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_resumo_pagamento AFTER INSERT ON pagamentos
+FOR EACH ROW WHEN (SELECT status FROM vendas WHERE id = NEW.venda_id) <> 'cancelada'
+BEGIN
+    INSERT INTO resumo_vendas_pagamento (dia, forma_pagamento, valor)
+    VALUES ((SELECT substr(data_hora, 1, 10) FROM vendas WHERE id = NEW.venda_id),
+            NEW.forma_pagamento, NEW.valor)
+    ON CONFLICT (dia, forma_pagamento) DO UPDATE
+    SET valor = valor + excluded.valor;
+END;
+""" + "".join(
+    # Venda cancelada (sinal -1) ou reativada (sinal +1): a venda inteira sai ou volta
+    f"""
+CREATE TRIGGER IF NOT EXISTS trg_resumo_status_venda_{nome} AFTER UPDATE OF status ON vendas
+FOR EACH ROW WHEN {condicao}
+BEGIN
+    INSERT INTO resumo_vendas_vendedor (dia, usuario_id, numero_vendas, faturamento)
+    VALUES (substr(NEW.data_hora, 1, 10), NEW.usuario_id, {sinal}, {sinal} * NEW.valor_final)
+    ON CONFLICT (dia, usuario_id) DO UPDATE
+    SET numero_vendas = numero_vendas + excluded.numero_vendas, faturamento = faturamento + excluded.faturamento;
+
+    INSERT INTO resumo_vendas_produto (dia, produto_id, quantidade, faturamento)
+    SELECT substr(NEW.data_hora, 1, 10), produto_id, {sinal} * SUM(quantidade), {sinal} * SUM(subtotal)
+    FROM itens_venda WHERE venda_id = NEW.id GROUP BY produto_id
+    ON CONFLICT (dia, produto_id) DO UPDATE
+    SET quantidade = quantidade + excluded.quantidade, faturamento = faturamento + excluded.faturamento;
+
+    INSERT INTO resumo_vendas_pagamento (dia, forma_pagamento, valor)
+    SELECT substr(NEW.data_hora, 1, 10), forma_pagamento, {sinal} * SUM(valor)
+    FROM pagamentos WHERE venda_id = NEW.id GROUP BY forma_pagamento
+    ON CONFLICT (dia, forma_pagamento) DO UPDATE
+    SET valor = valor + excluded.valor;
+END;
+"""
+    for nome, sinal, condicao in (
+        ("cancelada", -1, "OLD.status <> 'cancelada' AND NEW.status = 'cancelada'"),
+        ("reativada", 1, "OLD.status = 'cancelada' AND NEW.status <> 'cancelada'"),
+    )
+)
+
+# Chaves estrangeiras usadas para resolver embeds: {tabela: {coluna: tabela_referenciada}}
+# O nome da constraint segue o padrão do Postgres: <tabela>_<coluna>_fkey
+CHAVES_ESTRANGEIRAS: Dict[str, Dict[str, str]] = {
+    "sessoes": {"usuario_id": "usuarios"},
+    "movimentacoes": {"produto_id": "produtos", "usuario_id": "usuarios"},
+    "vendas": {"cliente_id": "clientes", "usuario_id": "usuarios", "usuario_cancelamento_id": "usuarios"},
+    "itens_venda": {"venda_id": "vendas", "produto_id": "produtos"},
+    "pagamentos": {"venda_id": "vendas"},
+}
+
+_IDENTIFICADOR = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_TAMANHO_LOTE_IN = 500
+
+# Procedimentos disponíveis via rpc(): {nome: funcao(cliente, **params)}
+_PROCEDIMENTOS: Dict[str, Callable[..., Any]] = {}
+
+
+def registrar_procedimento(nome: str) -> Callable:
+    """
+    Decorador que registra um procedimento para ClienteSQLite.rpc().
+
+    O procedimento recebe o cliente como primeiro argumento e os parâmetros
+    da chamada como argumentos nomeados. Ele roda dentro de uma transação.
+
+    Args:
+        nome: Nome do procedimento (igual ao da função SQL no Postgres)
+    """
+    def decorador(funcao: Callable) -> Callable:
+        _PROCEDIMENTOS[nome] = funcao
+        return funcao
+    return decorador
+
+
+@dataclass
+class RespostaSQLite:
+    """Resposta no mesmo formato do APIResponse do postgrest (data e count)."""
+    data: Any
+    count: Optional[int] = None
+
+
+def _erro_api(codigo: str, mensagem: str, detalhes: Optional[str] = None) -> APIError:
+    """Cria um APIError no formato do PostgREST."""
+    return APIError({"code": codigo, "message": mensagem, "details": detalhes, "hint": None})
+
+
+def _converter_erro_sqlite(erro: sqlite3.Error) -> APIError:
+    """Converte erros do sqlite3 para os códigos equivalentes do Postgres."""
+    mensagem = str(erro)
+    if isinstance(erro, sqlite3.IntegrityError):
+        if "UNIQUE" in mensagem:
+            return _erro_api("23505", mensagem)
+        if "FOREIGN KEY" in mensagem:
+            return _erro_api("23503", mensagem)
+        if "NOT NULL" in mensagem:
+            return _erro_api("23502", mensagem)
+        if "CHECK" in mensagem:
+            return _erro_api("23514", mensagem)
+        return _erro_api("23000", mensagem)
+    if isinstance(erro, sqlite3.OperationalError):
+        if "locked" in mensagem or "busy" in mensagem:
+            return _erro_api("55P03", mensagem)
+        if "no such column" in mensagem:
+            return _erro_api("42703", mensagem)
+        if "no such table" in mensagem:
+            return _erro_api("42P01", mensagem)
+    return _erro_api("XX000", mensagem)
+
+
+def _validar_identificador(nome: str) -> str:
+    """Garante que o nome de tabela/coluna é seguro para compor SQL."""
+    if not _IDENTIFICADOR.match(nome or ""):
+        raise _erro_api("42703", f"Identificador inválido: {nome!r}")
+    return f'"{nome}"'
+
+
+def _valor_sql(valor: Any) -> Any:
+    """Converte valores Python para tipos aceitos pelo sqlite3."""
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor)
+    return valor
+
+
+def _dividir_nivel_superior(texto: str) -> List[str]:
+    """Divide por vírgulas fora de parênteses e aspas."""
+    partes = []
+    atual = []
+    profundidade = 0
+    entre_aspas = False
+    for caractere in texto:
+        if caractere == '"':
+            entre_aspas = not entre_aspas
+        elif not entre_aspas and caractere == "(":
+            profundidade += 1
+        elif not entre_aspas and caractere == ")":
+            profundidade -= 1
+        elif not entre_aspas and caractere == "," and profundidade == 0:
+            partes.append("".join(atual).strip())
+            atual = []
+            continue
+        atual.append(caractere)
+    if "".join(atual).strip():
+        partes.append("".join(atual).strip())
+    return partes
+
+
+def _analisar_selecao(texto: str) -> List[Tuple]:
+    """
+    Interpreta a string de select do PostgREST.
+
+    Returns:
+        Lista de itens: ("*",), ("coluna", nome, alias) ou
+        ("embed", alias, tabela, dica_fk, sub_itens)
+    """
+    itens = []
+    for parte in _dividir_nivel_superior(" ".join((texto or "*").split())):
+        parte = parte.replace(" ", "")
+        if not parte:
+            continue
+        if parte == "*":
+            itens.append(("*",))
+            continue
+
+        alias = None
+        if ":" in parte.split("(", 1)[0] and "::" not in parte.split("(", 1)[0]:
+            alias, parte = parte.split(":", 1)
+
+        if "(" in parte:
+            cabecalho, resto = parte.split("(", 1)
+            if not resto.endswith(")"):
+                raise _erro_api("PGRST100", f"Select inválido: {texto!r}")
+            tabela, _, dica = cabecalho.partition("!")
+            itens.append(("embed", alias or tabela, tabela, dica or None, _analisar_selecao(resto[:-1])))
+        else:
+            nome = parte.split("::", 1)[0]
+            itens.append(("coluna", nome, alias or nome))
+    return itens
+
+
+class ClienteSQLite:
+    """
+    Cliente com a mesma interface usada do cliente Supabase, sobre um arquivo SQLite.
+
+    Uma única conexão é compartilhada entre threads, protegida por um lock.
+    """
+
+    def __init__(self, caminho: str = ":memory:"):
+        self.caminho = caminho
+        self._lock = threading.RLock()
+        self._profundidade_transacao = 0
+        self.conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self.conexao.row_factory = sqlite3.Row
+        self.conexao.create_function("dobrar", 1, lambda s: s.casefold() if isinstance(s, str) else s, deterministic=True)
+        self.conexao.execute("PRAGMA foreign_keys = ON")
+        if caminho != ":memory:":
+            self.conexao.execute("PRAGMA journal_mode = WAL")
+            self.conexao.execute("PRAGMA synchronous = NORMAL")
+        self.conexao.executescript(_ESQUEMA)
+        self._colunas: Dict[str, Dict[str, str]] = {}
+        self._migrar_sincronizacao()
+        self._migrar_idempotencia()
+        self._migrar_resumos()
+
+    def _migrar_sincronizacao(self) -> None:
+        """Adiciona updated_at e os gatilhos de sincronização (também a bancos já existentes)."""
+        for tabela, coluna_inicial in TABELAS_SINCRONIZADAS.items():
+            if "updated_at" not in self.colunas(tabela):
+                self.conexao.execute(f"ALTER TABLE {tabela} ADD COLUMN updated_at TEXT")
+                self.conexao.execute(f"UPDATE {tabela} SET updated_at = {coluna_inicial}")
+                self._colunas.pop(tabela, None)
+            self.conexao.executescript(_esquema_sincronizacao(tabela))
+
+    def _migrar_idempotencia(self) -> None:
+        """Adiciona a chave de idempotência das vendas (também a bancos já existentes)."""
+        if "chave_idempotencia" not in self.colunas("vendas"):
+            self.conexao.execute("ALTER TABLE vendas ADD COLUMN chave_idempotencia TEXT")
+            self._colunas.pop("vendas", None)
+        self.conexao.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_vendas_chave_idempotencia ON vendas(chave_idempotencia)"
+        )
+
+    def _migrar_resumos(self) -> None:
+        """Cria os resumos diários de vendas, preenchendo-os em bancos que já têm vendas."""
+        existia = self.conexao.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'resumo_vendas_vendedor'"
+        ).fetchone()
+        self.conexao.executescript(_ESQUEMA_RESUMOS)
+        if not existia and self.conexao.execute("SELECT 1 FROM vendas LIMIT 1").fetchone():
+            with self.transacao():
+                _reconstruir_resumos_vendas(self)
+
+    def table(self, nome: str) -> "ConsultaSQLite":
+        """Inicia uma consulta na tabela (mesma assinatura do cliente Supabase)."""
+        return ConsultaSQLite(self, nome)
+
+    from_ = table
+
+    def rpc(self, nome: str, params: Optional[Dict[str, Any]] = None) -> "ChamadaProcedimento":
+        """Prepara a chamada de um procedimento registrado."""
+        return ChamadaProcedimento(self, nome, params or {})
+
+    def fechar(self) -> None:
+        """Fecha a conexão com o banco."""
+        with self._lock:
+            self.conexao.close()
+
+    @contextmanager
+    def transacao(self) -> Iterator[sqlite3.Connection]:
+        """Executa o bloco em uma transação (chamadas aninhadas reutilizam a externa)."""
+        with self._lock:
+            if self._profundidade_transacao > 0:
+                self._profundidade_transacao += 1
+                try:
+                    yield self.conexao
+                finally:
+                    self._profundidade_transacao -= 1
+                return
+
+            self.conexao.execute("BEGIN IMMEDIATE")
+            self._profundidade_transacao = 1
+            try:
+                yield self.conexao
+            except BaseException:
+                self.conexao.execute("ROLLBACK")
+                raise
+            else:
+                self.conexao.execute("COMMIT")
+            finally:
+                self._profundidade_transacao = 0
+
+    def colunas(self, tabela: str) -> Dict[str, str]:
+        """Retorna {coluna: tipo_declarado} da tabela."""
+        if tabela not in self._colunas:
+            _validar_identificador(tabela)
+            linhas = self.conexao.execute(f'PRAGMA table_info("{tabela}")').fetchall()
+            if not linhas:
+                raise _erro_api("42P01", f'relation "{tabela}" does not exist')
+            self._colunas[tabela] = {linha["name"]: (linha["type"] or "").upper() for linha in linhas}
+        return self._colunas[tabela]
+
+    def linha_para_dict(self, tabela: str, linha: sqlite3.Row) -> Dict[str, Any]:
+        """Converte uma linha do sqlite3 em dict, restaurando booleanos."""
+        tipos = self.colunas(tabela)
+        resultado = dict(linha)
+        for coluna, valor in resultado.items():
+            if valor is not None and tipos.get(coluna) == "BOOLEAN":
+                resultado[coluna] = bool(valor)
+        return resultado
+
+    def executar_sql(self, sql: str, parametros: Tuple = ()) -> List[sqlite3.Row]:
+        """Executa SQL convertendo erros do sqlite3 para APIError."""
+        with self._lock:
+            try:
+                return self.conexao.execute(sql, parametros).fetchall()
+            except sqlite3.Error as e:
+                raise _converter_erro_sqlite(e) from e
+
+
+class ChamadaProcedimento:
+    """Chamada preparada de um procedimento (equivalente ao rpc() do Supabase)."""
+
+    def __init__(self, cliente: ClienteSQLite, nome: str, params: Dict[str, Any]):
+        self.cliente = cliente
+        self.nome = nome
+        self.params = params
+
+    def execute(self) -> RespostaSQLite:
+        procedimento = _PROCEDIMENTOS.get(self.nome)
+        if procedimento is None:
+            raise _erro_api("PGRST202", f"Could not find the function public.{self.nome}")
+        try:
+            with self.cliente.transacao():
+                dados = procedimento(self.cliente, **self.params)
+        except sqlite3.Error as e:
+            raise _converter_erro_sqlite(e) from e
+        return RespostaSQLite(data=dados)
+
+
+class ConsultaSQLite:
+    """Construtor de consultas com a interface do query builder do postgrest."""
+
+    _OPERADORES = {
+        "eq": "=",
+        "neq": "<>",
+        "gt": ">",
+        "gte": ">=",
+        "lt": "<",
+        "lte": "<=",
+    }
+
+    def __init__(self, cliente: ClienteSQLite, tabela: str):
+        self.cliente = cliente
+        self.tabela = tabela
+        self._operacao = "select"
+        self._selecao = "*"
+        self._contagem: Optional[str] = None
+        self._somente_cabecalho = False
+        self._dados: Any = None
+        self._retornar = True
+        self._on_conflict: Optional[str] = None
+        self._ignorar_duplicados = False
+        self._filtros: List[Tuple[str, List[Any]]] = []
+        self._ordem: List[str] = []
+        self._limite: Optional[int] = None
+        self._deslocamento: Optional[int] = None
+        self._unico: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # Operações
+    # ------------------------------------------------------------------
+
+    def select(self, *colunas: str, count: Optional[str] = None, head: Optional[bool] = None) -> "ConsultaSQLite":
+        self._operacao = "select"
+        self._selecao = ",".join(colunas) if colunas else "*"
+        self._contagem = count
+        self._somente_cabecalho = bool(head)
+        return self
+
+    def insert(self, json: Any, count: Optional[str] = None, returning: str = "representation",
+               upsert: bool = False, default_to_null: bool = True) -> "ConsultaSQLite":
+        self._operacao = "upsert" if upsert else "insert"
+        self._dados = json
+        self._contagem = count
+        self._retornar = returning != "minimal"
+        return self
+
+    def upsert(self, json: Any, count: Optional[str] = None, returning: str = "representation",
+               ignore_duplicates: bool = False, on_conflict: str = "", default_to_null: bool = True) -> "ConsultaSQLite":
+        self._operacao = "upsert"
+        self._dados = json
+        self._contagem = count
+        self._retornar = returning != "minimal"
+        self._ignorar_duplicados = ignore_duplicates
+        self._on_conflict = on_conflict or None
+        return self
+
+    def update(self, json: Dict[str, Any], count: Optional[str] = None, returning: str = "representation") -> "ConsultaSQLite":
+        self._operacao = "update"
+        self._dados = json
+        self._contagem = count
+        self._retornar = returning != "minimal"
+        return self
+
+    def delete(self, count: Optional[str] = None, returning: str = "representation") -> "ConsultaSQLite":
+        self._operacao = "delete"
+        self._contagem = count
+        self._retornar = returning != "minimal"
+        return self
+
+    # ------------------------------------------------------------------
+    # Filtros
+    # ------------------------------------------------------------------
+
+    def _comparacao(self, coluna: str, operador: str, valor: Any) -> "ConsultaSQLite":
+        self._filtros.append(self._condicao(coluna, operador, valor))
+        return self
+
+    def eq(self, coluna: str, valor: Any) -> "ConsultaSQLite":
+        return self._comparacao(coluna, "eq", valor)
+
+    def neq(self, coluna: str, valor: Any) -> "ConsultaSQLite":
+        return self._comparacao(coluna, "neq", valor)
+
+    def gt(self, coluna: str, valor: Any) -> "ConsultaSQLite":
+        return self._comparacao(coluna, "gt", valor)
+
+    def gte(self, coluna: str, valor: Any) -> "ConsultaSQLite":
+        return self._comparacao(coluna, "gte", valor)
+
+    def lt(self, coluna: str, valor: Any) -> "ConsultaSQLite":
+        return self._comparacao(coluna, "lt", valor)
+
+    def lte(self, coluna: str, valor: Any) -> "ConsultaSQLite":
+        return self._comparacao(coluna, "lte", valor)
+
+    def like(self, coluna: str, padrao: str) -> "ConsultaSQLite":
+        return self._comparacao(coluna, "like", padrao)
+
+    def ilike(self, coluna: str, padrao: str) -> "ConsultaSQLite":
+        return self._comparacao(coluna, "ilike", padrao)
+
+    def is_(self, coluna: str, valor: Any) -> "ConsultaSQLite":
+        return self._comparacao(coluna, "is", valor)
+
+    def in_(self, coluna: str, valores: List[Any]) -> "ConsultaSQLite":
+        return self._comparacao(coluna, "in", list(valores))
+
+    def filter(self, coluna: str, operador: str, criterio: Any) -> "ConsultaSQLite":
+        """Filtro genérico no formato do PostgREST (ex: filter("preco", "gte", 10))."""
+        self._filtros.append(self._termo_postgrest(f"{coluna}.{operador}.{criterio}"))
+        return self
+
+    def or_(self, filtros: str, reference_table: Optional[str] = None) -> "ConsultaSQLite":
+        """Combina condições com OR, na sintaxe do PostgREST (ex: "nome.ilike.%ana%,cpf.eq.123")."""
+        self._filtros.append(self._grupo("OR", filtros))
+        return self
+
+    def _condicao(self, coluna: str, operador: str, valor: Any) -> Tuple[str, List[Any]]:
+        """Monta (sql, parametros) para uma condição simples."""
+        if coluna not in self.cliente.colunas(self.tabela):
+            raise _erro_api("42703", f'column {self.tabela}.{coluna} does not exist')
+        nome = _validar_identificador(coluna)
+
+        if operador in self._OPERADORES:
+            return f"{nome} {self._OPERADORES[operador]} ?", [_valor_sql(valor)]
+        if operador == "like":
+            return f"{nome} LIKE ?", [str(valor).replace("*", "%")]
+        if operador == "ilike":
+            return f"dobrar({nome}) LIKE dobrar(?)", [str(valor).replace("*", "%")]
+        if operador == "is":
+            texto = str(valor).lower()
+            if valor is None or texto == "null":
+                return f"{nome} IS NULL", []
+            if texto in ("true", "false"):
+                return f"{nome} IS ?", [1 if texto == "true" else 0]
+            raise _erro_api("PGRST100", f"Valor inválido para is: {valor!r}")
+        if operador == "in":
+            if not valor:
+                return "0", []
+            marcadores = ", ".join("?" for _ in valor)
+            return f"{nome} IN ({marcadores})", [_valor_sql(v) for v in valor]
+        raise _erro_api("PGRST100", f"Operador não suportado: {operador}")
+
+    def _termo_postgrest(self, termo: str) -> Tuple[str, List[Any]]:
+        """Interpreta um termo "coluna.operador.valor" (ou and(...)/or(...))."""
+        correspondencia = re.match(r"^(not\.)?(and|or)\((.*)\)$", termo, re.S)
+        if correspondencia:
+            sql, parametros = self._grupo(correspondencia.group(2).upper(), correspondencia.group(3))
+            if correspondencia.group(1):
+                sql = f"NOT {sql}"
+            return sql, parametros
+
+        partes = termo.split(".", 2)
+        if len(partes) < 3:
+            raise _erro_api("PGRST100", f"Filtro inválido: {termo!r}")
+        coluna, operador, valor = partes
+        negar = False
+        if operador == "not":
+            negar = True
+            operador, _, valor = valor.partition(".")
+
+        if operador == "in":
+            valor = [v.strip().strip('"') for v in _dividir_nivel_superior(valor.strip()[1:-1])]
+        elif len(valor) >= 2 and valor.startswith('"') and valor.endswith('"'):
+            valor = valor[1:-1]
+
+        sql, parametros = self._condicao(coluna, operador, valor)
+        if negar:
+            sql = f"NOT ({sql})"
+        return sql, parametros
+
+    def _grupo(self, juncao: str, texto: str) -> Tuple[str, List[Any]]:
+        """Combina vários termos PostgREST com AND/OR."""
+        partes_sql = []
+        parametros: List[Any] = []
+        for termo in _dividir_nivel_superior(texto):
+            sql, params = self._termo_postgrest(termo)
+            partes_sql.append(f"({sql})")
+            parametros.extend(params)
+        if not partes_sql:
+            return "1", []
+        return "(" + f" {juncao} ".join(partes_sql) + ")", parametros
+
+    # ------------------------------------------------------------------
+    # Ordenação e paginação
+    # ------------------------------------------------------------------
+
+    def order(self, coluna: str, desc: bool = False, nullsfirst: Optional[bool] = None,
+              foreign_table: Optional[str] = None) -> "ConsultaSQLite":
+        if coluna not in self.cliente.colunas(self.tabela):
+            raise _erro_api("42703", f'column {self.tabela}.{coluna} does not exist')
+        nome = _validar_identificador(coluna)
+        direcao = "DESC" if desc else "ASC"
+        # Padrão do Postgres: NULLs por último em ASC e primeiro em DESC
+        if nullsfirst is None:
+            nullsfirst = desc
+        self._ordem.append(f"({nome} IS NULL) {'DESC' if nullsfirst else 'ASC'}")
+        self._ordem.append(f"{nome} {direcao}")
+        return self
+
+    def limit(self, quantidade: int, foreign_table: Optional[str] = None) -> "ConsultaSQLite":
+        self._limite = int(quantidade)
+        return self
+
+    def offset(self, quantidade: int) -> "ConsultaSQLite":
+        self._deslocamento = int(quantidade)
+        return self
+
+    def range(self, inicio: int, fim: int, foreign_table: Optional[str] = None) -> "ConsultaSQLite":
+        self._deslocamento = int(inicio)
+        self._limite = int(fim) - int(inicio) + 1
+        return self
+
+    def single(self) -> "ConsultaSQLite":
+        self._unico = "single"
+        return self
+
+    def maybe_single(self) -> "ConsultaSQLite":
+        self._unico = "maybe_single"
+        return self
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+
+    def _where(self) -> Tuple[str, List[Any]]:
+        if not self._filtros:
+            return "", []
+        parametros: List[Any] = []
+        for _, params in self._filtros:
+            parametros.extend(params)
+        return " WHERE " + " AND ".join(f"({sql})" for sql, _ in self._filtros), parametros
+
+    def _paginacao(self) -> str:
+        sql = ""
+        if self._limite is not None:
+            sql += f" LIMIT {int(self._limite)}"
+        if self._deslocamento:
+            if self._limite is None:
+                sql += " LIMIT -1"
+            sql += f" OFFSET {int(self._deslocamento)}"
+        return sql
+
+    def execute(self) -> RespostaSQLite:
+        with self.cliente._lock:
+            try:
+                if self._operacao == "select":
+                    resposta = self._executar_select()
+                elif self._operacao in ("insert", "upsert"):
+                    resposta = self._executar_insert()
+                elif self._operacao == "update":
+                    resposta = self._executar_update()
+                else:
+                    resposta = self._executar_delete()
+            except sqlite3.Error as e:
+                raise _converter_erro_sqlite(e) from e
+
+        if self._unico:
+            if len(resposta.data) == 1:
+                resposta.data = resposta.data[0]
+            elif self._unico == "maybe_single" and not resposta.data:
+                resposta.data = None
+            else:
+                raise _erro_api("PGRST116", "JSON object requested, multiple (or no) rows returned")
+        return resposta
+
+    def _executar_select(self) -> RespostaSQLite:
+        tabela = _validar_identificador(self.tabela)
+        self.cliente.colunas(self.tabela)
+        where, parametros = self._where()
+        conexao = self.cliente.conexao
+
+        contagem = None
+        if self._contagem:
+            contagem = conexao.execute(f"SELECT COUNT(*) FROM {tabela}{where}", parametros).fetchone()[0]
+
+        if self._somente_cabecalho:
+            return RespostaSQLite(data=[], count=contagem)
+
+        ordem = f" ORDER BY {', '.join(self._ordem)}" if self._ordem else ""
+        linhas = conexao.execute(f"SELECT * FROM {tabela}{where}{ordem}{self._paginacao()}", parametros).fetchall()
+        registros = [self.cliente.linha_para_dict(self.tabela, linha) for linha in linhas]
+        dados = _montar_registros(self.cliente, self.tabela, registros, _analisar_selecao(self._selecao))
+        return RespostaSQLite(data=dados, count=contagem)
+
+    def _resposta_escrita(self, registros: List[Dict[str, Any]]) -> RespostaSQLite:
+        contagem = len(registros) if self._contagem else None
+        if not self._retornar:
+            return RespostaSQLite(data=[], count=contagem)
+        return RespostaSQLite(data=registros, count=contagem)
+
+    def _executar_insert(self) -> RespostaSQLite:
+        linhas = self._dados if isinstance(self._dados, list) else [self._dados]
+        if not linhas:
+            return self._resposta_escrita([])
+
+        colunas_tabela = self.cliente.colunas(self.tabela)
+        tabela = _validar_identificador(self.tabela)
+        conflito = [c.strip() for c in (self._on_conflict or "id").split(",") if c.strip()]
+
+        registros = []
+        with self.cliente.transacao() as conexao:
+            for linha in linhas:
+                for coluna in linha:
+                    if coluna not in colunas_tabela:
+                        raise _erro_api("PGRST204", f"Could not find the '{coluna}' column of '{self.tabela}'")
+                colunas = list(linha.keys())
+                nomes = ", ".join(_validar_identificador(c) for c in colunas)
+                marcadores = ", ".join("?" for _ in colunas)
+                valores = [_valor_sql(linha[c]) for c in colunas]
+
+                if not colunas:
+                    sql = f"INSERT INTO {tabela} DEFAULT VALUES"
+                else:
+                    sql = f"INSERT INTO {tabela} ({nomes}) VALUES ({marcadores})"
+                if self._operacao == "upsert" and colunas:
+                    alvo = ", ".join(_validar_identificador(c) for c in conflito)
+                    atualizar = [c for c in colunas if c not in conflito]
+                    if self._ignorar_duplicados or not atualizar:
+                        sql += f" ON CONFLICT ({alvo}) DO NOTHING"
+                    else:
+                        sets = ", ".join(f"{_validar_identificador(c)} = excluded.{_validar_identificador(c)}" for c in atualizar)
+                        sql += f" ON CONFLICT ({alvo}) DO UPDATE SET {sets}"
+                sql += " RETURNING *"
+
+                for resultado in conexao.execute(sql, valores).fetchall():
+                    registros.append(self.cliente.linha_para_dict(self.tabela, resultado))
+
+        return self._resposta_escrita(registros)
+
+    def _executar_update(self) -> RespostaSQLite:
+        colunas_tabela = self.cliente.colunas(self.tabela)
+        for coluna in self._dados:
+            if coluna not in colunas_tabela:
+                raise _erro_api("PGRST204", f"Could not find the '{coluna}' column of '{self.tabela}'")
+        if not self._dados:
+            return self._resposta_escrita([])
+
+        tabela = _validar_identificador(self.tabela)
+        sets = ", ".join(f"{_validar_identificador(c)} = ?" for c in self._dados)
+        valores = [_valor_sql(v) for v in self._dados.values()]
+        where, parametros = self._where()
+        linhas = self.cliente.conexao.execute(
+            f"UPDATE {tabela} SET {sets}{where} RETURNING *", valores + parametros
+        ).fetchall()
+        return self._resposta_escrita([self.cliente.linha_para_dict(self.tabela, l) for l in linhas])
+
+    def _executar_delete(self) -> RespostaSQLite:
+        tabela = _validar_identificador(self.tabela)
+        self.cliente.colunas(self.tabela)
+        where, parametros = self._where()
+        linhas = self.cliente.conexao.execute(f"DELETE FROM {tabela}{where} RETURNING *", parametros).fetchall()
+        return self._resposta_escrita([self.cliente.linha_para_dict(self.tabela, l) for l in linhas])
+
+
+def _buscar_por_coluna(cliente: ClienteSQLite, tabela: str, coluna: str, valores: List[Any]) -> List[Dict[str, Any]]:
+    """Busca as linhas de `tabela` cujo `coluna` está em `valores` (em lotes)."""
+    valores = [v for v in dict.fromkeys(valores) if v is not None]
+    nome_tabela = _validar_identificador(tabela)
+    nome_coluna = _validar_identificador(coluna)
+    registros = []
+    for i in range(0, len(valores), _TAMANHO_LOTE_IN):
+        lote = valores[i:i + _TAMANHO_LOTE_IN]
+        marcadores = ", ".join("?" for _ in lote)
+        linhas = cliente.conexao.execute(
+            f"SELECT * FROM {nome_tabela} WHERE {nome_coluna} IN ({marcadores}) ORDER BY id", lote
+        ).fetchall()
+        registros.extend(cliente.linha_para_dict(tabela, linha) for linha in linhas)
+    return registros
+
+
+def _resolver_embed(cliente: ClienteSQLite, tabela: str, registros: List[Dict[str, Any]],
+                    alvo: str, dica: Optional[str], sub_itens: List[Tuple]) -> List[Any]:
+    """Resolve um embed para cada registro (dict para N:1, lista para 1:N)."""
+
+    def combina(tabela_fk: str, coluna: str) -> bool:
+        return dica is None or dica in (coluna, f"{tabela_fk}_{coluna}_fkey")
+
+    # Relação N:1 (tabela -> alvo)
+    candidatas = [c for c, ref in CHAVES_ESTRANGEIRAS.get(tabela, {}).items() if ref == alvo and combina(tabela, c)]
+    if len(candidatas) > 1:
+        raise _erro_api("PGRST201", f"More than one relationship was found for '{tabela}' and '{alvo}'")
+    if candidatas:
+        coluna = candidatas[0]
+        relacionados = _buscar_por_coluna(cliente, alvo, "id", [r.get(coluna) for r in registros])
+        montados = _montar_registros(cliente, alvo, relacionados, sub_itens)
+        por_id = {original["id"]: montado for original, montado in zip(relacionados, montados)}
+        return [por_id.get(r.get(coluna)) for r in registros]
+
+    # Relação 1:N (alvo -> tabela)
+    candidatas = [c for c, ref in CHAVES_ESTRANGEIRAS.get(alvo, {}).items() if ref == tabela and combina(alvo, c)]
+    if len(candidatas) > 1:
+        raise _erro_api("PGRST201", f"More than one relationship was found for '{tabela}' and '{alvo}'")
+    if candidatas:
+        coluna = candidatas[0]
+        relacionados = _buscar_por_coluna(cliente, alvo, coluna, [r.get("id") for r in registros])
+        montados = _montar_registros(cliente, alvo, relacionados, sub_itens)
+        por_pai: Dict[Any, List[Dict[str, Any]]] = {}
+        for original, montado in zip(relacionados, montados):
+            por_pai.setdefault(original[coluna], []).append(montado)
+        return [por_pai.get(r.get("id"), []) for r in registros]
+
+    raise _erro_api("PGRST200", f"Could not find a relationship between '{tabela}' and '{alvo}'")
+
+
+def _montar_registros(cliente: ClienteSQLite, tabela: str, registros: List[Dict[str, Any]],
+                      itens: List[Tuple]) -> List[Dict[str, Any]]:
+    """Aplica a projeção do select (colunas, aliases e embeds) aos registros."""
+    colunas_tabela = cliente.colunas(tabela)
+    embeds = {}
+    for item in itens:
+        if item[0] == "embed":
+            _, alias, alvo, dica, sub_itens = item
+            embeds[alias] = _resolver_embed(cliente, tabela, registros, alvo, dica, sub_itens)
+        elif item[0] == "coluna" and item[1] not in colunas_tabela:
+            raise _erro_api("42703", f"column {tabela}.{item[1]} does not exist")
+
+    resultado = []
+    for indice, registro in enumerate(registros):
+        saida = {}
+        for item in itens:
+            if item[0] == "*":
+                saida.update(registro)
+            elif item[0] == "coluna":
+                saida[item[2]] = registro.get(item[1])
+            else:
+                saida[item[1]] = embeds[item[1]][indice]
+        resultado.append(saida)
+    return resultado
+
+
+# Procedimentos equivalentes às funções SQL do Postgres (pasta sql/)
+
+def _mover_estoque(cliente: ClienteSQLite, produto_id: int, tipo: str, quantidade: int,
+                   observacao: Optional[str], usuario_id: Optional[int],
+                   indice: Optional[int] = None) -> Dict[str, Any]:
+    """Atualiza a quantidade do produto e insere a movimentação (dentro da transação atual)."""
+    detalhe = None if indice is None else str(indice)
+    if tipo not in ("entrada", "saida", "ajuste"):
+        raise _erro_api("22023", f"Tipo de movimentação inválido: {tipo}", detalhe)
+    if quantidade is None or quantidade <= 0:
+        raise _erro_api("22023", f"Quantidade inválida: {quantidade}", detalhe)
+
+    linha = cliente.conexao.execute(
+        "SELECT quantidade FROM produtos WHERE id = ?", (produto_id,)
+    ).fetchone()
+    if linha is None:
+        raise _erro_api("P0002", f"Produto não encontrado: {produto_id}", detalhe)
+
+    anterior = linha["quantidade"]
+    if tipo == "entrada":
+        nova = anterior + quantidade
+    elif tipo == "saida":
+        nova = anterior - quantidade
+    else:
+        nova = quantidade
+
+    cliente.conexao.execute("UPDATE produtos SET quantidade = ? WHERE id = ?", (nova, produto_id))
+    cursor = cliente.conexao.execute(
+        "INSERT INTO movimentacoes (produto_id, tipo, quantidade, quantidade_anterior, quantidade_nova, observacao, usuario_id) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (produto_id, tipo, quantidade, anterior, nova, observacao, usuario_id)
+    )
+    return {"movimentacao_id": cursor.lastrowid, "quantidade_anterior": anterior, "quantidade_nova": nova}
+
+
+@registrar_procedimento("aplicar_movimentacao")
+def _aplicar_movimentacao(cliente: ClienteSQLite, p_produto_id: int, p_tipo: str, p_quantidade: int,
+                          p_observacao: Optional[str] = None, p_usuario_id: Optional[int] = None) -> Dict[str, Any]:
+    """Equivalente de sql/001_aplicar_movimentacao.sql."""
+    return _mover_estoque(cliente, p_produto_id, p_tipo, p_quantidade, p_observacao, p_usuario_id)
+
+
+@registrar_procedimento("aplicar_movimentacoes_lote")
+def _aplicar_movimentacoes_lote(cliente: ClienteSQLite, p_movimentacoes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Equivalente de sql/002_aplicar_movimentacoes_lote.sql (todas ou nenhuma)."""
+    resultados = []
+    for indice, item in enumerate(p_movimentacoes):
+        resultado = _mover_estoque(
+            cliente, item.get("produto_id"), item.get("tipo"), item.get("quantidade"),
+            item.get("observacao"), item.get("usuario_id"), indice
+        )
+        resultados.append({"produto_id": item.get("produto_id"), **resultado})
+    return resultados
+
+
+@registrar_procedimento("registrar_venda_completa")
+def _registrar_venda_completa(cliente: ClienteSQLite, p_venda: Dict[str, Any], p_itens: List[Dict[str, Any]],
+                              p_pagamentos: List[Dict[str, Any]], p_validar_estoque: bool = True) -> Dict[str, Any]:
+    """Equivalente de sql/003_registrar_venda_completa.sql e 007_vendas_idempotencia.sql."""
+    if not p_itens:
+        raise _erro_api("22023", "Venda sem itens")
+
+    chave = p_venda.get("chave_idempotencia")
+    carrinho = p_venda.get("carrinho")
+    if chave is not None:
+        existente = cliente.conexao.execute(
+            "SELECT id FROM vendas WHERE chave_idempotencia = ?", (chave,)
+        ).fetchone()
+        if existente is not None:
+            return {"venda_id": existente["id"], "repetida": True}
+
+    if p_validar_estoque:
+        solicitado: Dict[Any, int] = {}
+        for item in p_itens:
+            solicitado[item["produto_id"]] = solicitado.get(item["produto_id"], 0) + item["quantidade"]
+
+        # Disponível = estoque - reservas ativas de outros carrinhos
+        agora = cliente.conexao.execute(f"SELECT {_AGORA}").fetchone()[0]
+        faltas = []
+        for produto_id, quantidade in solicitado.items():
+            linha = cliente.conexao.execute(
+                "SELECT descricao, quantidade FROM produtos WHERE id = ?", (produto_id,)
+            ).fetchone()
+            reservado = cliente.conexao.execute(
+                "SELECT COALESCE(SUM(quantidade), 0) FROM reservas_estoque "
+                "WHERE produto_id = ? AND expira_em > ? AND carrinho IS NOT ?",
+                (produto_id, agora, carrinho)
+            ).fetchone()[0]
+            if linha is None or quantidade > linha["quantidade"] - reservado or linha["quantidade"] <= 0:
+                faltas.append({
+                    "produto_id": produto_id,
+                    "descricao": linha["descricao"] if linha else None,
+                    "disponivel": max(linha["quantidade"] - reservado, 0) if linha else None,
+                    "solicitado": quantidade,
+                })
+        if faltas:
+            raise _erro_api("DK001", "Estoque insuficiente", json.dumps(faltas))
+
+    venda = {
+        "valor_total": p_venda["valor_total"],
+        "desconto_percentual": p_venda.get("desconto_percentual") or 0,
+        "desconto_valor": p_venda.get("desconto_valor") or 0,
+        "valor_final": p_venda["valor_final"],
+        "cliente_id": p_venda.get("cliente_id"),
+        "usuario_id": p_venda.get("usuario_id"),
+        "status": p_venda.get("status") or "finalizada",
+        "chave_idempotencia": chave,
+    }
+    venda_id = cliente.table("vendas").insert(venda).execute().data[0]["id"]
+
+    cliente.table("itens_venda").insert([
+        {
+            "venda_id": venda_id,
+            "produto_id": item["produto_id"],
+            "quantidade": item["quantidade"],
+            "preco_unitario": item["preco_unitario"],
+            "subtotal": item["subtotal"],
+        }
+        for item in p_itens
+    ]).execute()
+
+    if p_pagamentos:
+        cliente.table("pagamentos").insert([
+            {
+                "venda_id": venda_id,
+                "forma_pagamento": pagamento["forma_pagamento"],
+                "valor": pagamento["valor"],
+                "numero_parcelas": pagamento.get("numero_parcelas"),
+                "valor_recebido": pagamento.get("valor_recebido"),
+                "troco": pagamento.get("troco"),
+            }
+            for pagamento in p_pagamentos
+        ]).execute()
+
+    _aplicar_movimentacoes_lote(cliente, [
+        {
+            "produto_id": item["produto_id"],
+            "tipo": "saida",
+            "quantidade": item["quantidade"],
+            "observacao": f"Venda #{venda_id}",
+            "usuario_id": p_venda.get("usuario_id"),
+        }
+        for item in p_itens
+    ])
+
+    # As unidades reservadas pelo carrinho acabaram de ser vendidas
+    if carrinho is not None:
+        cliente.conexao.execute("DELETE FROM reservas_estoque WHERE carrinho = ?", (carrinho,))
+
+    return {"venda_id": venda_id}
+
+
+@registrar_procedimento("reservar_estoque")
+def _reservar_estoque(cliente: ClienteSQLite, p_carrinho: str, p_produto_id: int, p_quantidade: int,
+                      p_validade_segundos: int = 900) -> Dict[str, Any]:
+    """Equivalente de sql/006_reservas_estoque.sql (reservar_estoque)."""
+    if p_quantidade is None or p_quantidade < 0:
+        raise _erro_api("22023", f"Quantidade inválida: {p_quantidade}")
+
+    conexao = cliente.conexao
+    linha = conexao.execute("SELECT quantidade FROM produtos WHERE id = ?", (p_produto_id,)).fetchone()
+    if linha is None:
+        raise _erro_api("P0002", f"Produto não encontrado: {p_produto_id}")
+
+    agora = conexao.execute(f"SELECT {_AGORA}").fetchone()[0]
+    expira_em = conexao.execute(
+        "SELECT strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime', ?)", (f"+{int(p_validade_segundos)} seconds",)
+    ).fetchone()[0]
+
+    conexao.execute("DELETE FROM reservas_estoque WHERE produto_id = ? AND expira_em <= ?", (p_produto_id, agora))
+    reservado_outros = conexao.execute(
+        "SELECT COALESCE(SUM(quantidade), 0) FROM reservas_estoque WHERE produto_id = ? AND carrinho <> ?",
+        (p_produto_id, p_carrinho)
+    ).fetchone()[0]
+    atual = conexao.execute(
+        "SELECT quantidade FROM reservas_estoque WHERE produto_id = ? AND carrinho = ?",
+        (p_produto_id, p_carrinho)
+    ).fetchone()
+
+    disponivel = max(linha["quantidade"] - reservado_outros, 0)
+    if p_quantidade > disponivel and p_quantidade > (atual["quantidade"] if atual else 0):
+        return {"reservado": False, "disponivel": disponivel}
+
+    if p_quantidade == 0:
+        conexao.execute(
+            "DELETE FROM reservas_estoque WHERE carrinho = ? AND produto_id = ?", (p_carrinho, p_produto_id)
+        )
+    else:
+        conexao.execute(
+            "INSERT INTO reservas_estoque (carrinho, produto_id, quantidade, expira_em) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (carrinho, produto_id) DO UPDATE SET quantidade = excluded.quantidade, expira_em = excluded.expira_em",
+            (p_carrinho, p_produto_id, p_quantidade, expira_em)
+        )
+    conexao.execute("UPDATE reservas_estoque SET expira_em = ? WHERE carrinho = ?", (expira_em, p_carrinho))
+
+    return {"reservado": True, "disponivel": disponivel}
+
+
+@registrar_procedimento("liberar_reservas")
+def _liberar_reservas(cliente: ClienteSQLite, p_carrinho: str, p_produto_id: Optional[int] = None) -> int:
+    """Equivalente de sql/006_reservas_estoque.sql (liberar_reservas)."""
+    cursor = cliente.conexao.execute(
+        "DELETE FROM reservas_estoque WHERE carrinho = ? AND (? IS NULL OR produto_id = ?)",
+        (p_carrinho, p_produto_id, p_produto_id)
+    )
+    return cursor.rowcount
+
+
+@registrar_procedimento("produtos_sem_movimentacao")
+def _produtos_sem_movimentacao(cliente: ClienteSQLite, p_desde: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Equivalente de sql/008_produtos_sem_movimentacao.sql."""
+    linhas = cliente.conexao.execute(
+        "SELECT p.*, u.ultima_movimentacao, u.ultima_data_hora "
+        "FROM produtos p "
+        "LEFT JOIN ("
+        "    SELECT produto_id, MAX(created_at) AS ultima_movimentacao, MAX(data_hora) AS ultima_data_hora"
+        "    FROM movimentacoes GROUP BY produto_id"
+        ") u ON u.produto_id = p.id "
+        "WHERE ? IS NULL OR u.produto_id IS NULL "
+        "   OR (u.ultima_movimentacao < ? AND u.ultima_data_hora < ?) "
+        "ORDER BY p.id",
+        (p_desde, p_desde, p_desde)
+    ).fetchall()
+    return [cliente.linha_para_dict("produtos", linha) for linha in linhas]
+
+
+@registrar_procedimento("reconstruir_resumos_vendas")
+def _reconstruir_resumos_vendas(cliente: ClienteSQLite, p_inicio: Optional[str] = None,
+                                p_fim: Optional[str] = None) -> Dict[str, Any]:
+    """Equivalente de sql/009_resumos_vendas.sql."""
+    intervalo = (p_inicio or "0000-00-00", p_fim or "9999-99-99")
+    for tabela in ("resumo_vendas_produto", "resumo_vendas_vendedor", "resumo_vendas_pagamento"):
+        cliente.conexao.execute(f"DELETE FROM {tabela} WHERE dia BETWEEN ? AND ?", intervalo)
+
+    cliente.conexao.execute(
+        "INSERT INTO resumo_vendas_vendedor (dia, usuario_id, numero_vendas, faturamento) "
+        "SELECT substr(data_hora, 1, 10), usuario_id, COUNT(*), SUM(valor_final) FROM vendas "
+        "WHERE status <> 'cancelada' AND substr(data_hora, 1, 10) BETWEEN ? AND ? "
+        "GROUP BY 1, 2",
+        intervalo
+    )
+    cliente.conexao.execute(
+        "INSERT INTO resumo_vendas_produto (dia, produto_id, quantidade, faturamento) "
+        "SELECT substr(v.data_hora, 1, 10), i.produto_id, SUM(i.quantidade), SUM(i.subtotal) "
+        "FROM itens_venda i JOIN vendas v ON v.id = i.venda_id "
+        "WHERE v.status <> 'cancelada' AND substr(v.data_hora, 1, 10) BETWEEN ? AND ? "
+        "GROUP BY 1, 2",
+        intervalo
+    )
+    cliente.conexao.execute(
+        "INSERT INTO resumo_vendas_pagamento (dia, forma_pagamento, valor) "
+        "SELECT substr(v.data_hora, 1, 10), p.forma_pagamento, SUM(p.valor) "
+        "FROM pagamentos p JOIN vendas v ON v.id = p.venda_id "
+        "WHERE v.status <> 'cancelada' AND substr(v.data_hora, 1, 10) BETWEEN ? AND ? "
+        "GROUP BY 1, 2",
+        intervalo
+    )
+    dias = cliente.conexao.execute(
+        "SELECT COUNT(DISTINCT dia) FROM resumo_vendas_vendedor WHERE dia BETWEEN ? AND ?", intervalo
+    ).fetchone()[0]
+    return {"dias": dias}
+
+
+def _cortes_resumos(p_dia_inicio: Optional[str], p_dia_fim: Optional[str]) -> Tuple[str, str]:
+    """Vendas lidas antes do primeiro corte e a partir do segundo; entre eles, os resumos."""
+    if not p_dia_inicio or not p_dia_fim:
+        return "9999", "9999"
+    seguinte = date.fromordinal(date.fromisoformat(p_dia_fim).toordinal() + 1)
+    return f"{p_dia_inicio}T00:00:00", f"{seguinte.isoformat()}T00:00:00"
+
+
+@registrar_procedimento("resumo_vendas_periodo")
+def _resumo_vendas_periodo(cliente: ClienteSQLite, p_inicio: str, p_fim: str, p_usuario_id: Optional[int] = None,
+                           p_forma_pagamento: Optional[str] = None, p_dia_inicio: Optional[str] = None,
+                           p_dia_fim: Optional[str] = None) -> Dict[str, Any]:
+    """Equivalente de sql/011_relatorios_vendas.sql."""
+    de, ate = _cortes_resumos(p_dia_inicio, p_dia_fim)
+    vendas_lidas = (
+        "SELECT v.id, v.valor_final FROM vendas v "
+        "WHERE ((v.data_hora >= ? AND v.data_hora < ?) OR v.data_hora >= ?) AND v.data_hora <= ? "
+        "AND v.status <> 'cancelada' AND (? IS NULL OR v.usuario_id = ?) "
+        "AND (? IS NULL OR EXISTS (SELECT 1 FROM pagamentos f WHERE f.venda_id = v.id AND f.forma_pagamento = ?))"
+    )
+    parametros = (p_inicio, de, ate, p_fim, p_usuario_id, p_usuario_id, p_forma_pagamento, p_forma_pagamento)
+    dias = (p_dia_inicio, p_dia_fim)
+
+    numero_vendas, faturamento = cliente.conexao.execute(
+        f"SELECT COALESCE(SUM(numero_vendas), 0), ROUND(COALESCE(SUM(faturamento), 0), 2) FROM ("
+        f"    SELECT COUNT(*) AS numero_vendas, SUM(valor_final) AS faturamento FROM ({vendas_lidas})"
+        f"    UNION ALL"
+        f"    SELECT SUM(numero_vendas), SUM(faturamento) FROM resumo_vendas_vendedor WHERE dia BETWEEN ? AND ?"
+        f")",
+        parametros + dias
+    ).fetchone()
+    formas = cliente.conexao.execute(
+        f"SELECT forma_pagamento, ROUND(SUM(valor), 2) FROM ("
+        f"    SELECT p.forma_pagamento, p.valor FROM pagamentos p JOIN ({vendas_lidas}) v ON v.id = p.venda_id"
+        f"    UNION ALL"
+        f"    SELECT forma_pagamento, valor FROM resumo_vendas_pagamento WHERE dia BETWEEN ? AND ?"
+        f") GROUP BY forma_pagamento HAVING ROUND(SUM(valor), 2) <> 0 ORDER BY forma_pagamento",
+        parametros + dias
+    ).fetchall()
+
+    return {
+        "faturamento_total": faturamento,
+        "numero_vendas": numero_vendas,
+        "ticket_medio": faturamento / numero_vendas if numero_vendas > 0 else 0,
+        "distribuicao_pagamento": [
+            {"forma_pagamento": forma, "valor": valor,
+             "percentual": valor * 100 / faturamento if faturamento > 0 else 0}
+            for forma, valor in formas
+        ]
+    }
+
+
+@registrar_procedimento("resumo_vendas_por_vendedor")
+def _resumo_vendas_por_vendedor(cliente: ClienteSQLite, p_inicio: str, p_fim: str, p_dia_inicio: Optional[str] = None,
+                                p_dia_fim: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Equivalente de sql/011_relatorios_vendas.sql."""
+    de, ate = _cortes_resumos(p_dia_inicio, p_dia_fim)
+    linhas = cliente.conexao.execute(
+        "SELECT x.usuario_id, u.username, x.numero_vendas, ROUND(x.faturamento, 2) FROM ("
+        "    SELECT usuario_id, SUM(numero_vendas) AS numero_vendas, SUM(faturamento) AS faturamento FROM ("
+        "        SELECT usuario_id, COUNT(*) AS numero_vendas, SUM(valor_final) AS faturamento FROM vendas "
+        "        WHERE ((data_hora >= ? AND data_hora < ?) OR data_hora >= ?) AND data_hora <= ? "
+        "          AND status <> 'cancelada' GROUP BY usuario_id"
+        "        UNION ALL"
+        "        SELECT usuario_id, SUM(numero_vendas), SUM(faturamento) FROM resumo_vendas_vendedor "
+        "        WHERE dia BETWEEN ? AND ? GROUP BY usuario_id"
+        "    ) GROUP BY usuario_id HAVING SUM(numero_vendas) > 0"
+        ") x LEFT JOIN usuarios u ON u.id = x.usuario_id "
+        "ORDER BY x.faturamento DESC, x.usuario_id",
+        (p_inicio, de, ate, p_fim, p_dia_inicio, p_dia_fim)
+    ).fetchall()
+
+    total = sum(faturamento for _, _, _, faturamento in linhas)
+    return [
+        {
+            "usuario_id": usuario_id,
+            "nome_vendedor": username or f"Usuário {usuario_id}",
+            "numero_vendas": numero_vendas,
+            "faturamento_total": faturamento,
+            "ticket_medio": faturamento / numero_vendas,
+            "percentual_participacao": faturamento * 100 / total if total > 0 else 0
+        }
+        for usuario_id, username, numero_vendas, faturamento in linhas
+    ]
+
+
+@registrar_procedimento("listar_vendas_periodo")
+def _listar_vendas_periodo(cliente: ClienteSQLite, p_inicio: str, p_fim: str, p_usuario_id: Optional[int] = None,
+                           p_forma_pagamento: Optional[str] = None, p_apos_data_hora: Optional[str] = None,
+                           p_apos_id: Optional[int] = None, p_limite: int = 100) -> List[Dict[str, Any]]:
+    """Equivalente de sql/011_relatorios_vendas.sql."""
+    linhas = cliente.conexao.execute(
+        "SELECT v.id, v.data_hora, v.valor_total, v.desconto_valor, v.desconto_percentual, v.valor_final, "
+        "       v.status, c.nome AS cliente_nome, u.username AS vendedor_nome "
+        "FROM vendas v "
+        "LEFT JOIN clientes c ON c.id = v.cliente_id "
+        "LEFT JOIN usuarios u ON u.id = v.usuario_id "
+        "WHERE v.data_hora >= ? AND v.data_hora <= ? "
+        "  AND (? IS NULL OR (v.data_hora, v.id) > (?, ?)) "
+        "  AND (? IS NULL OR v.usuario_id = ?) "
+        "  AND (? IS NULL OR EXISTS (SELECT 1 FROM pagamentos f WHERE f.venda_id = v.id AND f.forma_pagamento = ?)) "
+        "ORDER BY v.data_hora, v.id LIMIT ?",
+        (p_inicio, p_fim, p_apos_data_hora, p_apos_data_hora, p_apos_id, p_usuario_id, p_usuario_id,
+         p_forma_pagamento, p_forma_pagamento, p_limite)
+    ).fetchall()
+    vendas = [dict(linha) for linha in linhas]
+
+    pagamentos = _buscar_por_coluna(cliente, "pagamentos", "venda_id", [venda["id"] for venda in vendas])
+    por_venda: Dict[int, List[Dict[str, Any]]] = {}
+    for pagamento in pagamentos:
+        por_venda.setdefault(pagamento["venda_id"], []).append({
+            "venda_id": pagamento["venda_id"],
+            "forma_pagamento": pagamento["forma_pagamento"],
+            "valor": pagamento["valor"],
+            "numero_parcelas": pagamento["numero_parcelas"]
+        })
+    for venda in vendas:
+        venda["pagamentos"] = por_venda.get(venda["id"], [])
+    return vendas
+
+
+def criar_cliente_sqlite(caminho: str) -> ClienteSQLite:
+    """
+    Cria o cliente SQLite, criando o arquivo e o esquema se necessário.
+
+    Args:
+        caminho: Caminho do arquivo do banco (ou ":memory:")
+
+    Returns:
+        ClienteSQLite pronto para uso
+    """
+    return ClienteSQLite(caminho)
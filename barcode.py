@@ -11,6 +11,7 @@ import qrcode
 from io import BytesIO
 from typing import Optional
 import database
+from cache_catalogo import catalogo
 from logging_config import registrar_erro, registrar_info
 
 
@@ -88,6 +89,11 @@ def buscar_por_codigo(codigo: str) -> Optional[dict]:
     """
     Busca produto por código de barras.
     
+    Consulta o índice de códigos do cache do catálogo (dicionário em memória,
+    O(1)); o banco só é consultado se o código não estiver no cache.
+    Chamada a cada leitura do leitor: registra apenas códigos inválidos,
+    não encontrados e erros.
+    
     Args:
         codigo: Código de barras do produto
         
@@ -100,25 +106,14 @@ def buscar_por_codigo(codigo: str) -> Optional[dict]:
         ...     print(produto['descricao'])
     """
     try:
-        # Validar formato do código antes de buscar
+        # Validar formato do código antes de buscar (validar_codigo_barras já registra o motivo)
         if not validar_codigo_barras(codigo):
-            registrar_info(
-                "barcode",
-                "buscar_por_codigo",
-                f"Tentativa de busca com código inválido: {codigo}"
-            )
             return None
         
-        # Buscar produto no banco de dados
-        response = database.supabase.table("produtos").select("*").eq("codigo_barras", codigo).execute()
+        # Buscar produto (cache do catálogo, depois banco de dados)
+        produto = catalogo.obter_por_codigo_barras(codigo)
         
-        if response.data and len(response.data) > 0:
-            produto = response.data[0]
-            registrar_info(
-                "barcode",
-                "buscar_por_codigo",
-                f"Produto encontrado: {produto.get('descricao')} (ID: {produto.get('id')})"
-            )
+        if produto:
             return produto
         else:
             registrar_info(
@@ -162,10 +157,10 @@ def gerar_qrcode(produto_id: int) -> Optional[bytes]:
         ...         f.write(qr_bytes)
     """
     try:
-        # Buscar produto no banco de dados
-        response = database.supabase.table("produtos").select("*").eq("id", produto_id).execute()
+        # Buscar produto (cache do catálogo, depois banco de dados)
+        produto = catalogo.obter(produto_id)
         
-        if not response.data or len(response.data) == 0:
+        if not produto:
             registrar_info(
                 "barcode",
                 "gerar_qrcode",
@@ -173,8 +168,6 @@ def gerar_qrcode(produto_id: int) -> Optional[bytes]:
             )
             return None
         
-        produto = response.data[0]
-        
         # Criar dados para o QR code em formato JSON
         import json
         qr_data = json.dumps({
@@ -0,0 +1,455 @@
+"""
+Cache do Catálogo de Produtos - Sistema DEKIDS
+
+Cache em memória, compartilhado pelo processo, da tabela produtos. As telas de
+estoque, PDV, busca, código de barras e QR code consultam o cache antes do
+banco, evitando leituras repetidas do mesmo catálogo.
+
+- Produtos indexados por id, com índice secundário por código de barras
+- Carga completa do catálogo (em lotes) com validade (TTL)
+- Ao fim da validade, sincronização incremental: apenas os produtos alterados
+  ou excluídos desde a última leitura (updated_at e tabela exclusoes) são
+  baixados, em vez do catálogo inteiro
+- Escritas deste terminal atualizam o cache: cadastros e edições gravam o
+  produto devolvido pelo banco, exclusões o removem e movimentações atualizam
+  a quantidade; o que não vem completo (vendas) marca o produto como
+  desatualizado, relido sob demanda em uma única consulta
+- A validade cobre as escritas feitas por outros terminais
+- Índices de busca e de sugestões (indice_busca) mantidos junto com o cache
+- Códigos de barras inexistentes ficam em cache por VALIDADE_NEGATIVA
+  segundos, para leituras repetidas do leitor não irem ao banco
+- Sincronização em segundo plano (iniciar_sincronizacao): carrega o catálogo
+  ao iniciar e aplica as alterações periodicamente, mantendo as consultas do
+  PDV em memória
+- Contadores de acertos e faltas para monitoramento
+"""
+
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from indice_busca import IndiceBusca, IndiceSugestoes
+from logging_config import registrar_erro
+
+
+# Configurações
+VALIDADE_PADRAO = 30.0  # segundos
+VALIDADE_NEGATIVA = 5.0  # segundos que um código de barras inexistente fica em cache
+MAXIMO_AUSENTES = 1000   # códigos inexistentes guardados
+
+
+class CatalogoProdutos:
+    """Cache dos produtos por id, com carga completa opcional e invalidação explícita."""
+
+    def __init__(self, validade: float = VALIDADE_PADRAO):
+        self.validade = validade
+        self._lock = threading.RLock()
+        self._por_id: Dict[int, Dict[str, Any]] = {}
+        self._carregado_em: Dict[int, float] = {}
+        self._por_codigo: Dict[str, int] = {}
+        self._sujos: Set[int] = set()
+        self._ausentes: Dict[str, float] = {}
+        self._sincronizador: Optional[threading.Thread] = None
+        self._parar = threading.Event()
+        self.indice = IndiceBusca()
+        self.sugestoes = IndiceSugestoes()
+        self._completo_em: Optional[float] = None
+        self._marca: Optional[str] = None
+        self._geracao = 0
+        self.acertos = 0
+        self.faltas = 0
+        self.sincronizacoes = 0
+        self.linhas_sincronizadas = 0
+
+    # ------------------------------------------------------------------
+    # Estado interno
+    # ------------------------------------------------------------------
+
+    def _valido(self, instante: Optional[float]) -> bool:
+        return instante is not None and time.monotonic() - instante <= self.validade
+
+    def _completo(self) -> bool:
+        return self._valido(self._completo_em)
+
+    def _indexar(self, produto: Dict[str, Any], instante: float) -> None:
+        produto_id = produto["id"]
+        anterior = self._por_id.get(produto_id)
+        if anterior and anterior.get("codigo_barras") and self._por_codigo.get(anterior["codigo_barras"]) == produto_id:
+            del self._por_codigo[anterior["codigo_barras"]]
+        self._por_id[produto_id] = dict(produto)
+        self._carregado_em[produto_id] = instante
+        if produto.get("codigo_barras"):
+            self._por_codigo[produto["codigo_barras"]] = produto_id
+            self._ausentes.pop(produto["codigo_barras"], None)
+        self.indice.atualizar(produto)
+        self.sugestoes.atualizar(produto)
+
+    def _remover(self, produto_id: int) -> None:
+        produto = self._por_id.pop(produto_id, None)
+        self._carregado_em.pop(produto_id, None)
+        if produto and produto.get("codigo_barras") and self._por_codigo.get(produto["codigo_barras"]) == produto_id:
+            del self._por_codigo[produto["codigo_barras"]]
+        self.indice.remover(produto_id)
+        self.sugestoes.remover(produto_id)
+
+    def _registrar(self, acerto: bool) -> None:
+        with self._lock:
+            if acerto:
+                self.acertos += 1
+            else:
+                self.faltas += 1
+
+    # ------------------------------------------------------------------
+    # Leitura do banco
+    # ------------------------------------------------------------------
+
+    def _carregar_tudo(self) -> None:
+        """Lê o catálogo inteiro (em lotes) e substitui o conteúdo do cache."""
+        from database import buscar_alteracoes
+
+        with self._lock:
+            geracao = self._geracao
+            self._sujos.clear()
+        produtos, _, marca = buscar_alteracoes("produtos", None)
+        instante = time.monotonic()
+
+        with self._lock:
+            # Invalidação completa durante a carga: não gravar dados possivelmente antigos
+            if geracao != self._geracao:
+                return
+            self._por_id.clear()
+            self._carregado_em.clear()
+            self._por_codigo.clear()
+            self.indice.limpar()
+            self.sugestoes.limpar()
+            for produto in produtos:
+                self._indexar(produto, instante)
+            self._completo_em = instante
+            self._marca = marca
+
+    def _sincronizar(self) -> None:
+        """Aplica ao cache apenas os produtos alterados ou excluídos desde a última leitura."""
+        from database import buscar_alteracoes
+
+        with self._lock:
+            geracao = self._geracao
+            marca = self._marca
+        alterados, excluidos, nova_marca = buscar_alteracoes("produtos", marca)
+        instante = time.monotonic()
+
+        with self._lock:
+            if geracao != self._geracao:
+                return
+            for produto in alterados:
+                self._indexar(produto, instante)
+            for produto_id in excluidos:
+                self._remover(produto_id)
+                self._sujos.discard(produto_id)
+            self._completo_em = instante
+            self._marca = nova_marca
+            self.sincronizacoes += 1
+            self.linhas_sincronizadas += len(alterados) + len(excluidos)
+
+    def _atualizar_sujos(self) -> None:
+        """Relê, em uma única consulta, os produtos marcados como desatualizados."""
+        from database import supabase, executar_operacao
+
+        with self._lock:
+            ids = sorted(self._sujos)
+            self._sujos.clear()
+        if not ids:
+            return
+
+        response = executar_operacao(
+            "cache_catalogo",
+            lambda: supabase.table("produtos").select("*").in_("id", ids).execute()
+        )
+        instante = time.monotonic()
+        encontrados = {produto["id"]: produto for produto in response.data or []}
+
+        with self._lock:
+            for produto_id in ids:
+                if produto_id in encontrados:
+                    self._indexar(encontrados[produto_id], instante)
+                else:
+                    self._remover(produto_id)
+
+    def _buscar_um(self, coluna: str, valor: Any) -> Optional[Dict[str, Any]]:
+        from database import supabase, executar_operacao
+
+        response = executar_operacao(
+            "cache_catalogo",
+            lambda: supabase.table("produtos").select("*").eq(coluna, valor).limit(1).execute()
+        )
+        if not response.data:
+            return None
+        produto = response.data[0]
+        with self._lock:
+            self._sujos.discard(produto["id"])
+            self._indexar(produto, time.monotonic())
+        return dict(produto)
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def _garantir_atualizado(self) -> None:
+        """
+        Deixa o catálogo completo e válido no cache.
+
+        Se a validade expirou, sincroniza apenas as alterações; carrega o
+        catálogo inteiro só na primeira vez (ou após invalidar tudo).
+        """
+        with self._lock:
+            completo = self._completo()
+            sincronizavel = self._marca is not None
+        self._registrar(completo)
+
+        if not completo and sincronizavel:
+            self._sincronizar()
+        elif not completo:
+            self._carregar_tudo()
+        self._atualizar_sujos()
+
+    def listar(self) -> List[Dict[str, Any]]:
+        """
+        Retorna todos os produtos (cópias), ordenados por id.
+
+        Raises:
+            Exception: se a leitura do banco falhar
+        """
+        self._garantir_atualizado()
+        with self._lock:
+            return [dict(self._por_id[produto_id]) for produto_id in sorted(self._por_id)]
+
+    def buscar(self, termo: str, campos: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Busca produtos pelo índice (acentos e maiúsculas ignorados).
+
+        Args:
+            termo: Texto digitado
+            campos: Campos considerados (padrão: descrição, marca, referência
+                    e código de barras)
+
+        Returns:
+            Produtos (cópias) do mais relevante para o menos relevante
+
+        Raises:
+            Exception: se a leitura do banco falhar
+        """
+        self._garantir_atualizado()
+        with self._lock:
+            ids = self.indice.buscar(termo, campos)
+            return [dict(self._por_id[produto_id]) for produto_id in ids if produto_id in self._por_id]
+
+    def sugerir(self, termo: str, max_sugestoes: int = 5) -> List[str]:
+        """
+        Sugestões para um termo sem resultados ("Você quis dizer").
+
+        Usa o índice de sugestões como está, sem acessar o banco; o catálogo
+        só é carregado se ainda não foi lido nenhuma vez.
+
+        Raises:
+            Exception: se a leitura do banco falhar
+        """
+        with self._lock:
+            carregado = self._completo_em is not None
+        if carregado:
+            self._registrar(True)
+        else:
+            self._garantir_atualizado()
+        return self.sugestoes.sugerir(termo, max_sugestoes)
+
+    def produtos_em_memoria(self) -> Optional[List[Dict[str, Any]]]:
+        """
+        Retorna todos os produtos se o catálogo completo estiver em cache
+        (sincronizando as alterações se a validade expirou), ou None, sem
+        acessar o banco, se o catálogo nunca foi carregado.
+
+        Usado pela busca avançada sem termo (só filtros), que prefere
+        consultar o banco a carregar o catálogo inteiro.
+        """
+        with self._lock:
+            completo = self._completo()
+            sincronizavel = self._marca is not None
+        self._registrar(completo)
+        if not completo and not sincronizavel:
+            return None
+
+        if not completo:
+            self._sincronizar()
+        self._atualizar_sujos()
+        with self._lock:
+            return [dict(self._por_id[produto_id]) for produto_id in sorted(self._por_id)]
+
+    def obter(self, produto_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Retorna o produto pelo id (cópia), ou None se não existir.
+
+        Raises:
+            Exception: se a leitura do banco falhar
+        """
+        with self._lock:
+            if produto_id not in self._sujos:
+                produto = self._por_id.get(produto_id)
+                if produto is not None and (self._completo() or self._valido(self._carregado_em.get(produto_id))):
+                    self.acertos += 1
+                    return dict(produto)
+                # Catálogo completo e válido: o produto não existe
+                if produto is None and self._completo():
+                    self.acertos += 1
+                    return None
+            self.faltas += 1
+
+        return self._buscar_um("id", produto_id)
+
+    def obter_por_codigo_barras(self, codigo: str) -> Optional[Dict[str, Any]]:
+        """
+        Retorna o produto pelo código de barras (cópia), ou None se não existir.
+
+        Raises:
+            Exception: se a leitura do banco falhar
+        """
+        with self._lock:
+            produto_id = self._por_codigo.get(codigo)
+            if produto_id is not None and produto_id not in self._sujos:
+                if self._completo() or self._valido(self._carregado_em.get(produto_id)):
+                    self.acertos += 1
+                    return dict(self._por_id[produto_id])
+            elif produto_id is None:
+                # Catálogo completo ou código consultado há pouco: não existe
+                ausente_em = self._ausentes.get(codigo)
+                if self._completo() or (ausente_em is not None and time.monotonic() - ausente_em <= VALIDADE_NEGATIVA):
+                    self.acertos += 1
+                    return None
+            self.faltas += 1
+
+        produto = self._buscar_um("codigo_barras", codigo)
+        if produto is None:
+            with self._lock:
+                if len(self._ausentes) >= MAXIMO_AUSENTES:
+                    self._ausentes.clear()
+                self._ausentes[codigo] = time.monotonic()
+        return produto
+
+    # ------------------------------------------------------------------
+    # Invalidação
+    # ------------------------------------------------------------------
+
+    def invalidar(self, produto_id: Optional[int] = None) -> None:
+        """
+        Invalida um produto (relido na próxima consulta) ou o cache inteiro.
+
+        Args:
+            produto_id: ID do produto alterado, ou None para descartar tudo
+        """
+        with self._lock:
+            if produto_id is None:
+                self._geracao += 1
+                self._por_id.clear()
+                self._carregado_em.clear()
+                self._por_codigo.clear()
+                self.indice.limpar()
+                self.sugestoes.limpar()
+                self._sujos.clear()
+                self._ausentes.clear()
+                self._completo_em = None
+                self._marca = None
+            else:
+                self._sujos.add(produto_id)
+
+    def gravar(self, produto: Dict[str, Any]) -> None:
+        """Aplica ao cache um produto devolvido por uma escrita deste terminal."""
+        with self._lock:
+            self._sujos.discard(produto["id"])
+            self._indexar(produto, time.monotonic())
+
+    def remover(self, produto_id: int) -> None:
+        """Remove do cache um produto excluído por este terminal."""
+        with self._lock:
+            self._sujos.discard(produto_id)
+            self._remover(produto_id)
+
+    def atualizar_quantidade(self, produto_id: int, quantidade: int) -> None:
+        """Aplica ao cache a quantidade gravada por uma movimentação de estoque."""
+        with self._lock:
+            produto = self._por_id.get(produto_id)
+            if produto is not None:
+                produto["quantidade"] = quantidade
+
+    # ------------------------------------------------------------------
+    # Sincronização em segundo plano
+    # ------------------------------------------------------------------
+
+    def _laco_sincronizacao(self, intervalo: float) -> None:
+        from resiliencia import backend_disponivel
+
+        while not self._parar.is_set():
+            try:
+                if backend_disponivel():
+                    with self._lock:
+                        sincronizavel = self._marca is not None
+                    if sincronizavel:
+                        self._sincronizar()
+                    else:
+                        self._carregar_tudo()
+                    self._atualizar_sujos()
+            except Exception as e:
+                registrar_erro(
+                    mensagem="Erro na sincronização do cache do catálogo",
+                    modulo="cache_catalogo",
+                    funcao="_laco_sincronizacao",
+                    detalhes={"erro": str(e)},
+                    exc_info=True
+                )
+            self._parar.wait(intervalo)
+
+    def iniciar_sincronizacao(self, intervalo: Optional[float] = None) -> None:
+        """
+        Inicia (uma única vez) a thread que carrega o catálogo e aplica as
+        alterações a cada `intervalo` segundos (padrão: metade da validade),
+        de modo que as consultas nunca encontrem o cache expirado.
+        """
+        with self._lock:
+            if self._sincronizador is not None and self._sincronizador.is_alive():
+                return
+            self._parar.clear()
+            self._sincronizador = threading.Thread(
+                target=self._laco_sincronizacao,
+                args=(intervalo if intervalo is not None else self.validade / 2,),
+                name="dekids-catalogo",
+                daemon=True
+            )
+            self._sincronizador.start()
+
+    def parar_sincronizacao(self) -> None:
+        """Sinaliza a thread de sincronização para terminar."""
+        self._parar.set()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Contadores e estado do cache para monitoramento."""
+        with self._lock:
+            total = self.acertos + self.faltas
+            return {
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+                "taxa_acerto": round(self.acertos / total, 3) if total else 0.0,
+                "produtos": len(self._por_id),
+                "desatualizados": len(self._sujos),
+                "completo": self._completo(),
+                "validade": self.validade,
+                "sincronizacoes": self.sincronizacoes,
+                "linhas_sincronizadas": self.linhas_sincronizadas,
+                "marca": self._marca,
+                "codigos_ausentes": len(self._ausentes),
+                "sincronizador_ativo": bool(self._sincronizador and self._sincronizador.is_alive()),
+            }
+
+
+# Instância compartilhada pelo processo
+catalogo = CatalogoProdutos()
+
+
+def obter_estado() -> Dict[str, Any]:
+    """Retorna os contadores do cache do catálogo."""
+    return catalogo.estatisticas()
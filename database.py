@@ -1,8 +1,18 @@
+import base64
+import json
 import os
+import threading
 import time
-from typing import Optional, List, Dict, Any
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Callable, Iterator, Tuple
 from supabase import create_client, Client
 from logging_config import registrar_erro, registrar_aviso, registrar_info
+from resiliencia import executar, classificar_erro, ultima_falha, ERRO_CONEXAO, ERRO_TRANSITORIO
+import diario_offline
+from cache_catalogo import catalogo
+from analitico import base_analitica
+from fila_estoque import fila_estoque
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -13,71 +23,280 @@ load_dotenv(dotenv_path=env_path, override=True)
 
 
 # --- CONFIGURAÇÃO --
+# Backend de armazenamento: "supabase" (padrão) ou "sqlite" (banco local)
+BACKEND = (os.getenv("DEKIDS_BACKEND") or "supabase").strip().lower()
 url = os.getenv("SUPABASE_URL")
 key = os.getenv("SUPABASE_KEY")
 
-if not url or not key:
-    erro_msg = "Variáveis de ambiente SUPABASE_URL ou SUPABASE_KEY não encontradas!"
-    print(f"ERRO CRÍTICO: {erro_msg}")
-    registrar_erro(
-        mensagem=erro_msg,
-        modulo="database",
-        funcao="<module>",
-        detalhes={"url_presente": bool(url), "key_presente": bool(key)}
-    )
-    raise ValueError(erro_msg)
+if BACKEND == "sqlite":
+    from backend_sqlite import criar_cliente_sqlite
+    
+    caminho_sqlite = os.getenv("DEKIDS_SQLITE_PATH") or str(script_dir / "dekids.db")
+    print(f"Usando banco local SQLite em: {caminho_sqlite}")
+    supabase = criar_cliente_sqlite(caminho_sqlite)
+else:
+    if not url or not key:
+        erro_msg = "Variáveis de ambiente SUPABASE_URL ou SUPABASE_KEY não encontradas!"
+        print(f"ERRO CRÍTICO: {erro_msg}")
+        registrar_erro(
+            mensagem=erro_msg,
+            modulo="database",
+            funcao="<module>",
+            detalhes={"url_presente": bool(url), "key_presente": bool(key)}
+        )
+        raise ValueError(erro_msg)
+    
+    print(f"Conectando ao Supabase em: {url}")
+    supabase: Client = create_client(url, key)
 
-print(f"Conectando ao Supabase em: {url}")
-supabase: Client = create_client(url, key)
+# Código de erro (SQLSTATE) das funções do banco para estoque insuficiente
+CODIGO_ESTOQUE_INSUFICIENTE = "DK001"
 
 # Configurações de reconexão
-MAX_TENTATIVAS_RECONEXAO = 3
-TIMEOUT_RECONEXAO = 2  # segundos
+INTERVALO_MINIMO_RECONEXAO = 5  # segundos entre recriações do cliente
+_ultima_reconexao = 0.0
+_lock_reconexao = threading.Lock()
 
 
 def reconectar_supabase() -> bool:
     """
-    Tenta reconectar ao Supabase em caso de falha de conexão.
+    Recria o cliente do Supabase após uma falha de conexão.
+    
+    Não bloqueia nem testa a conexão: as retentativas e o controle de
+    disponibilidade ficam a cargo de executar_operacao(). Recriações muito
+    próximas são ignoradas para não descartar o pool de conexões a cada falha.
     
     Returns:
-        True se reconexão bem-sucedida, False caso contrário
+        True se o cliente foi recriado, False caso contrário
     """
-    global supabase
+    global supabase, _ultima_reconexao
+    
+    # O banco local não tem conexão de rede a refazer
+    if BACKEND == "sqlite":
+        return False
     
-    for tentativa in range(1, MAX_TENTATIVAS_RECONEXAO + 1):
+    with _lock_reconexao:
+        agora = time.monotonic()
+        if agora - _ultima_reconexao < INTERVALO_MINIMO_RECONEXAO:
+            return False
+        _ultima_reconexao = agora
+        
         try:
-            registrar_info(
-                mensagem=f"Tentativa de reconexão {tentativa}/{MAX_TENTATIVAS_RECONEXAO}",
-                modulo="database",
-                funcao="reconectar_supabase"
-            )
-            
             supabase = create_client(url, key)
-            
-            # Testar conexão com uma query simples
-            supabase.table("produtos").select("id").limit(1).execute()
-            
             registrar_info(
-                mensagem="Reconexão ao Supabase bem-sucedida",
+                mensagem="Cliente do Supabase recriado após falha de conexão",
                 modulo="database",
-                funcao="reconectar_supabase",
-                detalhes={"tentativa": tentativa}
+                funcao="reconectar_supabase"
             )
             return True
             
         except Exception as e:
             registrar_erro(
-                mensagem=f"Falha na tentativa de reconexão {tentativa}",
+                mensagem="Falha ao recriar cliente do Supabase",
                 modulo="database",
                 funcao="reconectar_supabase",
-                detalhes={"tentativa": tentativa, "erro": str(e)},
+                detalhes={"erro": str(e)},
                 exc_info=True
             )
+            return False
+
+
+def executar_operacao(operacao: str, funcao: Callable[[], Any], idempotente: bool = True, prazo: Optional[float] = None) -> Any:
+    """
+    Executa uma chamada ao banco pela camada de resiliência.
+    
+    A função recebida deve referenciar o cliente global `supabase` no momento
+    da chamada (ex: lambda: supabase.table(...).execute()), para que uma
+    retentativa após reconexão use o cliente novo.
+    
+    Args:
+        operacao: Nome da operação (usado nos logs)
+        funcao: Função sem argumentos que executa a chamada
+        idempotente: False para inserts e outras escritas que não podem ser repetidas
+        prazo: Prazo total em segundos (opcional, usa o padrão da camada)
+        
+    Returns:
+        Retorno da função (normalmente o response do Supabase)
+        
+    Raises:
+        Exception: se a operação falhar após as retentativas permitidas
+    """
+    return executar(
+        operacao,
+        funcao,
+        idempotente=idempotente,
+        prazo=prazo,
+        ao_falhar_conexao=reconectar_supabase
+    )
+
+
+# Tamanho padrão dos lotes de leitura (o PostgREST do Supabase limita cada resposta a 1000 linhas)
+TAMANHO_LOTE_LEITURA = 1000
+
+
+def iterar_tabela(
+    tabela: str,
+    colunas: str = "*",
+    filtros: Optional[Callable[[Any], Any]] = None,
+    tamanho_lote: int = TAMANHO_LOTE_LEITURA,
+    prefetch: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """
+    Percorre uma tabela inteira em lotes ordenados por id (paginação por chave).
+    
+    Substitui select(...).execute() sobre tabelas inteiras: a memória fica
+    limitada a um lote e o resultado não é truncado pelo limite de linhas do
+    PostgREST. A iteração só termina quando um lote volta vazio, então um
+    limite do servidor menor que tamanho_lote não faz perder linhas.
+    
+    Args:
+        tabela: Nome da tabela
+        colunas: Colunas selecionadas ("id" é incluído se necessário)
+        filtros: Função que recebe a query e devolve a query filtrada (opcional)
+        tamanho_lote: Número de linhas por requisição
+        prefetch: Se True, busca o próximo lote em segundo plano enquanto o
+                  lote atual é consumido
+        
+    Yields:
+        Cada linha da tabela, em ordem crescente de id
+        
+    Raises:
+        Exception: se uma requisição falhar após as retentativas
+        
+    Exemplo:
+        for produto in iterar_tabela("produtos", "id, quantidade, preco"):
+            total += produto["quantidade"] * produto["preco"]
+    """
+    partes = [parte.strip() for parte in colunas.split(",")]
+    if "*" not in partes and "id" not in partes:
+        colunas = f"id, {colunas}"
+    
+    def buscar_lote(ultimo_id: Optional[Any]) -> List[Dict[str, Any]]:
+        def consulta():
+            query = supabase.table(tabela).select(colunas)
+            if filtros is not None:
+                query = filtros(query)
+            if ultimo_id is not None:
+                query = query.gt("id", ultimo_id)
+            return query.order("id").limit(tamanho_lote).execute()
+        
+        return executar_operacao(f"iterar_tabela:{tabela}", consulta).data or []
+    
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dekids-lote") if prefetch else None
+    try:
+        lote = buscar_lote(None)
+        while lote:
+            ultimo_id = lote[-1]["id"]
+            proximo = executor.submit(buscar_lote, ultimo_id) if executor is not None else None
+            
+            yield from lote
             
-            if tentativa < MAX_TENTATIVAS_RECONEXAO:
-                time.sleep(TIMEOUT_RECONEXAO)
+            lote = proximo.result() if proximo is not None else buscar_lote(ultimo_id)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Valores por requisição em filtros in_() (mantém a URL da consulta curta)
+TAMANHO_LOTE_IDS = 200
+
+
+def iterar_por_ids(
+    tabela: str,
+    colunas: str,
+    coluna: str,
+    valores: List[Any],
+    tamanho_lote_ids: int = TAMANHO_LOTE_IDS
+) -> Iterator[Dict[str, Any]]:
+    """
+    Percorre as linhas de uma tabela cuja `coluna` está em `valores`.
     
-    return False
+    Os valores são enviados em lotes de tamanho_lote_ids (um in_() por lote,
+    sem estourar o tamanho da URL) e as linhas de cada lote são lidas com
+    iterar_tabela, sem corte pelo limite de linhas do PostgREST.
+    
+    Args:
+        tabela: Nome da tabela
+        colunas: Colunas selecionadas (aceita embeds, ex: "produtos(descricao)")
+        coluna: Coluna comparada com os valores (ex: "venda_id")
+        valores: Valores procurados (repetidos e None são ignorados)
+        tamanho_lote_ids: Número de valores por requisição
+        
+    Yields:
+        Cada linha encontrada, em ordem de id dentro de cada lote
+        
+    Raises:
+        Exception: se uma requisição falhar após as retentativas
+    """
+    valores = [v for v in dict.fromkeys(valores) if v is not None]
+    for inicio in range(0, len(valores), tamanho_lote_ids):
+        lote = valores[inicio:inicio + tamanho_lote_ids]
+        yield from iterar_tabela(tabela, colunas, lambda query, lote=lote: query.in_(coluna, lote))
+
+# Segundos relidos antes da marca d'água na sincronização incremental, para não
+# perder escritas de transações que confirmaram depois de uma leitura anterior
+MARGEM_SINCRONIZACAO = 5
+
+
+def buscar_alteracoes(tabela: str, desde: Optional[str]) -> tuple[List[Dict[str, Any]], List[Any], Optional[str]]:
+    """
+    Busca as linhas alteradas e excluídas de uma tabela desde uma marca d'água.
+    
+    Sincronização incremental (sql/005_sincronizacao_incremental.sql e
+    sql/010_sincronizacao_analitica.sql): as tabelas produtos, clientes,
+    vendas e movimentacoes têm updated_at mantido pelo banco e as
+    exclusões ficam registradas na tabela exclusoes. Em vez de baixar a tabela
+    inteira, o terminal lê apenas o que mudou e aplica à sua cópia local.
+    
+    A leitura recomeça MARGEM_SINCRONIZACAO segundos antes da marca; linhas
+    repetidas são inofensivas porque a aplicação é idempotente.
+    
+    Args:
+        tabela: 'produtos', 'clientes', 'vendas' ou 'movimentacoes'
+        desde: Marca d'água devolvida pela chamada anterior (None lê a tabela inteira)
+    
+    Returns:
+        Tupla (alterados, ids_excluidos, nova_marca). A marca é o maior
+        updated_at/excluido_em visto (horário do banco), ou `desde` se nada mudou.
+    
+    Raises:
+        Exception: se uma requisição falhar após as retentativas
+    """
+    from datetime import timedelta
+    
+    inicio = None
+    if desde is not None:
+        inicio = (_instante(desde) - timedelta(seconds=MARGEM_SINCRONIZACAO)).isoformat(timespec="milliseconds")
+    
+    alterados = list(iterar_tabela(
+        tabela,
+        filtros=(lambda query: query.gte("updated_at", inicio)) if inicio else None
+    ))
+    
+    excluidos = []
+    marca = desde
+    if inicio:
+        excluidos = list(iterar_tabela(
+            "exclusoes",
+            "registro_id, excluido_em",
+            filtros=lambda query: query.eq("tabela", tabela).gte("excluido_em", inicio)
+        ))
+    
+    for linha in alterados:
+        if linha.get("updated_at") and (marca is None or _instante(linha["updated_at"]) > _instante(marca)):
+            marca = linha["updated_at"]
+    for exclusao in excluidos:
+        if marca is None or _instante(exclusao["excluido_em"]) > _instante(marca):
+            marca = exclusao["excluido_em"]
+    
+    return alterados, [exclusao["registro_id"] for exclusao in excluidos], marca
+
+
+def _instante(valor: str):
+    """Converte um timestamp ISO do banco para comparação."""
+    from datetime import datetime
+    return datetime.fromisoformat(valor.replace("Z", "+00:00"))
+
 
 # 1. FUNÇÃO PARA CADASTRAR
 def cadastrar_produto(descricao, genero, marca, referencia, tamanho, qtd, preco, codigo_barras=None, estoque_minimo=5):
@@ -114,7 +333,10 @@ def cadastrar_produto(descricao, genero, marca, referencia, tamanho, qtd, preco,
         data["codigo_barras"] = codigo_barras
     
     try:
-        response = supabase.table("produtos").insert(data).execute()
+        response = executar_operacao("cadastrar_produto", lambda: supabase.table("produtos").insert(data).execute(), idempotente=False)
+        invalidar_contagens_produtos()
+        for produto in response.data or []:
+            catalogo.gravar(produto)
         
         registrar_info(
             mensagem="Produto cadastrado com sucesso",
@@ -126,109 +348,44 @@ def cadastrar_produto(descricao, genero, marca, referencia, tamanho, qtd, preco,
         return response
         
     except Exception as e:
-        erro_str = str(e)
-        
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao cadastrar produto",
-                modulo="database",
-                funcao="cadastrar_produto",
-                detalhes={"erro": erro_str, "dados": data},
-                exc_info=True
-            )
-            
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    response = supabase.table("produtos").insert(data).execute()
-                    registrar_info(
-                        mensagem="Produto cadastrado após reconexão",
-                        modulo="database",
-                        funcao="cadastrar_produto"
-                    )
-                    return response
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao cadastrar produto após reconexão",
-                        modulo="database",
-                        funcao="cadastrar_produto",
-                        detalhes={"erro": str(e2)},
-                        exc_info=True
-                    )
-        else:
-            # Outros erros (violação de constraint, etc)
-            registrar_erro(
-                mensagem="Erro ao cadastrar produto no Supabase",
-                modulo="database",
-                funcao="cadastrar_produto",
-                detalhes={"erro": erro_str, "dados": data},
-                exc_info=True
-            )
-        
+        registrar_erro(
+            mensagem="Erro ao cadastrar produto no Supabase",
+            modulo="database",
+            funcao="cadastrar_produto",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e), "dados": data},
+            exc_info=True
+        )
         print(f"Erro ao cadastrar no Supabase: {e}")
         return None
 
 # 2. FUNÇÃO PARA LISTAR
 def listar_estoque():
     """
-    Lista todos os produtos do estoque.
+    Lista todos os produtos do estoque (via cache do catálogo).
     
     Returns:
         Lista de produtos se sucesso, lista vazia se erro
     """
     try:
-        response = supabase.table("produtos").select("*").order("id").execute()
+        produtos = catalogo.listar()
         
         registrar_info(
-            mensagem=f"Estoque listado com sucesso: {len(response.data)} itens",
+            mensagem=f"Estoque listado com sucesso: {len(produtos)} itens",
             modulo="database",
             funcao="listar_estoque"
         )
         
-        print(f"Sucesso! {len(response.data)} itens carregados.")
-        return response.data
+        print(f"Sucesso! {len(produtos)} itens carregados.")
+        return produtos
         
     except Exception as e:
-        erro_str = str(e)
-        
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao listar estoque",
-                modulo="database",
-                funcao="listar_estoque",
-                detalhes={"erro": erro_str},
-                exc_info=True
-            )
-            
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    response = supabase.table("produtos").select("*").order("id").execute()
-                    registrar_info(
-                        mensagem="Estoque listado após reconexão",
-                        modulo="database",
-                        funcao="listar_estoque"
-                    )
-                    return response.data
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao listar estoque após reconexão",
-                        modulo="database",
-                        funcao="listar_estoque",
-                        detalhes={"erro": str(e2)},
-                        exc_info=True
-                    )
-        else:
-            registrar_erro(
-                mensagem="Erro ao listar estoque",
-                modulo="database",
-                funcao="listar_estoque",
-                detalhes={"erro": erro_str},
-                exc_info=True
-            )
-        
+        registrar_erro(
+            mensagem="Erro ao listar estoque",
+            modulo="database",
+            funcao="listar_estoque",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e)},
+            exc_info=True
+        )
         print(f"ERRO AO LISTAR: Verifique se a tabela 'produtos' existe e se a KEY está correta. Detalhe: {e}")
         return []
 
@@ -244,7 +401,9 @@ def excluir_produto(id_produto):
         True se sucesso, False se erro
     """
     try:
-        supabase.table("produtos").delete().eq("id", id_produto).execute()
+        executar_operacao("excluir_produto", lambda: supabase.table("produtos").delete().eq("id", id_produto).execute())
+        invalidar_contagens_produtos()
+        catalogo.remover(id_produto)
         
         registrar_info(
             mensagem="Produto excluído com sucesso",
@@ -256,45 +415,13 @@ def excluir_produto(id_produto):
         return True
         
     except Exception as e:
-        erro_str = str(e)
-        
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao excluir produto",
-                modulo="database",
-                funcao="excluir_produto",
-                detalhes={"erro": erro_str, "produto_id": id_produto},
-                exc_info=True
-            )
-            
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    supabase.table("produtos").delete().eq("id", id_produto).execute()
-                    registrar_info(
-                        mensagem="Produto excluído após reconexão",
-                        modulo="database",
-                        funcao="excluir_produto"
-                    )
-                    return True
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao excluir produto após reconexão",
-                        modulo="database",
-                        funcao="excluir_produto",
-                        detalhes={"erro": str(e2)},
-                        exc_info=True
-                    )
-        else:
-            registrar_erro(
-                mensagem="Erro ao excluir produto no banco",
-                modulo="database",
-                funcao="excluir_produto",
-                detalhes={"erro": erro_str, "produto_id": id_produto},
-                exc_info=True
-            )
-        
+        registrar_erro(
+            mensagem="Erro ao excluir produto no banco",
+            modulo="database",
+            funcao="excluir_produto",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e), "produto_id": id_produto},
+            exc_info=True
+        )
         print(f"Erro ao excluir no banco: {e}")
         return False
 
@@ -303,8 +430,9 @@ def registrar_saida(id_produto, qtd_atual):
     """
     Registra saída de uma unidade do produto.
     
-    Esta função agora utiliza registrar_movimentacao() internamente
-    para manter histórico completo de movimentações.
+    A movimentação passa pela fila por produto (fila_estoque), que envia uma
+    de cada vez via registrar_movimentacao() e agrupa cliques seguidos de
+    +1/-1 em uma única movimentação com o saldo.
     
     Args:
         id_produto: ID do produto
@@ -315,11 +443,10 @@ def registrar_saida(id_produto, qtd_atual):
     """
     try:
         if qtd_atual > 0:
-            # Usar registrar_movimentacao para criar histórico
-            resultado = registrar_movimentacao(
-                produto_id=id_produto,
-                tipo='saida',
-                quantidade=1,
+            resultado = fila_estoque.registrar(
+                id_produto,
+                'saida',
+                1,
                 observacao='Saída unitária via interface'
             )
             
@@ -357,8 +484,8 @@ def registrar_entrada(id_produto, qtd_atual):
     """
     Registra entrada de uma unidade do produto.
     
-    Esta função agora utiliza registrar_movimentacao() internamente
-    para manter histórico completo de movimentações.
+    A movimentação passa pela fila por produto (fila_estoque), como em
+    registrar_saida().
     
     Args:
         id_produto: ID do produto
@@ -368,11 +495,10 @@ def registrar_entrada(id_produto, qtd_atual):
         True se sucesso, False se erro
     """
     try:
-        # Usar registrar_movimentacao para criar histórico
-        resultado = registrar_movimentacao(
-            produto_id=id_produto,
-            tipo='entrada',
-            quantidade=1,
+        resultado = fila_estoque.registrar(
+            id_produto,
+            'entrada',
+            1,
             observacao='Entrada unitária via interface'
         )
         
@@ -402,6 +528,9 @@ def registrar_estorno(id_produto, qtd_atual):
     """
     Registra estorno de uma unidade do produto.
     
+    O estorno é uma entrada de uma unidade gravada por registrar_movimentacao()
+    (quantidade e histórico na mesma transação, catálogo atualizado).
+    
     Args:
         id_produto: ID do produto
         qtd_atual: Quantidade atual do produto
@@ -410,59 +539,26 @@ def registrar_estorno(id_produto, qtd_atual):
         True se sucesso, False se erro
     """
     try:
-        nova_qtd = int(qtd_atual) + 1
-        supabase.table("produtos").update({"quantidade": nova_qtd}).eq("id", id_produto).execute()
-        
-        registrar_info(
-            mensagem="Estorno registrado com sucesso",
-            modulo="database",
-            funcao="registrar_estorno",
-            detalhes={"produto_id": id_produto, "qtd_anterior": qtd_atual, "qtd_nova": nova_qtd}
-        )
-        
-        return True
+        resultado = registrar_movimentacao(id_produto, 'entrada', 1, observacao='Estorno unitário via interface')
         
-    except Exception as e:
-        erro_str = str(e)
-        
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao registrar estorno",
-                modulo="database",
-                funcao="registrar_estorno",
-                detalhes={"erro": erro_str, "produto_id": id_produto},
-                exc_info=True
-            )
-            
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    nova_qtd = int(qtd_atual) + 1
-                    supabase.table("produtos").update({"quantidade": nova_qtd}).eq("id", id_produto).execute()
-                    registrar_info(
-                        mensagem="Estorno registrado após reconexão",
-                        modulo="database",
-                        funcao="registrar_estorno"
-                    )
-                    return True
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao registrar estorno após reconexão",
-                        modulo="database",
-                        funcao="registrar_estorno",
-                        detalhes={"erro": str(e2)},
-                        exc_info=True
-                    )
-        else:
-            registrar_erro(
-                mensagem="Erro ao registrar estorno",
+        if resultado:
+            registrar_info(
+                mensagem="Estorno registrado com sucesso via registrar_movimentacao",
                 modulo="database",
                 funcao="registrar_estorno",
-                detalhes={"erro": erro_str, "produto_id": id_produto},
-                exc_info=True
+                detalhes={"produto_id": id_produto, "qtd_anterior": qtd_atual}
             )
         
+        return resultado
+        
+    except Exception as e:
+        registrar_erro(
+            mensagem="Erro ao registrar estorno",
+            modulo="database",
+            funcao="registrar_estorno",
+            detalhes={"erro": str(e), "produto_id": id_produto},
+            exc_info=True
+        )
         print(f"Erro ao registrar estorno: {e}")
         return False
     
@@ -479,7 +575,13 @@ def editar_produto(id_produto, novos_dados):
         Response do Supabase se sucesso, None se erro
     """
     try:
-        response = supabase.table("produtos").update(novos_dados).eq("id", id_produto).execute()
+        response = executar_operacao("editar_produto", lambda: supabase.table("produtos").update(novos_dados).eq("id", id_produto).execute())
+        invalidar_contagens_produtos()
+        if response.data:
+            for produto in response.data:
+                catalogo.gravar(produto)
+        else:
+            catalogo.invalidar(id_produto)
         
         registrar_info(
             mensagem="Produto editado com sucesso",
@@ -491,45 +593,13 @@ def editar_produto(id_produto, novos_dados):
         return response
         
     except Exception as e:
-        erro_str = str(e)
-        
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao editar produto",
-                modulo="database",
-                funcao="editar_produto",
-                detalhes={"erro": erro_str, "produto_id": id_produto},
-                exc_info=True
-            )
-            
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    response = supabase.table("produtos").update(novos_dados).eq("id", id_produto).execute()
-                    registrar_info(
-                        mensagem="Produto editado após reconexão",
-                        modulo="database",
-                        funcao="editar_produto"
-                    )
-                    return response
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao editar produto após reconexão",
-                        modulo="database",
-                        funcao="editar_produto",
-                        detalhes={"erro": str(e2)},
-                        exc_info=True
-                    )
-        else:
-            registrar_erro(
-                mensagem="Erro ao editar produto",
-                modulo="database",
-                funcao="editar_produto",
-                detalhes={"erro": erro_str, "produto_id": id_produto},
-                exc_info=True
-            )
-        
+        registrar_erro(
+            mensagem="Erro ao editar produto",
+            modulo="database",
+            funcao="editar_produto",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e), "produto_id": id_produto},
+            exc_info=True
+        )
         print(f"Erro ao editar: {e}")
         return None
 
@@ -557,9 +627,13 @@ def atualizar_estoque_minimo(produto_id: int, estoque_minimo: int) -> bool:
             return False
 
         # Atualizar estoque mínimo
-        response = supabase.table("produtos").update({
-            "estoque_minimo": estoque_minimo
-        }).eq("id", produto_id).execute()
+        response = executar_operacao(
+            "atualizar_estoque_minimo",
+            lambda: supabase.table("produtos").update({
+                "estoque_minimo": estoque_minimo
+            }).eq("id", produto_id).execute()
+        )
+        catalogo.invalidar(produto_id)
 
         registrar_info(
             mensagem="Estoque mínimo atualizado com sucesso",
@@ -571,153 +645,44 @@ def atualizar_estoque_minimo(produto_id: int, estoque_minimo: int) -> bool:
         return True
 
     except Exception as e:
-        erro_str = str(e)
-
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao atualizar estoque mínimo",
-                modulo="database",
-                funcao="atualizar_estoque_minimo",
-                detalhes={"erro": erro_str, "produto_id": produto_id},
-                exc_info=True
-            )
-
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    response = supabase.table("produtos").update({
-                        "estoque_minimo": estoque_minimo
-                    }).eq("id", produto_id).execute()
-
-                    registrar_info(
-                        mensagem="Estoque mínimo atualizado após reconexão",
-                        modulo="database",
-                        funcao="atualizar_estoque_minimo"
-                    )
-                    return True
-
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao atualizar estoque mínimo após reconexão",
-                        modulo="database",
-                        funcao="atualizar_estoque_minimo",
-                        detalhes={"erro": str(e2)},
-                        exc_info=True
-                    )
-        else:
-            registrar_erro(
-                mensagem="Erro ao atualizar estoque mínimo",
-                modulo="database",
-                funcao="atualizar_estoque_minimo",
-                detalhes={"erro": erro_str, "produto_id": produto_id},
-                exc_info=True
-            )
-
+        registrar_erro(
+            mensagem="Erro ao atualizar estoque mínimo",
+            modulo="database",
+            funcao="atualizar_estoque_minimo",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e), "produto_id": produto_id},
+            exc_info=True
+        )
         print(f"Erro ao atualizar estoque mínimo: {e}")
         return False
 
 
-
-
-def inserir_venda(dados_venda: dict) -> Optional[int]:
-    """
-    Insere uma nova venda na tabela 'vendas'.
-
-    Args:
-        dados_venda (dict): Dicionário com os dados da venda contendo:
-            - valor_total (float): Valor total antes dos descontos
-            - desconto_percentual (float, opcional): Desconto percentual (0-100)
-            - desconto_valor (float, opcional): Desconto em valor fixo
-            - valor_final (float): Valor final após descontos
-            - cliente_id (int, opcional): ID do cliente (None para venda avulsa)
-            - usuario_id (int): ID do vendedor
-            - status (str, opcional): Status da venda (padrão: 'finalizada')
-
-    Returns:
-        Optional[int]: ID da venda criada ou None em caso de erro
-
-    Validates: Requirement 5.3
-    """
-    global supabase
-
-    if not supabase:
-        print("❌ Erro: Conexão com Supabase não estabelecida")
-        return None
-
-    try:
-        # Preparar dados com valores padrão
-        dados_insert = {
-            'valor_total': dados_venda['valor_total'],
-            'valor_final': dados_venda['valor_final'],
-            'usuario_id': dados_venda['usuario_id'],
-            'desconto_percentual': dados_venda.get('desconto_percentual', 0),
-            'desconto_valor': dados_venda.get('desconto_valor', 0),
-            'status': dados_venda.get('status', 'finalizada')
-        }
-
-        # Adicionar cliente_id apenas se fornecido (para vendas não avulsas)
-        if dados_venda.get('cliente_id'):
-            dados_insert['cliente_id'] = dados_venda['cliente_id']
-
-        # Inserir venda na tabela
-        response = supabase.table('vendas').insert(dados_insert).execute()
-
-        if response.data and len(response.data) > 0:
-            venda_id = response.data[0]['id']
-            print(f"✅ Venda inserida com sucesso. ID: {venda_id}")
-            return venda_id
-        else:
-            print("❌ Erro: Resposta vazia ao inserir venda")
-            return None
-
-    except Exception as e:
-        print(f"❌ Erro ao inserir venda: {str(e)}")
-
-        # Tentar reconectar em caso de erro de conexão
-        if "connection" in str(e).lower() or "network" in str(e).lower():
-            print("🔄 Tentando reconectar...")
-            if reconectar_supabase():
-                try:
-                    # Tentar inserir novamente após reconexão
-                    response = supabase.table('vendas').insert(dados_insert).execute()
-
-                    if response.data and len(response.data) > 0:
-                        venda_id = response.data[0]['id']
-                        print(f"✅ Venda inserida com sucesso após reconexão. ID: {venda_id}")
-                        return venda_id
-                    else:
-                        print("❌ Erro: Resposta vazia ao inserir venda após reconexão")
-                        return None
-
-                except Exception as e2:
-                    print(f"❌ Erro ao inserir venda após reconexão: {str(e2)}")
-                    return None
-            else:
-                print("❌ Falha na reconexão")
-                return None
-
-        return None
-
-
 if __name__ == "__main__":
     pass
 
 
 # 8. FUNÇÃO PARA REGISTRAR MOVIMENTAÇÃO COM HISTÓRICO
-def registrar_movimentacao(produto_id: int, tipo: str, quantidade: int, observacao: str = None, usuario_id: int = None) -> bool:
+def registrar_movimentacao(produto_id: int, tipo: str, quantidade: int, observacao: str = None, usuario_id: int = None, permitir_offline: bool = True) -> bool:
     """
     Registra uma movimentação de estoque com transação atômica.
     
+    A quantidade do produto e o registro da movimentação são gravados pela
+    função aplicar_movimentacao do banco (sql/001_aplicar_movimentacao.sql),
+    em uma única transação e com a linha do produto bloqueada.
+    
+    Se a chamada não chegar ao banco (sem conexão), a movimentação é gravada
+    no diário offline e enviada quando a conexão voltar.
+    
     Args:
         produto_id: ID do produto
         tipo: Tipo de movimentação ('entrada', 'saida', 'ajuste')
         quantidade: Quantidade da movimentação (sempre positiva)
         observacao: Observação opcional sobre a movimentação
         usuario_id: ID do usuário que realizou a movimentação (opcional)
+        permitir_offline: Se False, lança diario_offline.EnvioAdiado em vez de
+                          gravar no diário (usado pelo próprio reenvio do diário)
         
     Returns:
-        True se sucesso, False se erro
+        True se sucesso (ou gravada no diário offline), False se erro
     """
     try:
         # Validar tipo de movimentação
@@ -740,33 +705,29 @@ def registrar_movimentacao(produto_id: int, tipo: str, quantidade: int, observac
             )
             return False
         
-        # Buscar produto atual para obter quantidade_anterior
-        response_produto = supabase.table("produtos").select("quantidade").eq("id", produto_id).execute()
-        
-        if not response_produto.data:
-            registrar_erro(
-                mensagem=f"Produto não encontrado: {produto_id}",
-                modulo="database",
-                funcao="registrar_movimentacao",
-                detalhes={"produto_id": produto_id}
-            )
-            return False
-        
-        quantidade_anterior = response_produto.data[0]["quantidade"]
+        # TRANSAÇÃO: atualizar quantidade do produto e inserir o registro da
+        # movimentação em uma única chamada (função aplicar_movimentacao no banco)
+        params = {
+            "p_produto_id": produto_id,
+            "p_tipo": tipo,
+            "p_quantidade": quantidade,
+            "p_observacao": observacao,
+            "p_usuario_id": usuario_id
+        }
+        response = executar_operacao(
+            "registrar_movimentacao",
+            lambda: supabase.rpc("aplicar_movimentacao", params).execute(),
+            idempotente=False
+        )
         
-        # Calcular nova quantidade baseado no tipo
-        if tipo == 'entrada':
-            quantidade_nova = quantidade_anterior + quantidade
-        elif tipo == 'saida':
-            quantidade_nova = quantidade_anterior - quantidade
-        elif tipo == 'ajuste':
-            # Para ajuste, a quantidade passada é o valor absoluto desejado
-            quantidade_nova = quantidade
+        quantidade_anterior = response.data["quantidade_anterior"]
+        quantidade_nova = response.data["quantidade_nova"]
+        catalogo.atualizar_quantidade(produto_id, quantidade_nova)
         
-        # Não permitir quantidade negativa (exceto se for ajuste explícito)
+        # Estoque negativo é permitido, mas registrado como aviso (exceto ajuste explícito)
         if quantidade_nova < 0 and tipo != 'ajuste':
             registrar_aviso(
-                mensagem=f"Movimentação resultaria em estoque negativo",
+                mensagem=f"Movimentação resultou em estoque negativo",
                 modulo="database",
                 funcao="registrar_movimentacao",
                 detalhes={
@@ -777,23 +738,6 @@ def registrar_movimentacao(produto_id: int, tipo: str, quantidade: int, observac
                     "quantidade_nova": quantidade_nova
                 }
             )
-            # Permitir continuar, mas registrar aviso
-        
-        # TRANSAÇÃO: Atualizar quantidade do produto
-        supabase.table("produtos").update({"quantidade": quantidade_nova}).eq("id", produto_id).execute()
-        
-        # TRANSAÇÃO: Inserir registro de movimentação
-        movimentacao_data = {
-            "produto_id": produto_id,
-            "tipo": tipo,
-            "quantidade": quantidade,
-            "quantidade_anterior": quantidade_anterior,
-            "quantidade_nova": quantidade_nova,
-            "observacao": observacao,
-            "usuario_id": usuario_id
-        }
-        
-        supabase.table("movimentacoes").insert(movimentacao_data).execute()
         
         registrar_info(
             mensagem=f"Movimentação registrada com sucesso",
@@ -811,77 +755,144 @@ def registrar_movimentacao(produto_id: int, tipo: str, quantidade: int, observac
         return True
         
     except Exception as e:
-        erro_str = str(e)
-        
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao registrar movimentação",
-                modulo="database",
-                funcao="registrar_movimentacao",
-                detalhes={"erro": erro_str, "produto_id": produto_id, "tipo": tipo},
-                exc_info=True
-            )
-            
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    # Repetir toda a operação após reconexão
-                    response_produto = supabase.table("produtos").select("quantidade").eq("id", produto_id).execute()
-                    if not response_produto.data:
-                        return False
-                    
-                    quantidade_anterior = response_produto.data[0]["quantidade"]
-                    
-                    if tipo == 'entrada':
-                        quantidade_nova = quantidade_anterior + quantidade
-                    elif tipo == 'saida':
-                        quantidade_nova = quantidade_anterior - quantidade
-                    elif tipo == 'ajuste':
-                        quantidade_nova = quantidade
-                    
-                    supabase.table("produtos").update({"quantidade": quantidade_nova}).eq("id", produto_id).execute()
-                    
-                    movimentacao_data = {
-                        "produto_id": produto_id,
-                        "tipo": tipo,
-                        "quantidade": quantidade,
-                        "quantidade_anterior": quantidade_anterior,
-                        "quantidade_nova": quantidade_nova,
-                        "observacao": observacao,
-                        "usuario_id": usuario_id
-                    }
-                    
-                    supabase.table("movimentacoes").insert(movimentacao_data).execute()
-                    
-                    registrar_info(
-                        mensagem="Movimentação registrada após reconexão",
-                        modulo="database",
-                        funcao="registrar_movimentacao"
-                    )
-                    return True
-                    
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao registrar movimentação após reconexão",
-                        modulo="database",
-                        funcao="registrar_movimentacao",
-                        detalhes={"erro": str(e2)},
-                        exc_info=True
-                    )
-        else:
-            registrar_erro(
-                mensagem="Erro ao registrar movimentação",
-                modulo="database",
-                funcao="registrar_movimentacao",
-                detalhes={"erro": erro_str, "produto_id": produto_id, "tipo": tipo},
-                exc_info=True
-            )
+        # Só é seguro adiar se a chamada não chegou ao banco
+        if ultima_falha() == ERRO_CONEXAO:
+            if not permitir_offline:
+                raise diario_offline.EnvioAdiado(str(e)) from e
+            diario_offline.registrar("movimentacao", {
+                "produto_id": produto_id,
+                "tipo": tipo,
+                "quantidade": quantidade,
+                "observacao": observacao,
+                "usuario_id": usuario_id
+            })
+            return True
         
+        registrar_erro(
+            mensagem="Erro ao registrar movimentação",
+            modulo="database",
+            funcao="registrar_movimentacao",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e), "produto_id": produto_id, "tipo": tipo},
+            exc_info=True
+        )
         print(f"Erro ao registrar movimentação: {e}")
         return False
 
 
+# 8.1 FUNÇÃO PARA REGISTRAR MOVIMENTAÇÕES EM LOTE
+def registrar_movimentacoes_lote(movimentacoes: List[Dict[str, Any]], permitir_offline: bool = True) -> tuple[bool, List[Dict[str, Any]]]:
+    """
+    Registra várias movimentações de estoque em uma única chamada: todas ou nenhuma.
+    
+    Usa a função aplicar_movimentacoes_lote do banco (sql/002_aplicar_movimentacoes_lote.sql).
+    Se qualquer item for rejeitado, nenhuma movimentação do lote é gravada.
+    
+    Args:
+        movimentacoes: Lista de dicionários com produto_id, tipo ('entrada', 'saida',
+                       'ajuste'), quantidade e, opcionalmente, observacao e usuario_id
+        permitir_offline: Se False, lança diario_offline.EnvioAdiado em vez de
+                          gravar no diário (usado pelo próprio reenvio do diário)
+        
+    Returns:
+        Tupla (sucesso, resultados) com um resultado por item, na mesma ordem:
+        - produto_id, tipo, quantidade
+        - sucesso: True se o item foi aplicado (ou gravado no diário offline)
+        - quantidade_anterior / quantidade_nova: None se não aplicado ou offline
+        - erro: motivo da rejeição (None se sucesso)
+    """
+    lote = [
+        {
+            "produto_id": mov.get("produto_id"),
+            "tipo": mov.get("tipo"),
+            "quantidade": mov.get("quantidade"),
+            "observacao": mov.get("observacao"),
+            "usuario_id": mov.get("usuario_id")
+        }
+        for mov in movimentacoes
+    ]
+    resultados = [
+        {
+            "produto_id": mov["produto_id"],
+            "tipo": mov["tipo"],
+            "quantidade": mov["quantidade"],
+            "sucesso": False,
+            "quantidade_anterior": None,
+            "quantidade_nova": None,
+            "erro": None
+        }
+        for mov in lote
+    ]
+    
+    if not lote:
+        return True, resultados
+    
+    def rejeitar(indice: Optional[int], mensagem: str) -> tuple[bool, List[Dict[str, Any]]]:
+        for i, resultado in enumerate(resultados):
+            resultado["erro"] = mensagem if indice in (None, i) else "Lote não aplicado: outro item foi rejeitado"
+        return False, resultados
+    
+    # Validar antes de enviar (evita uma chamada que seria rejeitada)
+    for indice, mov in enumerate(lote):
+        if mov["tipo"] not in ['entrada', 'saida', 'ajuste']:
+            return rejeitar(indice, f"Tipo de movimentação inválido: {mov['tipo']}")
+        if not isinstance(mov["quantidade"], int) or mov["quantidade"] <= 0:
+            return rejeitar(indice, f"Quantidade inválida: {mov['quantidade']}")
+    
+    try:
+        response = executar_operacao(
+            "registrar_movimentacoes_lote",
+            lambda: supabase.rpc("aplicar_movimentacoes_lote", {"p_movimentacoes": lote}).execute(),
+            idempotente=False
+        )
+        
+        for resultado, aplicado in zip(resultados, response.data):
+            resultado["sucesso"] = True
+            resultado["quantidade_anterior"] = aplicado["quantidade_anterior"]
+            resultado["quantidade_nova"] = aplicado["quantidade_nova"]
+            catalogo.atualizar_quantidade(resultado["produto_id"], aplicado["quantidade_nova"])
+            
+            if aplicado["quantidade_nova"] < 0 and resultado["tipo"] != 'ajuste':
+                registrar_aviso(
+                    mensagem=f"Movimentação resultou em estoque negativo",
+                    modulo="database",
+                    funcao="registrar_movimentacoes_lote",
+                    detalhes=resultado
+                )
+        
+        registrar_info(
+            mensagem=f"Lote de {len(lote)} movimentações registrado com sucesso",
+            modulo="database",
+            funcao="registrar_movimentacoes_lote",
+            detalhes={"produtos": [mov["produto_id"] for mov in lote]}
+        )
+        
+        return True, resultados
+        
+    except Exception as e:
+        # Só é seguro adiar se a chamada não chegou ao banco
+        if ultima_falha() == ERRO_CONEXAO:
+            if not permitir_offline:
+                raise diario_offline.EnvioAdiado(str(e)) from e
+            diario_offline.registrar("movimentacao_lote", {"movimentacoes": lote})
+            for resultado in resultados:
+                resultado["sucesso"] = True
+            return True, resultados
+        
+        registrar_erro(
+            mensagem="Erro ao registrar lote de movimentações",
+            modulo="database",
+            funcao="registrar_movimentacoes_lote",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e), "itens": len(lote)},
+            exc_info=True
+        )
+        print(f"Erro ao registrar lote de movimentações: {e}")
+        
+        # O índice do item rejeitado vem no campo details do erro
+        detalhe = str(getattr(e, "details", "") or "")
+        indice = int(detalhe) if detalhe.isdigit() and int(detalhe) < len(lote) else None
+        return rejeitar(indice, getattr(e, "message", None) or str(e))
+
+
 # 9. FUNÇÃO PARA LISTAR MOVIMENTAÇÕES COM FILTROS
 def listar_movimentacoes(produto_id: int = None, data_inicio: str = None, data_fim: str = None, limit: int = None, offset: int = 0) -> List[Dict[str, Any]]:
     """
@@ -925,7 +936,7 @@ def listar_movimentacoes(produto_id: int = None, data_inicio: str = None, data_f
             query = query.offset(offset)
         
         # Executar query
-        response = query.execute()
+        response = executar_operacao("listar_movimentacoes", query.execute)
         
         registrar_info(
             mensagem=f"Movimentações listadas com sucesso: {len(response.data)} itens",
@@ -942,62 +953,136 @@ def listar_movimentacoes(produto_id: int = None, data_inicio: str = None, data_f
         return response.data
         
     except Exception as e:
-        erro_str = str(e)
+        registrar_erro(
+            mensagem="Erro ao listar movimentações",
+            modulo="database",
+            funcao="listar_movimentacoes",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e)},
+            exc_info=True
+        )
+        print(f"Erro ao listar movimentações: {e}")
+        return []
+
+
+# 9.1 FUNÇÃO PARA LISTAR MOVIMENTAÇÕES COM PAGINAÇÃO POR CURSOR
+def _codificar_cursor(valores: list) -> str:
+    """Codifica a posição da última linha lida em um cursor opaco."""
+    return base64.urlsafe_b64encode(json.dumps(valores).encode("utf-8")).decode("ascii")
+
+
+def _decodificar_cursor(cursor: str) -> list:
+    """Decodifica um cursor gerado por _codificar_cursor()."""
+    return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+
+
+def listar_movimentacoes_pagina(
+    produto_id: int = None,
+    data_inicio: str = None,
+    data_fim: str = None,
+    limite: int = 50,
+    cursor: Optional[str] = None
+) -> tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Lista movimentações de estoque, da mais recente para a mais antiga, com
+    paginação por cursor (created_at, id).
+    
+    Cada página custa o mesmo, em qualquer profundidade, e novas movimentações
+    registradas entre as páginas não deslocam as linhas já exibidas.
+    
+    Args:
+        produto_id: ID do produto para filtrar (opcional)
+        data_inicio: Data inicial no formato ISO (YYYY-MM-DD) (opcional)
+        data_fim: Data final no formato ISO (YYYY-MM-DD) (opcional)
+        limite: Número máximo de movimentações por página
+        cursor: Cursor retornado pela página anterior (None para a primeira página)
         
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao listar movimentações",
-                modulo="database",
-                funcao="listar_movimentacoes",
-                detalhes={"erro": erro_str},
-                exc_info=True
-            )
-            
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    query = supabase.table("movimentacoes").select("*")
-                    
-                    if produto_id is not None:
-                        query = query.eq("produto_id", produto_id)
-                    
-                    if data_inicio is not None:
-                        query = query.gte("created_at", data_inicio)
-                    
-                    if data_fim is not None:
-                        data_fim_completa = f"{data_fim}T23:59:59"
-                        query = query.lte("created_at", data_fim_completa)
-                    
-                    query = query.order("created_at", desc=True)
-                    response = query.execute()
-                    
-                    registrar_info(
-                        mensagem="Movimentações listadas após reconexão",
-                        modulo="database",
-                        funcao="listar_movimentacoes"
-                    )
-                    return response.data
-                    
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao listar movimentações após reconexão",
-                        modulo="database",
-                        funcao="listar_movimentacoes",
-                        detalhes={"erro": str(e2)},
-                        exc_info=True
-                    )
-        else:
-            registrar_erro(
-                mensagem="Erro ao listar movimentações",
-                modulo="database",
-                funcao="listar_movimentacoes",
-                detalhes={"erro": erro_str},
-                exc_info=True
+    Returns:
+        Tupla (movimentações, próximo_cursor). próximo_cursor é None quando não
+        há mais páginas. Em caso de erro retorna ([], None).
+    """
+    try:
+        query = supabase.table("movimentacoes").select("*")
+        
+        if produto_id is not None:
+            query = query.eq("produto_id", produto_id)
+        if data_inicio is not None:
+            query = query.gte("created_at", data_inicio)
+        if data_fim is not None:
+            # Adicionar 23:59:59 para incluir todo o dia final
+            query = query.lte("created_at", f"{data_fim}T23:59:59")
+        
+        # Continuar depois da última linha da página anterior
+        if cursor:
+            created_at, mov_id = _decodificar_cursor(cursor)
+            query = query.or_(
+                f'created_at.lt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.lt.{int(mov_id)})'
             )
         
+        # Uma linha a mais indica se existe próxima página
+        query = query.order("created_at", desc=True).order("id", desc=True).limit(limite + 1)
+        
+        response = executar_operacao("listar_movimentacoes_pagina", query.execute)
+        movimentacoes = response.data or []
+        
+        proximo_cursor = None
+        if len(movimentacoes) > limite:
+            movimentacoes = movimentacoes[:limite]
+            ultima = movimentacoes[-1]
+            proximo_cursor = _codificar_cursor([ultima["created_at"], ultima["id"]])
+        
+        registrar_info(
+            mensagem=f"Movimentações listadas com sucesso: {len(movimentacoes)} itens",
+            modulo="database",
+            funcao="listar_movimentacoes_pagina",
+            detalhes={
+                "produto_id": produto_id,
+                "data_inicio": data_inicio,
+                "data_fim": data_fim,
+                "total": len(movimentacoes),
+                "tem_mais": proximo_cursor is not None
+            }
+        )
+        
+        return movimentacoes, proximo_cursor
+        
+    except Exception as e:
+        registrar_erro(
+            mensagem="Erro ao listar movimentações",
+            modulo="database",
+            funcao="listar_movimentacoes_pagina",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e)},
+            exc_info=True
+        )
         print(f"Erro ao listar movimentações: {e}")
-        return []
+        return [], None
+
+
+# 9.2 FUNÇÃO PARA LISTAR PRODUTOS SEM MOVIMENTAÇÃO
+def listar_produtos_sem_movimentacao(desde: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Lista os produtos com a data da última movimentação, em uma única chamada.
+    
+    A função produtos_sem_movimentacao do banco (sql/008_produtos_sem_movimentacao.sql)
+    calcula a última movimentação de todos os produtos com um GROUP BY e junta
+    o resultado aos produtos, em vez de uma consulta por produto.
+    
+    Args:
+        desde: Data ISO; se informada, apenas produtos sem movimentação desde
+               essa data (ou que nunca tiveram movimentação)
+    
+    Returns:
+        Lista de produtos, cada um com 'ultima_movimentacao' (created_at) e
+        'ultima_data_hora' (data_hora) da última movimentação, ou None
+    
+    Raises:
+        Exception: se a consulta falhar (quem chama decide como tratar)
+    """
+    response = executar_operacao(
+        "listar_produtos_sem_movimentacao",
+        lambda: supabase.rpc("produtos_sem_movimentacao", {"p_desde": desde}).execute()
+    )
+    return response.data or []
 
 
 # 10. FUNÇÃO PARA DESFAZER ÚLTIMA MOVIMENTAÇÃO
@@ -1013,12 +1098,15 @@ def desfazer_ultima_movimentacao(produto_id: int) -> bool:
     """
     try:
         # Buscar última movimentação do produto
-        response_mov = supabase.table("movimentacoes")\
-            .select("*")\
-            .eq("produto_id", produto_id)\
-            .order("created_at", desc=True)\
-            .limit(1)\
-            .execute()
+        response_mov = executar_operacao(
+            "desfazer_ultima_movimentacao",
+            lambda: supabase.table("movimentacoes")
+                .select("*")
+                .eq("produto_id", produto_id)
+                .order("created_at", desc=True)
+                .limit(1)
+                .execute()
+        )
         
         if not response_mov.data:
             registrar_aviso(
@@ -1035,16 +1123,23 @@ def desfazer_ultima_movimentacao(produto_id: int) -> bool:
         quantidade_anterior = ultima_movimentacao["quantidade_anterior"]
         
         # Reverter quantidade do produto para o valor anterior
-        supabase.table("produtos")\
-            .update({"quantidade": quantidade_anterior})\
-            .eq("id", produto_id)\
-            .execute()
+        executar_operacao(
+            "desfazer_ultima_movimentacao",
+            lambda: supabase.table("produtos")
+                .update({"quantidade": quantidade_anterior})
+                .eq("id", produto_id)
+                .execute()
+        )
+        catalogo.atualizar_quantidade(produto_id, quantidade_anterior)
         
         # Deletar o registro da movimentação
-        supabase.table("movimentacoes")\
-            .delete()\
-            .eq("id", movimentacao_id)\
-            .execute()
+        executar_operacao(
+            "desfazer_ultima_movimentacao",
+            lambda: supabase.table("movimentacoes")
+                .delete()
+                .eq("id", movimentacao_id)
+                .execute()
+        )
         
         registrar_info(
             mensagem=f"Movimentação desfeita com sucesso",
@@ -1061,69 +1156,13 @@ def desfazer_ultima_movimentacao(produto_id: int) -> bool:
         return True
         
     except Exception as e:
-        erro_str = str(e)
-        
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao desfazer movimentação",
-                modulo="database",
-                funcao="desfazer_ultima_movimentacao",
-                detalhes={"erro": erro_str, "produto_id": produto_id},
-                exc_info=True
-            )
-            
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    response_mov = supabase.table("movimentacoes")\
-                        .select("*")\
-                        .eq("produto_id", produto_id)\
-                        .order("created_at", desc=True)\
-                        .limit(1)\
-                        .execute()
-                    
-                    if not response_mov.data:
-                        return False
-                    
-                    ultima_movimentacao = response_mov.data[0]
-                    movimentacao_id = ultima_movimentacao["id"]
-                    quantidade_anterior = ultima_movimentacao["quantidade_anterior"]
-                    
-                    supabase.table("produtos")\
-                        .update({"quantidade": quantidade_anterior})\
-                        .eq("id", produto_id)\
-                        .execute()
-                    
-                    supabase.table("movimentacoes")\
-                        .delete()\
-                        .eq("id", movimentacao_id)\
-                        .execute()
-                    
-                    registrar_info(
-                        mensagem="Movimentação desfeita após reconexão",
-                        modulo="database",
-                        funcao="desfazer_ultima_movimentacao"
-                    )
-                    return True
-                    
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao desfazer movimentação após reconexão",
-                        modulo="database",
-                        funcao="desfazer_ultima_movimentacao",
-                        detalhes={"erro": str(e2)},
-                        exc_info=True
-                    )
-        else:
-            registrar_erro(
-                mensagem="Erro ao desfazer movimentação",
-                modulo="database",
-                funcao="desfazer_ultima_movimentacao",
-                detalhes={"erro": erro_str, "produto_id": produto_id},
-                exc_info=True
-            )
-        
+        registrar_erro(
+            mensagem="Erro ao desfazer movimentação",
+            modulo="database",
+            funcao="desfazer_ultima_movimentacao",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e), "produto_id": produto_id},
+            exc_info=True
+        )
         print(f"Erro ao desfazer movimentação: {e}")
         return False
 
@@ -1150,10 +1189,13 @@ def criar_usuario(username: str, senha: str) -> tuple[bool, str]:
     
     try:
         # Validar username único
-        response = supabase.table("usuarios")\
-            .select("id")\
-            .eq("username", username)\
-            .execute()
+        response = executar_operacao(
+            "criar_usuario",
+            lambda: supabase.table("usuarios")
+                .select("id")
+                .eq("username", username)
+                .execute()
+        )
         
         if response.data:
             registrar_aviso(
@@ -1169,14 +1211,18 @@ def criar_usuario(username: str, senha: str) -> tuple[bool, str]:
         senha_hash = bcrypt.hashpw(senha.encode('utf-8'), salt).decode('utf-8')
         
         # Inserir usuário na tabela
-        supabase.table("usuarios")\
-            .insert({
-                "username": username,
-                "senha_hash": senha_hash,
-                "ativo": True,
-                "tentativas_login": 0
-            })\
-            .execute()
+        executar_operacao(
+            "criar_usuario",
+            lambda: supabase.table("usuarios")
+                .insert({
+                    "username": username,
+                    "senha_hash": senha_hash,
+                    "ativo": True,
+                    "tentativas_login": 0
+                })
+                .execute(),
+            idempotente=False
+        )
         
         registrar_info(
             mensagem=f"Usuário criado com sucesso",
@@ -1188,68 +1234,13 @@ def criar_usuario(username: str, senha: str) -> tuple[bool, str]:
         return True, "Usuário criado com sucesso"
         
     except Exception as e:
-        erro_str = str(e)
-        
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao criar usuário",
-                modulo="database",
-                funcao="criar_usuario",
-                detalhes={"erro": erro_str, "username": username},
-                exc_info=True
-            )
-            
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    # Verificar novamente se username é único
-                    response = supabase.table("usuarios")\
-                        .select("id")\
-                        .eq("username", username)\
-                        .execute()
-                    
-                    if response.data:
-                        return False, f"Usuário '{username}' já existe"
-                    
-                    # Gerar hash e inserir
-                    salt = bcrypt.gensalt()
-                    senha_hash = bcrypt.hashpw(senha.encode('utf-8'), salt).decode('utf-8')
-                    
-                    supabase.table("usuarios")\
-                        .insert({
-                            "username": username,
-                            "senha_hash": senha_hash,
-                            "ativo": True,
-                            "tentativas_login": 0
-                        })\
-                        .execute()
-                    
-                    registrar_info(
-                        mensagem="Usuário criado após reconexão",
-                        modulo="database",
-                        funcao="criar_usuario"
-                    )
-                    return True, "Usuário criado com sucesso"
-                    
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao criar usuário após reconexão",
-                        modulo="database",
-                        funcao="criar_usuario",
-                        detalhes={"erro": str(e2)},
-                        exc_info=True
-                    )
-                    return False, "Erro ao conectar ao banco de dados"
-        else:
-            registrar_erro(
-                mensagem="Erro ao criar usuário",
-                modulo="database",
-                funcao="criar_usuario",
-                detalhes={"erro": erro_str, "username": username},
-                exc_info=True
-            )
-        
+        registrar_erro(
+            mensagem="Erro ao criar usuário",
+            modulo="database",
+            funcao="criar_usuario",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e), "username": username},
+            exc_info=True
+        )
         print(f"Erro ao criar usuário: {e}")
         return False, "Erro ao criar usuário"
 
@@ -1274,10 +1265,13 @@ def autenticar_usuario(username: str, senha: str) -> tuple[bool, str, dict | Non
     
     try:
         # Buscar usuário
-        response = supabase.table("usuarios")\
-            .select("*")\
-            .eq("username", username)\
-            .execute()
+        response = executar_operacao(
+            "autenticar_usuario",
+            lambda: supabase.table("usuarios")
+                .select("*")
+                .eq("username", username)
+                .execute()
+        )
         
         if not response.data:
             registrar_aviso(
@@ -1336,13 +1330,16 @@ def autenticar_usuario(username: str, senha: str) -> tuple[bool, str, dict | Non
             if tentativas >= 3:
                 bloqueado_ate = datetime.now() + timedelta(minutes=5)
                 
-                supabase.table("usuarios")\
-                    .update({
-                        "tentativas_login": tentativas,
-                        "bloqueado_ate": bloqueado_ate.isoformat()
-                    })\
-                    .eq("id", usuario_id)\
-                    .execute()
+                executar_operacao(
+                    "autenticar_usuario",
+                    lambda: supabase.table("usuarios")
+                        .update({
+                            "tentativas_login": tentativas,
+                            "bloqueado_ate": bloqueado_ate.isoformat()
+                        })
+                        .eq("id", usuario_id)
+                        .execute()
+                )
                 
                 registrar_aviso(
                     mensagem=f"Usuário bloqueado após 3 tentativas falhadas",
@@ -1356,10 +1353,13 @@ def autenticar_usuario(username: str, senha: str) -> tuple[bool, str, dict | Non
                 )
                 return False, "Credenciais inválidas. Conta bloqueada por 5 minutos", None
             else:
-                supabase.table("usuarios")\
-                    .update({"tentativas_login": tentativas})\
-                    .eq("id", usuario_id)\
-                    .execute()
+                executar_operacao(
+                    "autenticar_usuario",
+                    lambda: supabase.table("usuarios")
+                        .update({"tentativas_login": tentativas})
+                        .eq("id", usuario_id)
+                        .execute()
+                )
                 
                 registrar_aviso(
                     mensagem=f"Tentativa de login falhada",
@@ -1374,14 +1374,17 @@ def autenticar_usuario(username: str, senha: str) -> tuple[bool, str, dict | Non
                 return False, f"Credenciais inválidas. Tentativa {tentativas} de 3", None
         
         # Senha correta - resetar tentativas e atualizar último acesso
-        supabase.table("usuarios")\
-            .update({
-                "tentativas_login": 0,
-                "bloqueado_ate": None,
-                "ultimo_acesso": datetime.now().isoformat()
-            })\
-            .eq("id", usuario_id)\
-            .execute()
+        executar_operacao(
+            "autenticar_usuario",
+            lambda: supabase.table("usuarios")
+                .update({
+                    "tentativas_login": 0,
+                    "bloqueado_ate": None,
+                    "ultimo_acesso": datetime.now().isoformat()
+                })
+                .eq("id", usuario_id)
+                .execute()
+        )
         
         registrar_info(
             mensagem=f"Login bem-sucedido",
@@ -1401,41 +1404,13 @@ def autenticar_usuario(username: str, senha: str) -> tuple[bool, str, dict | Non
         return True, "Autenticado com sucesso", dados_usuario
         
     except Exception as e:
-        erro_str = str(e)
-        
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao autenticar usuário",
-                modulo="database",
-                funcao="autenticar_usuario",
-                detalhes={"erro": erro_str, "username": username},
-                exc_info=True
-            )
-            
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    # Tentar autenticar novamente
-                    return autenticar_usuario(username, senha)
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao autenticar após reconexão",
-                        modulo="database",
-                        funcao="autenticar_usuario",
-                        detalhes={"erro": str(e2)},
-                        exc_info=True
-                    )
-                    return False, "Erro ao conectar ao banco de dados", None
-        else:
-            registrar_erro(
-                mensagem="Erro ao autenticar usuário",
-                modulo="database",
-                funcao="autenticar_usuario",
-                detalhes={"erro": erro_str, "username": username},
-                exc_info=True
-            )
-        
+        registrar_erro(
+            mensagem="Erro ao autenticar usuário",
+            modulo="database",
+            funcao="autenticar_usuario",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e), "username": username},
+            exc_info=True
+        )
         print(f"Erro ao autenticar usuário: {e}")
         return False, "Erro ao autenticar usuário", None
 
@@ -1454,10 +1429,13 @@ def registrar_acesso(usuario_id: int) -> bool:
     from datetime import datetime
     
     try:
-        supabase.table("usuarios")\
-            .update({"ultimo_acesso": datetime.now().isoformat()})\
-            .eq("id", usuario_id)\
-            .execute()
+        executar_operacao(
+            "registrar_acesso",
+            lambda: supabase.table("usuarios")
+                .update({"ultimo_acesso": datetime.now().isoformat()})
+                .eq("id", usuario_id)
+                .execute()
+        )
         
         registrar_info(
             mensagem=f"Acesso registrado",
@@ -1469,50 +1447,13 @@ def registrar_acesso(usuario_id: int) -> bool:
         return True
         
     except Exception as e:
-        erro_str = str(e)
-        
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao registrar acesso",
-                modulo="database",
-                funcao="registrar_acesso",
-                detalhes={"erro": erro_str, "usuario_id": usuario_id},
-                exc_info=True
-            )
-            
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    supabase.table("usuarios")\
-                        .update({"ultimo_acesso": datetime.now().isoformat()})\
-                        .eq("id", usuario_id)\
-                        .execute()
-                    
-                    registrar_info(
-                        mensagem="Acesso registrado após reconexão",
-                        modulo="database",
-                        funcao="registrar_acesso"
-                    )
-                    return True
-                    
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao registrar acesso após reconexão",
-                        modulo="database",
-                        funcao="registrar_acesso",
-                        detalhes={"erro": str(e2)},
-                        exc_info=True
-                    )
-        else:
-            registrar_erro(
-                mensagem="Erro ao registrar acesso",
-                modulo="database",
-                funcao="registrar_acesso",
-                detalhes={"erro": erro_str, "usuario_id": usuario_id},
-                exc_info=True
-            )
-        
+        registrar_erro(
+            mensagem="Erro ao registrar acesso",
+            modulo="database",
+            funcao="registrar_acesso",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e), "usuario_id": usuario_id},
+            exc_info=True
+        )
         print(f"Erro ao registrar acesso: {e}")
         return False
 
@@ -1536,10 +1477,13 @@ def alterar_senha(usuario_id: int, senha_antiga: str, senha_nova: str) -> tuple[
     
     try:
         # Buscar usuário
-        response = supabase.table("usuarios")\
-            .select("*")\
-            .eq("id", usuario_id)\
-            .execute()
+        response = executar_operacao(
+            "alterar_senha",
+            lambda: supabase.table("usuarios")
+                .select("*")
+                .eq("id", usuario_id)
+                .execute()
+        )
         
         if not response.data:
             registrar_aviso(
@@ -1573,10 +1517,13 @@ def alterar_senha(usuario_id: int, senha_antiga: str, senha_nova: str) -> tuple[
         senha_hash_nova = bcrypt.hashpw(senha_nova.encode('utf-8'), salt).decode('utf-8')
         
         # Atualizar senha no banco
-        supabase.table("usuarios")\
-            .update({"senha_hash": senha_hash_nova})\
-            .eq("id", usuario_id)\
-            .execute()
+        executar_operacao(
+            "alterar_senha",
+            lambda: supabase.table("usuarios")
+                .update({"senha_hash": senha_hash_nova})
+                .eq("id", usuario_id)
+                .execute()
+        )
         
         registrar_info(
             mensagem=f"Senha alterada com sucesso",
@@ -1588,76 +1535,13 @@ def alterar_senha(usuario_id: int, senha_antiga: str, senha_nova: str) -> tuple[
         return True, "Senha alterada com sucesso"
         
     except Exception as e:
-        erro_str = str(e)
-        
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao alterar senha",
-                modulo="database",
-                funcao="alterar_senha",
-                detalhes={"erro": erro_str, "usuario_id": usuario_id},
-                exc_info=True
-            )
-            
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    # Buscar usuário novamente
-                    response = supabase.table("usuarios")\
-                        .select("*")\
-                        .eq("id", usuario_id)\
-                        .execute()
-                    
-                    if not response.data:
-                        return False, "Usuário não encontrado"
-                    
-                    usuario = response.data[0]
-                    senha_hash_atual = usuario["senha_hash"]
-                    
-                    # Verificar senha antiga
-                    senha_antiga_valida = bcrypt.checkpw(
-                        senha_antiga.encode('utf-8'),
-                        senha_hash_atual.encode('utf-8')
-                    )
-                    
-                    if not senha_antiga_valida:
-                        return False, "Senha antiga incorreta"
-                    
-                    # Gerar hash e atualizar
-                    salt = bcrypt.gensalt()
-                    senha_hash_nova = bcrypt.hashpw(senha_nova.encode('utf-8'), salt).decode('utf-8')
-                    
-                    supabase.table("usuarios")\
-                        .update({"senha_hash": senha_hash_nova})\
-                        .eq("id", usuario_id)\
-                        .execute()
-                    
-                    registrar_info(
-                        mensagem="Senha alterada após reconexão",
-                        modulo="database",
-                        funcao="alterar_senha"
-                    )
-                    return True, "Senha alterada com sucesso"
-                    
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao alterar senha após reconexão",
-                        modulo="database",
-                        funcao="alterar_senha",
-                        detalhes={"erro": str(e2)},
-                        exc_info=True
-                    )
-                    return False, "Erro ao conectar ao banco de dados"
-        else:
-            registrar_erro(
-                mensagem="Erro ao alterar senha",
-                modulo="database",
-                funcao="alterar_senha",
-                detalhes={"erro": erro_str, "usuario_id": usuario_id},
-                exc_info=True
-            )
-        
+        registrar_erro(
+            mensagem="Erro ao alterar senha",
+            modulo="database",
+            funcao="alterar_senha",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e), "usuario_id": usuario_id},
+            exc_info=True
+        )
         print(f"Erro ao alterar senha: {e}")
         return False, "Erro ao alterar senha"
 
@@ -1685,13 +1569,17 @@ def criar_sessao(usuario_id: int) -> tuple[bool, str, str | None]:
         expira_em = datetime.now() + timedelta(hours=2)
         
         # Inserir sessão no banco
-        response = supabase.table("sessoes")\
-            .insert({
-                "usuario_id": usuario_id,
-                "token": token,
-                "expira_em": expira_em.isoformat()
-            })\
-            .execute()
+        response = executar_operacao(
+            "criar_sessao",
+            lambda: supabase.table("sessoes")
+                .insert({
+                    "usuario_id": usuario_id,
+                    "token": token,
+                    "expira_em": expira_em.isoformat()
+                })
+                .execute(),
+            idempotente=False
+        )
         
         if response.data:
             registrar_info(
@@ -1711,63 +1599,13 @@ def criar_sessao(usuario_id: int) -> tuple[bool, str, str | None]:
             return False, "Erro ao criar sessão", None
             
     except Exception as e:
-        erro_str = str(e)
-        
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao criar sessão",
-                modulo="database",
-                funcao="criar_sessao",
-                detalhes={"erro": erro_str, "usuario_id": usuario_id},
-                exc_info=True
-            )
-            
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    import secrets
-                    from datetime import datetime, timedelta
-                    
-                    token = secrets.token_urlsafe(32)
-                    expira_em = datetime.now() + timedelta(hours=2)
-                    
-                    response = supabase.table("sessoes")\
-                        .insert({
-                            "usuario_id": usuario_id,
-                            "token": token,
-                            "expira_em": expira_em.isoformat()
-                        })\
-                        .execute()
-                    
-                    if response.data:
-                        registrar_info(
-                            mensagem="Sessão criada após reconexão",
-                            modulo="database",
-                            funcao="criar_sessao"
-                        )
-                        return True, "Sessão criada com sucesso", token
-                    else:
-                        return False, "Erro ao criar sessão", None
-                        
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao criar sessão após reconexão",
-                        modulo="database",
-                        funcao="criar_sessao",
-                        detalhes={"erro": str(e2)},
-                        exc_info=True
-                    )
-                    return False, "Erro ao conectar ao banco de dados", None
-        else:
-            registrar_erro(
-                mensagem="Erro ao criar sessão",
-                modulo="database",
-                funcao="criar_sessao",
-                detalhes={"erro": erro_str, "usuario_id": usuario_id},
-                exc_info=True
-            )
-        
+        registrar_erro(
+            mensagem="Erro ao criar sessão",
+            modulo="database",
+            funcao="criar_sessao",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e), "usuario_id": usuario_id},
+            exc_info=True
+        )
         print(f"Erro ao criar sessão: {e}")
         return False, "Erro ao criar sessão", None
 
@@ -1786,10 +1624,13 @@ def validar_sessao(token: str) -> tuple[bool, str, dict | None]:
         from datetime import datetime
         
         # Buscar sessão pelo token
-        response = supabase.table("sessoes")\
-            .select("*, usuarios(*)")\
-            .eq("token", token)\
-            .execute()
+        response = executar_operacao(
+            "validar_sessao",
+            lambda: supabase.table("sessoes")
+                .select("*, usuarios(*)")
+                .eq("token", token)
+                .execute()
+        )
         
         if not response.data:
             return False, "Sessão não encontrada", None
@@ -1820,64 +1661,13 @@ def validar_sessao(token: str) -> tuple[bool, str, dict | None]:
         return True, "Sessão válida", usuario
         
     except Exception as e:
-        erro_str = str(e)
-        
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao validar sessão",
-                modulo="database",
-                funcao="validar_sessao",
-                detalhes={"erro": erro_str},
-                exc_info=True
-            )
-            
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    from datetime import datetime
-                    
-                    response = supabase.table("sessoes")\
-                        .select("*, usuarios(*)")\
-                        .eq("token", token)\
-                        .execute()
-                    
-                    if not response.data:
-                        return False, "Sessão não encontrada", None
-                    
-                    sessao = response.data[0]
-                    expira_em = datetime.fromisoformat(sessao["expira_em"].replace('Z', '+00:00'))
-                    agora = datetime.now(expira_em.tzinfo) if expira_em.tzinfo else datetime.now()
-                    
-                    if agora > expira_em:
-                        return False, "Sessão expirada", None
-                    
-                    usuario = sessao["usuarios"]
-                    registrar_info(
-                        mensagem="Sessão validada após reconexão",
-                        modulo="database",
-                        funcao="validar_sessao"
-                    )
-                    return True, "Sessão válida", usuario
-                    
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao validar sessão após reconexão",
-                        modulo="database",
-                        funcao="validar_sessao",
-                        detalhes={"erro": str(e2)},
-                        exc_info=True
-                    )
-                    return False, "Erro ao conectar ao banco de dados", None
-        else:
-            registrar_erro(
-                mensagem="Erro ao validar sessão",
-                modulo="database",
-                funcao="validar_sessao",
-                detalhes={"erro": erro_str},
-                exc_info=True
-            )
-        
+        registrar_erro(
+            mensagem="Erro ao validar sessão",
+            modulo="database",
+            funcao="validar_sessao",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e)},
+            exc_info=True
+        )
         print(f"Erro ao validar sessão: {e}")
         return False, "Erro ao validar sessão", None
 
@@ -1895,10 +1685,13 @@ def limpar_sessoes_expiradas() -> tuple[bool, str]:
         # Deletar sessões expiradas
         agora = datetime.now().isoformat()
         
-        response = supabase.table("sessoes")\
-            .delete()\
-            .lt("expira_em", agora)\
-            .execute()
+        response = executar_operacao(
+            "limpar_sessoes_expiradas",
+            lambda: supabase.table("sessoes")
+                .delete()
+                .lt("expira_em", agora)
+                .execute()
+        )
         
         registrar_info(
             mensagem="Sessões expiradas limpas",
@@ -1908,54 +1701,13 @@ def limpar_sessoes_expiradas() -> tuple[bool, str]:
         return True, "Sessões expiradas removidas"
         
     except Exception as e:
-        erro_str = str(e)
-        
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao limpar sessões",
-                modulo="database",
-                funcao="limpar_sessoes_expiradas",
-                detalhes={"erro": erro_str},
-                exc_info=True
-            )
-            
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    from datetime import datetime
-                    agora = datetime.now().isoformat()
-                    
-                    supabase.table("sessoes")\
-                        .delete()\
-                        .lt("expira_em", agora)\
-                        .execute()
-                    
-                    registrar_info(
-                        mensagem="Sessões limpas após reconexão",
-                        modulo="database",
-                        funcao="limpar_sessoes_expiradas"
-                    )
-                    return True, "Sessões expiradas removidas"
-                    
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao limpar sessões após reconexão",
-                        modulo="database",
-                        funcao="limpar_sessoes_expiradas",
-                        detalhes={"erro": str(e2)},
-                        exc_info=True
-                    )
-                    return False, "Erro ao conectar ao banco de dados"
-        else:
-            registrar_erro(
-                mensagem="Erro ao limpar sessões",
-                modulo="database",
-                funcao="limpar_sessoes_expiradas",
-                detalhes={"erro": erro_str},
-                exc_info=True
-            )
-        
+        registrar_erro(
+            mensagem="Erro ao limpar sessões",
+            modulo="database",
+            funcao="limpar_sessoes_expiradas",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e)},
+            exc_info=True
+        )
         print(f"Erro ao limpar sessões: {e}")
         return False, "Erro ao limpar sessões"
 
@@ -1972,10 +1724,13 @@ def encerrar_sessao(token: str) -> tuple[bool, str]:
     """
     try:
         # Deletar sessão
-        response = supabase.table("sessoes")\
-            .delete()\
-            .eq("token", token)\
-            .execute()
+        response = executar_operacao(
+            "encerrar_sessao",
+            lambda: supabase.table("sessoes")
+                .delete()
+                .eq("token", token)
+                .execute()
+        )
         
         registrar_info(
             mensagem="Sessão encerrada",
@@ -1986,51 +1741,13 @@ def encerrar_sessao(token: str) -> tuple[bool, str]:
         return True, "Sessão encerrada com sucesso"
         
     except Exception as e:
-        erro_str = str(e)
-        
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao encerrar sessão",
-                modulo="database",
-                funcao="encerrar_sessao",
-                detalhes={"erro": erro_str},
-                exc_info=True
-            )
-            
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    supabase.table("sessoes")\
-                        .delete()\
-                        .eq("token", token)\
-                        .execute()
-                    
-                    registrar_info(
-                        mensagem="Sessão encerrada após reconexão",
-                        modulo="database",
-                        funcao="encerrar_sessao"
-                    )
-                    return True, "Sessão encerrada com sucesso"
-                    
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao encerrar sessão após reconexão",
-                        modulo="database",
-                        funcao="encerrar_sessao",
-                        detalhes={"erro": str(e2)},
-                        exc_info=True
-                    )
-                    return False, "Erro ao conectar ao banco de dados"
-        else:
-            registrar_erro(
-                mensagem="Erro ao encerrar sessão",
-                modulo="database",
-                funcao="encerrar_sessao",
-                detalhes={"erro": erro_str},
-                exc_info=True
-            )
-        
+        registrar_erro(
+            mensagem="Erro ao encerrar sessão",
+            modulo="database",
+            funcao="encerrar_sessao",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e)},
+            exc_info=True
+        )
         print(f"Erro ao encerrar sessão: {e}")
         return False, "Erro ao encerrar sessão"
 
@@ -2041,7 +1758,7 @@ def obter_sessao_ativa() -> tuple[bool, str, dict | None]:
         print("DEBUG obter_sessao_ativa: Iniciando busca de sessão...")
         from datetime import datetime
         print("DEBUG obter_sessao_ativa: Consultando banco de dados...")
-        response = supabase.table('sessoes').select('*, usuarios(*)').order('created_at', desc=True).limit(1).execute()
+        response = executar_operacao("obter_sessao_ativa", lambda: supabase.table('sessoes').select('*, usuarios(*)').order('created_at', desc=True).limit(1).execute())
         print(f"DEBUG obter_sessao_ativa: Resposta recebida - {len(response.data) if response.data else 0} sessões encontradas")
         if not response.data:
             return False, 'Nenhuma sessão ativa encontrada', None
@@ -2054,13 +1771,266 @@ def obter_sessao_ativa() -> tuple[bool, str, dict | None]:
         dados_sessao = {'token': sessao['token'], 'usuario': {'id': usuario['id'], 'username': usuario['username'], 'ativo': usuario['ativo']}}
         return True, 'Sessão ativa encontrada', dados_sessao
     except Exception as e:
-        print(f'Erro ao buscar sessão ativa: {e}')
-        return False, 'Erro ao buscar sessão ativa', None
-
+        print(f'Erro ao buscar sessão ativa: {e}')
+        return False, 'Erro ao buscar sessão ativa', None
+
+
+# ============================================================================
+# BUSCA AVANÇADA
+# ============================================================================
+
+# Campos de ordenação aceitos na busca avançada (nome amigável -> coluna)
+# Campos da busca por termo da tela de estoque (índice de busca do cache_catalogo)
+CAMPOS_BUSCA_PRODUTOS = ("descricao", "marca", "referencia")
+
+CAMPOS_ORDENACAO_PRODUTOS = {
+    "nome": "descricao",
+    "preco": "preco",
+    "quantidade": "quantidade"
+}
+
+
+# Cache das contagens da busca avançada: {filtros normalizados: (total, instante)}.
+# Invalidado nas escritas de produtos deste terminal; a validade cobre as de outros terminais.
+VALIDADE_CACHE_CONTAGEM = 60  # segundos
+_cache_contagens: Dict[tuple, tuple] = {}
+_lock_cache_contagens = threading.Lock()
+
+
+def _chave_contagem(filtros: dict) -> tuple:
+    """Normaliza os filtros que afetam a contagem (ignora ordenação e paginação)."""
+    chave = []
+    for campo in ("termo", "genero", "marca"):
+        if filtros.get(campo):
+            chave.append((campo, filtros[campo]))
+    for campo in ("preco_min", "preco_max"):
+        if filtros.get(campo) is not None:
+            chave.append((campo, filtros[campo]))
+    return tuple(chave)
+
+
+def _contagem_em_cache(filtros: dict) -> Optional[int]:
+    """Retorna a contagem em cache para os filtros, ou None se ausente/expirada."""
+    with _lock_cache_contagens:
+        item = _cache_contagens.get(_chave_contagem(filtros))
+    if item is None or time.monotonic() - item[1] > VALIDADE_CACHE_CONTAGEM:
+        return None
+    return item[0]
+
+
+def _guardar_contagem(filtros: dict, total: int) -> None:
+    with _lock_cache_contagens:
+        _cache_contagens[_chave_contagem(filtros)] = (total, time.monotonic())
+
+
+def invalidar_contagens_produtos() -> None:
+    """Descarta as contagens em cache (chamada após cadastrar, editar ou excluir produtos)."""
+    with _lock_cache_contagens:
+        _cache_contagens.clear()
+
+
+def _produtos_em_memoria(filtros: dict) -> Optional[list]:
+    """
+    Produtos candidatos da busca avançada a partir do cache do catálogo.
+    
+    Com termo, usa o índice de busca (ordem de relevância; carrega o catálogo
+    se necessário). Sem termo, retorna o catálogo em cache (ordem de id) ou
+    None se ele não estiver carregado.
+    """
+    if filtros.get("termo"):
+        return catalogo.buscar(filtros["termo"], CAMPOS_BUSCA_PRODUTOS)
+    return catalogo.produtos_em_memoria()
+
+
+def _filtrar_produtos_em_memoria(produtos: list, filtros: dict) -> list:
+    """
+    Aplica os filtros da busca avançada ao catálogo em cache, com a mesma
+    semântica da consulta no servidor (_consulta_produtos_filtrada).
+    O termo já foi aplicado pelo índice de busca (_produtos_em_memoria).
+    """
+    if filtros.get("genero"):
+        produtos = [p for p in produtos if p.get("genero") == filtros["genero"]]
+    
+    if filtros.get("marca"):
+        produtos = [p for p in produtos if p.get("marca") == filtros["marca"]]
+    
+    if filtros.get("preco_min") is not None:
+        produtos = [p for p in produtos if p.get("preco") is not None and p["preco"] >= filtros["preco_min"]]
+    
+    if filtros.get("preco_max") is not None:
+        produtos = [p for p in produtos if p.get("preco") is not None and p["preco"] <= filtros["preco_max"]]
+    
+    return produtos
+
+
+def _ordenar_produtos_em_memoria(produtos: list, filtros: dict) -> list:
+    """
+    Ordena como o servidor: nulos por último (asc) ou primeiro (desc), id como desempate.
+    Sem order_by mantém a ordem recebida (relevância, se houver termo).
+    """
+    campo = CAMPOS_ORDENACAO_PRODUTOS.get(filtros.get("order_by")) if filtros.get("order_by") else None
+    if not campo:
+        return produtos
+    produtos = sorted(produtos, key=lambda p: p["id"])
+    
+    def chave(produto):
+        valor = produto.get(campo)
+        if isinstance(valor, str):
+            valor = valor.casefold()
+        return (valor is None, valor if valor is not None else 0)
+    
+    # sorted é estável também com reverse=True: o desempate por id é mantido
+    desc = filtros.get("order_direction", "asc").lower() == "desc"
+    return sorted(produtos, key=chave, reverse=desc)
+
+
+def _consulta_produtos_filtrada(filtros: dict, colunas: str = "*", contagem: Optional[str] = None, somente_contagem: bool = False):
+    """
+    Monta a consulta de produtos com os filtros da busca avançada aplicados no servidor.
+    
+    Args:
+        filtros: Mesmos filtros de buscar_produtos_avancado
+        colunas: Colunas retornadas
+        contagem: Tipo de contagem do PostgREST ('exact', 'planned', 'estimated') ou None
+        somente_contagem: Se True, retorna apenas a contagem (sem linhas)
+    
+    Returns:
+        Tupla (query, filtros_aplicados)
+    """
+    query = supabase.table("produtos").select(colunas, count=contagem, head=somente_contagem)
+    filtros_aplicados = []
+    
+    # Filtro de gênero (exato)
+    if filtros.get("genero"):
+        query = query.eq("genero", filtros["genero"])
+        filtros_aplicados.append(f"genero={filtros['genero']}")
+    
+    # Filtro de marca (exato)
+    if filtros.get("marca"):
+        query = query.eq("marca", filtros["marca"])
+        filtros_aplicados.append(f"marca={filtros['marca']}")
+    
+    # Filtro de preço mínimo
+    if filtros.get("preco_min") is not None:
+        query = query.gte("preco", filtros["preco_min"])
+        filtros_aplicados.append(f"preco>={filtros['preco_min']}")
+    
+    # Filtro de preço máximo
+    if filtros.get("preco_max") is not None:
+        query = query.lte("preco", filtros["preco_max"])
+        filtros_aplicados.append(f"preco<={filtros['preco_max']}")
+    
+    # Filtro de busca multi-campo (case-insensitive) com OR + ILIKE no servidor.
+    # O valor vai entre aspas para que vírgulas, pontos e parênteses do termo
+    # não quebrem a sintaxe do or=(...); aspas e barras são descartadas.
+    if filtros.get("termo"):
+        termo = filtros["termo"].replace('"', "").replace("\\", "")
+        padrao = f'"%{termo}%"'
+        query = query.or_(
+            f"descricao.ilike.{padrao},"
+            f"marca.ilike.{padrao},"
+            f"referencia.ilike.{padrao}"
+        )
+        filtros_aplicados.append(f"termo='{filtros['termo']}'")
+    
+    return query, filtros_aplicados
+
+
+def _buscar_pagina_no_banco(filtros: dict, contagem: Optional[str], limit: Optional[int], offset: int) -> tuple[list, int, list]:
+    """Executa no banco a consulta de buscar_produtos_pagina (filtros, ordenação, página e total)."""
+    total_cache = _contagem_em_cache(filtros) if contagem else None
+    if total_cache is not None:
+        contagem = None
+    
+    query, filtros_aplicados = _consulta_produtos_filtrada(filtros, contagem=contagem)
+    
+    # Aplicar ordenação (id como desempate para paginação estável).
+    # Nulos ficam por último em ordem crescente e primeiro em decrescente.
+    order_by = filtros.get("order_by")
+    order_direction = filtros.get("order_direction", "asc")
+    campo = CAMPOS_ORDENACAO_PRODUTOS.get(order_by) if order_by else None
+    if campo:
+        query = query.order(campo, desc=(order_direction.lower() == "desc"))
+        filtros_aplicados.append(f"order_by={order_by} {order_direction}")
+    query = query.order("id")
+    
+    # Aplicar paginação (padrão: 50 itens por página)
+    if limit is not None:
+        query = query.range(offset, offset + limit - 1)
+    
+    response = executar_operacao("buscar_produtos_avancado", query.execute)
+    produtos = response.data or []
+    if total_cache is not None:
+        total_produtos = total_cache
+    elif response.count is not None:
+        total_produtos = response.count
+        _guardar_contagem(filtros, total_produtos)
+    else:
+        total_produtos = len(produtos)
+    
+    return produtos, total_produtos, filtros_aplicados
+
+
+def buscar_produtos_pagina(filtros: dict, contagem: Optional[str] = "exact") -> tuple[list, int]:
+    """
+    Busca uma página de produtos e o total de resultados em uma única requisição.
+    
+    Filtros, busca multi-campo, ordenação e paginação são aplicados pelo
+    banco; apenas a página solicitada é transferida. O total fica em cache por
+    conjunto de filtros, então as páginas seguintes não pedem contagem.
+    A busca por termo usa o índice em memória do cache_catalogo (sem acentos,
+    resultados por relevância se não houver order_by). Só com filtros, a
+    busca é feita em memória se o catálogo estiver em cache.
+    
+    Args:
+        filtros: Mesmos filtros de buscar_produtos_avancado
+        contagem: Tipo de contagem: 'exact' (padrão), 'planned' ou 'estimated'
+                  (estimativas são mais rápidas em catálogos grandes), ou None
+                  para não contar
+    
+    Returns:
+        Tupla (produtos da página, total de produtos que atendem aos filtros).
+        Se contagem for None, o total é o número de produtos retornados.
+        Em caso de erro retorna ([], 0).
+    """
+    try:
+        limit = filtros.get("limit", 50)
+        offset = filtros.get("offset", 0)
+        
+        em_memoria = _produtos_em_memoria(filtros)
+        if em_memoria is not None:
+            encontrados = _ordenar_produtos_em_memoria(_filtrar_produtos_em_memoria(em_memoria, filtros), filtros)
+            total_produtos = len(encontrados)
+            produtos = encontrados[offset:offset + limit] if limit is not None else encontrados
+            filtros_aplicados = [f"{campo}={valor}" for campo, valor in filtros.items() if valor not in (None, "")]
+            filtros_aplicados.append("catalogo_em_cache")
+        else:
+            produtos, total_produtos, filtros_aplicados = _buscar_pagina_no_banco(filtros, contagem, limit, offset)
+        
+        if limit is not None:
+            filtros_aplicados.append(f"paginacao={offset}-{offset+len(produtos)}/{total_produtos}")
+        
+        registrar_info(
+            mensagem=f"Busca avançada realizada: {len(produtos)} produtos retornados de {total_produtos} encontrados",
+            modulo="database",
+            funcao="buscar_produtos_avancado",
+            detalhes={"filtros": filtros_aplicados, "total": total_produtos, "retornados": len(produtos)}
+        )
+        
+        print(f"Busca avançada: {len(produtos)} produtos retornados de {total_produtos} encontrados com filtros: {', '.join(filtros_aplicados)}")
+        return produtos, total_produtos
+        
+    except Exception as e:
+        registrar_erro(
+            mensagem="Erro ao buscar produtos",
+            modulo="database",
+            funcao="buscar_produtos_avancado",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e), "filtros": filtros},
+            exc_info=True
+        )
+        print(f"Erro ao buscar produtos: {e}")
+        return [], 0
 
-# ============================================================================
-# BUSCA AVANÇADA
-# ============================================================================
 
 def buscar_produtos_avancado(filtros: dict) -> list:
     """
@@ -2074,7 +2044,8 @@ def buscar_produtos_avancado(filtros: dict) -> list:
     - Ordenação por nome, preço ou quantidade (ascendente ou descendente)
     - Paginação (limit, offset)
     
-    Todos os filtros são combinados com AND (produto deve atender a TODOS os critérios).
+    Todos os filtros são combinados com AND (produto deve atender a TODOS os critérios)
+    e aplicados pelo banco. Para obter também o total, use buscar_produtos_pagina().
     
     Args:
         filtros: Dicionário com filtros opcionais:
@@ -2106,183 +2077,8 @@ def buscar_produtos_avancado(filtros: dict) -> list:
         }
         produtos = buscar_produtos_avancado(filtros)
     """
-    try:
-        # Começar com todos os produtos
-        query = supabase.table("produtos").select("*")
-        
-        # Aplicar filtros
-        filtros_aplicados = []
-        
-        # Filtro de gênero (exato)
-        if filtros.get("genero"):
-            query = query.eq("genero", filtros["genero"])
-            filtros_aplicados.append(f"genero={filtros['genero']}")
-        
-        # Filtro de marca (exato)
-        if filtros.get("marca"):
-            query = query.eq("marca", filtros["marca"])
-            filtros_aplicados.append(f"marca={filtros['marca']}")
-        
-        # Filtro de preço mínimo
-        if filtros.get("preco_min") is not None:
-            query = query.gte("preco", filtros["preco_min"])
-            filtros_aplicados.append(f"preco>={filtros['preco_min']}")
-        
-        # Filtro de preço máximo
-        if filtros.get("preco_max") is not None:
-            query = query.lte("preco", filtros["preco_max"])
-            filtros_aplicados.append(f"preco<={filtros['preco_max']}")
-        
-        # Executar query
-        response = query.order("id").execute()
-        produtos = response.data
-        
-        # Filtro de busca multi-campo (case-insensitive)
-        # Nota: Supabase não suporta OR com ilike facilmente, então fazemos em Python
-        if filtros.get("termo"):
-            termo = filtros["termo"].lower()
-            produtos = [
-                p for p in produtos
-                if (termo in (p.get("descricao") or "").lower() or
-                    termo in (p.get("marca") or "").lower() or
-                    termo in (p.get("referencia") or "").lower())
-            ]
-            filtros_aplicados.append(f"termo='{filtros['termo']}'")
-        
-        # Aplicar ordenação
-        order_by = filtros.get("order_by")
-        order_direction = filtros.get("order_direction", "asc")
-        
-        if order_by:
-            # Mapear nomes amigáveis para campos do banco
-            campo_map = {
-                "nome": "descricao",
-                "preco": "preco",
-                "quantidade": "quantidade"
-            }
-            
-            campo = campo_map.get(order_by)
-            if campo:
-                reverse = (order_direction.lower() == "desc")
-                
-                # Ordenar com tratamento de valores None
-                produtos = sorted(
-                    produtos,
-                    key=lambda p: (p.get(campo) is None, p.get(campo) or 0),
-                    reverse=reverse
-                )
-                
-                filtros_aplicados.append(f"order_by={order_by} {order_direction}")
-        
-        # Aplicar paginação (padrão: 50 itens por página)
-        limit = filtros.get("limit", 50)
-        offset = filtros.get("offset", 0)
-        
-        # Guardar total antes da paginação
-        total_produtos = len(produtos)
-        
-        # Aplicar paginação
-        if limit is not None:
-            produtos = produtos[offset:offset + limit]
-            filtros_aplicados.append(f"paginacao={offset}-{offset+len(produtos)}/{total_produtos}")
-        
-        registrar_info(
-            mensagem=f"Busca avançada realizada: {len(produtos)} produtos retornados de {total_produtos} encontrados",
-            modulo="database",
-            funcao="buscar_produtos_avancado",
-            detalhes={"filtros": filtros_aplicados, "total": total_produtos, "retornados": len(produtos)}
-        )
-        
-        print(f"Busca avançada: {len(produtos)} produtos retornados de {total_produtos} encontrados com filtros: {', '.join(filtros_aplicados)}")
-        return produtos
-        
-    except Exception as e:
-        erro_str = str(e)
-        
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao buscar produtos",
-                modulo="database",
-                funcao="buscar_produtos_avancado",
-                detalhes={"erro": erro_str, "filtros": filtros},
-                exc_info=True
-            )
-            
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    # Repetir a busca após reconexão
-                    query = supabase.table("produtos").select("*")
-                    
-                    if filtros.get("genero"):
-                        query = query.eq("genero", filtros["genero"])
-                    if filtros.get("marca"):
-                        query = query.eq("marca", filtros["marca"])
-                    if filtros.get("preco_min") is not None:
-                        query = query.gte("preco", filtros["preco_min"])
-                    if filtros.get("preco_max") is not None:
-                        query = query.lte("preco", filtros["preco_max"])
-                    
-                    response = query.order("id").execute()
-                    produtos = response.data
-                    
-                    if filtros.get("termo"):
-                        termo = filtros["termo"].lower()
-                        produtos = [
-                            p for p in produtos
-                            if (termo in (p.get("descricao") or "").lower() or
-                                termo in (p.get("marca") or "").lower() or
-                                termo in (p.get("referencia") or "").lower())
-                        ]
-                    
-                    # Aplicar ordenação após reconexão
-                    order_by = filtros.get("order_by")
-                    order_direction = filtros.get("order_direction", "asc")
-                    
-                    if order_by:
-                        campo_map = {
-                            "nome": "descricao",
-                            "preco": "preco",
-                            "quantidade": "quantidade"
-                        }
-                        
-                        campo = campo_map.get(order_by)
-                        if campo:
-                            reverse = (order_direction.lower() == "desc")
-                            produtos = sorted(
-                                produtos,
-                                key=lambda p: (p.get(campo) is None, p.get(campo) or 0),
-                                reverse=reverse
-                            )
-                    
-                    registrar_info(
-                        mensagem="Busca avançada realizada após reconexão",
-                        modulo="database",
-                        funcao="buscar_produtos_avancado"
-                    )
-                    return produtos
-                    
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao buscar produtos após reconexão",
-                        modulo="database",
-                        funcao="buscar_produtos_avancado",
-                        detalhes={"erro": str(e2), "filtros": filtros},
-                        exc_info=True
-                    )
-                    return []
-        else:
-            registrar_erro(
-                mensagem="Erro ao buscar produtos",
-                modulo="database",
-                funcao="buscar_produtos_avancado",
-                detalhes={"erro": erro_str, "filtros": filtros},
-                exc_info=True
-            )
-        
-        print(f"Erro ao buscar produtos: {e}")
-        return []
+    produtos, _ = buscar_produtos_pagina(filtros, contagem=None)
+    return produtos
 
 
 def contar_produtos_avancado(filtros: dict) -> int:
@@ -2290,6 +2086,9 @@ def contar_produtos_avancado(filtros: dict) -> int:
     Conta o número total de produtos que atendem aos filtros especificados.
     Útil para implementar paginação na UI.
     
+    A contagem é feita pelo banco (count=exact, sem transferir linhas) e
+    fica em cache por conjunto de filtros até a próxima escrita de produtos.
+    
     Args:
         filtros: Dicionário com os mesmos filtros de buscar_produtos_avancado
                  (exceto limit e offset que são ignorados)
@@ -2298,20 +2097,26 @@ def contar_produtos_avancado(filtros: dict) -> int:
         Número total de produtos que atendem aos critérios
     """
     try:
-        # Remover limit e offset para contar todos
-        filtros_count = {k: v for k, v in filtros.items() if k not in ['limit', 'offset']}
+        total = _contagem_em_cache(filtros)
+        if total is not None:
+            return total
         
-        # Usar buscar_produtos_avancado sem paginação
-        produtos = buscar_produtos_avancado(filtros_count)
+        em_memoria = _produtos_em_memoria(filtros)
+        if em_memoria is not None:
+            return len(_filtrar_produtos_em_memoria(em_memoria, filtros))
         
-        return len(produtos)
+        query, _ = _consulta_produtos_filtrada(filtros, colunas="id", contagem="exact", somente_contagem=True)
+        response = executar_operacao("contar_produtos_avancado", query.execute)
+        total = response.count or 0
+        _guardar_contagem(filtros, total)
+        return total
         
     except Exception as e:
         registrar_erro(
             mensagem="Erro ao contar produtos",
             modulo="database",
             funcao="contar_produtos_avancado",
-            detalhes={"erro": str(e), "filtros": filtros},
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e), "filtros": filtros},
             exc_info=True
         )
         return 0
@@ -2383,8 +2188,10 @@ def gerar_sugestoes(termo_busca: str, max_sugestoes: int = 5) -> list[str]:
     """
     Gera sugestões de termos similares quando uma busca não retorna resultados.
     
-    Usa o algoritmo de distância de Levenshtein para encontrar os termos mais
-    similares ao termo de busca entre todos os produtos cadastrados.
+    Usa o índice de sugestões do cache do catálogo (indice_busca.IndiceSugestoes):
+    um dicionário de deleções (SymSpell) sobre as palavras da descrição e da
+    marca e as referências, com distância de edição limitada. O índice é
+    atualizado a cada escrita de produto, então a sugestão não consulta o banco.
     
     Args:
         termo_busca: Termo que não retornou resultados
@@ -2392,74 +2199,17 @@ def gerar_sugestoes(termo_busca: str, max_sugestoes: int = 5) -> list[str]:
     
     Returns:
         Lista com até max_sugestoes termos similares, ordenados por similaridade
-        (menor distância primeiro)
+        (menor distância primeiro; empate: termo mais frequente primeiro)
     
     Exemplo:
         # Usuário buscou "moleton" mas não há produtos com esse termo
-        # Função retorna ["moletom", "conjunto moletom", "moletom infantil", ...]
+        # Função retorna ["moletom", ...]
         sugestoes = gerar_sugestoes("moleton")
     
     Requisitos: 9.3
     """
     try:
-        # Buscar todos os produtos
-        response = supabase.table("produtos").select("descricao, marca, referencia").execute()
-        produtos = response.data
-        
-        if not produtos:
-            registrar_info(
-                mensagem="Nenhum produto encontrado para gerar sugestões",
-                modulo="database",
-                funcao="gerar_sugestoes"
-            )
-            return []
-        
-        # Coletar todos os termos únicos dos produtos
-        termos = set()
-        for produto in produtos:
-            # Adicionar descrição completa
-            if produto.get("descricao"):
-                termos.add(produto["descricao"].strip())
-            
-            # Adicionar marca
-            if produto.get("marca"):
-                termos.add(produto["marca"].strip())
-            
-            # Adicionar referência
-            if produto.get("referencia"):
-                termos.add(produto["referencia"].strip())
-            
-            # Adicionar palavras individuais da descrição (para sugestões mais granulares)
-            if produto.get("descricao"):
-                palavras = produto["descricao"].split()
-                for palavra in palavras:
-                    palavra_limpa = palavra.strip().lower()
-                    # Adicionar apenas palavras com 3+ caracteres
-                    if len(palavra_limpa) >= 3:
-                        termos.add(palavra_limpa)
-        
-        # Remover o próprio termo de busca (case-insensitive)
-        termos = {t for t in termos if t.lower() != termo_busca.lower()}
-        
-        if not termos:
-            registrar_info(
-                mensagem="Nenhum termo disponível para gerar sugestões",
-                modulo="database",
-                funcao="gerar_sugestoes"
-            )
-            return []
-        
-        # Calcular distância de Levenshtein para cada termo
-        distancias = []
-        for termo in termos:
-            distancia = calcular_distancia_levenshtein(termo_busca, termo)
-            distancias.append((termo, distancia))
-        
-        # Ordenar por distância (menor primeiro = mais similar)
-        distancias.sort(key=lambda x: (x[1], x[0]))
-        
-        # Retornar top N sugestões
-        sugestoes = [termo for termo, _ in distancias[:max_sugestoes]]
+        sugestoes = catalogo.sugerir(termo_busca, max_sugestoes)
         
         registrar_info(
             mensagem=f"Geradas {len(sugestoes)} sugestões para termo '{termo_busca}'",
@@ -2468,7 +2218,7 @@ def gerar_sugestoes(termo_busca: str, max_sugestoes: int = 5) -> list[str]:
             detalhes={
                 "termo_busca": termo_busca,
                 "sugestoes": sugestoes,
-                "total_termos_analisados": len(termos)
+                "total_termos_indexados": len(catalogo.sugestoes)
             }
         )
         
@@ -2476,83 +2226,13 @@ def gerar_sugestoes(termo_busca: str, max_sugestoes: int = 5) -> list[str]:
         return sugestoes
         
     except Exception as e:
-        erro_str = str(e)
-        
-        # Verificar se é erro de conexão
-        if "connection" in erro_str.lower() or "timeout" in erro_str.lower():
-            registrar_erro(
-                mensagem="Erro de conexão ao gerar sugestões",
-                modulo="database",
-                funcao="gerar_sugestoes",
-                detalhes={"erro": erro_str, "termo_busca": termo_busca},
-                exc_info=True
-            )
-            
-            # Tentar reconectar
-            if reconectar_supabase():
-                try:
-                    # Repetir a busca após reconexão
-                    response = supabase.table("produtos").select("descricao, marca, referencia").execute()
-                    produtos = response.data
-                    
-                    if not produtos:
-                        return []
-                    
-                    # Coletar termos
-                    termos = set()
-                    for produto in produtos:
-                        if produto.get("descricao"):
-                            termos.add(produto["descricao"].strip())
-                        if produto.get("marca"):
-                            termos.add(produto["marca"].strip())
-                        if produto.get("referencia"):
-                            termos.add(produto["referencia"].strip())
-                        if produto.get("descricao"):
-                            palavras = produto["descricao"].split()
-                            for palavra in palavras:
-                                palavra_limpa = palavra.strip().lower()
-                                if len(palavra_limpa) >= 3:
-                                    termos.add(palavra_limpa)
-                    
-                    termos = {t for t in termos if t.lower() != termo_busca.lower()}
-                    
-                    if not termos:
-                        return []
-                    
-                    # Calcular distâncias
-                    distancias = []
-                    for termo in termos:
-                        distancia = calcular_distancia_levenshtein(termo_busca, termo)
-                        distancias.append((termo, distancia))
-                    
-                    distancias.sort(key=lambda x: (x[1], x[0]))
-                    sugestoes = [termo for termo, _ in distancias[:max_sugestoes]]
-                    
-                    registrar_info(
-                        mensagem="Sugestões geradas após reconexão",
-                        modulo="database",
-                        funcao="gerar_sugestoes"
-                    )
-                    return sugestoes
-                    
-                except Exception as e2:
-                    registrar_erro(
-                        mensagem="Falha ao gerar sugestões após reconexão",
-                        modulo="database",
-                        funcao="gerar_sugestoes",
-                        detalhes={"erro": str(e2), "termo_busca": termo_busca},
-                        exc_info=True
-                    )
-                    return []
-        else:
-            registrar_erro(
-                mensagem="Erro ao gerar sugestões",
-                modulo="database",
-                funcao="gerar_sugestoes",
-                detalhes={"erro": erro_str, "termo_busca": termo_busca},
-                exc_info=True
-            )
-        
+        registrar_erro(
+            mensagem="Erro ao gerar sugestões",
+            modulo="database",
+            funcao="gerar_sugestoes",
+            detalhes={"erro": str(e), "tipo_erro": classificar_erro(e), "termo_busca": termo_busca},
+            exc_info=True
+        )
         print(f"Erro ao gerar sugestões: {e}")
         return []
 
@@ -2570,9 +2250,14 @@ def inserir_venda(dados_venda: dict) -> Optional[int]:
             - cliente_id (int, opcional): ID do cliente (None para venda avulsa)
             - usuario_id (int): ID do vendedor
             - status (str, opcional): Status da venda (padrão: 'finalizada')
+            - chave_idempotencia (str, opcional): Chave única da venda (gerada se ausente)
+    
+    Com a chave de idempotência (sql/007_vendas_idempotencia.sql), repetir a
+    inserção devolve a venda já gravada em vez de criar outra, por isso a
+    chamada pode ser repetida com segurança após timeout ou reconexão.
     
     Returns:
-        Optional[int]: ID da venda criada ou None em caso de erro
+        Optional[int]: ID da venda criada (ou já existente) ou None em caso de erro
     
     Validates: Requirement 5.3
     """
@@ -2590,50 +2275,42 @@ def inserir_venda(dados_venda: dict) -> Optional[int]:
             'usuario_id': dados_venda['usuario_id'],
             'desconto_percentual': dados_venda.get('desconto_percentual', 0),
             'desconto_valor': dados_venda.get('desconto_valor', 0),
-            'status': dados_venda.get('status', 'finalizada')
+            'status': dados_venda.get('status', 'finalizada'),
+            'chave_idempotencia': dados_venda.get('chave_idempotencia') or str(uuid.uuid4())
         }
         
         # Adicionar cliente_id apenas se fornecido (para vendas não avulsas)
         if dados_venda.get('cliente_id'):
             dados_insert['cliente_id'] = dados_venda['cliente_id']
         
-        # Inserir venda na tabela
-        response = supabase.table('vendas').insert(dados_insert).execute()
+        # Inserir venda na tabela (chave repetida não insere de novo)
+        response = executar_operacao(
+            "inserir_venda",
+            lambda: supabase.table('vendas').upsert(
+                dados_insert, on_conflict='chave_idempotencia', ignore_duplicates=True
+            ).execute()
+        )
         
         if response.data and len(response.data) > 0:
             venda_id = response.data[0]['id']
             print(f"✅ Venda inserida com sucesso. ID: {venda_id}")
             return venda_id
+        
+        # Venda já gravada por uma tentativa anterior com a mesma chave
+        response = executar_operacao(
+            "inserir_venda",
+            lambda: supabase.table('vendas').select('id').eq('chave_idempotencia', dados_insert['chave_idempotencia']).execute()
+        )
+        if response.data:
+            venda_id = response.data[0]['id']
+            print(f"✅ Venda já registrada. ID: {venda_id}")
+            return venda_id
         else:
             print("❌ Erro: Resposta vazia ao inserir venda")
             return None
             
     except Exception as e:
         print(f"❌ Erro ao inserir venda: {str(e)}")
-        
-        # Tentar reconectar em caso de erro de conexão
-        if "connection" in str(e).lower() or "network" in str(e).lower():
-            print("🔄 Tentando reconectar...")
-            if reconectar_supabase():
-                try:
-                    # Tentar inserir novamente após reconexão
-                    response = supabase.table('vendas').insert(dados_insert).execute()
-                    
-                    if response.data and len(response.data) > 0:
-                        venda_id = response.data[0]['id']
-                        print(f"✅ Venda inserida com sucesso após reconexão. ID: {venda_id}")
-                        return venda_id
-                    else:
-                        print("❌ Erro: Resposta vazia ao inserir venda após reconexão")
-                        return None
-                        
-                except Exception as e2:
-                    print(f"❌ Erro ao inserir venda após reconexão: {str(e2)}")
-                    return None
-            else:
-                print("❌ Falha na reconexão")
-                return None
-        
         return None
 
 
@@ -2678,7 +2355,7 @@ def inserir_itens_venda(venda_id: int, itens: List[Dict]) -> bool:
             })
         
         # Inserir todos os itens em lote
-        response = supabase.table('itens_venda').insert(dados_insert).execute()
+        response = executar_operacao("inserir_itens_venda", lambda: supabase.table('itens_venda').insert(dados_insert).execute(), idempotente=False)
         
         if response.data and len(response.data) > 0:
             print(f"✅ {len(response.data)} itens inseridos com sucesso para venda ID: {venda_id}")
@@ -2688,30 +2365,11 @@ def inserir_itens_venda(venda_id: int, itens: List[Dict]) -> bool:
             return False
             
     except Exception as e:
+        # Falha após o envio: o lote pode ter sido gravado (não repetir às cegas)
+        if classificar_erro(e) == ERRO_TRANSITORIO and _venda_tem_registros('itens_venda', venda_id):
+            print(f"✅ Itens da venda ID {venda_id} já registrados")
+            return True
         print(f"❌ Erro ao inserir itens da venda: {str(e)}")
-        
-        # Tentar reconectar em caso de erro de conexão
-        if "connection" in str(e).lower() or "network" in str(e).lower():
-            print("🔄 Tentando reconectar...")
-            if reconectar_supabase():
-                try:
-                    # Tentar inserir novamente após reconexão
-                    response = supabase.table('itens_venda').insert(dados_insert).execute()
-                    
-                    if response.data and len(response.data) > 0:
-                        print(f"✅ {len(response.data)} itens inseridos com sucesso após reconexão para venda ID: {venda_id}")
-                        return True
-                    else:
-                        print("❌ Erro: Resposta vazia ao inserir itens da venda após reconexão")
-                        return False
-                        
-                except Exception as e2:
-                    print(f"❌ Erro ao inserir itens da venda após reconexão: {str(e2)}")
-                    return False
-            else:
-                print("❌ Falha na reconexão")
-                return False
-        
         return False
 
 
@@ -2767,7 +2425,7 @@ def inserir_pagamentos(venda_id: int, pagamentos: List[Dict]) -> bool:
             dados_insert.append(dados_pagamento)
         
         # Inserir todos os pagamentos em lote
-        response = supabase.table('pagamentos').insert(dados_insert).execute()
+        response = executar_operacao("inserir_pagamentos", lambda: supabase.table('pagamentos').insert(dados_insert).execute(), idempotente=False)
         
         if response.data and len(response.data) > 0:
             print(f"✅ {len(response.data)} pagamentos inseridos com sucesso para venda ID: {venda_id}")
@@ -2777,34 +2435,125 @@ def inserir_pagamentos(venda_id: int, pagamentos: List[Dict]) -> bool:
             return False
             
     except Exception as e:
+        # Falha após o envio: o lote pode ter sido gravado (não repetir às cegas)
+        if classificar_erro(e) == ERRO_TRANSITORIO and _venda_tem_registros('pagamentos', venda_id):
+            print(f"✅ Pagamentos da venda ID {venda_id} já registrados")
+            return True
         print(f"❌ Erro ao inserir pagamentos da venda: {str(e)}")
-        
-        # Tentar reconectar em caso de erro de conexão
-        if "connection" in str(e).lower() or "network" in str(e).lower():
-            print("🔄 Tentando reconectar...")
-            if reconectar_supabase():
-                try:
-                    # Tentar inserir novamente após reconexão
-                    response = supabase.table('pagamentos').insert(dados_insert).execute()
-                    
-                    if response.data and len(response.data) > 0:
-                        print(f"✅ {len(response.data)} pagamentos inseridos com sucesso após reconexão para venda ID: {venda_id}")
-                        return True
-                    else:
-                        print("❌ Erro: Resposta vazia ao inserir pagamentos da venda após reconexão")
-                        return False
-                        
-                except Exception as e2:
-                    print(f"❌ Erro ao inserir pagamentos da venda após reconexão: {str(e2)}")
-                    return False
-            else:
-                print("❌ Falha na reconexão")
-                return False
-        
+        return False
+
+
+def _venda_tem_registros(tabela: str, venda_id: int) -> bool:
+    """Confere se um lote de itens/pagamentos da venda chegou a ser gravado."""
+    try:
+        response = executar_operacao(
+            f"conferir_{tabela}",
+            lambda: supabase.table(tabela).select('id').eq('venda_id', venda_id).limit(1).execute()
+        )
+        return bool(response.data)
+    except Exception:
         return False
 
 
 
+def registrar_venda_completa(
+    dados_venda: dict,
+    itens: List[Dict],
+    pagamentos: List[Dict],
+    validar_estoque: bool = True
+) -> tuple[Optional[int], List[Dict]]:
+    """
+    Registra uma venda completa em uma única chamada e uma única transação.
+    
+    A função registrar_venda_completa do banco (sql/003_registrar_venda_completa.sql)
+    bloqueia os produtos, confere o estoque, insere venda, itens e pagamentos e
+    dá baixa no estoque. Em caso de erro nada é gravado.
+    
+    Com dados_venda['chave_idempotencia'] (sql/007_vendas_idempotencia.sql), a
+    chamada é segura para repetir: uma venda já gravada com a mesma chave é
+    devolvida sem nova gravação nem nova baixa de estoque.
+    
+    Com dados_venda['carrinho'] (Carrinho.id), o estoque conferido desconta as
+    reservas dos outros carrinhos e as reservas do carrinho são apagadas na
+    mesma transação da venda.
+    
+    Args:
+        dados_venda (dict): Dados da venda (mesmo formato de inserir_venda)
+        itens (List[Dict]): Itens da venda (mesmo formato de inserir_itens_venda)
+        pagamentos (List[Dict]): Pagamentos (mesmo formato de inserir_pagamentos)
+        validar_estoque (bool): Se False, não confere o estoque (vendas já
+            concluídas offline, que podem deixar o estoque negativo)
+    
+    Returns:
+        Tupla (venda_id, faltas):
+        - venda_id: ID da venda criada ou None em caso de erro
+        - faltas: Itens sem estoque suficiente, cada um com produto_id, descricao,
+          disponivel e solicitado (lista vazia se o erro foi outro)
+    
+    Validates: Requirements 5.3, 5.4, 5.5, 5.6
+    """
+    global supabase
+    
+    if not supabase:
+        print("❌ Erro: Conexão com Supabase não estabelecida")
+        return None, []
+    
+    params = {
+        "p_venda": {
+            'valor_total': dados_venda['valor_total'],
+            'valor_final': dados_venda['valor_final'],
+            'usuario_id': dados_venda['usuario_id'],
+            'desconto_percentual': dados_venda.get('desconto_percentual', 0),
+            'desconto_valor': dados_venda.get('desconto_valor', 0),
+            'cliente_id': dados_venda.get('cliente_id'),
+            'status': dados_venda.get('status', 'finalizada'),
+            'chave_idempotencia': dados_venda.get('chave_idempotencia'),
+            'carrinho': dados_venda.get('carrinho')
+        },
+        "p_itens": [
+            {
+                'produto_id': item['produto_id'],
+                'quantidade': item['quantidade'],
+                'preco_unitario': item['preco_unitario'],
+                'subtotal': item['subtotal']
+            }
+            for item in itens
+        ],
+        "p_pagamentos": pagamentos,
+        "p_validar_estoque": validar_estoque
+    }
+    
+    try:
+        response = executar_operacao(
+            "registrar_venda_completa",
+            lambda: supabase.rpc("registrar_venda_completa", params).execute(),
+            idempotente=bool(dados_venda.get('chave_idempotencia'))
+        )
+        venda_id = response.data["venda_id"]
+        if response.data.get("repetida"):
+            registrar_info(
+                mensagem="Venda já registrada com a mesma chave de idempotência",
+                modulo="database",
+                funcao="registrar_venda_completa",
+                detalhes={"venda_id": venda_id, "chave_idempotencia": dados_venda.get('chave_idempotencia')}
+            )
+        for item in itens:
+            catalogo.invalidar(item['produto_id'])
+        print(f"✅ Venda completa registrada com sucesso. ID: {venda_id}")
+        return venda_id, []
+        
+    except Exception as e:
+        # Estoque insuficiente: a lista de faltas vem no campo details do erro
+        if getattr(e, "code", None) == CODIGO_ESTOQUE_INSUFICIENTE:
+            try:
+                return None, json.loads(e.details or "[]")
+            except ValueError:
+                return None, []
+        
+        print(f"❌ Erro ao registrar venda completa: {str(e)}")
+        return None, []
+
+
 def buscar_venda_completa(venda_id: int) -> Optional[Dict]:
     """
     Busca uma venda completa com todos os dados relacionados (itens, pagamentos, cliente, vendedor).
@@ -2842,14 +2591,17 @@ def buscar_venda_completa(venda_id: int) -> Optional[Dict]:
     
     try:
         # Buscar dados da venda com JOINs para cliente, vendedor e usuário de cancelamento
-        response = supabase.table('vendas').select(
-            '''
-            *,
-            cliente:clientes(*),
-            vendedor:usuarios!vendas_usuario_id_fkey(*),
-            usuario_cancelamento:usuarios!vendas_usuario_cancelamento_id_fkey(*)
-            '''
-        ).eq('id', venda_id).execute()
+        response = executar_operacao(
+            "buscar_venda_completa",
+            lambda: supabase.table('vendas').select(
+                '''
+                *,
+                cliente:clientes(*),
+                vendedor:usuarios!vendas_usuario_id_fkey(*),
+                usuario_cancelamento:usuarios!vendas_usuario_cancelamento_id_fkey(*)
+                '''
+            ).eq('id', venda_id).execute()
+        )
         
         if not response.data or len(response.data) == 0:
             print(f"⚠️ Venda com ID {venda_id} não encontrada")
@@ -2858,17 +2610,20 @@ def buscar_venda_completa(venda_id: int) -> Optional[Dict]:
         venda = response.data[0]
         
         # Buscar itens da venda com dados dos produtos
-        itens_response = supabase.table('itens_venda').select(
-            '''
-            *,
-            produto:produtos(*)
-            '''
-        ).eq('venda_id', venda_id).execute()
+        itens_response = executar_operacao(
+            "buscar_venda_completa",
+            lambda: supabase.table('itens_venda').select(
+                '''
+                *,
+                produto:produtos(*)
+                '''
+            ).eq('venda_id', venda_id).execute()
+        )
         
         itens = itens_response.data if itens_response.data else []
         
         # Buscar pagamentos da venda
-        pagamentos_response = supabase.table('pagamentos').select('*').eq('venda_id', venda_id).execute()
+        pagamentos_response = executar_operacao("buscar_venda_completa", lambda: supabase.table('pagamentos').select('*').eq('venda_id', venda_id).execute())
         
         pagamentos = pagamentos_response.data if pagamentos_response.data else []
         
@@ -2895,71 +2650,6 @@ def buscar_venda_completa(venda_id: int) -> Optional[Dict]:
         
     except Exception as e:
         print(f"❌ Erro ao buscar venda completa: {str(e)}")
-        
-        # Tentar reconectar em caso de erro de conexão
-        if "connection" in str(e).lower() or "network" in str(e).lower():
-            print("🔄 Tentando reconectar...")
-            if reconectar_supabase():
-                try:
-                    # Tentar buscar novamente após reconexão
-                    response = supabase.table('vendas').select(
-                        '''
-                        *,
-                        cliente:clientes(*),
-                        vendedor:usuarios!vendas_usuario_id_fkey(*),
-                        usuario_cancelamento:usuarios!vendas_usuario_cancelamento_id_fkey(*)
-                        '''
-                    ).eq('id', venda_id).execute()
-                    
-                    if not response.data or len(response.data) == 0:
-                        print(f"⚠️ Venda com ID {venda_id} não encontrada após reconexão")
-                        return None
-                    
-                    venda = response.data[0]
-                    
-                    # Buscar itens da venda com dados dos produtos
-                    itens_response = supabase.table('itens_venda').select(
-                        '''
-                        *,
-                        produto:produtos(*)
-                        '''
-                    ).eq('venda_id', venda_id).execute()
-                    
-                    itens = itens_response.data if itens_response.data else []
-                    
-                    # Buscar pagamentos da venda
-                    pagamentos_response = supabase.table('pagamentos').select('*').eq('venda_id', venda_id).execute()
-                    
-                    pagamentos = pagamentos_response.data if pagamentos_response.data else []
-                    
-                    # Estruturar dados da venda completa
-                    venda_completa = {
-                        'id': venda['id'],
-                        'data_hora': venda['data_hora'],
-                        'valor_total': float(venda['valor_total']),
-                        'desconto_percentual': float(venda['desconto_percentual']),
-                        'desconto_valor': float(venda['desconto_valor']),
-                        'valor_final': float(venda['valor_final']),
-                        'status': venda['status'],
-                        'data_cancelamento': venda.get('data_cancelamento'),
-                        'motivo_cancelamento': venda.get('motivo_cancelamento'),
-                        'cliente': venda.get('cliente'),  # None para vendas avulsas
-                        'vendedor': venda.get('vendedor'),
-                        'usuario_cancelamento': venda.get('usuario_cancelamento'),
-                        'itens': itens,
-                        'pagamentos': pagamentos
-                    }
-                    
-                    print(f"✅ Venda ID {venda_id} encontrada após reconexão com {len(itens)} itens e {len(pagamentos)} pagamentos")
-                    return venda_completa
-                    
-                except Exception as e2:
-                    print(f"❌ Erro ao buscar venda completa após reconexão: {str(e2)}")
-                    return None
-            else:
-                print("❌ Falha na reconexão")
-                return None
-        
         return None
 
 
@@ -2995,7 +2685,7 @@ def marcar_venda_cancelada(venda_id: int, motivo: str, usuario_id: int) -> bool:
         }
         
         # Atualizar venda na tabela
-        response = supabase.table('vendas').update(dados_update).eq('id', venda_id).execute()
+        response = executar_operacao("marcar_venda_cancelada", lambda: supabase.table('vendas').update(dados_update).eq('id', venda_id).execute())
         
         if response.data and len(response.data) > 0:
             print(f"✅ Venda ID {venda_id} marcada como cancelada com sucesso")
@@ -3006,37 +2696,247 @@ def marcar_venda_cancelada(venda_id: int, motivo: str, usuario_id: int) -> bool:
             
     except Exception as e:
         print(f"❌ Erro ao marcar venda como cancelada: {str(e)}")
-        
-        # Tentar reconectar em caso de erro de conexão
-        if "connection" in str(e).lower() or "network" in str(e).lower():
-            print("🔄 Tentando reconectar...")
-            if reconectar_supabase():
-                try:
-                    from datetime import datetime
-                    
-                    # Preparar dados de atualização
-                    dados_update = {
-                        'status': 'cancelada',
-                        'data_cancelamento': datetime.now().isoformat(),
-                        'motivo_cancelamento': motivo,
-                        'usuario_cancelamento_id': usuario_id
-                    }
-                    
-                    # Tentar atualizar novamente após reconexão
-                    response = supabase.table('vendas').update(dados_update).eq('id', venda_id).execute()
-                    
-                    if response.data and len(response.data) > 0:
-                        print(f"✅ Venda ID {venda_id} marcada como cancelada após reconexão")
-                        return True
-                    else:
-                        print(f"❌ Erro: Venda ID {venda_id} não encontrada ou não atualizada após reconexão")
-                        return False
-                        
-                except Exception as e2:
-                    print(f"❌ Erro ao marcar venda como cancelada após reconexão: {str(e2)}")
-                    return False
-            else:
-                print("❌ Falha na reconexão")
-                return False
-        
         return False
+
+
+# ============================================================================
+# RESUMOS DIÁRIOS DE VENDAS
+# ============================================================================
+
+# Tabelas de resumo (sql/009_resumos_vendas.sql): {nome: (tabela, colunas, chave)}
+RESUMOS_VENDAS = {
+    "produto": ("resumo_vendas_produto", "dia, produto_id, quantidade, faturamento", "produto_id"),
+    "vendedor": ("resumo_vendas_vendedor", "dia, usuario_id, numero_vendas, faturamento", "usuario_id"),
+    "pagamento": ("resumo_vendas_pagamento", "dia, forma_pagamento, valor", "forma_pagamento"),
+}
+
+
+def listar_resumos_vendas(resumo: str, dia_inicio: str, dia_fim: str) -> List[Dict[str, Any]]:
+    """
+    Lista as linhas de um resumo diário de vendas entre dois dias (inclusive).
+    
+    Os resumos são mantidos pelos gatilhos do banco a cada venda registrada,
+    cancelada ou reativada, então um período longo custa uma linha por dia e
+    produto (vendedor, forma de pagamento) em vez de todas as vendas e itens.
+    
+    Args:
+        resumo: 'produto', 'vendedor' ou 'pagamento'
+        dia_inicio: Primeiro dia (YYYY-MM-DD)
+        dia_fim: Último dia (YYYY-MM-DD)
+    
+    Returns:
+        Linhas do resumo, em ordem de dia
+    
+    Raises:
+        Exception: se a consulta falhar (quem chama decide como tratar)
+    """
+    tabela, colunas, chave = RESUMOS_VENDAS[resumo]
+    linhas: List[Dict[str, Any]] = []
+    while True:
+        inicio = len(linhas)
+        response = executar_operacao(
+            f"listar_{tabela}",
+            lambda: supabase.table(tabela).select(colunas)
+                .gte('dia', dia_inicio).lte('dia', dia_fim)
+                .order('dia').order(chave)
+                .range(inicio, inicio + TAMANHO_LOTE_LEITURA - 1)
+                .execute()
+        )
+        if not response.data:
+            return linhas
+        linhas.extend(response.data)
+
+
+def reconstruir_resumos_vendas(data_inicio: Optional[str] = None, data_fim: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Recalcula os resumos diários de vendas a partir das vendas gravadas.
+    
+    Usada no preenchimento inicial (depois de aplicar sql/009_resumos_vendas.sql)
+    e para corrigir os resumos após alterações feitas direto no banco:
+    
+        python -c "import database; print(database.reconstruir_resumos_vendas())"
+    
+    Args:
+        data_inicio: Primeiro dia (YYYY-MM-DD); None para desde o início
+        data_fim: Último dia (YYYY-MM-DD); None para até hoje
+    
+    Returns:
+        {'dias': número de dias com vendas no intervalo}
+    
+    Raises:
+        Exception: se a reconstrução falhar
+    """
+    response = executar_operacao(
+        "reconstruir_resumos_vendas",
+        lambda: supabase.rpc("reconstruir_resumos_vendas", {"p_inicio": data_inicio, "p_fim": data_fim}).execute()
+    )
+    registrar_info(
+        mensagem="Resumos diários de vendas reconstruídos",
+        modulo="database",
+        funcao="reconstruir_resumos_vendas",
+        detalhes={"data_inicio": data_inicio, "data_fim": data_fim, "resultado": response.data}
+    )
+    return response.data or {}
+
+
+# ============================================================================
+# RELATÓRIOS DE VENDAS NO BANCO
+# ============================================================================
+
+def resumo_vendas_periodo(data_inicio: str, data_fim: str, usuario_id: Optional[int] = None,
+                          forma_pagamento: Optional[str] = None,
+                          dias: Optional[Tuple[str, str]] = None) -> Dict[str, Any]:
+    """
+    Totais das vendas não canceladas do período, agregados no banco.
+    
+    A função resumo_vendas_periodo (sql/011_relatorios_vendas.sql) devolve só
+    os totais e a distribuição por forma de pagamento, em vez de todas as
+    vendas e pagamentos do período.
+    
+    Args:
+        data_inicio: Início do período (ISO, com hora)
+        data_fim: Fim do período, inclusive (ISO, com hora)
+        usuario_id: Filtro opcional por vendedor
+        forma_pagamento: Filtro opcional por forma de pagamento
+        dias: (primeiro_dia, ultimo_dia) lidos dos resumos diários; apenas sem filtros
+    
+    Returns:
+        {'faturamento_total', 'numero_vendas', 'ticket_medio',
+         'distribuicao_pagamento': [{'forma_pagamento', 'valor', 'percentual'}]}
+    
+    Raises:
+        Exception: se a consulta falhar (quem chama decide como tratar)
+    """
+    dia_inicio, dia_fim = dias or (None, None)
+    response = executar_operacao(
+        "resumo_vendas_periodo",
+        lambda: supabase.rpc("resumo_vendas_periodo", {
+            "p_inicio": data_inicio,
+            "p_fim": data_fim,
+            "p_usuario_id": usuario_id,
+            "p_forma_pagamento": forma_pagamento,
+            "p_dia_inicio": dia_inicio,
+            "p_dia_fim": dia_fim
+        }).execute()
+    )
+    return response.data or {}
+
+
+def resumo_vendas_por_vendedor(data_inicio: str, data_fim: str,
+                               dias: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+    """
+    Totais por vendedor das vendas não canceladas do período, agregados no banco.
+    
+    Args:
+        data_inicio: Início do período (ISO, com hora)
+        data_fim: Fim do período, inclusive (ISO, com hora)
+        dias: (primeiro_dia, ultimo_dia) lidos dos resumos diários
+    
+    Returns:
+        Uma linha por vendedor, do maior faturamento: {'usuario_id', 'nome_vendedor',
+        'numero_vendas', 'faturamento_total', 'ticket_medio', 'percentual_participacao'}
+    
+    Raises:
+        Exception: se a consulta falhar (quem chama decide como tratar)
+    """
+    dia_inicio, dia_fim = dias or (None, None)
+    response = executar_operacao(
+        "resumo_vendas_por_vendedor",
+        lambda: supabase.rpc("resumo_vendas_por_vendedor", {
+            "p_inicio": data_inicio,
+            "p_fim": data_fim,
+            "p_dia_inicio": dia_inicio,
+            "p_dia_fim": dia_fim
+        }).execute()
+    )
+    return response.data or []
+
+
+def listar_vendas_periodo(data_inicio: str, data_fim: str, usuario_id: Optional[int] = None,
+                          forma_pagamento: Optional[str] = None, apos: Optional[Tuple[str, int]] = None,
+                          limite: int = TAMANHO_LOTE_LEITURA) -> List[Dict[str, Any]]:
+    """
+    Lista uma página das vendas do período (inclusive canceladas), em ordem
+    de data_hora e id, com cliente, vendedor e pagamentos de cada venda.
+    
+    Args:
+        data_inicio: Início do período (ISO, com hora)
+        data_fim: Fim do período, inclusive (ISO, com hora)
+        usuario_id: Filtro opcional por vendedor
+        forma_pagamento: Filtro opcional por forma de pagamento
+        apos: (data_hora, id) da última venda da página anterior; None para a primeira
+        limite: Número máximo de vendas da página
+    
+    Returns:
+        Vendas da página, cada uma com 'cliente_nome', 'vendedor_nome' e 'pagamentos'
+    
+    Raises:
+        Exception: se a consulta falhar (quem chama decide como tratar)
+    """
+    apos_data_hora, apos_id = apos or (None, None)
+    response = executar_operacao(
+        "listar_vendas_periodo",
+        lambda: supabase.rpc("listar_vendas_periodo", {
+            "p_inicio": data_inicio,
+            "p_fim": data_fim,
+            "p_usuario_id": usuario_id,
+            "p_forma_pagamento": forma_pagamento,
+            "p_apos_data_hora": apos_data_hora,
+            "p_apos_id": apos_id,
+            "p_limite": limite
+        }).execute()
+    )
+    return response.data or []
+
+
+# ============================================================================
+# DIÁRIO OFFLINE
+# ============================================================================
+
+def _reenviar_movimentacao(dados: dict, salvar_progresso) -> None:
+    """
+    Processador do diário offline para movimentações de estoque.
+    
+    Só adia se a chamada não chegou ao banco (sem conexão ou disjuntor
+    aberto). Após um erro transitório a movimentação pode ter sido aplicada:
+    reenviá-la poderia duplicá-la, então a entrada vai para revisão manual.
+    
+    Raises:
+        diario_offline.EnvioAdiado: se o backend continuar sem conexão
+        ValueError: se o banco rejeitar a movimentação ou o resultado for incerto
+    """
+    if registrar_movimentacao(permitir_offline=False, **dados):
+        return
+    if ultima_falha() == ERRO_TRANSITORIO:
+        raise ValueError(f"Resultado incerto para a movimentação do produto {dados.get('produto_id')}: verificar o estoque antes de reenviar")
+    raise ValueError(f"Movimentação rejeitada para o produto {dados.get('produto_id')}")
+
+
+def _reenviar_movimentacao_lote(dados: dict, salvar_progresso) -> None:
+    """
+    Processador do diário offline para lotes de movimentações.
+    
+    Adia e envia para revisão manual nos mesmos casos de _reenviar_movimentacao().
+    
+    Raises:
+        diario_offline.EnvioAdiado: se o backend continuar sem conexão
+        ValueError: se o banco rejeitar o lote ou o resultado for incerto
+    """
+    sucesso, resultados = registrar_movimentacoes_lote(dados["movimentacoes"], permitir_offline=False)
+    if sucesso:
+        return
+    if ultima_falha() == ERRO_TRANSITORIO:
+        raise ValueError("Resultado incerto para o lote de movimentações: verificar o estoque antes de reenviar")
+    erros = [r["erro"] for r in resultados if r["erro"]]
+    raise ValueError(f"Lote de movimentações rejeitado: {erros[0] if erros else 'erro desconhecido'}")
+
+
+diario_offline.registrar_processador("movimentacao", _reenviar_movimentacao)
+diario_offline.registrar_processador("movimentacao_lote", _reenviar_movimentacao_lote)
+
+if BACKEND != "sqlite":
+    diario_offline.iniciar_reenvio()
+    # Catálogo em memória desde o início (leitor de código de barras, buscas)
+    catalogo.iniciar_sincronizacao()
+    # Base analítica local dos relatórios, se configurada (DEKIDS_ANALITICO_PATH)
+    base_analitica.iniciar_sincronizacao()
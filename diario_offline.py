@@ -0,0 +1,285 @@
+"""
+Diário Offline - Sistema DEKIDS
+
+Diário local (SQLite, somente inclusão) para vendas e movimentações de estoque
+registradas enquanto o backend está indisponível. O caixa nunca espera a rede
+para aceitar uma venda: a operação é gravada no diário e um reenviador em
+segundo plano a envia, na ordem de registro, quando a conexão volta.
+
+Cada tipo de entrada tem um processador registrado com registrar_processador().
+O processador recebe os dados da entrada e uma função para salvar o progresso,
+permitindo retomar uma venda parcialmente enviada sem duplicar etapas.
+Ele deve lançar EnvioAdiado quando o backend continuar indisponível.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from logging_config import registrar_erro, registrar_aviso, registrar_info
+from resiliencia import backend_disponivel
+
+
+# Configurações
+CAMINHO_PADRAO = str(Path(__file__).parent / "diario_offline.db")
+INTERVALO_REENVIO = 5.0   # segundos entre verificações do reenviador
+TAMANHO_LOTE = 50         # entradas lidas por lote de reenvio
+
+STATUS_PENDENTE = "pendente"
+STATUS_FALHOU = "falhou"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS diario (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    tipo TEXT NOT NULL,
+    dados TEXT NOT NULL,
+    criado_em REAL NOT NULL,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    ultimo_erro TEXT,
+    status TEXT NOT NULL DEFAULT 'pendente'
+);
+CREATE INDEX IF NOT EXISTS idx_diario_status ON diario(status, seq);
+"""
+
+
+class EnvioAdiado(Exception):
+    """O backend continua indisponível: a entrada deve permanecer no diário."""
+
+
+# Processadores por tipo de entrada: {tipo: funcao(dados, salvar_progresso)}
+_processadores: Dict[str, Callable[[Dict[str, Any], Callable[[Dict[str, Any]], None]], None]] = {}
+
+_lock = threading.RLock()
+_lock_reenvio = threading.Lock()
+_conexao: Optional[sqlite3.Connection] = None
+_reenviador: Optional[threading.Thread] = None
+_parar = threading.Event()
+_acordar = threading.Event()
+_ultimo_reenvio: Optional[float] = None
+
+
+def _obter_conexao() -> sqlite3.Connection:
+    """Abre (uma única vez) a conexão com o arquivo do diário."""
+    global _conexao
+    if _conexao is None:
+        caminho = os.getenv("DEKIDS_DIARIO_PATH") or CAMINHO_PADRAO
+        _conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        _conexao.row_factory = sqlite3.Row
+        if caminho != ":memory:":
+            _conexao.execute("PRAGMA journal_mode = WAL")
+        # Cada entrada precisa sobreviver a uma queda de energia logo após a venda
+        _conexao.execute("PRAGMA synchronous = FULL")
+        _conexao.executescript(_ESQUEMA)
+    return _conexao
+
+
+def registrar_processador(tipo: str, funcao: Callable[[Dict[str, Any], Callable[[Dict[str, Any]], None]], None]) -> None:
+    """
+    Registra a função que envia ao backend as entradas de um tipo.
+
+    Args:
+        tipo: Tipo da entrada (ex: 'venda', 'movimentacao')
+        funcao: Função (dados, salvar_progresso) que lança EnvioAdiado se o
+                backend estiver indisponível e qualquer outra exceção para
+                erros definitivos
+    """
+    _processadores[tipo] = funcao
+
+
+def registrar(tipo: str, dados: Dict[str, Any]) -> str:
+    """
+    Grava uma entrada no diário (operação local, não acessa a rede).
+
+    Args:
+        tipo: Tipo da entrada
+        dados: Dados serializáveis em JSON
+
+    Returns:
+        Identificador (UUID) da entrada
+    """
+    id_entrada = str(uuid.uuid4())
+    with _lock:
+        _obter_conexao().execute(
+            "INSERT INTO diario (id, tipo, dados, criado_em) VALUES (?, ?, ?, ?)",
+            (id_entrada, tipo, json.dumps(dados, default=str), time.time())
+        )
+
+    registrar_aviso(
+        mensagem=f"Operação '{tipo}' gravada no diário offline",
+        modulo="diario_offline",
+        funcao="registrar",
+        detalhes={"id": id_entrada, "tipo": tipo, "pendentes": profundidade()}
+    )
+    return id_entrada
+
+
+def _salvar_dados(seq: int, dados: Dict[str, Any]) -> None:
+    with _lock:
+        _obter_conexao().execute(
+            "UPDATE diario SET dados = ? WHERE seq = ?",
+            (json.dumps(dados, default=str), seq)
+        )
+
+
+def _ler_pendentes(limite: int) -> List[sqlite3.Row]:
+    with _lock:
+        return _obter_conexao().execute(
+            "SELECT * FROM diario WHERE status = ? ORDER BY seq LIMIT ?",
+            (STATUS_PENDENTE, limite)
+        ).fetchall()
+
+
+def reenviar_pendentes(limite: int = TAMANHO_LOTE) -> int:
+    """
+    Envia as entradas pendentes em ordem, até `limite` entradas.
+
+    Para no primeiro EnvioAdiado (backend ainda indisponível) para preservar
+    a ordem. Entradas com erro definitivo são marcadas como 'falhou' e
+    mantidas no diário para conferência.
+
+    Args:
+        limite: Número máximo de entradas processadas
+
+    Returns:
+        Número de entradas enviadas com sucesso
+    """
+    # Apenas um reenvio por vez, para preservar a ordem das entradas
+    if not _lock_reenvio.acquire(blocking=False):
+        return 0
+    try:
+        return _reenviar(limite)
+    finally:
+        _lock_reenvio.release()
+
+
+def _reenviar(limite: int) -> int:
+    global _ultimo_reenvio
+    enviadas = 0
+
+    for entrada in _ler_pendentes(limite):
+        seq = entrada["seq"]
+        tipo = entrada["tipo"]
+        processador = _processadores.get(tipo)
+        if processador is None:
+            # Processador ainda não carregado: aguardar para não quebrar a ordem
+            break
+
+        dados = json.loads(entrada["dados"])
+        try:
+            processador(dados, lambda d, seq=seq: _salvar_dados(seq, d))
+
+        except EnvioAdiado as e:
+            with _lock:
+                _obter_conexao().execute(
+                    "UPDATE diario SET dados = ?, tentativas = tentativas + 1, ultimo_erro = ? WHERE seq = ?",
+                    (json.dumps(dados, default=str), str(e), seq)
+                )
+            break
+
+        except Exception as e:
+            with _lock:
+                _obter_conexao().execute(
+                    "UPDATE diario SET dados = ?, tentativas = tentativas + 1, ultimo_erro = ?, status = ? WHERE seq = ?",
+                    (json.dumps(dados, default=str), str(e), STATUS_FALHOU, seq)
+                )
+            registrar_erro(
+                mensagem="Entrada do diário offline rejeitada pelo backend",
+                modulo="diario_offline",
+                funcao="reenviar_pendentes",
+                detalhes={"id": entrada["id"], "tipo": tipo, "erro": str(e)},
+                exc_info=True
+            )
+            continue
+
+        with _lock:
+            _obter_conexao().execute("DELETE FROM diario WHERE seq = ?", (seq,))
+        enviadas += 1
+
+    _ultimo_reenvio = time.time()
+    if enviadas:
+        registrar_info(
+            mensagem=f"{enviadas} entrada(s) do diário offline enviadas",
+            modulo="diario_offline",
+            funcao="reenviar_pendentes",
+            detalhes={"pendentes": profundidade()}
+        )
+    return enviadas
+
+
+def profundidade() -> int:
+    """Número de entradas aguardando envio."""
+    with _lock:
+        return _obter_conexao().execute(
+            "SELECT COUNT(*) FROM diario WHERE status = ?", (STATUS_PENDENTE,)
+        ).fetchone()[0]
+
+
+def atraso_segundos() -> float:
+    """Idade, em segundos, da entrada pendente mais antiga (0 se não houver)."""
+    with _lock:
+        linha = _obter_conexao().execute(
+            "SELECT MIN(criado_em) FROM diario WHERE status = ?", (STATUS_PENDENTE,)
+        ).fetchone()
+    if not linha or linha[0] is None:
+        return 0.0
+    return max(0.0, time.time() - linha[0])
+
+
+def obter_estado() -> Dict[str, Any]:
+    """Resumo do diário para monitoramento (profundidade, atraso e falhas)."""
+    with _lock:
+        falhas = _obter_conexao().execute(
+            "SELECT COUNT(*) FROM diario WHERE status = ?", (STATUS_FALHOU,)
+        ).fetchone()[0]
+    return {
+        "pendentes": profundidade(),
+        "atraso_segundos": round(atraso_segundos(), 1),
+        "falhas": falhas,
+        "ultimo_reenvio": _ultimo_reenvio,
+        "reenviador_ativo": bool(_reenviador and _reenviador.is_alive()),
+    }
+
+
+def _laco_reenvio(intervalo: float) -> None:
+    while not _parar.is_set():
+        _acordar.wait(intervalo)
+        _acordar.clear()
+        if _parar.is_set():
+            break
+        try:
+            while profundidade() > 0 and backend_disponivel():
+                if reenviar_pendentes() == 0:
+                    break
+        except Exception as e:
+            registrar_erro(
+                mensagem="Erro no reenviador do diário offline",
+                modulo="diario_offline",
+                funcao="_laco_reenvio",
+                detalhes={"erro": str(e)},
+                exc_info=True
+            )
+
+
+def iniciar_reenvio(intervalo: float = INTERVALO_REENVIO) -> None:
+    """Inicia (uma única vez) a thread de reenvio em segundo plano."""
+    global _reenviador
+    with _lock:
+        if _reenviador is not None and _reenviador.is_alive():
+            return
+        _parar.clear()
+        _reenviador = threading.Thread(
+            target=_laco_reenvio, args=(intervalo,), name="dekids-diario", daemon=True
+        )
+        _reenviador.start()
+
+
+def parar_reenvio() -> None:
+    """Sinaliza a thread de reenvio para terminar."""
+    _parar.set()
+    _acordar.set()
@@ -8,21 +8,12 @@ identificação de produtos sem movimentação.
 Requisitos: 2.1, 2.4, 5.3, 5.5
 """
 
-import os
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
-from supabase import create_client, Client
-from dotenv import load_dotenv
+from cache_catalogo import catalogo
+from database import iterar_tabela, listar_produtos_sem_movimentacao
 from logging_config import registrar_erro, registrar_info, registrar_aviso
 
-# Carregar variáveis de ambiente
-load_dotenv()
-
-# Configurar cliente Supabase
-url: str = os.environ.get("SUPABASE_URL")
-key: str = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
-
 
 def verificar_estoque_baixo(produto_id: int = None) -> List[Dict[str, Any]]:
     """
@@ -40,17 +31,14 @@ def verificar_estoque_baixo(produto_id: int = None) -> List[Dict[str, Any]]:
     Requisitos: 2.1, 2.4
     """
     try:
-        # Construir query base
-        query = supabase.table("produtos").select("*")
-        
-        # Filtrar por produto específico se fornecido
+        # Buscar o produto específico (catálogo em memória) ou percorrer todos os produtos em lotes
         if produto_id is not None:
-            query = query.eq("id", produto_id)
+            produto = catalogo.obter(produto_id)
+            produtos = [produto] if produto is not None else []
+        else:
+            produtos = list(iterar_tabela("produtos"))
         
-        # Executar query
-        response = query.execute()
-        
-        if not response.data:
+        if not produtos:
             registrar_info(
                 mensagem="Nenhum produto encontrado para verificação de estoque baixo",
                 modulo="estoque",
@@ -61,7 +49,7 @@ def verificar_estoque_baixo(produto_id: int = None) -> List[Dict[str, Any]]:
         
         # Filtrar produtos com estoque baixo
         produtos_estoque_baixo = []
-        for produto in response.data:
+        for produto in produtos:
             quantidade = produto.get("quantidade", 0)
             estoque_minimo = produto.get("estoque_minimo", 5)
             
@@ -102,10 +90,16 @@ def calcular_valor_total_estoque() -> float:
     Requisitos: 5.3
     """
     try:
-        # Buscar todos os produtos
-        response = supabase.table("produtos").select("quantidade, preco").execute()
+        # Percorrer todos os produtos em lotes, calculando o valor total
+        valor_total = 0.0
+        total_produtos = 0
+        for produto in iterar_tabela("produtos", "quantidade, preco", prefetch=True):
+            quantidade = produto.get("quantidade", 0)
+            preco = produto.get("preco", 0.0)
+            valor_total += quantidade * preco
+            total_produtos += 1
         
-        if not response.data:
+        if total_produtos == 0:
             registrar_info(
                 mensagem="Nenhum produto encontrado para cálculo de valor total",
                 modulo="estoque",
@@ -113,20 +107,13 @@ def calcular_valor_total_estoque() -> float:
             )
             return 0.0
         
-        # Calcular valor total
-        valor_total = 0.0
-        for produto in response.data:
-            quantidade = produto.get("quantidade", 0)
-            preco = produto.get("preco", 0.0)
-            valor_total += quantidade * preco
-        
         registrar_info(
             mensagem=f"Cálculo de valor total concluído: R$ {valor_total:.2f}",
             modulo="estoque",
             funcao="calcular_valor_total_estoque",
             detalhes={
                 "valor_total": valor_total,
-                "total_produtos": len(response.data)
+                "total_produtos": total_produtos
             }
         )
         
@@ -163,49 +150,11 @@ def produtos_sem_movimentacao(dias: int = 30) -> List[Dict[str, Any]]:
         data_limite = datetime.now() - timedelta(days=dias)
         data_limite_str = data_limite.isoformat()
         
-        # Buscar todos os produtos
-        response_produtos = supabase.table("produtos").select("*").execute()
-        
-        if not response_produtos.data:
-            registrar_info(
-                mensagem="Nenhum produto encontrado para verificação de movimentação",
-                modulo="estoque",
-                funcao="produtos_sem_movimentacao",
-                detalhes={"dias": dias}
-            )
-            return []
-        
-        produtos_sem_mov = []
-        
-        for produto in response_produtos.data:
-            produto_id = produto["id"]
-            
-            # Buscar última movimentação do produto
-            response_mov = (
-                supabase.table("movimentacoes")
-                .select("created_at")
-                .eq("produto_id", produto_id)
-                .order("created_at", desc=True)
-                .limit(1)
-                .execute()
-            )
-            
-            # Se não tem movimentação ou última movimentação é anterior à data limite
-            if not response_mov.data:
-                # Produto nunca teve movimentação
-                produto_info = produto.copy()
-                produto_info["ultima_movimentacao"] = None
-                produtos_sem_mov.append(produto_info)
-            else:
-                ultima_mov_str = response_mov.data[0]["created_at"]
-                # Converter string ISO para datetime
-                ultima_mov = datetime.fromisoformat(ultima_mov_str.replace('Z', '+00:00'))
-                
-                if ultima_mov < data_limite:
-                    # Última movimentação é anterior à data limite
-                    produto_info = produto.copy()
-                    produto_info["ultima_movimentacao"] = ultima_mov_str
-                    produtos_sem_mov.append(produto_info)
+        # Produtos sem movimentação desde a data limite, com a data da última
+        # movimentação (ou None se nunca teve), em uma única consulta
+        produtos_sem_mov = listar_produtos_sem_movimentacao(data_limite_str)
+        for produto in produtos_sem_mov:
+            produto.pop("ultima_data_hora", None)
         
         registrar_info(
             mensagem=f"Verificação de produtos sem movimentação concluída: {len(produtos_sem_mov)} produto(s) encontrado(s)",
@@ -0,0 +1,199 @@
+"""
+Fila de Movimentações de Estoque - Sistema DEKIDS
+
+Escalonador de escritas de estoque dentro do processo: as movimentações de
+um mesmo produto são enviadas uma de cada vez, na ordem de chegada, enquanto
+produtos diferentes são enviados em paralelo.
+
+- Uma fila por produto_id; um único envio em andamento por produto
+- Entradas e saídas acumuladas na fila enquanto um envio está em andamento
+  (ex: cliques seguidos em +1/-1) viram uma única movimentação com o saldo;
+  saldo zero não vai ao banco
+- Um clique isolado em um produto sem envio em andamento vai ao banco na hora
+- Ajustes (valor absoluto) nunca são agrupados
+- Profundidade da fila por produto para identificar os itens mais disputados
+
+Cada envio usa database.registrar_movimentacao (função aplicar_movimentacao
+do banco, com a linha do produto bloqueada), que continua garantindo a
+consistência entre terminais diferentes.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+
+# Configurações
+MAX_WORKERS = 4             # produtos enviados em paralelo
+JANELA_AGRUPAMENTO = 0.2    # segundos aguardando o restante de uma rajada já na fila antes do primeiro envio
+TIPOS_AGRUPAVEIS = ("entrada", "saida")
+
+
+@dataclass
+class _Pedido:
+    """Movimentação aguardando envio."""
+    tipo: str
+    quantidade: int
+    observacao: Optional[str]
+    usuario_id: Optional[int]
+    futuro: Future = field(default_factory=Future)
+
+    def agrupavel(self) -> bool:
+        return self.tipo in TIPOS_AGRUPAVEIS and isinstance(self.quantidade, int) and self.quantidade > 0
+
+
+def _agrupar(pedidos: List[_Pedido]) -> List[List[_Pedido]]:
+    """Divide os pedidos em grupos consecutivos de entradas/saídas do mesmo usuário."""
+    grupos: List[List[_Pedido]] = []
+    for pedido in pedidos:
+        anterior = grupos[-1] if grupos else None
+        if (anterior and pedido.agrupavel() and anterior[0].agrupavel()
+                and anterior[0].usuario_id == pedido.usuario_id):
+            anterior.append(pedido)
+        else:
+            grupos.append([pedido])
+    return grupos
+
+
+class FilaEstoque:
+    """Filas de movimentação por produto, executadas em um pool de threads."""
+
+    def __init__(self, executar: Optional[Callable[..., bool]] = None,
+                 max_workers: int = MAX_WORKERS, janela: float = JANELA_AGRUPAMENTO):
+        self._lock = threading.Lock()
+        self._pendentes: Dict[int, Deque[_Pedido]] = {}
+        self._ativos: Set[int] = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executar = executar
+        self.max_workers = max_workers
+        self.janela = janela
+
+        # Contadores para monitoramento
+        self.recebidas = 0
+        self.enviadas = 0
+        self.agrupadas = 0
+
+    def _aplicar_no_banco(self, produto_id: int, tipo: str, quantidade: int,
+                          observacao: Optional[str], usuario_id: Optional[int]) -> bool:
+        if self._executar is not None:
+            return self._executar(produto_id, tipo, quantidade, observacao, usuario_id)
+        from database import registrar_movimentacao
+        return registrar_movimentacao(produto_id, tipo, quantidade, observacao, usuario_id)
+
+    def enviar(self, produto_id: int, tipo: str, quantidade: int,
+               observacao: Optional[str] = None, usuario_id: Optional[int] = None) -> Future:
+        """
+        Coloca uma movimentação na fila do produto.
+
+        Args:
+            produto_id: ID do produto
+            tipo: 'entrada', 'saida' ou 'ajuste'
+            quantidade: Quantidade da movimentação (sempre positiva)
+            observacao: Observação opcional
+            usuario_id: ID do usuário (opcional)
+
+        Returns:
+            Future com o resultado de registrar_movimentacao (bool)
+        """
+        pedido = _Pedido(tipo, quantidade, observacao, usuario_id)
+        with self._lock:
+            self.recebidas += 1
+            self._pendentes.setdefault(produto_id, deque()).append(pedido)
+            if produto_id not in self._ativos:
+                self._ativos.add(produto_id)
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="dekids-estoque")
+                self._executor.submit(self._drenar, produto_id)
+        return pedido.futuro
+
+    def registrar(self, produto_id: int, tipo: str, quantidade: int,
+                  observacao: Optional[str] = None, usuario_id: Optional[int] = None) -> bool:
+        """Igual a enviar(), aguardando o resultado."""
+        return self.enviar(produto_id, tipo, quantidade, observacao, usuario_id).result()
+
+    def _drenar(self, produto_id: int) -> None:
+        # Um pedido isolado vai direto ao banco; os cliques que chegarem durante
+        # o envio se acumulam na fila. Só espera pelo restante de uma rajada
+        # quando mais de um pedido chegou antes do início do envio.
+        with self._lock:
+            rajada = len(self._pendentes.get(produto_id) or ()) > 1
+        if rajada and self.janela > 0:
+            time.sleep(self.janela)
+
+        while True:
+            with self._lock:
+                fila = self._pendentes.get(produto_id)
+                if not fila:
+                    self._pendentes.pop(produto_id, None)
+                    self._ativos.discard(produto_id)
+                    return
+                pedidos = list(fila)
+                fila.clear()
+
+            for grupo in _agrupar(pedidos):
+                self._aplicar_grupo(produto_id, grupo)
+
+    def _aplicar_grupo(self, produto_id: int, grupo: List[_Pedido]) -> None:
+        primeiro = grupo[0]
+        tipo, quantidade, observacao = primeiro.tipo, primeiro.quantidade, primeiro.observacao
+
+        if len(grupo) > 1:
+            saldo = sum(p.quantidade if p.tipo == "entrada" else -p.quantidade for p in grupo)
+            tipo = "entrada" if saldo > 0 else "saida"
+            quantidade = abs(saldo)
+            observacoes = {p.observacao for p in grupo}
+            observacao = observacao if len(observacoes) == 1 else f"{len(grupo)} movimentações agrupadas"
+
+        try:
+            if quantidade == 0 and len(grupo) > 1:
+                # Cliques que se anulam: nada a gravar
+                resultado = True
+            else:
+                resultado = self._aplicar_no_banco(produto_id, tipo, quantidade, observacao, primeiro.usuario_id)
+                with self._lock:
+                    self.enviadas += 1
+        except Exception as e:
+            for pedido in grupo:
+                pedido.futuro.set_exception(e)
+            return
+        finally:
+            with self._lock:
+                self.agrupadas += len(grupo) - 1
+
+        for pedido in grupo:
+            pedido.futuro.set_result(resultado)
+
+    def profundidade(self, produto_id: int) -> int:
+        """Movimentações do produto aguardando envio."""
+        with self._lock:
+            return len(self._pendentes.get(produto_id) or ())
+
+    def profundidades(self) -> Dict[int, int]:
+        """{produto_id: movimentações aguardando envio} dos produtos com fila."""
+        with self._lock:
+            return {produto_id: len(fila) for produto_id, fila in self._pendentes.items() if fila}
+
+    def estatisticas(self, limite: int = 5) -> Dict[str, Any]:
+        """Contadores e produtos com as maiores filas, para monitoramento."""
+        profundidades = self.profundidades()
+        with self._lock:
+            return {
+                "pendentes": sum(profundidades.values()),
+                "produtos_em_envio": len(self._ativos),
+                "mais_disputados": sorted(profundidades.items(), key=lambda par: par[1], reverse=True)[:limite],
+                "recebidas": self.recebidas,
+                "enviadas": self.enviadas,
+                "agrupadas": self.agrupadas,
+            }
+
+
+# Instância global usada pelo sistema
+fila_estoque = FilaEstoque()
+
+
+def obter_estado() -> Dict[str, Any]:
+    """Retorna os contadores da fila de movimentações."""
+    return fila_estoque.estatisticas()
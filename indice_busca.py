@@ -0,0 +1,481 @@
+"""
+Índice de Busca de Produtos - Sistema DEKIDS
+
+Índice invertido em memória para a busca enquanto se digita (tela de estoque
+e PDV), sobre descrição, marca, referência e código de barras.
+
+- Textos normalizados: sem acentos e sem diferença de maiúsculas/minúsculas
+  ("Calça" encontra "calca"), divididos em palavras
+- Índice invertido (campo, palavra) -> produtos; palavras de um único
+  produto (referências, códigos) guardam só o id, para economizar memória
+- Trigramas sobre o vocabulário: uma palavra da busca com 3+ caracteres
+  encontra as palavras indexadas que a contêm sem percorrer o catálogo;
+  com 1-2 caracteres, vale como início de palavra
+- Cada palavra da busca deve aparecer em algum dos campos, em qualquer ordem
+- Resultados ordenados por relevância: palavra exata > início de palavra >
+  trecho; código de barras e referência pesam mais que descrição e marca
+- Atualização incremental por produto (atualizar/remover), feita pelo
+  cache_catalogo a cada escrita ou sincronização
+
+IndiceSugestoes ("Você quis dizer") usa o mesmo vocabulário normalizado com um
+dicionário de deleções (SymSpell): cada termo é indexado pelas variantes com
+até DISTANCIA_MAXIMA letras removidas, e a busca gera as deleções do termo
+digitado em vez de comparar com todo o vocabulário.
+"""
+
+import re
+import sys
+import threading
+import unicodedata
+from itertools import product as combinar
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+# Campos indexados e seus pesos na relevância
+PESOS_CAMPOS = {
+    "codigo_barras": 4,
+    "referencia": 3,
+    "descricao": 2,
+    "marca": 1,
+}
+
+# Pontuação por tipo de correspondência da palavra
+PONTOS_EXATO = 3
+PONTOS_INICIO = 2
+PONTOS_TRECHO = 1
+
+_PALAVRA = re.compile(r"\w+")
+
+# Sugestões: distância de edição máxima, prefixo usado nas deleções (limita o
+# tamanho do dicionário) e tamanho mínimo das palavras do vocabulário
+DISTANCIA_MAXIMA = 2
+PREFIXO_DELECOES = 7
+TAMANHO_MINIMO_TERMO = 3
+
+
+def normalizar(texto: Any) -> str:
+    """Remove acentos e diferença de maiúsculas/minúsculas ("Calça Jeans" -> "calca jeans")."""
+    if texto is None:
+        return ""
+    decomposto = unicodedata.normalize("NFKD", str(texto))
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).casefold().strip()
+
+
+def palavras(texto: Any) -> List[str]:
+    """Palavras normalizadas do texto."""
+    return _PALAVRA.findall(normalizar(texto))
+
+
+def _chave(campo: str, palavra: str) -> str:
+    # Chaves internadas: os produtos com a mesma palavra compartilham a string
+    return sys.intern(f"{campo}\x1f{palavra}")
+
+
+def _trigramas(palavra: str) -> Set[str]:
+    return {palavra[i:i + 3] for i in range(len(palavra) - 2)}
+
+
+class IndiceBusca:
+    """Índice invertido dos campos de texto dos produtos."""
+
+    def __init__(self, campos: Iterable[str] = tuple(PESOS_CAMPOS)):
+        self.campos = tuple(campos)
+        self._lock = threading.RLock()
+        # {produto_id: (chave campo+palavra, ...)}: para reindexar e remover
+        self._chaves_produto: Dict[int, Tuple[str, ...]] = {}
+        # {chave campo+palavra: produto_id ou {produto_id, ...}}
+        self._produtos: Dict[str, Any] = {}
+        # {palavra: número de chaves campo+palavra que a usam}
+        self._vocabulario: Dict[str, int] = {}
+        # Vocabulário: {trigrama: {palavra, ...}} e {1-2 primeiros caracteres: {palavra, ...}}
+        self._trigramas: Dict[str, Set[str]] = {}
+        self._prefixos: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._chaves_produto)
+
+    # ------------------------------------------------------------------
+    # Atualização
+    # ------------------------------------------------------------------
+
+    def atualizar(self, produto: Dict[str, Any]) -> None:
+        """Indexa (ou reindexa) um produto."""
+        produto_id = produto["id"]
+        pares = sorted({
+            (campo, palavra)
+            for campo in self.campos
+            for palavra in palavras(produto.get(campo))
+        })
+
+        with self._lock:
+            chaves = tuple(_chave(campo, palavra) for campo, palavra in pares)
+            if self._chaves_produto.get(produto_id) == chaves:
+                return
+            self._desindexar(produto_id)
+            self._chaves_produto[produto_id] = chaves
+            for (_, palavra), chave in zip(pares, chaves):
+                atual = self._produtos.get(chave)
+                if atual is None:
+                    self._produtos[chave] = produto_id
+                    if palavra not in self._vocabulario:
+                        self._vocabulario[palavra] = 0
+                        self._adicionar_vocabulario(palavra)
+                    self._vocabulario[palavra] += 1
+                elif isinstance(atual, set):
+                    atual.add(produto_id)
+                elif atual != produto_id:
+                    self._produtos[chave] = {atual, produto_id}
+
+    def remover(self, produto_id: int) -> None:
+        """Remove um produto do índice."""
+        with self._lock:
+            self._desindexar(produto_id)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._chaves_produto.clear()
+            self._produtos.clear()
+            self._vocabulario.clear()
+            self._trigramas.clear()
+            self._prefixos.clear()
+
+    def _desindexar(self, produto_id: int) -> None:
+        for chave in self._chaves_produto.pop(produto_id, ()):
+            atual = self._produtos.get(chave)
+            if isinstance(atual, set):
+                atual.discard(produto_id)
+                if len(atual) == 1:
+                    self._produtos[chave] = next(iter(atual))
+                continue
+            if atual != produto_id:
+                continue
+            del self._produtos[chave]
+            palavra = chave.split("\x1f", 1)[1]
+            self._vocabulario[palavra] -= 1
+            if not self._vocabulario[palavra]:
+                del self._vocabulario[palavra]
+                self._remover_vocabulario(palavra)
+
+    def _adicionar_vocabulario(self, palavra: str) -> None:
+        for trigrama in _trigramas(palavra):
+            self._trigramas.setdefault(trigrama, set()).add(palavra)
+        for tamanho in (1, 2):
+            if len(palavra) >= tamanho:
+                self._prefixos.setdefault(palavra[:tamanho], set()).add(palavra)
+
+    def _remover_vocabulario(self, palavra: str) -> None:
+        chaves = [(self._trigramas, t) for t in _trigramas(palavra)]
+        chaves += [(self._prefixos, palavra[:tamanho]) for tamanho in (1, 2) if len(palavra) >= tamanho]
+        for mapa, chave in chaves:
+            conjunto = mapa.get(chave)
+            if conjunto is not None:
+                conjunto.discard(palavra)
+                if not conjunto:
+                    del mapa[chave]
+
+    # ------------------------------------------------------------------
+    # Busca
+    # ------------------------------------------------------------------
+
+    def _vocabulario_com(self, palavra: str) -> Set[str]:
+        """Palavras indexadas que contêm a palavra (ou começam com ela, se tiver 1-2 caracteres)."""
+        if len(palavra) < 3:
+            return self._prefixos.get(palavra, set())
+
+        conjuntos = []
+        for trigrama in _trigramas(palavra):
+            conjunto = self._trigramas.get(trigrama)
+            if not conjunto:
+                return set()
+            conjuntos.append(conjunto)
+        conjuntos.sort(key=len)
+        candidatas = conjuntos[0].intersection(*conjuntos[1:])
+        return {candidata for candidata in candidatas if palavra in candidata}
+
+    def _ids(self, campo: str, indexada: str) -> Set[int]:
+        ids = self._produtos.get(_chave(campo, indexada))
+        if ids is None:
+            return set()
+        return ids if isinstance(ids, set) else {ids}
+
+    def _estimar(self, vocabulario: Set[str], campos: Tuple[str, ...]) -> int:
+        """Número aproximado de produtos de uma palavra (para processar as mais seletivas primeiro)."""
+        return sum(len(self._ids(campo, indexada)) for indexada in vocabulario for campo in campos)
+
+    def _faixas(self, palavra: str, vocabulario: Set[str], campos: Tuple[str, ...],
+                dentro: Optional[Set[int]]) -> List[Tuple[int, Set[int]]]:
+        """Produtos que contêm a palavra (restritos a `dentro`), agrupados por pontuação (maior primeiro)."""
+        grupos: Dict[int, List[Set[int]]] = {}
+        for indexada in vocabulario:
+            if indexada == palavra:
+                tipo = PONTOS_EXATO
+            elif indexada.startswith(palavra):
+                tipo = PONTOS_INICIO
+            else:
+                tipo = PONTOS_TRECHO
+            for campo in campos:
+                ids = self._ids(campo, indexada)
+                if dentro is not None:
+                    ids = ids & dentro
+                if ids:
+                    grupos.setdefault(tipo * PESOS_CAMPOS.get(campo, 1), []).append(ids)
+        return [(pontos, set().union(*conjuntos)) for pontos, conjuntos in sorted(grupos.items(), reverse=True)]
+
+    def buscar(self, termo: str, campos: Optional[Iterable[str]] = None, limite: Optional[int] = None) -> List[int]:
+        """
+        Busca produtos que contêm todas as palavras do termo.
+
+        Args:
+            termo: Texto digitado (acentos e maiúsculas são ignorados)
+            campos: Campos considerados (padrão: todos os indexados)
+            limite: Número máximo de ids retornados (opcional)
+
+        Returns:
+            Ids dos produtos, do mais relevante para o menos relevante
+            (empate: menor id primeiro)
+        """
+        termos = list(dict.fromkeys(palavras(termo)))
+        if not termos:
+            return []
+        campos = tuple(campos) if campos else self.campos
+
+        with self._lock:
+            vocabularios = {palavra: self._vocabulario_com(palavra) for palavra in termos}
+            termos.sort(key=lambda palavra: self._estimar(vocabularios[palavra], campos))
+
+            faixas_por_palavra = []
+            encontrados: Optional[Set[int]] = None
+            for palavra in termos:
+                faixas = self._faixas(palavra, vocabularios[palavra], campos, encontrados)
+                ids = set().union(*(conjunto for _, conjunto in faixas))
+                encontrados = ids if encontrados is None else encontrados & ids
+                if not encontrados:
+                    return []
+                faixas_por_palavra.append(faixas)
+
+        if len(faixas_por_palavra) == 1:
+            # Uma palavra: concatena as faixas, sem pontuar produto a produto
+            resultado: List[int] = []
+            restantes = encontrados
+            for _, conjunto in faixas_por_palavra[0]:
+                faixa = conjunto & restantes
+                resultado.extend(sorted(faixa))
+                restantes = restantes - faixa
+                if limite is not None and len(resultado) >= limite:
+                    break
+            return resultado[:limite] if limite is not None else resultado
+
+        pontos = dict.fromkeys(encontrados, 0)
+        for faixas in faixas_por_palavra:
+            restantes = encontrados
+            for valor, conjunto in faixas:
+                faixa = conjunto & restantes
+                for produto_id in faixa:
+                    pontos[produto_id] += valor
+                restantes = restantes - faixa
+        resultado = sorted(pontos, key=lambda produto_id: (-pontos[produto_id], produto_id))
+        return resultado[:limite] if limite is not None else resultado
+
+
+# ============================================================================
+# SUGESTÕES (SymSpell)
+# ============================================================================
+
+def distancia_edicao(a: str, b: str, limite: int) -> int:
+    """
+    Distância de Levenshtein entre a e b, interrompida ao passar de `limite`.
+
+    Returns:
+        A distância, ou limite + 1 se ela for maior que o limite
+    """
+    if abs(len(a) - len(b)) > limite:
+        return limite + 1
+    if len(a) > len(b):
+        a, b = b, a
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        atual = [i] + [0] * len(b)
+        menor = i
+        for j, cb in enumerate(b, 1):
+            atual[j] = min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + (ca != cb))
+            menor = min(menor, atual[j])
+        if menor > limite:
+            return limite + 1
+        anterior = atual
+    return anterior[-1] if anterior[-1] <= limite else limite + 1
+
+
+def _delecoes(termo: str, distancia: int) -> Set[str]:
+    """
+    Variantes do termo com até `distancia` letras removidas (inclui o próprio termo).
+
+    Com distância 2 usa só o prefixo do termo, para limitar o dicionário; com
+    distância 1 (códigos), o termo inteiro, para não juntar códigos de mesmo prefixo.
+    """
+    resultado = {termo[:PREFIXO_DELECOES] if distancia > 1 else termo}
+    fronteira = set(resultado)
+    for _ in range(distancia):
+        proxima = set()
+        for variante in fronteira:
+            for i in range(len(variante)):
+                proxima.add(variante[:i] + variante[i + 1:])
+        proxima -= resultado
+        resultado |= proxima
+        fronteira = proxima
+    return resultado
+
+
+def _limite_distancia(termo: str) -> int:
+    # Palavras curtas e códigos (referências com dígitos) aceitam só uma edição:
+    # com duas, "ref1234" ficaria a essa distância de milhares de referências
+    if len(termo) <= 4 or any(c.isdigit() for c in termo):
+        return 1
+    return DISTANCIA_MAXIMA
+
+
+class IndiceSugestoes:
+    """
+    Vocabulário de sugestões (palavras da descrição e da marca, e referências)
+    com dicionário de deleções para busca aproximada.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # {termo normalizado: [forma exibida, nº de produtos]}
+        self._termos: Dict[str, List[Any]] = {}
+        # {deleção: termo ou {termos}}
+        self._delecoes: Dict[str, Any] = {}
+        # {produto_id: (termos, ...)}
+        self._termos_produto: Dict[int, Tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._termos)
+
+    @staticmethod
+    def _termos_de(produto: Dict[str, Any]) -> Dict[str, str]:
+        """{termo normalizado: forma exibida} de um produto."""
+        termos = {}
+        for campo in ("descricao", "marca"):
+            for palavra in _PALAVRA.findall((produto.get(campo) or "").lower()):
+                chave = normalizar(palavra)
+                if len(chave) >= TAMANHO_MINIMO_TERMO:
+                    termos.setdefault(chave, palavra)
+        referencia = (produto.get("referencia") or "").strip()
+        if len(referencia) >= TAMANHO_MINIMO_TERMO:
+            termos.setdefault(normalizar(referencia), referencia)
+        return termos
+
+    def atualizar(self, produto: Dict[str, Any]) -> None:
+        """Indexa (ou reindexa) os termos de um produto."""
+        produto_id = produto["id"]
+        termos = self._termos_de(produto)
+        with self._lock:
+            if set(self._termos_produto.get(produto_id, ())) == set(termos):
+                return
+            self._desindexar(produto_id)
+            self._termos_produto[produto_id] = tuple(termos)
+            for chave, exibicao in termos.items():
+                registro = self._termos.get(chave)
+                if registro is not None:
+                    registro[1] += 1
+                    continue
+                self._termos[chave] = [exibicao, 1]
+                for delecao in _delecoes(chave, _limite_distancia(chave)):
+                    atual = self._delecoes.get(delecao)
+                    if atual is None:
+                        self._delecoes[delecao] = chave
+                    elif isinstance(atual, set):
+                        atual.add(chave)
+                    else:
+                        self._delecoes[delecao] = {atual, chave}
+
+    def remover(self, produto_id: int) -> None:
+        with self._lock:
+            self._desindexar(produto_id)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._termos.clear()
+            self._delecoes.clear()
+            self._termos_produto.clear()
+
+    def _desindexar(self, produto_id: int) -> None:
+        for chave in self._termos_produto.pop(produto_id, ()):
+            registro = self._termos.get(chave)
+            if registro is None:
+                continue
+            registro[1] -= 1
+            if registro[1] > 0:
+                continue
+            del self._termos[chave]
+            for delecao in _delecoes(chave, _limite_distancia(chave)):
+                atual = self._delecoes.get(delecao)
+                if isinstance(atual, set):
+                    atual.discard(chave)
+                    if len(atual) == 1:
+                        self._delecoes[delecao] = next(iter(atual))
+                elif atual == chave:
+                    del self._delecoes[delecao]
+
+    def _corrigir(self, palavra: str) -> List[Tuple[int, int, str]]:
+        """Termos a até a distância limite da palavra: [(distância, -nº de produtos, termo)]."""
+        limite = _limite_distancia(palavra)
+        candidatos = set()
+        for delecao in _delecoes(palavra, limite):
+            atual = self._delecoes.get(delecao)
+            if isinstance(atual, set):
+                candidatos |= atual
+            elif atual is not None:
+                candidatos.add(atual)
+
+        resultado = []
+        for candidato in candidatos:
+            distancia = distancia_edicao(palavra, candidato, limite)
+            if distancia <= limite:
+                resultado.append((distancia, -self._termos[candidato][1], candidato))
+        resultado.sort()
+        return resultado
+
+    def sugerir(self, termo: str, max_sugestoes: int = 5) -> List[str]:
+        """
+        Sugere termos parecidos com o termo digitado.
+
+        Cada palavra do termo é corrigida separadamente (a até
+        DISTANCIA_MAXIMA edições); termos com várias palavras geram
+        combinações das correções.
+
+        Args:
+            termo: Termo que não retornou resultados
+            max_sugestoes: Número máximo de sugestões
+
+        Returns:
+            Sugestões, da mais parecida (e mais frequente) para a menos
+        """
+        normalizado = normalizar(termo)
+        entrada = _PALAVRA.findall(normalizado) if " " in normalizado else [normalizado]
+        entrada = [palavra for palavra in entrada if palavra]
+        if not entrada:
+            return []
+
+        with self._lock:
+            opcoes = []
+            for palavra in entrada:
+                correcoes = self._corrigir(palavra)[:max_sugestoes]
+                if not correcoes:
+                    if palavra in self._termos or len(palavra) < TAMANHO_MINIMO_TERMO:
+                        correcoes = [(0, 0, palavra)]
+                    else:
+                        return []
+                opcoes.append([
+                    (distancia, frequencia, self._termos[chave][0] if chave in self._termos else chave)
+                    for distancia, frequencia, chave in correcoes
+                ])
+
+        combinacoes = []
+        for escolha in combinar(*opcoes):
+            frase = " ".join(exibicao for _, _, exibicao in escolha)
+            if normalizar(frase) == normalizado:
+                continue
+            combinacoes.append((sum(c[0] for c in escolha), sum(c[1] for c in escolha), frase))
+        combinacoes.sort()
+        return [frase for _, _, frase in combinacoes[:max_sugestoes]]
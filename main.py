@@ -4,7 +4,7 @@ import time
 import base64
 from datetime import datetime, timedelta
 # Adicione 'editar_produto' na importação abaixo
-from database import cadastrar_produto, listar_estoque, excluir_produto, registrar_saida, registrar_entrada, registrar_estorno, editar_produto, registrar_movimentacao, buscar_produtos_avancado, gerar_sugestoes, atualizar_estoque_minimo, listar_movimentacoes, desfazer_ultima_movimentacao, contar_produtos_avancado
+from database import cadastrar_produto, listar_estoque, excluir_produto, registrar_saida, registrar_entrada, registrar_estorno, editar_produto, registrar_movimentacao, buscar_produtos_avancado, buscar_produtos_pagina, gerar_sugestoes, atualizar_estoque_minimo, listar_movimentacoes_pagina, desfazer_ultima_movimentacao, contar_produtos_avancado
 from barcode import gerar_qrcode, validar_codigo_barras
 from relatorios_estoque import gerar_relatorio_estoque_baixo, gerar_relatorio_movimentacoes, gerar_relatorio_produtos_sem_movimentacao, exportar_csv
 from estoque import calcular_valor_total_estoque
@@ -664,24 +664,8 @@ def main(page: ft.Page):
             filtros["limit"] = filtros_sessao["itens_por_pagina"]
             filtros["offset"] = (filtros_sessao["pagina_atual"] - 1) * filtros_sessao["itens_por_pagina"]
             
-            # Contar total de produtos (sem paginação) para calcular páginas
-            filtros_count = {k: v for k, v in filtros.items() if k not in ['limit', 'offset']}
-            if filtros_count:
-                # Buscar todos para contar (otimização futura: usar COUNT do banco)
-                todos_produtos = buscar_produtos_avancado(filtros_count)
-                filtros_sessao["total_produtos"] = len(todos_produtos)
-            else:
-                todos_produtos = listar_estoque()
-                filtros_sessao["total_produtos"] = len(todos_produtos)
-            
-            # Buscar produtos da página atual
-            if filtros:
-                produtos = buscar_produtos_avancado(filtros)
-            else:
-                # Se não há filtros, aplicar paginação manualmente
-                offset = filtros["offset"]
-                limit = filtros["limit"]
-                produtos = todos_produtos[offset:offset + limit]
+            # Buscar apenas a página atual e o total de produtos (uma única requisição)
+            produtos, filtros_sessao["total_produtos"] = buscar_produtos_pagina(filtros)
             
             # Calcular informações de paginação
             total_paginas = (filtros_sessao["total_produtos"] + filtros_sessao["itens_por_pagina"] - 1) // filtros_sessao["itens_por_pagina"]
@@ -1407,7 +1391,7 @@ def main(page: ft.Page):
     historico_produto_id = ft.Text(visible=False)
     historico_produto_nome = ft.Text("", size=20, weight="bold", color="#E91E63")
     historico_state = {
-        "offset": 0,
+        "cursor": None,  # Cursor da próxima página (paginação por created_at, id)
         "limit": 20,  # Carregar 20 movimentações por vez
         "total_carregado": 0,
         "tem_mais": True
@@ -1454,25 +1438,31 @@ def main(page: ft.Page):
             
             # Se limpar=True, resetar estado e limpar lista
             if limpar:
-                historico_state["offset"] = 0
+                historico_state["cursor"] = None
                 historico_state["total_carregado"] = 0
                 historico_state["tem_mais"] = True
                 lista_historico.controls.clear()
             
-            # Buscar movimentações com paginação (lazy loading)
-            movimentacoes = listar_movimentacoes(
+            # Buscar movimentações com paginação por cursor (lazy loading)
+            movimentacoes, proximo_cursor = listar_movimentacoes_pagina(
                 produto_id, 
                 data_inicio_val, 
                 data_fim_val,
-                limit=historico_state["limit"],
-                offset=historico_state["offset"]
+                limite=historico_state["limit"],
+                cursor=historico_state["cursor"]
             )
             
+            # Remover botão "Carregar mais" da página anterior (fica sempre no fim da lista)
+            if lista_historico.controls and isinstance(lista_historico.controls[-1], ft.Container):
+                last_control = lista_historico.controls[-1]
+                if hasattr(last_control, 'content') and isinstance(last_control.content, ft.ElevatedButton):
+                    lista_historico.controls.pop()
+            
             # Atualizar estado
             if movimentacoes:
-                historico_state["offset"] += len(movimentacoes)
+                historico_state["cursor"] = proximo_cursor
                 historico_state["total_carregado"] += len(movimentacoes)
-                historico_state["tem_mais"] = len(movimentacoes) == historico_state["limit"]
+                historico_state["tem_mais"] = proximo_cursor is not None
                 
                 # Atualizar informações (apenas na primeira carga)
                 if limpar:
@@ -1534,12 +1524,6 @@ def main(page: ft.Page):
                 
                 # Adicionar botão "Carregar mais" se houver mais movimentações
                 if historico_state["tem_mais"]:
-                    # Remover botão anterior se existir
-                    if lista_historico.controls and isinstance(lista_historico.controls[-1], ft.Container):
-                        last_control = lista_historico.controls[-1]
-                        if hasattr(last_control, 'content') and isinstance(last_control.content, ft.ElevatedButton):
-                            lista_historico.controls.pop()
-                    
                     btn_carregar_mais = ft.Container(
                         content=ft.ElevatedButton(
                             "Carregar mais movimentações",
@@ -1567,11 +1551,6 @@ def main(page: ft.Page):
                 else:
                     # Não há mais movimentações para carregar
                     historico_state["tem_mais"] = False
-                    # Remover botão "Carregar mais"
-                    if lista_historico.controls and isinstance(lista_historico.controls[-1], ft.Container):
-                        last_control = lista_historico.controls[-1]
-                        if hasattr(last_control, 'content') and isinstance(last_control.content, ft.ElevatedButton):
-                            lista_historico.controls.pop()
                     
                     lista_historico.controls.append(
                         ft.Container(
@@ -2,18 +2,84 @@
 Módulo de Relatórios - Sistema de Vendas DEKIDS
 
 Este módulo gera relatórios gerenciais de vendas, produtos e vendedores.
+
+Os dias completos do período são lidos dos resumos diários de vendas
+(sql/009_resumos_vendas.sql), mantidos pelo banco a cada venda registrada ou
+cancelada; apenas o dia atual e dias incluídos em parte são lidos das vendas.
+Os totais de vendas do período e por vendedor são agregados no próprio banco
+(sql/011_relatorios_vendas.sql); a lista de vendas é lida em páginas, apenas
+quando exibida. Os itens dos produtos mais vendidos são agregados em colunas
+NumPy pelo módulo agregacao.
+
+Com a base analítica local configurada (analitico.py), os relatórios rodam
+como SQL sobre ela, sem consultar o banco.
 """
 
 import csv
-from typing import List, Dict, Optional
-from database import supabase
+from datetime import date, datetime, time, timedelta
+from typing import List, Dict, Optional, Tuple
+import agregacao
+import database
+from analitico import base_analitica
+
+
+# Trecho do período lido das vendas: (inicio, fim, fim_inclusivo)
+Trecho = Tuple[str, str, bool]
+
+# Vendas por página na lista do relatório de vendas por período
+TAMANHO_PAGINA_VENDAS = 100
+
+
+def _dividir_periodo(data_inicio: str, data_fim: str) -> Tuple[Optional[Tuple[str, str]], List[Trecho]]:
+    """
+    Divide o período em dias completos, lidos dos resumos diários, e trechos
+    lidos das vendas: o dia atual (ainda em andamento) e dias incluídos
+    apenas em parte no período.
+    
+    Args:
+        data_inicio: Início do período (ISO, com hora)
+        data_fim: Fim do período, inclusive (ISO, com hora)
+    
+    Returns:
+        Tupla (dias, trechos):
+        - dias: (primeiro_dia, ultimo_dia) no formato YYYY-MM-DD, ou None
+        - trechos: Lista de (inicio, fim, fim_inclusivo) a consultar nas vendas
+    """
+    try:
+        inicio = datetime.fromisoformat(data_inicio)
+        fim = datetime.fromisoformat(data_fim)
+    except ValueError:
+        return None, [(data_inicio, data_fim, True)]
+
+    primeiro = inicio.date() if inicio.time() == time.min else inicio.date() + timedelta(days=1)
+    ultimo = fim.date() if fim.time() >= time(23, 59, 59) else fim.date() - timedelta(days=1)
+    ultimo = min(ultimo, date.today() - timedelta(days=1))
+
+    if primeiro > ultimo:
+        return None, [(data_inicio, data_fim, True)]
+
+    trechos: List[Trecho] = []
+    if inicio.date() < primeiro:
+        trechos.append((data_inicio, f"{primeiro.isoformat()}T00:00:00", False))
+    seguinte = ultimo + timedelta(days=1)
+    if fim >= datetime.combine(seguinte, time.min):
+        trechos.append((f"{seguinte.isoformat()}T00:00:00", data_fim, True))
+
+    return (primeiro.isoformat(), ultimo.isoformat()), trechos
+
+
+def _filtrar_trecho(query, inicio: str, fim: str, fim_inclusivo: bool):
+    """Aplica o trecho do período à query de vendas."""
+    query = query.gte('data_hora', inicio)
+    return query.lte('data_hora', fim) if fim_inclusivo else query.lt('data_hora', fim)
 
 
 def relatorio_vendas_periodo(
     data_inicio: str,
     data_fim: str,
     usuario_id: Optional[int] = None,
-    forma_pagamento: Optional[str] = None
+    forma_pagamento: Optional[str] = None,
+    incluir_vendas: bool = True
 ) -> Dict:
     """
     Gera relatório de vendas por período.
@@ -23,6 +89,8 @@ def relatorio_vendas_periodo(
         data_fim: Data final (formato ISO)
         usuario_id: Filtro opcional por vendedor
         forma_pagamento: Filtro opcional por forma de pagamento
+        incluir_vendas: Se False, retorna apenas as métricas ('vendas' vazia);
+                        a lista pode ser lida em páginas com relatorio_vendas_pagina
         
     Returns:
         Dict com métricas e lista de vendas
@@ -38,109 +106,40 @@ def relatorio_vendas_periodo(
         if 'T' not in data_fim:
             data_fim = f"{data_fim}T23:59:59"
         
-        # Construir query base para vendas
-        query = supabase.table('vendas').select(
-            'id, data_hora, valor_total, desconto_valor, desconto_percentual, valor_final, '
-            'status, cliente_id, usuario_id, '
-            'clientes(nome, cpf), '
-            'usuarios!vendas_usuario_id_fkey(username)'
-        ).gte('data_hora', data_inicio).lte('data_hora', data_fim)
-        
-        # Aplicar filtro por vendedor se fornecido
-        if usuario_id is not None:
-            query = query.eq('usuario_id', usuario_id)
-        
-        # Executar query
-        response = query.execute()
-        vendas = response.data if response.data else []
-        
-        # Buscar pagamentos para todas as vendas
-        venda_ids = [v['id'] for v in vendas]
-        pagamentos_data = []
-        
-        if venda_ids:
-            pagamentos_response = supabase.table('pagamentos').select(
-                'venda_id, forma_pagamento, valor, numero_parcelas'
-            ).in_('venda_id', venda_ids).execute()
-            pagamentos_data = pagamentos_response.data if pagamentos_response.data else []
-        
-        # Criar mapa de pagamentos por venda_id
-        pagamentos_por_venda = {}
-        for pag in pagamentos_data:
-            venda_id = pag['venda_id']
-            if venda_id not in pagamentos_por_venda:
-                pagamentos_por_venda[venda_id] = []
-            pagamentos_por_venda[venda_id].append(pag)
-        
-        # Filtrar por forma de pagamento se fornecido
-        if forma_pagamento:
-            vendas_filtradas = []
-            for venda in vendas:
-                pagamentos_venda = pagamentos_por_venda.get(venda['id'], [])
-                if any(p['forma_pagamento'] == forma_pagamento for p in pagamentos_venda):
-                    vendas_filtradas.append(venda)
-            vendas = vendas_filtradas
-        
-        # Separar vendas canceladas das não canceladas
-        vendas_nao_canceladas = [v for v in vendas if v['status'] != 'cancelada']
-        
-        # Calcular métricas (excluindo vendas canceladas)
-        faturamento_total = sum(v['valor_final'] for v in vendas_nao_canceladas)
-        numero_vendas = len(vendas_nao_canceladas)
-        ticket_medio = faturamento_total / numero_vendas if numero_vendas > 0 else 0.0
-        
-        # Calcular distribuição por forma de pagamento
-        distribuicao_pagamento = {}
-        for venda in vendas_nao_canceladas:
-            pagamentos_venda = pagamentos_por_venda.get(venda['id'], [])
-            for pag in pagamentos_venda:
-                forma = pag['forma_pagamento']
-                if forma not in distribuicao_pagamento:
-                    distribuicao_pagamento[forma] = 0.0
-                distribuicao_pagamento[forma] += pag['valor']
-        
-        # Converter para lista com percentuais
-        distribuicao_lista = []
-        for forma, valor in distribuicao_pagamento.items():
-            percentual = (valor / faturamento_total * 100) if faturamento_total > 0 else 0.0
-            distribuicao_lista.append({
-                'forma_pagamento': forma,
-                'valor': float(valor),
-                'percentual': float(percentual)
-            })
+        if base_analitica.preparar():
+            return base_analitica.relatorio_vendas_periodo(
+                data_inicio, data_fim, usuario_id, forma_pagamento, incluir_vendas
+            )
         
-        # Preparar lista de vendas com detalhes
+        # Totais agregados no banco; sem filtros, os dias completos vêm dos
+        # resumos diários (que não têm vendedor x forma de pagamento)
+        dias = None
+        if usuario_id is None and not forma_pagamento:
+            dias, _ = _dividir_periodo(data_inicio, data_fim)
+        resumo = database.resumo_vendas_periodo(data_inicio, data_fim, usuario_id, forma_pagamento, dias)
+        
+        distribuicao_lista = [
+            {
+                'forma_pagamento': dist['forma_pagamento'],
+                'valor': float(dist['valor']),
+                'percentual': float(dist['percentual'])
+            }
+            for dist in resumo.get('distribuicao_pagamento') or []
+        ]
+        
+        # Lista completa de vendas, lida em páginas (a tela usa relatorio_vendas_pagina)
         vendas_detalhadas = []
-        for venda in vendas:
-            pagamentos_venda = pagamentos_por_venda.get(venda['id'], [])
-            
-            # Extrair nome do cliente
-            cliente_nome = None
-            if venda.get('clientes') and isinstance(venda['clientes'], dict):
-                cliente_nome = venda['clientes'].get('nome')
-            
-            # Extrair nome do vendedor
-            vendedor_nome = None
-            if venda.get('usuarios') and isinstance(venda['usuarios'], dict):
-                vendedor_nome = venda['usuarios'].get('username')
-            
-            vendas_detalhadas.append({
-                'id': venda['id'],
-                'data_hora': venda['data_hora'],
-                'valor_total': float(venda['valor_total']),
-                'desconto_valor': float(venda.get('desconto_valor', 0)),
-                'desconto_percentual': float(venda.get('desconto_percentual', 0)),
-                'valor_final': float(venda['valor_final']),
-                'status': venda['status'],
-                'cliente_nome': cliente_nome,
-                'vendedor_nome': vendedor_nome,
-                'pagamentos': pagamentos_venda
-            })
+        apos = None
+        while incluir_vendas:
+            pagina, apos = relatorio_vendas_pagina(data_inicio, data_fim, usuario_id, forma_pagamento, apos)
+            vendas_detalhadas.extend(pagina)
+            if apos is None:
+                break
         
         return {
-            'faturamento_total': float(faturamento_total),
-            'numero_vendas': numero_vendas,
-            'ticket_medio': float(ticket_medio),
+            'faturamento_total': float(resumo.get('faturamento_total') or 0),
+            'numero_vendas': int(resumo.get('numero_vendas') or 0),
+            'ticket_medio': float(resumo.get('ticket_medio') or 0),
             'distribuicao_pagamento': distribuicao_lista,
             'vendas': vendas_detalhadas
         }
@@ -163,6 +162,151 @@ def relatorio_vendas_periodo(
         raise
 
 
+def relatorio_vendas_pagina(
+    data_inicio: str,
+    data_fim: str,
+    usuario_id: Optional[int] = None,
+    forma_pagamento: Optional[str] = None,
+    apos: Optional[Tuple[str, int]] = None,
+    limite: int = TAMANHO_PAGINA_VENDAS
+) -> Tuple[List[Dict], Optional[Tuple[str, int]]]:
+    """
+    Lê uma página da lista de vendas do relatório de vendas por período.
+    
+    Args:
+        data_inicio: Data inicial (formato ISO)
+        data_fim: Data final (formato ISO)
+        usuario_id: Filtro opcional por vendedor
+        forma_pagamento: Filtro opcional por forma de pagamento
+        apos: Cursor devolvido pela página anterior; None para a primeira
+        limite: Número máximo de vendas da página
+    
+    Returns:
+        Tupla (vendas, proximo):
+        - vendas: Vendas da página, em ordem de data/hora (inclusive canceladas)
+        - proximo: Cursor da página seguinte, ou None se esta é a última
+    """
+    try:
+        if 'T' not in data_inicio:
+            data_inicio = f"{data_inicio}T00:00:00"
+        if 'T' not in data_fim:
+            data_fim = f"{data_fim}T23:59:59"
+        
+        if base_analitica.preparar():
+            vendas = base_analitica.pagina_vendas_periodo(
+                data_inicio, data_fim, usuario_id, forma_pagamento, apos, limite
+            )
+        else:
+            vendas = []
+            for venda in database.listar_vendas_periodo(
+                data_inicio, data_fim, usuario_id, forma_pagamento, apos, limite
+            ):
+                vendas.append({
+                    'id': venda['id'],
+                    'data_hora': venda['data_hora'],
+                    'valor_total': float(venda['valor_total']),
+                    'desconto_valor': float(venda.get('desconto_valor') or 0),
+                    'desconto_percentual': float(venda.get('desconto_percentual') or 0),
+                    'valor_final': float(venda['valor_final']),
+                    'status': venda['status'],
+                    'cliente_nome': venda.get('cliente_nome'),
+                    'vendedor_nome': venda.get('vendedor_nome'),
+                    'pagamentos': venda.get('pagamentos') or []
+                })
+        
+        proximo = (vendas[-1]['data_hora'], vendas[-1]['id']) if len(vendas) == limite else None
+        return vendas, proximo
+        
+    except Exception as e:
+        from logging_config import registrar_erro
+        registrar_erro(
+            mensagem="Erro ao listar vendas do relatório",
+            modulo="relatorios",
+            funcao="relatorio_vendas_pagina",
+            detalhes={
+                "data_inicio": data_inicio,
+                "data_fim": data_fim,
+                "usuario_id": usuario_id,
+                "forma_pagamento": forma_pagamento,
+                "apos": apos,
+                "erro": str(e)
+            },
+            exc_info=True
+        )
+        raise
+
+
+def _itens_vendidos(trecho: Trecho) -> List[Dict]:
+    """Itens das vendas não canceladas de um trecho do período, com o produto."""
+    venda_ids = [
+        venda['id'] for venda in database.iterar_tabela(
+            'vendas', 'id', lambda query: _filtrar_trecho(query, *trecho).neq('status', 'cancelada')
+        )
+    ]
+    
+    # Buscar itens de venda com informações dos produtos
+    return list(database.iterar_por_ids(
+        'itens_venda',
+        'produto_id, quantidade, subtotal, '
+        'produtos(id, descricao, marca, referencia, tamanho, genero, preco)',
+        'venda_id',
+        venda_ids
+    ))
+
+
+def _itens_dos_resumos(dia_inicio: str, dia_fim: str) -> List[Dict]:
+    """Totais por produto dos resumos diários, no formato dos itens de venda."""
+    linhas = database.listar_resumos_vendas('produto', dia_inicio, dia_fim)
+    agregado = agregacao.agregar_linhas(linhas, 'produto_id', 'quantidade', 'faturamento')
+    
+    # Produtos cujas vendas foram todas canceladas ficam com quantidade zero
+    agregado = agregado.selecionar(agregado.quantidades > 0)
+    if not len(agregado):
+        return []
+    
+    produtos = {
+        p['id']: p for p in database.iterar_por_ids(
+            'produtos', 'id, descricao, marca, referencia, tamanho, genero, preco', 'id', agregado.chaves.tolist()
+        )
+    }
+    
+    return [
+        {'produto_id': produto_id, 'quantidade': quantidade, 'subtotal': agregacao.reais(centavos),
+         'produtos': produtos.get(produto_id)}
+        for produto_id, quantidade, centavos, _ in agregacao.registros(agregado)
+    ]
+
+
+def _produto_atende(produto: Optional[Dict], filtros: Optional[Dict]) -> bool:
+    """Verifica se o produto existe e atende aos filtros do relatório de produtos."""
+    if not produto or not isinstance(produto, dict):
+        return False
+    if not filtros:
+        return True
+    
+    # Filtro por gênero
+    if 'genero' in filtros and filtros['genero']:
+        if produto.get('genero') != filtros['genero']:
+            return False
+    
+    # Filtro por marca
+    if 'marca' in filtros and filtros['marca']:
+        if produto.get('marca') != filtros['marca']:
+            return False
+    
+    # Filtro por preço mínimo
+    if 'preco_min' in filtros and filtros['preco_min'] is not None:
+        if produto.get('preco', 0) < filtros['preco_min']:
+            return False
+    
+    # Filtro por preço máximo
+    if 'preco_max' in filtros and filtros['preco_max'] is not None:
+        if produto.get('preco', 0) > filtros['preco_max']:
+            return False
+    
+    return True
+
+
 def relatorio_produtos_mais_vendidos(
     data_inicio: str,
     data_fim: str,
@@ -202,106 +346,43 @@ def relatorio_produtos_mais_vendidos(
         if 'T' not in data_fim:
             data_fim = f"{data_fim}T23:59:59"
         
-        # Buscar vendas não canceladas no período
-        vendas_response = supabase.table('vendas').select(
-            'id, data_hora, status'
-        ).gte('data_hora', data_inicio).lte('data_hora', data_fim).neq('status', 'cancelada').execute()
-        
-        vendas = vendas_response.data if vendas_response.data else []
-        
-        if not vendas:
-            return []
-        
-        venda_ids = [v['id'] for v in vendas]
-        
-        # Buscar itens de venda com informações dos produtos
-        itens_response = supabase.table('itens_venda').select(
-            'produto_id, quantidade, subtotal, '
-            'produtos(id, descricao, marca, referencia, tamanho, genero, preco)'
-        ).in_('venda_id', venda_ids).execute()
+        if base_analitica.preparar():
+            return base_analitica.relatorio_produtos_mais_vendidos(data_inicio, data_fim, filtros, limit)
         
-        itens = itens_response.data if itens_response.data else []
+        # Dias completos dos resumos diários; o restante das vendas
+        dias, trechos = _dividir_periodo(data_inicio, data_fim)
+        itens = _itens_dos_resumos(*dias) if dias else []
+        for trecho in trechos:
+            itens.extend(_itens_vendidos(trecho))
         
         if not itens:
             return []
         
-        # Aplicar filtros de produto se fornecidos
-        if filtros:
-            itens_filtrados = []
-            for item in itens:
-                produto = item.get('produtos')
-                if not produto or not isinstance(produto, dict):
-                    continue
-                
-                # Filtro por gênero
-                if 'genero' in filtros and filtros['genero']:
-                    if produto.get('genero') != filtros['genero']:
-                        continue
-                
-                # Filtro por marca
-                if 'marca' in filtros and filtros['marca']:
-                    if produto.get('marca') != filtros['marca']:
-                        continue
-                
-                # Filtro por preço mínimo
-                if 'preco_min' in filtros and filtros['preco_min'] is not None:
-                    if produto.get('preco', 0) < filtros['preco_min']:
-                        continue
-                
-                # Filtro por preço máximo
-                if 'preco_max' in filtros and filtros['preco_max'] is not None:
-                    if produto.get('preco', 0) > filtros['preco_max']:
-                        continue
-                
-                itens_filtrados.append(item)
-            
-            itens = itens_filtrados
-        
-        # Agregar dados por produto_id
-        produtos_agregados = {}
-        
-        for item in itens:
-            produto_id = item['produto_id']
-            quantidade = item['quantidade']
-            subtotal = item['subtotal']
-            produto = item.get('produtos')
-            
-            if not produto or not isinstance(produto, dict):
-                continue
-            
-            if produto_id not in produtos_agregados:
-                produtos_agregados[produto_id] = {
-                    'produto_id': produto_id,
-                    'descricao': produto.get('descricao', ''),
-                    'marca': produto.get('marca', ''),
-                    'referencia': produto.get('referencia', ''),
-                    'tamanho': produto.get('tamanho', ''),
-                    'quantidade_vendida': 0,
-                    'faturamento_gerado': 0.0
-                }
-            
-            produtos_agregados[produto_id]['quantidade_vendida'] += quantidade
-            produtos_agregados[produto_id]['faturamento_gerado'] += float(subtotal)
-        
-        # Converter para lista
-        produtos_lista = list(produtos_agregados.values())
-        
-        # Calcular faturamento total para percentuais
-        faturamento_total = sum(p['faturamento_gerado'] for p in produtos_lista)
-        
-        # Adicionar percentual de participação
-        for produto in produtos_lista:
-            if faturamento_total > 0:
-                produto['percentual_participacao'] = (produto['faturamento_gerado'] / faturamento_total) * 100
-            else:
-                produto['percentual_participacao'] = 0.0
-        
-        # Ordenar por quantidade vendida (descendente)
-        produtos_lista.sort(key=lambda x: x['quantidade_vendida'], reverse=True)
-        
-        # Aplicar limite se fornecido
-        if limit is not None and limit > 0:
-            produtos_lista = produtos_lista[:limit]
+        # Agregar dados por produto_id; os filtros de produto valem para o
+        # produto inteiro, então são aplicados aos grupos e não a cada item
+        agregado = agregacao.agregar_linhas(itens, 'produto_id', 'quantidade', 'subtotal')
+        agregado = agregado.filtrar(lambda indice: _produto_atende(itens[indice].get('produtos'), filtros))
+        
+        # Faturamento total para percentuais (antes do limite)
+        faturamento_total = int(agregado.centavos.sum())
+        
+        # Ordenar por quantidade vendida (descendente) e aplicar limite se fornecido
+        agregado = agregado.ordenar('quantidades', limit)
+        percentuais = agregado.participacao(faturamento_total).tolist()
+        
+        produtos_lista = []
+        for (produto_id, quantidade, centavos, primeiro), percentual in zip(agregacao.registros(agregado), percentuais):
+            produto = itens[primeiro]['produtos']
+            produtos_lista.append({
+                'produto_id': produto_id,
+                'descricao': produto.get('descricao', ''),
+                'marca': produto.get('marca', ''),
+                'referencia': produto.get('referencia', ''),
+                'tamanho': produto.get('tamanho', ''),
+                'quantidade_vendida': quantidade,
+                'faturamento_gerado': agregacao.reais(centavos),
+                'percentual_participacao': percentual
+            })
         
         return produtos_lista
         
@@ -352,64 +433,23 @@ def relatorio_vendas_por_vendedor(
         if 'T' not in data_fim:
             data_fim = f"{data_fim}T23:59:59"
         
-        # Buscar vendas não canceladas no período com informações do vendedor
-        vendas_response = supabase.table('vendas').select(
-            'id, usuario_id, valor_final, status, '
-            'usuarios!vendas_usuario_id_fkey(username)'
-        ).gte('data_hora', data_inicio).lte('data_hora', data_fim).neq('status', 'cancelada').execute()
-        
-        vendas = vendas_response.data if vendas_response.data else []
-        
-        if not vendas:
-            return []
-        
-        # Agregar dados por usuario_id (vendedor)
-        vendedores_agregados = {}
-        
-        for venda in vendas:
-            usuario_id = venda['usuario_id']
-            valor_final = float(venda['valor_final'])
-            
-            # Extrair nome do vendedor
-            nome_vendedor = None
-            if venda.get('usuarios') and isinstance(venda['usuarios'], dict):
-                nome_vendedor = venda['usuarios'].get('username')
-            
-            if usuario_id not in vendedores_agregados:
-                vendedores_agregados[usuario_id] = {
-                    'usuario_id': usuario_id,
-                    'nome_vendedor': nome_vendedor or f'Usuário {usuario_id}',
-                    'numero_vendas': 0,
-                    'faturamento_total': 0.0
-                }
-            
-            vendedores_agregados[usuario_id]['numero_vendas'] += 1
-            vendedores_agregados[usuario_id]['faturamento_total'] += valor_final
-        
-        # Converter para lista
-        vendedores_lista = list(vendedores_agregados.values())
-        
-        # Calcular faturamento total para percentuais
-        faturamento_total_geral = sum(v['faturamento_total'] for v in vendedores_lista)
-        
-        # Calcular ticket médio e percentual de participação
-        for vendedor in vendedores_lista:
-            # Ticket médio = faturamento_total / numero_vendas
-            if vendedor['numero_vendas'] > 0:
-                vendedor['ticket_medio'] = vendedor['faturamento_total'] / vendedor['numero_vendas']
-            else:
-                vendedor['ticket_medio'] = 0.0
-            
-            # Percentual de participação
-            if faturamento_total_geral > 0:
-                vendedor['percentual_participacao'] = (vendedor['faturamento_total'] / faturamento_total_geral) * 100
-            else:
-                vendedor['percentual_participacao'] = 0.0
-        
-        # Ordenar por faturamento_total em ordem decrescente
-        vendedores_lista.sort(key=lambda x: x['faturamento_total'], reverse=True)
-        
-        return vendedores_lista
+        if base_analitica.preparar():
+            return base_analitica.relatorio_vendas_por_vendedor(data_inicio, data_fim)
+        
+        # Agregado no banco (GROUP BY usuario_id), ordenado por faturamento;
+        # os dias completos vêm dos resumos diários
+        dias, _ = _dividir_periodo(data_inicio, data_fim)
+        return [
+            {
+                'usuario_id': vendedor['usuario_id'],
+                'nome_vendedor': vendedor['nome_vendedor'],
+                'numero_vendas': int(vendedor['numero_vendas']),
+                'faturamento_total': float(vendedor['faturamento_total']),
+                'ticket_medio': float(vendedor['ticket_medio']),
+                'percentual_participacao': float(vendedor['percentual_participacao'])
+            }
+            for vendedor in database.resumo_vendas_por_vendedor(data_inicio, data_fim, dias)
+        ]
         
     except Exception as e:
         from logging_config import registrar_erro
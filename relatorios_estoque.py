@@ -7,7 +7,8 @@ Este módulo gera relatórios gerenciais de estoque e movimentações.
 import csv
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
-from database import supabase
+from analitico import base_analitica
+from database import supabase, iterar_tabela, listar_produtos_sem_movimentacao
 from logging_config import registrar_erro, registrar_info
 
 
@@ -27,14 +28,10 @@ def gerar_relatorio_estoque_baixo() -> List[Dict]:
         - diferenca: Diferença entre estoque atual e mínimo
     """
     try:
-        # Buscar todos os produtos
-        response = supabase.table("produtos").select("*").execute()
-        produtos = response.data if response.data else []
-        
-        # Filtrar produtos com estoque baixo
+        # Filtrar produtos com estoque baixo, percorrendo todos os produtos em lotes
         produtos_estoque_baixo = []
         
-        for produto in produtos:
+        for produto in iterar_tabela("produtos", prefetch=True):
             estoque_minimo = produto.get('estoque_minimo', 5)
             quantidade_atual = produto.get('quantidade', 0)
             
@@ -98,17 +95,22 @@ def gerar_relatorio_movimentacoes(data_inicio: str, data_fim: str) -> List[Dict]
         if 'T' not in data_fim:
             data_fim = f"{data_fim}T23:59:59"
         
-        # Buscar movimentações no período com informações do produto
-        response = supabase.table("movimentacoes").select(
-            "id, produto_id, tipo, quantidade, quantidade_anterior, quantidade_nova, "
-            "data_hora, observacao, usuario_id, "
-            "produtos(descricao, marca, referencia, tamanho)"
-        ).gte('data_hora', data_inicio).lte('data_hora', data_fim).order('data_hora', desc=True).execute()
-        
-        movimentacoes = response.data if response.data else []
+        # Base analítica local, se configurada: o relatório é uma consulta local
+        if base_analitica.preparar():
+            relatorio = base_analitica.relatorio_movimentacoes(data_inicio, data_fim)
+            movimentacoes = []
+        else:
+            # Buscar movimentações no período com informações do produto
+            response = supabase.table("movimentacoes").select(
+                "id, produto_id, tipo, quantidade, quantidade_anterior, quantidade_nova, "
+                "data_hora, observacao, usuario_id, "
+                "produtos(descricao, marca, referencia, tamanho)"
+            ).gte('data_hora', data_inicio).lte('data_hora', data_fim).order('data_hora', desc=True).execute()
+            
+            movimentacoes = response.data if response.data else []
+            relatorio = []
         
         # Formatar dados para o relatório
-        relatorio = []
         for mov in movimentacoes:
             produto = mov.get('produtos', {})
             if isinstance(produto, dict):
@@ -176,55 +178,38 @@ def gerar_relatorio_produtos_sem_movimentacao(dias: int) -> List[Dict]:
         data_limite = datetime.now() - timedelta(days=dias)
         data_limite_str = data_limite.strftime('%Y-%m-%dT%H:%M:%S')
         
-        # Buscar todos os produtos
-        produtos_response = supabase.table("produtos").select("*").execute()
-        produtos = produtos_response.data if produtos_response.data else []
-        
-        # Buscar todas as movimentações recentes
-        movimentacoes_response = supabase.table("movimentacoes").select(
-            "produto_id, data_hora"
-        ).gte('data_hora', data_limite_str).execute()
+        # Produtos sem movimentação recente, já com a data da última
+        # movimentação (uma única consulta, independente do tamanho do catálogo)
+        if base_analitica.preparar():
+            produtos = base_analitica.produtos_sem_movimentacao(data_limite_str)
+        else:
+            produtos = listar_produtos_sem_movimentacao(data_limite_str)
         
-        movimentacoes = movimentacoes_response.data if movimentacoes_response.data else []
-        
-        # Criar set de produtos com movimentação recente
-        produtos_com_movimentacao = set(mov['produto_id'] for mov in movimentacoes)
-        
-        # Filtrar produtos sem movimentação recente
         produtos_sem_movimentacao = []
         
         for produto in produtos:
             produto_id = produto['id']
+            ultima_movimentacao = produto.get('ultima_data_hora')
+            dias_sem_movimentacao = None
             
-            # Se produto não tem movimentação recente
-            if produto_id not in produtos_com_movimentacao:
-                # Buscar última movimentação do produto (se houver)
-                ultima_mov_response = supabase.table("movimentacoes").select(
-                    "data_hora"
-                ).eq('produto_id', produto_id).order('data_hora', desc=True).limit(1).execute()
-                
-                ultima_movimentacao = None
-                dias_sem_movimentacao = None
-                
-                if ultima_mov_response.data and len(ultima_mov_response.data) > 0:
-                    ultima_movimentacao = ultima_mov_response.data[0]['data_hora']
-                    # Calcular dias desde última movimentação
-                    try:
-                        data_ultima = datetime.fromisoformat(ultima_movimentacao.replace('Z', '+00:00'))
-                        dias_sem_movimentacao = (datetime.now() - data_ultima.replace(tzinfo=None)).days
-                    except:
-                        dias_sem_movimentacao = None
-                
-                produtos_sem_movimentacao.append({
-                    'id': produto_id,
-                    'descricao': produto['descricao'],
-                    'marca': produto.get('marca', ''),
-                    'referencia': produto.get('referencia', ''),
-                    'tamanho': produto.get('tamanho', ''),
-                    'quantidade': produto.get('quantidade', 0),
-                    'ultima_movimentacao': ultima_movimentacao,
-                    'dias_sem_movimentacao': dias_sem_movimentacao if dias_sem_movimentacao else f"Mais de {dias}"
-                })
+            if ultima_movimentacao:
+                # Calcular dias desde última movimentação
+                try:
+                    data_ultima = datetime.fromisoformat(ultima_movimentacao.replace('Z', '+00:00'))
+                    dias_sem_movimentacao = (datetime.now() - data_ultima.replace(tzinfo=None)).days
+                except:
+                    dias_sem_movimentacao = None
+            
+            produtos_sem_movimentacao.append({
+                'id': produto_id,
+                'descricao': produto['descricao'],
+                'marca': produto.get('marca', ''),
+                'referencia': produto.get('referencia', ''),
+                'tamanho': produto.get('tamanho', ''),
+                'quantidade': produto.get('quantidade', 0),
+                'ultima_movimentacao': ultima_movimentacao,
+                'dias_sem_movimentacao': dias_sem_movimentacao if dias_sem_movimentacao else f"Mais de {dias}"
+            })
         
         registrar_info(
             mensagem=f"Relatório de produtos sem movimentação gerado: {len(produtos_sem_movimentacao)} produtos",
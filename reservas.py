@@ -0,0 +1,114 @@
+"""
+Reservas de Estoque - Sistema DEKIDS
+
+Reservas com validade (TTL) para os carrinhos dos terminais de venda.
+Ao colocar um produto no carrinho o terminal reserva as unidades no banco
+(sql/006_reservas_estoque.sql); o estoque disponível para os outros
+carrinhos é a quantidade em estoque menos as reservas ativas. Assim o
+conflito pela última peça aparece ao adicionar ao carrinho, e não na
+finalização da venda depois do pagamento.
+
+- Uma chamada por alteração do carrinho, que devolve o disponível do produto
+- Cada alteração renova a validade de todas as reservas do carrinho
+- As reservas são liberadas na finalização, remoção do item, limpeza do
+  carrinho ou quando a validade expira (terminal fechado, queda de rede)
+- Sem conexão o carrinho segue com o estoque do catálogo, como antes, e a
+  conferência fica para a finalização da venda
+"""
+
+from typing import Optional, Tuple
+
+from logging_config import registrar_aviso, registrar_erro
+from resiliencia import backend_disponivel, falha_de_disponibilidade
+
+
+# Configurações
+VALIDADE_RESERVA = 900   # segundos sem alteração do carrinho até a reserva expirar
+PRAZO_RESERVA = 2.0      # segundos: o caixa não espera mais que isso por uma reserva
+
+
+def reservar(carrinho_id: str, produto_id: int, quantidade: int) -> Tuple[bool, Optional[int]]:
+    """
+    Define a reserva do carrinho para um produto.
+
+    Args:
+        carrinho_id: Identificador do carrinho (Carrinho.id)
+        produto_id: ID do produto
+        quantidade: Quantidade total do produto no carrinho (0 remove a reserva)
+
+    Returns:
+        Tupla (reservado, disponivel):
+        - reservado: False se não há estoque livre para a quantidade pedida
+        - disponivel: Estoque menos as reservas de outros carrinhos, ou None
+          se o backend está indisponível (reserva não realizada)
+    """
+    import database
+
+    if not backend_disponivel():
+        return True, None
+
+    try:
+        response = database.executar_operacao(
+            "reservar_estoque",
+            lambda: database.supabase.rpc("reservar_estoque", {
+                "p_carrinho": carrinho_id,
+                "p_produto_id": produto_id,
+                "p_quantidade": quantidade,
+                "p_validade_segundos": VALIDADE_RESERVA
+            }).execute(),
+            prazo=PRAZO_RESERVA
+        )
+        return bool(response.data["reservado"]), int(response.data["disponivel"])
+
+    except Exception as e:
+        if falha_de_disponibilidade():
+            # Sem conexão: o carrinho usa o estoque do catálogo
+            return True, None
+        registrar_erro(
+            mensagem="Erro ao reservar estoque",
+            modulo="reservas",
+            funcao="reservar",
+            detalhes={"carrinho": carrinho_id, "produto_id": produto_id, "quantidade": quantidade, "erro": str(e)},
+            exc_info=True
+        )
+        return False, None
+
+
+def liberar(carrinho_id: str, produto_id: Optional[int] = None) -> int:
+    """
+    Libera as reservas do carrinho.
+
+    Falhas apenas são registradas: a reserva expira sozinha após
+    VALIDADE_RESERVA segundos.
+
+    Args:
+        carrinho_id: Identificador do carrinho (Carrinho.id)
+        produto_id: ID do produto (None libera todas as reservas do carrinho)
+
+    Returns:
+        Número de reservas liberadas
+    """
+    import database
+
+    if not backend_disponivel():
+        return 0
+
+    try:
+        response = database.executar_operacao(
+            "liberar_reservas",
+            lambda: database.supabase.rpc("liberar_reservas", {
+                "p_carrinho": carrinho_id,
+                "p_produto_id": produto_id
+            }).execute(),
+            prazo=PRAZO_RESERVA
+        )
+        return int(response.data or 0)
+
+    except Exception as e:
+        registrar_aviso(
+            mensagem="Reserva de estoque não liberada (expira automaticamente)",
+            modulo="reservas",
+            funcao="liberar",
+            detalhes={"carrinho": carrinho_id, "produto_id": produto_id, "erro": str(e)}
+        )
+        return 0
@@ -0,0 +1,392 @@
+"""
+Módulo de Resiliência - Sistema DEKIDS
+
+Camada única de execução para as chamadas ao banco de dados. Todas as
+operações de database.py passam por executar(), que oferece:
+- Classificação de erros por tipo de exceção e código (não por texto da mensagem)
+- Retentativas com backoff exponencial e jitter
+- Prazo (deadline) por operação, limitando a latência de cauda
+- Disjuntor (circuit breaker) que falha rápido enquanto o backend está instável
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeout
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+import httpx
+from postgrest.exceptions import APIError
+
+from logging_config import registrar_aviso, registrar_info
+
+
+T = TypeVar("T")
+
+# Classes de erro
+ERRO_CONEXAO = "conexao"          # requisição não chegou ao servidor (sempre seguro repetir)
+ERRO_TRANSITORIO = "transitorio"  # falha temporária, mas a requisição pode ter sido processada
+ERRO_PERMANENTE = "permanente"    # erro de dados/constraint/permissão: repetir não adianta
+
+# Configurações padrão
+PRAZO_PADRAO = 8.0           # segundos por operação (todas as tentativas somadas)
+MAX_TENTATIVAS = 3
+ATRASO_BASE = 0.2            # segundos
+ATRASO_MAXIMO = 2.0          # segundos
+LIMIAR_FALHAS_DISJUNTOR = 5  # falhas consecutivas até abrir o disjuntor
+TEMPO_ABERTURA_DISJUNTOR = 15.0  # segundos em falha rápida antes de testar novamente
+MAX_WORKERS = 8
+
+# Status HTTP que indicam indisponibilidade temporária
+_STATUS_TRANSITORIOS = {408, 425, 429, 500, 502, 503, 504}
+
+# Códigos do PostgREST/Postgres que indicam indisponibilidade temporária
+_CODIGOS_TRANSITORIOS = {
+    "PGRST000",  # não foi possível conectar ao banco
+    "PGRST001",  # erro interno de conexão
+    "PGRST002",  # cache de schema indisponível
+    "PGRST003",  # tempo esgotado aguardando conexão do pool
+    "40001",     # falha de serialização
+    "40P01",     # deadlock detectado
+    "55P03",     # lock não disponível
+    "57014",     # statement timeout
+    "57P01",     # banco em desligamento
+    "57P03",     # banco ainda não aceita conexões
+}
+
+
+class ErroBackend(Exception):
+    """Erro base da camada de execução."""
+
+
+class BackendIndisponivel(ErroBackend):
+    """Disjuntor aberto: o backend está instável e a chamada nem foi enviada."""
+
+
+class PrazoExcedido(ErroBackend):
+    """A operação não terminou dentro do prazo configurado."""
+
+
+@dataclass
+class PoliticaExecucao:
+    """
+    Parâmetros de execução de uma operação.
+
+    Attributes:
+        tentativas: Número máximo de tentativas
+        atraso_base: Atraso inicial do backoff (segundos)
+        atraso_maximo: Teto do atraso entre tentativas (segundos)
+        prazo: Tempo máximo total da operação (segundos)
+    """
+    tentativas: int = MAX_TENTATIVAS
+    atraso_base: float = ATRASO_BASE
+    atraso_maximo: float = ATRASO_MAXIMO
+    prazo: float = PRAZO_PADRAO
+
+
+def classificar_erro(erro: BaseException) -> str:
+    """
+    Classifica um erro em conexão, transitório ou permanente.
+
+    Args:
+        erro: Exceção capturada
+
+    Returns:
+        ERRO_CONEXAO, ERRO_TRANSITORIO ou ERRO_PERMANENTE
+    """
+    if isinstance(erro, BackendIndisponivel):
+        return ERRO_CONEXAO
+
+    if isinstance(erro, PrazoExcedido):
+        return ERRO_TRANSITORIO
+
+    # Falhas antes do envio: a requisição não chegou ao servidor
+    if isinstance(erro, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, ConnectionRefusedError)):
+        return ERRO_CONEXAO
+
+    # Falhas de transporte após o envio (timeout de leitura, conexão caída, etc)
+    if isinstance(erro, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return ERRO_TRANSITORIO
+
+    if isinstance(erro, APIError):
+        codigo = erro.code
+        if isinstance(codigo, int):
+            return ERRO_TRANSITORIO if codigo in _STATUS_TRANSITORIOS else ERRO_PERMANENTE
+        codigo = str(codigo or "")
+        if codigo.isdigit() and len(codigo) == 3:
+            return ERRO_TRANSITORIO if int(codigo) in _STATUS_TRANSITORIOS else ERRO_PERMANENTE
+        if codigo in _CODIGOS_TRANSITORIOS or codigo.startswith("08") or codigo.startswith("53"):
+            return ERRO_TRANSITORIO
+        return ERRO_PERMANENTE
+
+    if isinstance(erro, httpx.HTTPStatusError):
+        status = erro.response.status_code
+        return ERRO_TRANSITORIO if status in _STATUS_TRANSITORIOS else ERRO_PERMANENTE
+
+    if isinstance(erro, OSError):
+        return ERRO_TRANSITORIO
+
+    return ERRO_PERMANENTE
+
+
+def erro_de_conexao(erro: BaseException) -> bool:
+    """Retorna True se o erro indica falha de conexão ou indisponibilidade temporária."""
+    return classificar_erro(erro) != ERRO_PERMANENTE
+
+
+class Disjuntor:
+    """
+    Disjuntor (circuit breaker) compartilhado por todas as operações do backend.
+
+    Estados:
+        - fechado: chamadas passam normalmente
+        - aberto: chamadas falham imediatamente com BackendIndisponivel
+        - meio_aberto: após o tempo de abertura, uma chamada de teste é liberada
+    """
+
+    FECHADO = "fechado"
+    ABERTO = "aberto"
+    MEIO_ABERTO = "meio_aberto"
+
+    def __init__(self, limiar_falhas: int = LIMIAR_FALHAS_DISJUNTOR, tempo_abertura: float = TEMPO_ABERTURA_DISJUNTOR):
+        self.limiar_falhas = limiar_falhas
+        self.tempo_abertura = tempo_abertura
+        self._estado = self.FECHADO
+        self._falhas_consecutivas = 0
+        self._aberto_em = 0.0
+        self._teste_em_andamento = False
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self) -> str:
+        """Estado atual do disjuntor (considerando o tempo de abertura)."""
+        with self._lock:
+            if self._estado == self.ABERTO and time.monotonic() - self._aberto_em >= self.tempo_abertura:
+                return self.MEIO_ABERTO
+            return self._estado
+
+    def permitir(self) -> bool:
+        """
+        Verifica se uma chamada pode ser enviada ao backend.
+
+        Returns:
+            True se a chamada pode prosseguir, False se deve falhar rápido
+        """
+        with self._lock:
+            if self._estado == self.FECHADO:
+                return True
+
+            if self._estado == self.ABERTO:
+                if time.monotonic() - self._aberto_em < self.tempo_abertura:
+                    return False
+                self._estado = self.MEIO_ABERTO
+                self._teste_em_andamento = False
+
+            # Meio aberto: liberar apenas uma chamada de teste por vez
+            if self._teste_em_andamento:
+                return False
+            self._teste_em_andamento = True
+            return True
+
+    def registrar_sucesso(self) -> None:
+        """Registra uma chamada bem-sucedida (fecha o disjuntor)."""
+        with self._lock:
+            estado_anterior = self._estado
+            self._estado = self.FECHADO
+            self._falhas_consecutivas = 0
+            self._teste_em_andamento = False
+
+        if estado_anterior != self.FECHADO:
+            registrar_info(
+                mensagem="Disjuntor fechado: backend respondeu novamente",
+                modulo="resiliencia",
+                funcao="registrar_sucesso"
+            )
+
+    def registrar_falha(self) -> None:
+        """Registra uma falha de disponibilidade (pode abrir o disjuntor)."""
+        with self._lock:
+            self._falhas_consecutivas += 1
+            abrir = (
+                self._estado == self.MEIO_ABERTO
+                or self._falhas_consecutivas >= self.limiar_falhas
+            )
+            if abrir and self._estado != self.ABERTO:
+                self._estado = self.ABERTO
+                self._aberto_em = time.monotonic()
+                self._teste_em_andamento = False
+            else:
+                abrir = False
+            falhas = self._falhas_consecutivas
+
+        if abrir:
+            registrar_aviso(
+                mensagem="Disjuntor aberto: chamadas ao backend falharão rápido",
+                modulo="resiliencia",
+                funcao="registrar_falha",
+                detalhes={"falhas_consecutivas": falhas, "tempo_abertura": self.tempo_abertura}
+            )
+
+    def liberar_teste(self) -> None:
+        """Libera a vaga de teste do estado meio aberto sem registrar resultado."""
+        with self._lock:
+            self._teste_em_andamento = False
+
+    def resumo(self) -> Dict[str, Any]:
+        """Retorna um resumo do estado do disjuntor para monitoramento."""
+        estado = self.estado
+        with self._lock:
+            return {
+                "estado": estado,
+                "falhas_consecutivas": self._falhas_consecutivas,
+            }
+
+
+# Instâncias compartilhadas
+disjuntor = Disjuntor()
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="dekids-db")
+_contexto = threading.local()
+
+POLITICA_LEITURA = PoliticaExecucao()
+POLITICA_ESCRITA = PoliticaExecucao(tentativas=2)
+
+
+def _calcular_atraso(tentativa: int, politica: PoliticaExecucao) -> float:
+    """Backoff exponencial com jitter completo (0 até base * 2^tentativa, limitado ao teto)."""
+    teto = min(politica.atraso_maximo, politica.atraso_base * (2 ** tentativa))
+    return random.uniform(0, teto)
+
+
+def _executar_com_prazo(funcao: Callable[[], T], limite: float) -> T:
+    """Executa a função em uma thread do pool, aguardando no máximo `limite` segundos."""
+    # Chamadas aninhadas (já dentro do pool) rodam diretamente para evitar deadlock
+    if getattr(_contexto, "no_pool", False):
+        return funcao()
+
+    def _rodar():
+        _contexto.no_pool = True
+        return funcao()
+
+    futuro = _executor.submit(_rodar)
+    try:
+        return futuro.result(timeout=limite)
+    except FuturoTimeout:
+        futuro.cancel()
+        raise PrazoExcedido(f"Operação excedeu o prazo de {limite:.2f}s")
+
+
+def executar(
+    operacao: str,
+    funcao: Callable[[], T],
+    idempotente: bool = True,
+    politica: Optional[PoliticaExecucao] = None,
+    prazo: Optional[float] = None,
+    ao_falhar_conexao: Optional[Callable[[], Any]] = None
+) -> T:
+    """
+    Executa uma chamada ao backend com disjuntor, prazo e retentativas.
+
+    Operações não idempotentes (ex: inserts) só são repetidas quando o erro
+    garante que a requisição não chegou ao servidor (ERRO_CONEXAO).
+
+    Args:
+        operacao: Nome da operação (usado nos logs)
+        funcao: Função sem argumentos que executa a chamada
+        idempotente: Se True, pode repetir após qualquer erro transitório
+        politica: Política de execução (padrão: leitura para idempotentes, escrita caso contrário)
+        prazo: Sobrescreve o prazo total da política (segundos)
+        ao_falhar_conexao: Callback chamado após erros de conexão (ex: recriar cliente)
+
+    Returns:
+        O retorno de `funcao`
+
+    Raises:
+        BackendIndisponivel: se o disjuntor estiver aberto
+        PrazoExcedido: se o prazo total for excedido
+        Exception: o último erro da chamada, se não for recuperável
+    """
+    if politica is None:
+        politica = POLITICA_LEITURA if idempotente else POLITICA_ESCRITA
+
+    prazo_total = prazo if prazo is not None else politica.prazo
+    limite = time.monotonic() + prazo_total
+    tentativa = 0
+    _contexto.ultima_falha = None
+
+    while True:
+        if not disjuntor.permitir():
+            _contexto.ultima_falha = ERRO_CONEXAO
+            raise BackendIndisponivel(f"Backend indisponível (disjuntor aberto) em '{operacao}'")
+
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            disjuntor.liberar_teste()
+            _contexto.ultima_falha = ERRO_TRANSITORIO
+            raise PrazoExcedido(f"Prazo de {prazo_total:.2f}s excedido em '{operacao}'")
+
+        try:
+            resultado = _executar_com_prazo(funcao, restante)
+            disjuntor.registrar_sucesso()
+            _contexto.ultima_falha = None
+            return resultado
+
+        except Exception as e:
+            classe = classificar_erro(e)
+            _contexto.ultima_falha = classe
+
+            if classe == ERRO_PERMANENTE:
+                # O backend respondeu: está disponível, o erro é da operação
+                disjuntor.registrar_sucesso()
+                raise
+
+            disjuntor.registrar_falha()
+
+            if classe == ERRO_CONEXAO and ao_falhar_conexao is not None:
+                try:
+                    ao_falhar_conexao()
+                except Exception:
+                    pass
+
+            tentativa += 1
+            pode_repetir = idempotente or classe == ERRO_CONEXAO
+            if not pode_repetir or tentativa >= politica.tentativas:
+                raise
+
+            atraso = _calcular_atraso(tentativa, politica)
+            if time.monotonic() + atraso >= limite:
+                raise
+
+            registrar_aviso(
+                mensagem=f"Falha {classe} em '{operacao}', nova tentativa em {atraso:.2f}s",
+                modulo="resiliencia",
+                funcao="executar",
+                detalhes={"operacao": operacao, "tentativa": tentativa, "erro": str(e)}
+            )
+            time.sleep(atraso)
+
+
+def backend_disponivel() -> bool:
+    """Retorna False enquanto o disjuntor estiver aberto."""
+    return disjuntor.estado != Disjuntor.ABERTO
+
+
+def ultima_falha() -> Optional[str]:
+    """Classe de erro da última operação executada nesta thread (None se teve sucesso)."""
+    return getattr(_contexto, "ultima_falha", None)
+
+
+def falha_de_disponibilidade() -> bool:
+    """
+    Indica se a última operação executada nesta thread falhou por
+    indisponibilidade do backend (conexão, timeout, prazo ou disjuntor aberto).
+
+    Permite que funções que retornam False/None em caso de erro distingam
+    "backend fora do ar" de erros de dados.
+    """
+    return ultima_falha() in (ERRO_CONEXAO, ERRO_TRANSITORIO)
+
+
+def obter_estado() -> Dict[str, Any]:
+    """Retorna o estado da camada de execução para monitoramento."""
+    return {"disjuntor": disjuntor.resumo()}
@@ -0,0 +1,56 @@
+-- Movimentação de estoque atômica (uma chamada, uma transação).
+-- Usada por database.registrar_movimentacao() via supabase.rpc("aplicar_movimentacao").
+-- Equivalente local: procedimento "aplicar_movimentacao" em backend_sqlite.py.
+
+CREATE OR REPLACE FUNCTION public.aplicar_movimentacao(
+    p_produto_id bigint,
+    p_tipo text,
+    p_quantidade integer,
+    p_observacao text DEFAULT NULL,
+    p_usuario_id bigint DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_anterior integer;
+    v_nova integer;
+    v_movimentacao_id bigint;
+BEGIN
+    IF p_tipo NOT IN ('entrada', 'saida', 'ajuste') THEN
+        RAISE EXCEPTION 'Tipo de movimentação inválido: %', p_tipo USING ERRCODE = '22023';
+    END IF;
+
+    IF p_quantidade IS NULL OR p_quantidade <= 0 THEN
+        RAISE EXCEPTION 'Quantidade inválida: %', p_quantidade USING ERRCODE = '22023';
+    END IF;
+
+    -- Bloqueia a linha do produto até o fim da transação
+    SELECT quantidade INTO v_anterior
+    FROM produtos
+    WHERE id = p_produto_id
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Produto não encontrado: %', p_produto_id USING ERRCODE = 'P0002';
+    END IF;
+
+    v_nova := CASE p_tipo
+        WHEN 'entrada' THEN v_anterior + p_quantidade
+        WHEN 'saida' THEN v_anterior - p_quantidade
+        ELSE p_quantidade  -- ajuste: valor absoluto desejado
+    END;
+
+    UPDATE produtos SET quantidade = v_nova WHERE id = p_produto_id;
+
+    INSERT INTO movimentacoes (produto_id, tipo, quantidade, quantidade_anterior, quantidade_nova, observacao, usuario_id)
+    VALUES (p_produto_id, p_tipo, p_quantidade, v_anterior, v_nova, p_observacao, p_usuario_id)
+    RETURNING id INTO v_movimentacao_id;
+
+    RETURN jsonb_build_object(
+        'movimentacao_id', v_movimentacao_id,
+        'quantidade_anterior', v_anterior,
+        'quantidade_nova', v_nova
+    );
+END;
+$$;
@@ -0,0 +1,77 @@
+-- Várias movimentações de estoque em uma única chamada: todas ou nenhuma.
+-- Usada por database.registrar_movimentacoes_lote() via supabase.rpc("aplicar_movimentacoes_lote").
+-- Equivalente local: procedimento "aplicar_movimentacoes_lote" em backend_sqlite.py.
+--
+-- p_movimentacoes: [{"produto_id", "tipo", "quantidade", "observacao", "usuario_id"}, ...]
+-- Retorna um resultado por item, na mesma ordem. Em caso de erro nada é gravado
+-- e o índice (base 0) do item rejeitado vai no DETAIL da exceção.
+
+CREATE OR REPLACE FUNCTION public.aplicar_movimentacoes_lote(p_movimentacoes jsonb)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_item jsonb;
+    v_indice integer := 0;
+    v_produto_id bigint;
+    v_tipo text;
+    v_quantidade integer;
+    v_anterior integer;
+    v_nova integer;
+    v_movimentacao_id bigint;
+    v_resultados jsonb := '[]'::jsonb;
+BEGIN
+    -- Bloqueia todos os produtos do lote em ordem de id (evita deadlock entre terminais)
+    PERFORM 1
+    FROM produtos
+    WHERE id IN (SELECT (elem->>'produto_id')::bigint FROM jsonb_array_elements(p_movimentacoes) AS elem)
+    ORDER BY id
+    FOR UPDATE;
+
+    FOR v_item IN SELECT value FROM jsonb_array_elements(p_movimentacoes) LOOP
+        v_produto_id := (v_item->>'produto_id')::bigint;
+        v_tipo := v_item->>'tipo';
+        v_quantidade := (v_item->>'quantidade')::integer;
+
+        IF v_tipo IS NULL OR v_tipo NOT IN ('entrada', 'saida', 'ajuste') THEN
+            RAISE EXCEPTION 'Tipo de movimentação inválido: %', v_tipo
+                USING ERRCODE = '22023', DETAIL = v_indice::text;
+        END IF;
+
+        IF v_quantidade IS NULL OR v_quantidade <= 0 THEN
+            RAISE EXCEPTION 'Quantidade inválida: %', v_quantidade
+                USING ERRCODE = '22023', DETAIL = v_indice::text;
+        END IF;
+
+        SELECT quantidade INTO v_anterior FROM produtos WHERE id = v_produto_id;
+
+        IF NOT FOUND THEN
+            RAISE EXCEPTION 'Produto não encontrado: %', v_produto_id
+                USING ERRCODE = 'P0002', DETAIL = v_indice::text;
+        END IF;
+
+        v_nova := CASE v_tipo
+            WHEN 'entrada' THEN v_anterior + v_quantidade
+            WHEN 'saida' THEN v_anterior - v_quantidade
+            ELSE v_quantidade  -- ajuste: valor absoluto desejado
+        END;
+
+        UPDATE produtos SET quantidade = v_nova WHERE id = v_produto_id;
+
+        INSERT INTO movimentacoes (produto_id, tipo, quantidade, quantidade_anterior, quantidade_nova, observacao, usuario_id)
+        VALUES (v_produto_id, v_tipo, v_quantidade, v_anterior, v_nova,
+                v_item->>'observacao', (v_item->>'usuario_id')::bigint)
+        RETURNING id INTO v_movimentacao_id;
+
+        v_resultados := v_resultados || jsonb_build_object(
+            'produto_id', v_produto_id,
+            'movimentacao_id', v_movimentacao_id,
+            'quantidade_anterior', v_anterior,
+            'quantidade_nova', v_nova
+        );
+        v_indice := v_indice + 1;
+    END LOOP;
+
+    RETURN v_resultados;
+END;
+$$;
@@ -0,0 +1,108 @@
+-- Checkout em uma única chamada e uma única transação.
+-- Usada por database.registrar_venda_completa() via supabase.rpc("registrar_venda_completa").
+-- Equivalente local: procedimento "registrar_venda_completa" em backend_sqlite.py.
+-- Depende de 002_aplicar_movimentacoes_lote.sql.
+-- Substituída por 007_vendas_idempotencia.sql, que também desconta as reservas
+-- de estoque dos outros carrinhos (006_reservas_estoque.sql) e apaga as do
+-- carrinho vendido; esta versão não conhece as reservas (criadas depois).
+--
+-- p_venda:      {"valor_total", "desconto_percentual", "desconto_valor", "valor_final",
+--                "cliente_id", "usuario_id", "status"}
+-- p_itens:      [{"produto_id", "quantidade", "preco_unitario", "subtotal"}, ...]
+-- p_pagamentos: [{"forma_pagamento", "valor", "numero_parcelas", "valor_recebido", "troco"}, ...]
+-- p_validar_estoque: false apenas para vendas já concluídas offline (o estoque pode ficar negativo)
+--
+-- Estoque insuficiente gera o erro DK001 com a lista de faltas (jsonb) no DETAIL:
+--   [{"produto_id", "descricao", "disponivel", "solicitado"}, ...]
+
+CREATE OR REPLACE FUNCTION public.registrar_venda_completa(
+    p_venda jsonb,
+    p_itens jsonb,
+    p_pagamentos jsonb,
+    p_validar_estoque boolean DEFAULT true
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_faltas jsonb;
+    v_venda_id bigint;
+    v_usuario_id bigint := (p_venda->>'usuario_id')::bigint;
+BEGIN
+    IF jsonb_array_length(p_itens) = 0 THEN
+        RAISE EXCEPTION 'Venda sem itens' USING ERRCODE = '22023';
+    END IF;
+
+    -- Bloqueia os produtos da venda em ordem de id (evita deadlock entre terminais)
+    PERFORM 1
+    FROM produtos
+    WHERE id IN (SELECT (elem->>'produto_id')::bigint FROM jsonb_array_elements(p_itens) AS elem)
+    ORDER BY id
+    FOR UPDATE;
+
+    IF p_validar_estoque THEN
+        SELECT jsonb_agg(jsonb_build_object(
+                   'produto_id', s.produto_id,
+                   'descricao', p.descricao,
+                   'disponivel', p.quantidade,
+                   'solicitado', s.solicitado
+               ))
+        INTO v_faltas
+        FROM (
+            SELECT (elem->>'produto_id')::bigint AS produto_id,
+                   sum((elem->>'quantidade')::integer) AS solicitado
+            FROM jsonb_array_elements(p_itens) AS elem
+            GROUP BY 1
+        ) s
+        LEFT JOIN produtos p ON p.id = s.produto_id
+        WHERE p.id IS NULL OR s.solicitado > p.quantidade OR p.quantidade <= 0;
+
+        IF v_faltas IS NOT NULL THEN
+            RAISE EXCEPTION 'Estoque insuficiente' USING ERRCODE = 'DK001', DETAIL = v_faltas::text;
+        END IF;
+    END IF;
+
+    INSERT INTO vendas (valor_total, desconto_percentual, desconto_valor, valor_final, cliente_id, usuario_id, status)
+    VALUES (
+        (p_venda->>'valor_total')::numeric,
+        COALESCE((p_venda->>'desconto_percentual')::numeric, 0),
+        COALESCE((p_venda->>'desconto_valor')::numeric, 0),
+        (p_venda->>'valor_final')::numeric,
+        (p_venda->>'cliente_id')::bigint,
+        v_usuario_id,
+        COALESCE(p_venda->>'status', 'finalizada')
+    )
+    RETURNING id INTO v_venda_id;
+
+    INSERT INTO itens_venda (venda_id, produto_id, quantidade, preco_unitario, subtotal)
+    SELECT v_venda_id,
+           (elem->>'produto_id')::bigint,
+           (elem->>'quantidade')::integer,
+           (elem->>'preco_unitario')::numeric,
+           (elem->>'subtotal')::numeric
+    FROM jsonb_array_elements(p_itens) AS elem;
+
+    INSERT INTO pagamentos (venda_id, forma_pagamento, valor, numero_parcelas, valor_recebido, troco)
+    SELECT v_venda_id,
+           elem->>'forma_pagamento',
+           (elem->>'valor')::numeric,
+           (elem->>'numero_parcelas')::integer,
+           (elem->>'valor_recebido')::numeric,
+           (elem->>'troco')::numeric
+    FROM jsonb_array_elements(p_pagamentos) AS elem;
+
+    -- Baixa de estoque (mesma regra das demais movimentações)
+    PERFORM public.aplicar_movimentacoes_lote((
+        SELECT jsonb_agg(jsonb_build_object(
+                   'produto_id', elem->>'produto_id',
+                   'tipo', 'saida',
+                   'quantidade', elem->>'quantidade',
+                   'observacao', 'Venda #' || v_venda_id,
+                   'usuario_id', v_usuario_id
+               ))
+        FROM jsonb_array_elements(p_itens) AS elem
+    ));
+
+    RETURN jsonb_build_object('venda_id', v_venda_id);
+END;
+$$;
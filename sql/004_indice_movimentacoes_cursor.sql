@@ -0,0 +1,8 @@
+-- Índice para a paginação por cursor (created_at, id) do histórico de movimentações.
+-- Usado por database.listar_movimentacoes_pagina().
+
+CREATE INDEX IF NOT EXISTS idx_movimentacoes_produto_cursor
+    ON movimentacoes (produto_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_movimentacoes_cursor
+    ON movimentacoes (created_at DESC, id DESC);
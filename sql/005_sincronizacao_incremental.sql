@@ -0,0 +1,63 @@
+-- Sincronização incremental do catálogo: coluna updated_at mantida nas escritas
+-- e registro de exclusões (tombstones) para produtos e clientes.
+-- Usada por database.buscar_alteracoes() e pelo cache_catalogo.
+-- Equivalente local: esquema e gatilhos em backend_sqlite.py.
+
+ALTER TABLE public.produtos ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now();
+ALTER TABLE public.clientes ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now();
+
+CREATE INDEX IF NOT EXISTS idx_produtos_updated_at ON produtos (updated_at);
+CREATE INDEX IF NOT EXISTS idx_clientes_updated_at ON clientes (updated_at);
+
+-- Exclusões: uma linha por registro apagado, lida pelos terminais para
+-- remover o registro da cópia local
+CREATE TABLE IF NOT EXISTS public.exclusoes (
+    id bigserial PRIMARY KEY,
+    tabela text NOT NULL,
+    registro_id bigint NOT NULL,
+    excluido_em timestamptz NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE INDEX IF NOT EXISTS idx_exclusoes_tabela_data ON exclusoes (tabela, excluido_em);
+
+CREATE OR REPLACE FUNCTION public.definir_updated_at()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- clock_timestamp() e não now(): em transações longas, now() ficaria
+    -- muito atrás do instante da confirmação
+    NEW.updated_at := clock_timestamp();
+    RETURN NEW;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.registrar_exclusao()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO exclusoes (tabela, registro_id) VALUES (TG_TABLE_NAME, OLD.id);
+    RETURN OLD;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_produtos_updated_at ON produtos;
+CREATE TRIGGER trg_produtos_updated_at
+    BEFORE INSERT OR UPDATE ON produtos
+    FOR EACH ROW EXECUTE FUNCTION public.definir_updated_at();
+
+DROP TRIGGER IF EXISTS trg_clientes_updated_at ON clientes;
+CREATE TRIGGER trg_clientes_updated_at
+    BEFORE INSERT OR UPDATE ON clientes
+    FOR EACH ROW EXECUTE FUNCTION public.definir_updated_at();
+
+DROP TRIGGER IF EXISTS trg_produtos_exclusao ON produtos;
+CREATE TRIGGER trg_produtos_exclusao
+    AFTER DELETE ON produtos
+    FOR EACH ROW EXECUTE FUNCTION public.registrar_exclusao();
+
+DROP TRIGGER IF EXISTS trg_clientes_exclusao ON clientes;
+CREATE TRIGGER trg_clientes_exclusao
+    AFTER DELETE ON clientes
+    FOR EACH ROW EXECUTE FUNCTION public.registrar_exclusao();
@@ -0,0 +1,102 @@
+-- Reservas de estoque com validade: cada carrinho segura as unidades que
+-- colocou no carrinho, para que dois terminais não vendam a mesma peça.
+-- Usada por reservas.reservar() e reservas.liberar() via supabase.rpc(...).
+-- Equivalente local: tabela e procedimentos em backend_sqlite.py.
+
+CREATE TABLE IF NOT EXISTS public.reservas_estoque (
+    carrinho text NOT NULL,
+    produto_id bigint NOT NULL REFERENCES produtos(id) ON DELETE CASCADE,
+    quantidade integer NOT NULL CHECK (quantidade > 0),
+    expira_em timestamptz NOT NULL,
+    PRIMARY KEY (carrinho, produto_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_reservas_estoque_produto ON reservas_estoque (produto_id, expira_em);
+
+-- Define a reserva do carrinho para o produto (quantidade total no carrinho;
+-- 0 remove a reserva) e renova a validade de todas as reservas do carrinho.
+-- Disponível = quantidade em estoque - reservas ativas de outros carrinhos.
+CREATE OR REPLACE FUNCTION public.reservar_estoque(
+    p_carrinho text,
+    p_produto_id bigint,
+    p_quantidade integer,
+    p_validade_segundos integer DEFAULT 900
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_estoque integer;
+    v_reservado_outros integer;
+    v_atual integer;
+    v_disponivel integer;
+BEGIN
+    IF p_quantidade IS NULL OR p_quantidade < 0 THEN
+        RAISE EXCEPTION 'Quantidade inválida: %', p_quantidade USING ERRCODE = '22023';
+    END IF;
+
+    -- Bloqueia a linha do produto: reservas do mesmo produto ficam em fila
+    SELECT quantidade INTO v_estoque
+    FROM produtos
+    WHERE id = p_produto_id
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Produto não encontrado: %', p_produto_id USING ERRCODE = 'P0002';
+    END IF;
+
+    DELETE FROM reservas_estoque
+    WHERE produto_id = p_produto_id AND expira_em <= now();
+
+    SELECT COALESCE(SUM(quantidade), 0) INTO v_reservado_outros
+    FROM reservas_estoque
+    WHERE produto_id = p_produto_id AND carrinho <> p_carrinho;
+
+    SELECT quantidade INTO v_atual
+    FROM reservas_estoque
+    WHERE produto_id = p_produto_id AND carrinho = p_carrinho;
+
+    v_disponivel := GREATEST(v_estoque - v_reservado_outros, 0);
+
+    -- Reduzir a própria reserva é sempre permitido
+    IF p_quantidade > v_disponivel AND p_quantidade > COALESCE(v_atual, 0) THEN
+        RETURN jsonb_build_object('reservado', false, 'disponivel', v_disponivel);
+    END IF;
+
+    IF p_quantidade = 0 THEN
+        DELETE FROM reservas_estoque
+        WHERE carrinho = p_carrinho AND produto_id = p_produto_id;
+    ELSE
+        INSERT INTO reservas_estoque (carrinho, produto_id, quantidade, expira_em)
+        VALUES (p_carrinho, p_produto_id, p_quantidade, now() + make_interval(secs => p_validade_segundos))
+        ON CONFLICT (carrinho, produto_id) DO UPDATE
+        SET quantidade = EXCLUDED.quantidade, expira_em = EXCLUDED.expira_em;
+    END IF;
+
+    UPDATE reservas_estoque
+    SET expira_em = now() + make_interval(secs => p_validade_segundos)
+    WHERE carrinho = p_carrinho;
+
+    RETURN jsonb_build_object('reservado', true, 'disponivel', v_disponivel);
+END;
+$$;
+
+-- Libera as reservas do carrinho (de um produto ou todas)
+CREATE OR REPLACE FUNCTION public.liberar_reservas(
+    p_carrinho text,
+    p_produto_id bigint DEFAULT NULL
+)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_liberadas integer;
+BEGIN
+    DELETE FROM reservas_estoque
+    WHERE carrinho = p_carrinho
+      AND (p_produto_id IS NULL OR produto_id = p_produto_id);
+
+    GET DIAGNOSTICS v_liberadas = ROW_COUNT;
+    RETURN v_liberadas;
+END;
+$$;
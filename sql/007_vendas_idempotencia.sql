@@ -0,0 +1,142 @@
+-- Chave de idempotência nas vendas: cada venda leva uma chave gerada pelo
+-- terminal (UUID), única na tabela vendas. Repetir a chamada com a mesma chave
+-- (retentativa após timeout, reenvio do diário offline) devolve a venda já
+-- registrada em vez de gravar outra.
+-- Usada por database.registrar_venda_completa() e database.inserir_venda().
+-- Equivalente local: coluna, índice e procedimento em backend_sqlite.py.
+-- Substitui a função de 003_registrar_venda_completa.sql (mesma assinatura).
+--
+-- p_venda ganha o campo opcional "chave_idempotencia"; o retorno ganha
+-- "repetida": true quando a venda já existia.
+--
+-- p_venda também leva o campo opcional "carrinho" (reservas de
+-- 006_reservas_estoque.sql): o estoque conferido desconta as reservas ativas
+-- dos outros carrinhos, e as reservas do próprio carrinho são apagadas na
+-- mesma transação da venda.
+
+ALTER TABLE public.vendas ADD COLUMN IF NOT EXISTS chave_idempotencia text;
+
+CREATE UNIQUE INDEX IF NOT EXISTS vendas_chave_idempotencia_key ON vendas (chave_idempotencia);
+
+CREATE OR REPLACE FUNCTION public.registrar_venda_completa(
+    p_venda jsonb,
+    p_itens jsonb,
+    p_pagamentos jsonb,
+    p_validar_estoque boolean DEFAULT true
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_faltas jsonb;
+    v_venda_id bigint;
+    v_usuario_id bigint := (p_venda->>'usuario_id')::bigint;
+    v_chave text := p_venda->>'chave_idempotencia';
+    v_carrinho text := p_venda->>'carrinho';
+BEGIN
+    -- Venda já registrada com esta chave: devolver a existente
+    IF v_chave IS NOT NULL THEN
+        SELECT id INTO v_venda_id FROM vendas WHERE chave_idempotencia = v_chave;
+        IF FOUND THEN
+            RETURN jsonb_build_object('venda_id', v_venda_id, 'repetida', true);
+        END IF;
+    END IF;
+
+    IF jsonb_array_length(p_itens) = 0 THEN
+        RAISE EXCEPTION 'Venda sem itens' USING ERRCODE = '22023';
+    END IF;
+
+    -- Bloqueia os produtos da venda em ordem de id (evita deadlock entre terminais)
+    PERFORM 1
+    FROM produtos
+    WHERE id IN (SELECT (elem->>'produto_id')::bigint FROM jsonb_array_elements(p_itens) AS elem)
+    ORDER BY id
+    FOR UPDATE;
+
+    IF p_validar_estoque THEN
+        -- Disponível = estoque - reservas ativas de outros carrinhos
+        SELECT jsonb_agg(jsonb_build_object(
+                   'produto_id', s.produto_id,
+                   'descricao', p.descricao,
+                   'disponivel', GREATEST(p.quantidade - r.reservado, 0),
+                   'solicitado', s.solicitado
+               ))
+        INTO v_faltas
+        FROM (
+            SELECT (elem->>'produto_id')::bigint AS produto_id,
+                   sum((elem->>'quantidade')::integer) AS solicitado
+            FROM jsonb_array_elements(p_itens) AS elem
+            GROUP BY 1
+        ) s
+        LEFT JOIN produtos p ON p.id = s.produto_id
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(sum(quantidade), 0) AS reservado
+            FROM reservas_estoque
+            WHERE produto_id = s.produto_id
+              AND expira_em > now()
+              AND carrinho IS DISTINCT FROM v_carrinho
+        ) r
+        WHERE p.id IS NULL OR s.solicitado > p.quantidade - r.reservado OR p.quantidade <= 0;
+
+        IF v_faltas IS NOT NULL THEN
+            RAISE EXCEPTION 'Estoque insuficiente' USING ERRCODE = 'DK001', DETAIL = v_faltas::text;
+        END IF;
+    END IF;
+
+    INSERT INTO vendas (valor_total, desconto_percentual, desconto_valor, valor_final, cliente_id, usuario_id, status, chave_idempotencia)
+    VALUES (
+        (p_venda->>'valor_total')::numeric,
+        COALESCE((p_venda->>'desconto_percentual')::numeric, 0),
+        COALESCE((p_venda->>'desconto_valor')::numeric, 0),
+        (p_venda->>'valor_final')::numeric,
+        (p_venda->>'cliente_id')::bigint,
+        v_usuario_id,
+        COALESCE(p_venda->>'status', 'finalizada'),
+        v_chave
+    )
+    ON CONFLICT (chave_idempotencia) DO NOTHING
+    RETURNING id INTO v_venda_id;
+
+    -- Chamada concorrente com a mesma chave confirmou primeiro
+    IF v_venda_id IS NULL THEN
+        SELECT id INTO v_venda_id FROM vendas WHERE chave_idempotencia = v_chave;
+        RETURN jsonb_build_object('venda_id', v_venda_id, 'repetida', true);
+    END IF;
+
+    INSERT INTO itens_venda (venda_id, produto_id, quantidade, preco_unitario, subtotal)
+    SELECT v_venda_id,
+           (elem->>'produto_id')::bigint,
+           (elem->>'quantidade')::integer,
+           (elem->>'preco_unitario')::numeric,
+           (elem->>'subtotal')::numeric
+    FROM jsonb_array_elements(p_itens) AS elem;
+
+    INSERT INTO pagamentos (venda_id, forma_pagamento, valor, numero_parcelas, valor_recebido, troco)
+    SELECT v_venda_id,
+           elem->>'forma_pagamento',
+           (elem->>'valor')::numeric,
+           (elem->>'numero_parcelas')::integer,
+           (elem->>'valor_recebido')::numeric,
+           (elem->>'troco')::numeric
+    FROM jsonb_array_elements(p_pagamentos) AS elem;
+
+    -- Baixa de estoque (mesma regra das demais movimentações)
+    PERFORM public.aplicar_movimentacoes_lote((
+        SELECT jsonb_agg(jsonb_build_object(
+                   'produto_id', elem->>'produto_id',
+                   'tipo', 'saida',
+                   'quantidade', elem->>'quantidade',
+                   'observacao', 'Venda #' || v_venda_id,
+                   'usuario_id', v_usuario_id
+               ))
+        FROM jsonb_array_elements(p_itens) AS elem
+    ));
+
+    -- As unidades reservadas pelo carrinho acabaram de ser vendidas
+    IF v_carrinho IS NOT NULL THEN
+        DELETE FROM reservas_estoque WHERE carrinho = v_carrinho;
+    END IF;
+
+    RETURN jsonb_build_object('venda_id', v_venda_id);
+END;
+$$;
@@ -0,0 +1,40 @@
+-- Última movimentação de cada produto em uma única consulta (GROUP BY),
+-- juntada aos produtos, para os relatórios de produtos sem movimentação.
+-- Usada por database.listar_produtos_sem_movimentacao() via supabase.rpc("produtos_sem_movimentacao").
+-- Equivalente local: procedimento "produtos_sem_movimentacao" em backend_sqlite.py.
+--
+-- Retorna um único jsonb (array), para não ser cortado pelo limite de linhas
+-- do PostgREST: cada elemento é o produto com "ultima_movimentacao"
+-- (max created_at) e "ultima_data_hora" (max data_hora), nulos se o produto
+-- nunca teve movimentação. Com p_desde, apenas os produtos sem movimentação
+-- desde essa data.
+
+CREATE INDEX IF NOT EXISTS idx_movimentacoes_produto_data_hora
+    ON movimentacoes (produto_id, data_hora DESC);
+
+CREATE OR REPLACE FUNCTION public.produtos_sem_movimentacao(
+    p_desde timestamptz DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT COALESCE(jsonb_agg(
+               to_jsonb(p) || jsonb_build_object(
+                   'ultima_movimentacao', u.ultima_movimentacao,
+                   'ultima_data_hora', u.ultima_data_hora
+               )
+               ORDER BY p.id
+           ), '[]'::jsonb)
+    FROM produtos p
+    LEFT JOIN (
+        SELECT produto_id,
+               max(created_at) AS ultima_movimentacao,
+               max(data_hora) AS ultima_data_hora
+        FROM movimentacoes
+        GROUP BY produto_id
+    ) u ON u.produto_id = p.id
+    WHERE p_desde IS NULL
+       OR u.produto_id IS NULL
+       OR (u.ultima_movimentacao < p_desde AND u.ultima_data_hora < p_desde);
+$$;
@@ -0,0 +1,216 @@
+-- Resumos diários de vendas (dia x produto, dia x vendedor, dia x forma de
+-- pagamento), mantidos por gatilhos a cada venda registrada ou cancelada.
+-- Usados por relatorios.py para os dias completos do período; o dia atual
+-- continua lido das vendas.
+-- Equivalente local: tabelas, gatilhos e procedimento em backend_sqlite.py.
+--
+-- Depois de criar as tabelas, preencha os resumos com as vendas existentes:
+--   SELECT public.reconstruir_resumos_vendas();
+
+CREATE TABLE IF NOT EXISTS public.resumo_vendas_produto (
+    dia date NOT NULL,
+    produto_id bigint NOT NULL,
+    quantidade integer NOT NULL DEFAULT 0,
+    faturamento numeric(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, produto_id)
+);
+
+CREATE TABLE IF NOT EXISTS public.resumo_vendas_vendedor (
+    dia date NOT NULL,
+    usuario_id bigint NOT NULL,
+    numero_vendas integer NOT NULL DEFAULT 0,
+    faturamento numeric(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, usuario_id)
+);
+
+CREATE TABLE IF NOT EXISTS public.resumo_vendas_pagamento (
+    dia date NOT NULL,
+    forma_pagamento text NOT NULL,
+    valor numeric(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, forma_pagamento)
+);
+
+-- Soma (p_sinal = 1) ou subtrai (p_sinal = -1) uma venda inteira dos resumos
+CREATE OR REPLACE FUNCTION public.aplicar_venda_resumos(p_venda_id bigint, p_sinal integer)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_venda vendas%ROWTYPE;
+    v_dia date;
+BEGIN
+    SELECT * INTO v_venda FROM vendas WHERE id = p_venda_id;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+    v_dia := v_venda.data_hora::date;
+
+    INSERT INTO resumo_vendas_vendedor (dia, usuario_id, numero_vendas, faturamento)
+    VALUES (v_dia, v_venda.usuario_id, p_sinal, p_sinal * v_venda.valor_final)
+    ON CONFLICT (dia, usuario_id) DO UPDATE
+    SET numero_vendas = resumo_vendas_vendedor.numero_vendas + EXCLUDED.numero_vendas,
+        faturamento = resumo_vendas_vendedor.faturamento + EXCLUDED.faturamento;
+
+    INSERT INTO resumo_vendas_produto (dia, produto_id, quantidade, faturamento)
+    SELECT v_dia, produto_id, p_sinal * sum(quantidade), p_sinal * sum(subtotal)
+    FROM itens_venda
+    WHERE venda_id = p_venda_id
+    GROUP BY produto_id
+    ON CONFLICT (dia, produto_id) DO UPDATE
+    SET quantidade = resumo_vendas_produto.quantidade + EXCLUDED.quantidade,
+        faturamento = resumo_vendas_produto.faturamento + EXCLUDED.faturamento;
+
+    INSERT INTO resumo_vendas_pagamento (dia, forma_pagamento, valor)
+    SELECT v_dia, forma_pagamento, p_sinal * sum(valor)
+    FROM pagamentos
+    WHERE venda_id = p_venda_id
+    GROUP BY forma_pagamento
+    ON CONFLICT (dia, forma_pagamento) DO UPDATE
+    SET valor = resumo_vendas_pagamento.valor + EXCLUDED.valor;
+END;
+$$;
+
+-- Venda inserida: conta a venda para o vendedor
+CREATE OR REPLACE FUNCTION public.resumir_venda_inserida()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.status <> 'cancelada' THEN
+        INSERT INTO resumo_vendas_vendedor (dia, usuario_id, numero_vendas, faturamento)
+        VALUES (NEW.data_hora::date, NEW.usuario_id, 1, NEW.valor_final)
+        ON CONFLICT (dia, usuario_id) DO UPDATE
+        SET numero_vendas = resumo_vendas_vendedor.numero_vendas + 1,
+            faturamento = resumo_vendas_vendedor.faturamento + EXCLUDED.faturamento;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Venda cancelada (ou reativada): retira (ou devolve) a venda inteira
+CREATE OR REPLACE FUNCTION public.resumir_status_venda()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF OLD.status <> 'cancelada' AND NEW.status = 'cancelada' THEN
+        PERFORM public.aplicar_venda_resumos(NEW.id, -1);
+    ELSIF OLD.status = 'cancelada' AND NEW.status <> 'cancelada' THEN
+        PERFORM public.aplicar_venda_resumos(NEW.id, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.resumir_item_venda()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_dia date;
+BEGIN
+    SELECT data_hora::date INTO v_dia
+    FROM vendas
+    WHERE id = NEW.venda_id AND status <> 'cancelada';
+
+    IF FOUND THEN
+        INSERT INTO resumo_vendas_produto (dia, produto_id, quantidade, faturamento)
+        VALUES (v_dia, NEW.produto_id, NEW.quantidade, NEW.subtotal)
+        ON CONFLICT (dia, produto_id) DO UPDATE
+        SET quantidade = resumo_vendas_produto.quantidade + EXCLUDED.quantidade,
+            faturamento = resumo_vendas_produto.faturamento + EXCLUDED.faturamento;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.resumir_pagamento()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_dia date;
+BEGIN
+    SELECT data_hora::date INTO v_dia
+    FROM vendas
+    WHERE id = NEW.venda_id AND status <> 'cancelada';
+
+    IF FOUND THEN
+        INSERT INTO resumo_vendas_pagamento (dia, forma_pagamento, valor)
+        VALUES (v_dia, NEW.forma_pagamento, NEW.valor)
+        ON CONFLICT (dia, forma_pagamento) DO UPDATE
+        SET valor = resumo_vendas_pagamento.valor + EXCLUDED.valor;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_resumo_venda_inserida ON vendas;
+CREATE TRIGGER trg_resumo_venda_inserida
+    AFTER INSERT ON vendas
+    FOR EACH ROW EXECUTE FUNCTION public.resumir_venda_inserida();
+
+DROP TRIGGER IF EXISTS trg_resumo_status_venda ON vendas;
+CREATE TRIGGER trg_resumo_status_venda
+    AFTER UPDATE OF status ON vendas
+    FOR EACH ROW EXECUTE FUNCTION public.resumir_status_venda();
+
+DROP TRIGGER IF EXISTS trg_resumo_item_venda ON itens_venda;
+CREATE TRIGGER trg_resumo_item_venda
+    AFTER INSERT ON itens_venda
+    FOR EACH ROW EXECUTE FUNCTION public.resumir_item_venda();
+
+DROP TRIGGER IF EXISTS trg_resumo_pagamento ON pagamentos;
+CREATE TRIGGER trg_resumo_pagamento
+    AFTER INSERT ON pagamentos
+    FOR EACH ROW EXECUTE FUNCTION public.resumir_pagamento();
+
+-- Recalcula os resumos a partir das vendas (todos os dias ou um intervalo).
+-- Usada por database.reconstruir_resumos_vendas() para o preenchimento
+-- inicial e para corrigir os resumos após alterações manuais nas vendas.
+CREATE OR REPLACE FUNCTION public.reconstruir_resumos_vendas(
+    p_inicio date DEFAULT NULL,
+    p_fim date DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_inicio date := COALESCE(p_inicio, '-infinity'::date);
+    v_fim date := COALESCE(p_fim, 'infinity'::date);
+    v_dias integer;
+BEGIN
+    -- Vendas em andamento terminam antes; novas esperam a reconstrução
+    LOCK TABLE resumo_vendas_produto, resumo_vendas_vendedor, resumo_vendas_pagamento
+        IN SHARE ROW EXCLUSIVE MODE;
+
+    DELETE FROM resumo_vendas_produto WHERE dia BETWEEN v_inicio AND v_fim;
+    DELETE FROM resumo_vendas_vendedor WHERE dia BETWEEN v_inicio AND v_fim;
+    DELETE FROM resumo_vendas_pagamento WHERE dia BETWEEN v_inicio AND v_fim;
+
+    INSERT INTO resumo_vendas_vendedor (dia, usuario_id, numero_vendas, faturamento)
+    SELECT data_hora::date, usuario_id, count(*), sum(valor_final)
+    FROM vendas
+    WHERE status <> 'cancelada' AND data_hora::date BETWEEN v_inicio AND v_fim
+    GROUP BY 1, 2;
+
+    INSERT INTO resumo_vendas_produto (dia, produto_id, quantidade, faturamento)
+    SELECT v.data_hora::date, i.produto_id, sum(i.quantidade), sum(i.subtotal)
+    FROM itens_venda i
+    JOIN vendas v ON v.id = i.venda_id
+    WHERE v.status <> 'cancelada' AND v.data_hora::date BETWEEN v_inicio AND v_fim
+    GROUP BY 1, 2;
+
+    INSERT INTO resumo_vendas_pagamento (dia, forma_pagamento, valor)
+    SELECT v.data_hora::date, p.forma_pagamento, sum(p.valor)
+    FROM pagamentos p
+    JOIN vendas v ON v.id = p.venda_id
+    WHERE v.status <> 'cancelada' AND v.data_hora::date BETWEEN v_inicio AND v_fim
+    GROUP BY 1, 2;
+
+    SELECT count(*) INTO v_dias
+    FROM (SELECT DISTINCT dia FROM resumo_vendas_vendedor WHERE dia BETWEEN v_inicio AND v_fim) d;
+
+    RETURN jsonb_build_object('dias', v_dias);
+END;
+$$;
@@ -0,0 +1,33 @@
+-- Sincronização incremental de vendas e movimentações para a base analítica
+-- local (analitico.py): updated_at mantido nas escritas e exclusões
+-- registradas em "exclusoes", como produtos e clientes em 005.
+-- Usada por database.buscar_alteracoes() na sincronização da base analítica.
+-- Equivalente local: gatilhos de sincronização em backend_sqlite.py.
+-- Requer sql/005_sincronizacao_incremental.sql (exclusoes e funções dos gatilhos).
+
+ALTER TABLE public.vendas ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now();
+ALTER TABLE public.movimentacoes ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now();
+
+CREATE INDEX IF NOT EXISTS idx_vendas_updated_at ON vendas (updated_at);
+CREATE INDEX IF NOT EXISTS idx_movimentacoes_updated_at ON movimentacoes (updated_at);
+
+DROP TRIGGER IF EXISTS trg_vendas_updated_at ON vendas;
+CREATE TRIGGER trg_vendas_updated_at
+    BEFORE INSERT OR UPDATE ON vendas
+    FOR EACH ROW EXECUTE FUNCTION public.definir_updated_at();
+
+DROP TRIGGER IF EXISTS trg_movimentacoes_updated_at ON movimentacoes;
+CREATE TRIGGER trg_movimentacoes_updated_at
+    BEFORE INSERT OR UPDATE ON movimentacoes
+    FOR EACH ROW EXECUTE FUNCTION public.definir_updated_at();
+
+DROP TRIGGER IF EXISTS trg_vendas_exclusao ON vendas;
+CREATE TRIGGER trg_vendas_exclusao
+    AFTER DELETE ON vendas
+    FOR EACH ROW EXECUTE FUNCTION public.registrar_exclusao();
+
+-- desfazer_ultima_movimentacao apaga a movimentação desfeita
+DROP TRIGGER IF EXISTS trg_movimentacoes_exclusao ON movimentacoes;
+CREATE TRIGGER trg_movimentacoes_exclusao
+    AFTER DELETE ON movimentacoes
+    FOR EACH ROW EXECUTE FUNCTION public.registrar_exclusao();
@@ -0,0 +1,178 @@
+-- Relatórios de vendas agregados no banco: totais do período, distribuição
+-- por forma de pagamento e totais por vendedor voltam prontos (poucas
+-- linhas), e a lista de vendas é lida em páginas, só quando exibida.
+-- Usadas por relatorios.py via database.resumo_vendas_periodo(),
+-- database.resumo_vendas_por_vendedor() e database.listar_vendas_periodo().
+-- Equivalente local: procedimentos em backend_sqlite.py.
+--
+-- Com p_dia_inicio/p_dia_fim (apenas sem filtros), esses dias completos são
+-- lidos dos resumos diários (sql/009_resumos_vendas.sql) e o restante do
+-- período das vendas.
+
+CREATE INDEX IF NOT EXISTS idx_vendas_data_hora_id ON vendas (data_hora, id);
+CREATE INDEX IF NOT EXISTS idx_pagamentos_venda ON pagamentos (venda_id);
+
+-- Faturamento, número de vendas, ticket médio e distribuição por forma de
+-- pagamento das vendas não canceladas do período
+CREATE OR REPLACE FUNCTION public.resumo_vendas_periodo(
+    p_inicio timestamptz,
+    p_fim timestamptz,
+    p_usuario_id bigint DEFAULT NULL,
+    p_forma_pagamento text DEFAULT NULL,
+    p_dia_inicio date DEFAULT NULL,
+    p_dia_fim date DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+AS $$
+    WITH cortes AS (
+        -- Vendas lidas antes de "de" e a partir de "ate"; entre eles, os resumos
+        SELECT COALESCE(p_dia_inicio::timestamptz, 'infinity') AS de,
+               COALESCE((p_dia_fim + 1)::timestamptz, 'infinity') AS ate
+    ),
+    vendas_lidas AS (
+        SELECT v.id, v.valor_final
+        FROM cortes c
+        CROSS JOIN LATERAL (VALUES (p_inicio, c.de), (c.ate, 'infinity'::timestamptz)) AS t (de, ate)
+        JOIN vendas v ON v.data_hora >= t.de AND v.data_hora < t.ate AND v.data_hora <= p_fim
+        WHERE v.status <> 'cancelada'
+          AND (p_usuario_id IS NULL OR v.usuario_id = p_usuario_id)
+          AND (p_forma_pagamento IS NULL OR EXISTS (
+              SELECT 1 FROM pagamentos f WHERE f.venda_id = v.id AND f.forma_pagamento = p_forma_pagamento
+          ))
+    ),
+    totais AS (
+        SELECT COALESCE(sum(numero_vendas), 0) AS numero_vendas, COALESCE(sum(faturamento), 0) AS faturamento
+        FROM (
+            SELECT count(*) AS numero_vendas, sum(valor_final) AS faturamento FROM vendas_lidas
+            UNION ALL
+            SELECT sum(numero_vendas), sum(faturamento)
+            FROM resumo_vendas_vendedor
+            WHERE dia BETWEEN p_dia_inicio AND p_dia_fim
+        ) linhas
+    ),
+    formas AS (
+        SELECT forma_pagamento, sum(valor) AS valor
+        FROM (
+            SELECT p.forma_pagamento, p.valor
+            FROM pagamentos p
+            JOIN vendas_lidas v ON v.id = p.venda_id
+            UNION ALL
+            SELECT forma_pagamento, valor
+            FROM resumo_vendas_pagamento
+            WHERE dia BETWEEN p_dia_inicio AND p_dia_fim
+        ) linhas
+        GROUP BY forma_pagamento
+        -- Formas cujas vendas foram todas canceladas ficam com valor zero nos resumos
+        HAVING sum(valor) <> 0
+    )
+    SELECT jsonb_build_object(
+        'faturamento_total', t.faturamento,
+        'numero_vendas', t.numero_vendas,
+        'ticket_medio', CASE WHEN t.numero_vendas > 0 THEN t.faturamento / t.numero_vendas ELSE 0 END,
+        'distribuicao_pagamento', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                       'forma_pagamento', f.forma_pagamento,
+                       'valor', f.valor,
+                       'percentual', CASE WHEN t.faturamento > 0 THEN f.valor * 100 / t.faturamento ELSE 0 END
+                   ) ORDER BY f.forma_pagamento)
+            FROM formas f
+        ), '[]'::jsonb)
+    )
+    FROM totais t;
+$$;
+
+-- Número de vendas, faturamento, ticket médio e participação de cada
+-- vendedor nas vendas não canceladas do período, do maior faturamento
+CREATE OR REPLACE FUNCTION public.resumo_vendas_por_vendedor(
+    p_inicio timestamptz,
+    p_fim timestamptz,
+    p_dia_inicio date DEFAULT NULL,
+    p_dia_fim date DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+AS $$
+    WITH cortes AS (
+        SELECT COALESCE(p_dia_inicio::timestamptz, 'infinity') AS de,
+               COALESCE((p_dia_fim + 1)::timestamptz, 'infinity') AS ate
+    ),
+    vendedores AS (
+        SELECT usuario_id, sum(numero_vendas) AS numero_vendas, sum(faturamento) AS faturamento
+        FROM (
+            SELECT v.usuario_id, count(*) AS numero_vendas, sum(v.valor_final) AS faturamento
+            FROM cortes c
+            CROSS JOIN LATERAL (VALUES (p_inicio, c.de), (c.ate, 'infinity'::timestamptz)) AS t (de, ate)
+            JOIN vendas v ON v.data_hora >= t.de AND v.data_hora < t.ate AND v.data_hora <= p_fim
+            WHERE v.status <> 'cancelada'
+            GROUP BY v.usuario_id
+            UNION ALL
+            SELECT usuario_id, sum(numero_vendas), sum(faturamento)
+            FROM resumo_vendas_vendedor
+            WHERE dia BETWEEN p_dia_inicio AND p_dia_fim
+            GROUP BY usuario_id
+        ) linhas
+        GROUP BY usuario_id
+        -- Vendedores cujas vendas foram todas canceladas ficam com zero vendas
+        HAVING sum(numero_vendas) > 0
+    )
+    SELECT COALESCE(jsonb_agg(jsonb_build_object(
+               'usuario_id', x.usuario_id,
+               'nome_vendedor', COALESCE(u.username, 'Usuário ' || x.usuario_id),
+               'numero_vendas', x.numero_vendas,
+               'faturamento_total', x.faturamento,
+               'ticket_medio', x.faturamento / x.numero_vendas,
+               'percentual_participacao', CASE WHEN x.total > 0 THEN x.faturamento * 100 / x.total ELSE 0 END
+           ) ORDER BY x.faturamento DESC, x.usuario_id), '[]'::jsonb)
+    FROM (SELECT vendedores.*, sum(faturamento) OVER () AS total FROM vendedores) x
+    LEFT JOIN usuarios u ON u.id = x.usuario_id;
+$$;
+
+-- Uma página da lista de vendas do período (inclusive canceladas), em ordem
+-- de data_hora e id, com cliente, vendedor e pagamentos de cada venda.
+-- A próxima página começa depois de (p_apos_data_hora, p_apos_id), os
+-- valores da última venda da página anterior.
+CREATE OR REPLACE FUNCTION public.listar_vendas_periodo(
+    p_inicio timestamptz,
+    p_fim timestamptz,
+    p_usuario_id bigint DEFAULT NULL,
+    p_forma_pagamento text DEFAULT NULL,
+    p_apos_data_hora timestamptz DEFAULT NULL,
+    p_apos_id bigint DEFAULT NULL,
+    p_limite integer DEFAULT 100
+)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT COALESCE(jsonb_agg(to_jsonb(pagina) ORDER BY pagina.data_hora, pagina.id), '[]'::jsonb)
+    FROM (
+        SELECT v.id, v.data_hora, v.valor_total, v.desconto_valor, v.desconto_percentual,
+               v.valor_final, v.status,
+               c.nome AS cliente_nome,
+               u.username AS vendedor_nome,
+               COALESCE((
+                   SELECT jsonb_agg(jsonb_build_object(
+                              'venda_id', p.venda_id,
+                              'forma_pagamento', p.forma_pagamento,
+                              'valor', p.valor,
+                              'numero_parcelas', p.numero_parcelas
+                          ) ORDER BY p.id)
+                   FROM pagamentos p
+                   WHERE p.venda_id = v.id
+               ), '[]'::jsonb) AS pagamentos
+        FROM vendas v
+        LEFT JOIN clientes c ON c.id = v.cliente_id
+        LEFT JOIN usuarios u ON u.id = v.usuario_id
+        WHERE v.data_hora >= p_inicio AND v.data_hora <= p_fim
+          AND (p_apos_data_hora IS NULL OR (v.data_hora, v.id) > (p_apos_data_hora, p_apos_id))
+          AND (p_usuario_id IS NULL OR v.usuario_id = p_usuario_id)
+          AND (p_forma_pagamento IS NULL OR EXISTS (
+              SELECT 1 FROM pagamentos f WHERE f.venda_id = v.id AND f.forma_pagamento = p_forma_pagamento
+          ))
+        ORDER BY v.data_hora, v.id
+        LIMIT p_limite
+    ) pagina;
+$$;
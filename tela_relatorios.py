@@ -12,6 +12,7 @@ from typing import Optional, List, Dict
 from datetime import datetime, timedelta
 from relatorios import (
     relatorio_vendas_periodo,
+    relatorio_vendas_pagina,
     relatorio_produtos_mais_vendidos,
     relatorio_vendas_por_vendedor,
     exportar_relatorio_csv
@@ -44,6 +45,10 @@ class TelaRelatorios:
         self.dados_relatorio_produtos: Optional[List[Dict]] = None
         self.dados_relatorio_vendedores: Optional[List[Dict]] = None
         
+        # Lista de vendas do relatório por período, lida em páginas sob demanda
+        self.filtros_vendas: Optional[Dict] = None
+        self.vendas_proxima_pagina: Optional[tuple] = None
+        
         # Criar componentes da interface
         self._criar_componentes()
     
@@ -157,9 +162,32 @@ class TelaRelatorios:
             border_radius=5,
         )
         
+        self.btn_mostrar_vendas = ft.ElevatedButton(
+            "Mostrar Vendas",
+            icon=ft.icons.LIST,
+            disabled=True,
+            on_click=lambda e: self._mostrar_lista_vendas()
+        )
+        
+        self.btn_mais_vendas = ft.TextButton(
+            "Carregar mais",
+            icon=ft.icons.EXPAND_MORE,
+            visible=False,
+            on_click=lambda e: self._carregar_pagina_vendas()
+        )
+        
         # Container de distribuição por forma de pagamento
         self.vendas_distribuicao_pagamento = ft.Column([], spacing=5)
         
+        self.container_lista_vendas = ft.Container(
+            content=ft.Column([self.tabela_vendas, self.btn_mais_vendas], scroll=ft.ScrollMode.ALWAYS),
+            height=300,
+            border=ft.border.all(1, "#EEEEEE"),
+            border_radius=5,
+            padding=10,
+            visible=False
+        )
+        
         # Layout da aba
         self.aba_vendas_periodo = ft.Container(
             content=ft.Column([
@@ -230,15 +258,12 @@ class TelaRelatorios:
                     height=150
                 ),
                 ft.Divider(height=20),
-                # Tabela de vendas
-                ft.Text("📋 Lista de Vendas", size=14, weight="bold", color="#0070C0"),
-                ft.Container(
-                    content=ft.Column([self.tabela_vendas], scroll=ft.ScrollMode.ALWAYS),
-                    height=300,
-                    border=ft.border.all(1, "#EEEEEE"),
-                    border_radius=5,
-                    padding=10
-                ),
+                # Tabela de vendas (lida apenas quando exibida)
+                ft.Row([
+                    ft.Text("📋 Lista de Vendas", size=14, weight="bold", color="#0070C0"),
+                    self.btn_mostrar_vendas,
+                ], spacing=10),
+                self.container_lista_vendas,
             ], spacing=10, scroll=ft.ScrollMode.AUTO),
             padding=15,
             expand=True
@@ -531,94 +556,132 @@ class TelaRelatorios:
             if self.vendas_filtro_pagamento.value:
                 forma_pagamento = self.vendas_filtro_pagamento.value
             
-            # Gerar relatório
-            self.dados_relatorio_vendas = relatorio_vendas_periodo(
-                data_inicio=data_inicio,
-                data_fim=data_fim,
-                usuario_id=usuario_id,
-                forma_pagamento=forma_pagamento
-            )
-            
-            # Atualizar métricas
-            self.vendas_faturamento.value = f"R$ {self.dados_relatorio_vendas['faturamento_total']:.2f}"
-            self.vendas_num_vendas.value = str(self.dados_relatorio_vendas['numero_vendas'])
-            self.vendas_ticket_medio.value = f"R$ {self.dados_relatorio_vendas['ticket_medio']:.2f}"
-            
-            # Atualizar distribuição por forma de pagamento
-            self.vendas_distribuicao_pagamento.controls.clear()
+            self._carregar_relatorio_vendas(data_inicio, data_fim, usuario_id, forma_pagamento)
             
-            if self.dados_relatorio_vendas['distribuicao_pagamento']:
-                for dist in self.dados_relatorio_vendas['distribuicao_pagamento']:
-                    forma_texto = {
-                        'dinheiro': '💵 Dinheiro',
-                        'cartao_credito': '💳 Cartão Crédito',
-                        'cartao_debito': '💳 Cartão Débito',
-                        'pix': '📱 PIX'
-                    }.get(dist['forma_pagamento'], dist['forma_pagamento'])
-                    
-                    # Criar barra visual proporcional ao percentual
-                    largura_barra = int(dist['percentual'] * 3)  # Escala para visualização
-                    
-                    self.vendas_distribuicao_pagamento.controls.append(
-                        ft.Container(
-                            content=ft.Row([
-                                ft.Text(forma_texto, size=12, width=120),
-                                ft.Container(
-                                    content=ft.Text(
-                                        f"R$ {dist['valor']:.2f} ({dist['percentual']:.1f}%)",
-                                        size=12,
-                                        color="white",
-                                        weight="bold"
-                                    ),
-                                    bgcolor="#0070C0",
-                                    padding=5,
-                                    border_radius=3,
-                                    width=largura_barra if largura_barra > 80 else 80
-                                ),
-                            ], spacing=10),
-                            padding=5
-                        )
-                    )
-            else:
-                self.vendas_distribuicao_pagamento.controls.append(
-                    ft.Text("Nenhuma venda no período", italic=True, color="gray")
-                )
-            
-            # Atualizar tabela de vendas
-            self.tabela_vendas.rows.clear()
+            self._mostrar_snackbar(f"✅ Relatório gerado: {self.dados_relatorio_vendas['numero_vendas']} vendas", "green")
+            self.page.update()
             
-            for venda in self.dados_relatorio_vendas['vendas']:
-                status_cor = "green" if venda['status'] == 'finalizada' else "red"
-                status_texto = "Finalizada" if venda['status'] == 'finalizada' else "Cancelada"
+        except Exception as e:
+            self._mostrar_snackbar(f"❌ Erro ao gerar relatório: {str(e)}", "red")
+    
+    def _carregar_relatorio_vendas(self, data_inicio: str, data_fim: str,
+                                   usuario_id: Optional[int] = None, forma_pagamento: Optional[str] = None):
+        """Busca as métricas do relatório de vendas e atualiza a aba (a lista só se estiver exibida)."""
+        # Gerar relatório (apenas métricas; a lista de vendas é lida em páginas)
+        self.filtros_vendas = {
+            'data_inicio': data_inicio,
+            'data_fim': data_fim,
+            'usuario_id': usuario_id,
+            'forma_pagamento': forma_pagamento
+        }
+        self.dados_relatorio_vendas = relatorio_vendas_periodo(**self.filtros_vendas, incluir_vendas=False)
+        
+        # Atualizar métricas
+        self.vendas_faturamento.value = f"R$ {self.dados_relatorio_vendas['faturamento_total']:.2f}"
+        self.vendas_num_vendas.value = str(self.dados_relatorio_vendas['numero_vendas'])
+        self.vendas_ticket_medio.value = f"R$ {self.dados_relatorio_vendas['ticket_medio']:.2f}"
+        
+        # Atualizar distribuição por forma de pagamento
+        self.vendas_distribuicao_pagamento.controls.clear()
+        
+        if self.dados_relatorio_vendas['distribuicao_pagamento']:
+            for dist in self.dados_relatorio_vendas['distribuicao_pagamento']:
+                forma_texto = {
+                    'dinheiro': '💵 Dinheiro',
+                    'cartao_credito': '💳 Cartão Crédito',
+                    'cartao_debito': '💳 Cartão Débito',
+                    'pix': '📱 PIX'
+                }.get(dist['forma_pagamento'], dist['forma_pagamento'])
                 
-                cliente_texto = venda.get('cliente_nome', 'Venda Avulsa') or 'Venda Avulsa'
-                vendedor_texto = venda.get('vendedor_nome', '-') or '-'
+                # Criar barra visual proporcional ao percentual
+                largura_barra = int(dist['percentual'] * 3)  # Escala para visualização
                 
-                self.tabela_vendas.rows.append(
-                    ft.DataRow(
-                        cells=[
-                            ft.DataCell(ft.Text(f"#{venda['id']}")),
-                            ft.DataCell(ft.Text(self._formatar_data(venda['data_hora']))),
-                            ft.DataCell(ft.Text(cliente_texto[:20])),
-                            ft.DataCell(ft.Text(vendedor_texto[:15])),
-                            ft.DataCell(ft.Text(f"R$ {venda['valor_final']:.2f}", weight="bold")),
-                            ft.DataCell(ft.Text(status_texto, color=status_cor)),
-                        ]
+                self.vendas_distribuicao_pagamento.controls.append(
+                    ft.Container(
+                        content=ft.Row([
+                            ft.Text(forma_texto, size=12, width=120),
+                            ft.Container(
+                                content=ft.Text(
+                                    f"R$ {dist['valor']:.2f} ({dist['percentual']:.1f}%)",
+                                    size=12,
+                                    color="white",
+                                    weight="bold"
+                                ),
+                                bgcolor="#0070C0",
+                                padding=5,
+                                border_radius=3,
+                                width=largura_barra if largura_barra > 80 else 80
+                            ),
+                        ], spacing=10),
+                        padding=5
                     )
                 )
+        else:
+            self.vendas_distribuicao_pagamento.controls.append(
+                ft.Text("Nenhuma venda no período", italic=True, color="gray")
+            )
+        
+        # Reiniciar a tabela de vendas; se já está exibida, ler a primeira página
+        self.tabela_vendas.rows.clear()
+        self.vendas_proxima_pagina = None
+        self.btn_mais_vendas.visible = False
+        self.btn_mostrar_vendas.disabled = False
+        if self.container_lista_vendas.visible:
+            self._carregar_pagina_vendas(atualizar=False)
+        
+        # Habilitar botão de exportação
+        self.btn_exportar_vendas.disabled = False
+    
+    def _mostrar_lista_vendas(self):
+        """Exibe a lista de vendas do relatório, lendo a primeira página."""
+        if not self.filtros_vendas:
+            self._mostrar_snackbar("❌ Gere o relatório antes de listar as vendas", "orange")
+            return
+        
+        self.container_lista_vendas.visible = True
+        self.btn_mostrar_vendas.visible = False
+        self.tabela_vendas.rows.clear()
+        self.vendas_proxima_pagina = None
+        self._carregar_pagina_vendas()
+    
+    def _carregar_pagina_vendas(self, atualizar: bool = True):
+        """Lê a próxima página de vendas e acrescenta as linhas na tabela."""
+        try:
+            vendas, self.vendas_proxima_pagina = relatorio_vendas_pagina(
+                **self.filtros_vendas,
+                apos=self.vendas_proxima_pagina
+            )
+        except Exception as e:
+            self._mostrar_snackbar(f"❌ Erro ao listar vendas: {str(e)}", "red")
+            return
+        
+        for venda in vendas:
+            status_cor = "green" if venda['status'] == 'finalizada' else "red"
+            status_texto = "Finalizada" if venda['status'] == 'finalizada' else "Cancelada"
             
-            # Habilitar botão de exportação
-            self.btn_exportar_vendas.disabled = False
+            cliente_texto = venda.get('cliente_nome', 'Venda Avulsa') or 'Venda Avulsa'
+            vendedor_texto = venda.get('vendedor_nome', '-') or '-'
             
-            self._mostrar_snackbar(f"✅ Relatório gerado: {self.dados_relatorio_vendas['numero_vendas']} vendas", "green")
+            self.tabela_vendas.rows.append(
+                ft.DataRow(
+                    cells=[
+                        ft.DataCell(ft.Text(f"#{venda['id']}")),
+                        ft.DataCell(ft.Text(self._formatar_data(venda['data_hora']))),
+                        ft.DataCell(ft.Text(cliente_texto[:20])),
+                        ft.DataCell(ft.Text(vendedor_texto[:15])),
+                        ft.DataCell(ft.Text(f"R$ {venda['valor_final']:.2f}", weight="bold")),
+                        ft.DataCell(ft.Text(status_texto, color=status_cor)),
+                    ]
+                )
+            )
+        
+        self.btn_mais_vendas.visible = self.vendas_proxima_pagina is not None
+        if atualizar:
             self.page.update()
-            
-        except Exception as e:
-            self._mostrar_snackbar(f"❌ Erro ao gerar relatório: {str(e)}", "red")
     
     def _exportar_vendas_csv(self):
         """Exporta o relatório de vendas para CSV."""
-        if not self.dados_relatorio_vendas:
+        if not self.dados_relatorio_vendas or not self.filtros_vendas:
             self._mostrar_snackbar("❌ Gere o relatório antes de exportar", "orange")
             return
         
@@ -634,9 +697,10 @@ class TelaRelatorios:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             caminho = f"relatorios/vendas_periodo_{timestamp}.csv"
             
-            # Preparar dados para exportação
+            # Preparar dados para exportação (todas as vendas, lidas em páginas)
+            vendas = relatorio_vendas_periodo(**self.filtros_vendas)['vendas']
             dados_exportacao = []
-            for venda in self.dados_relatorio_vendas['vendas']:
+            for venda in vendas:
                 dados_exportacao.append({
                     'Numero_Venda': venda['id'],
                     'Data_Hora': venda['data_hora'],
@@ -950,80 +1014,17 @@ class TelaRelatorios:
         data_fim = self.vendedores_data_fim.value
         
         try:
-            # Buscar vendas do vendedor
-            relatorio_vendedor = relatorio_vendas_periodo(
-                data_inicio=data_inicio,
-                data_fim=data_fim,
-                usuario_id=vendedor['usuario_id']
-            )
-            
             # Mudar para a aba de vendas e aplicar o filtro
             self.tabs.selected_index = 0
             self.vendas_data_inicio.value = data_inicio
             self.vendas_data_fim.value = data_fim
             self.vendas_filtro_vendedor.value = str(vendedor['usuario_id'])
+            self.vendas_filtro_pagamento.value = None
             
-            # Atualizar dados e interface
-            self.dados_relatorio_vendas = relatorio_vendedor
-            
-            # Atualizar métricas
-            self.vendas_faturamento.value = f"R$ {relatorio_vendedor['faturamento_total']:.2f}"
-            self.vendas_num_vendas.value = str(relatorio_vendedor['numero_vendas'])
-            self.vendas_ticket_medio.value = f"R$ {relatorio_vendedor['ticket_medio']:.2f}"
-            
-            # Atualizar tabela
-            self.tabela_vendas.rows.clear()
-            for venda in relatorio_vendedor['vendas']:
-                status_cor = "green" if venda['status'] == 'finalizada' else "red"
-                status_texto = "Finalizada" if venda['status'] == 'finalizada' else "Cancelada"
-                cliente_texto = venda.get('cliente_nome', 'Venda Avulsa') or 'Venda Avulsa'
-                
-                self.tabela_vendas.rows.append(
-                    ft.DataRow(
-                        cells=[
-                            ft.DataCell(ft.Text(f"#{venda['id']}")),
-                            ft.DataCell(ft.Text(self._formatar_data(venda['data_hora']))),
-                            ft.DataCell(ft.Text(cliente_texto[:20])),
-                            ft.DataCell(ft.Text(vendedor['nome_vendedor'][:15])),
-                            ft.DataCell(ft.Text(f"R$ {venda['valor_final']:.2f}", weight="bold")),
-                            ft.DataCell(ft.Text(status_texto, color=status_cor)),
-                        ]
-                    )
-                )
-            
-            # Atualizar distribuição de pagamento
-            self.vendas_distribuicao_pagamento.controls.clear()
-            if relatorio_vendedor['distribuicao_pagamento']:
-                for dist in relatorio_vendedor['distribuicao_pagamento']:
-                    forma_texto = {
-                        'dinheiro': '💵 Dinheiro',
-                        'cartao_credito': '💳 Cartão Crédito',
-                        'cartao_debito': '💳 Cartão Débito',
-                        'pix': '📱 PIX'
-                    }.get(dist['forma_pagamento'], dist['forma_pagamento'])
-                    
-                    largura_barra = int(dist['percentual'] * 3)
-                    
-                    self.vendas_distribuicao_pagamento.controls.append(
-                        ft.Container(
-                            content=ft.Row([
-                                ft.Text(forma_texto, size=12, width=120),
-                                ft.Container(
-                                    content=ft.Text(
-                                        f"R$ {dist['valor']:.2f} ({dist['percentual']:.1f}%)",
-                                        size=12,
-                                        color="white",
-                                        weight="bold"
-                                    ),
-                                    bgcolor="#0070C0",
-                                    padding=5,
-                                    border_radius=3,
-                                    width=largura_barra if largura_barra > 80 else 80
-                                ),
-                            ], spacing=10),
-                            padding=5
-                        )
-                    )
+            # Buscar vendas do vendedor, já com a lista exibida
+            self.container_lista_vendas.visible = True
+            self.btn_mostrar_vendas.visible = False
+            self._carregar_relatorio_vendas(data_inicio, data_fim, usuario_id=vendedor['usuario_id'])
             
             self._mostrar_snackbar(f"📊 Exibindo vendas de {vendedor['nome_vendedor']}", "#0070C0")
             self.page.update()
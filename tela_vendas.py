@@ -3,6 +3,7 @@ Tela de Vendas (PDV) - Sistema de Vendas DEKIDS
 
 Interface completa de Ponto de Venda (PDV) com:
 - Busca e adição de produtos
+- Leitura de código de barras direto para o carrinho
 - Gerenciamento do carrinho
 - Seleção de cliente
 - Processamento de pagamentos
@@ -10,13 +11,22 @@ Interface completa de Ponto de Venda (PDV) com:
 - Geração de comprovante
 """
 
+import threading
+import time
 import flet as ft
 from typing import Optional, List, Dict
+from barcode import buscar_por_codigo
 from vendas import Carrinho, buscar_produtos_venda, finalizar_venda, gerar_comprovante, exportar_comprovante_pdf
 from clientes import buscar_clientes, cadastrar_cliente
 from validacao_vendas import validar_pagamentos_venda
 
 
+# Leitor de código de barras (teclado): caracteres chegam em rajada e terminam com Enter
+INTERVALO_MAXIMO_LEITOR = 0.05   # segundos entre caracteres de uma leitura
+TAMANHO_MINIMO_LEITOR = 8        # EAN-8 é o menor código aceito como leitura
+ESPERA_AGRUPAR_LEITURAS = 0.15   # segundos aguardando novas leituras antes de atualizar o carrinho
+
+
 class TelaPDV:
     """
     Classe principal da tela de PDV (Ponto de Venda).
@@ -47,6 +57,13 @@ class TelaPDV:
         # Lista de pagamentos adicionados
         self.pagamentos: List[Dict] = []
         
+        # Estado do leitor de código de barras
+        self._ultima_tecla: Optional[float] = None
+        self._em_rajada = False
+        self._leituras_pendentes: Dict[str, int] = {}
+        self._lock_leituras = threading.Lock()
+        self._temporizador_leituras: Optional[threading.Timer] = None
+        
         # Criar componentes da interface
         self._criar_componentes()
 
@@ -56,10 +73,11 @@ class TelaPDV:
         # Componentes de busca de produtos
         self.txt_busca_produto = ft.TextField(
             label="Buscar Produto",
-            hint_text="Digite código de barras, referência ou descrição",
+            hint_text="Leia o código de barras ou digite referência/descrição",
             prefix_icon=ft.icons.SEARCH,
             expand=True,
-            on_submit=lambda e: self._buscar_produtos()
+            on_change=lambda e: self._registrar_digitacao(),
+            on_submit=lambda e: self._enviar_busca()
         )
         
         self.btn_buscar = ft.ElevatedButton(
@@ -432,6 +450,83 @@ class TelaPDV:
     
     # ========== MÉTODOS DE BUSCA DE PRODUTOS ==========
     
+    def _registrar_digitacao(self):
+        """Acompanha o ritmo da digitação para distinguir o leitor do operador."""
+        agora = time.monotonic()
+        valor = self.txt_busca_produto.value or ""
+        
+        if len(valor) <= 1 or self._ultima_tecla is None:
+            # Início de uma nova entrada (ou código colado de uma vez pelo leitor)
+            self._em_rajada = True
+        elif agora - self._ultima_tecla > INTERVALO_MAXIMO_LEITOR:
+            self._em_rajada = False
+        
+        self._ultima_tecla = agora if valor else None
+    
+    def _enviar_busca(self):
+        """Enter no campo de busca: leitura do leitor vai ao carrinho, digitação busca."""
+        codigo = (self.txt_busca_produto.value or "").strip()
+        leitura = self._em_rajada and len(codigo) >= TAMANHO_MINIMO_LEITOR and codigo.isdigit()
+        self._ultima_tecla = None
+        self._em_rajada = False
+        
+        if not leitura:
+            self._buscar_produtos()
+            return
+        
+        # Limpar o campo para a próxima leitura e agrupar leituras em sequência
+        self.txt_busca_produto.value = ""
+        self.txt_busca_produto.update()
+        with self._lock_leituras:
+            self._leituras_pendentes[codigo] = self._leituras_pendentes.get(codigo, 0) + 1
+            if self._temporizador_leituras is None:
+                self._temporizador_leituras = threading.Timer(ESPERA_AGRUPAR_LEITURAS, self._aplicar_leituras)
+                self._temporizador_leituras.daemon = True
+                self._temporizador_leituras.start()
+    
+    def _aplicar_leituras(self):
+        """
+        Adiciona ao carrinho as leituras acumuladas, com uma única atualização da tela.
+        
+        Os códigos são resolvidos pelo índice de códigos em memória (barcode);
+        leituras com a reserva negada não entram no carrinho e a conferência
+        definitiva do estoque é feita na finalização da venda.
+        """
+        with self._lock_leituras:
+            leituras = self._leituras_pendentes
+            self._leituras_pendentes = {}
+            self._temporizador_leituras = None
+        
+        nao_encontrados = []
+        sem_estoque = []
+        acima_do_estoque = []
+        adicionados = 0
+        for codigo, quantidade in leituras.items():
+            produto = buscar_por_codigo(codigo)
+            if not produto:
+                nao_encontrados.append(codigo)
+                continue
+            item = self.carrinho.adicionar_leitura(produto, quantidade)
+            if item is None:
+                # Reserva negada: unidades reservadas por outros carrinhos
+                sem_estoque.append(produto.get('descricao', codigo))
+                continue
+            adicionados += quantidade
+            if item.quantidade > item.estoque_disponivel:
+                acima_do_estoque.append(item.descricao)
+        
+        if nao_encontrados:
+            self._mostrar_snackbar(f"❌ Código não encontrado: {', '.join(nao_encontrados)}", "red")
+        elif sem_estoque:
+            self._mostrar_snackbar(f"❌ Estoque insuficiente: {', '.join(sem_estoque)}", "red")
+        elif acima_do_estoque:
+            self._mostrar_snackbar(f"⚠️ Estoque pode ser insuficiente: {', '.join(acima_do_estoque)}", "orange")
+        elif adicionados:
+            self._mostrar_snackbar(f"✅ {adicionados} item(ns) adicionado(s) ao carrinho", "green")
+        
+        if adicionados:
+            self._atualizar_carrinho()
+    
     def _buscar_produtos(self):
         """Busca produtos e exibe na tabela."""
         termo = self.txt_busca_produto.value
@@ -958,7 +1053,11 @@ class TelaPDV:
             cliente_id=cliente_id
         )
         
-        if sucesso:
+        if sucesso and venda_id is None:
+            # Venda gravada no diário offline: comprovante disponível após o envio
+            self._mostrar_snackbar(f"⚠️ {mensagem}", "orange")
+            self._limpar_tela()
+        elif sucesso:
             self._mostrar_snackbar(f"✅ {mensagem}", "green")
             
             # Exibir comprovante
@@ -5,8 +5,13 @@ Este módulo gerencia o carrinho de compras e operações de vendas.
 Integra-se com o sistema de estoque existente para validação e baixa de produtos.
 """
 
+import uuid
 from dataclasses import dataclass
-from typing import List, Optional, Dict, Tuple
+from typing import Callable, List, Optional, Dict, Tuple
+
+import diario_offline
+import reservas
+from resiliencia import backend_disponivel, falha_de_disponibilidade
 
 
 @dataclass
@@ -42,24 +47,47 @@ class Carrinho:
     """
     Gerencia o carrinho de compras temporário.
     
+    Os itens ficam em um dicionário indexado por produto_id e o subtotal é
+    mantido a cada alteração, sem percorrer o carrinho. As quantidades do
+    carrinho ficam reservadas no banco (módulo reservas) enquanto a venda
+    não é finalizada.
+    
     Attributes:
-        itens: Lista de itens no carrinho
+        id: Identificador do carrinho nas reservas de estoque
+        itens: Lista de itens no carrinho (ordem de inclusão)
         desconto_percentual: Desconto percentual aplicado (0-100)
         desconto_valor: Desconto em valor fixo aplicado
     """
     
     def __init__(self):
         """Inicializa um carrinho vazio sem descontos."""
-        self.itens: List[ItemCarrinho] = []
+        self.id = str(uuid.uuid4())
+        self._itens: Dict[int, ItemCarrinho] = {}
+        self._subtotal: float = 0.0
         self.desconto_percentual: float = 0.0
         self.desconto_valor: float = 0.0
     
+    @property
+    def itens(self) -> List[ItemCarrinho]:
+        """Itens do carrinho, na ordem em que foram incluídos."""
+        return list(self._itens.values())
+    
+    def _incluir_item(self, item: ItemCarrinho) -> None:
+        self._itens[item.produto_id] = item
+        self._subtotal += item.calcular_subtotal()
+    
+    def _alterar_quantidade(self, item: ItemCarrinho, quantidade: int) -> None:
+        self._subtotal += (quantidade - item.quantidade) * item.preco_unitario
+        item.quantidade = quantidade
+    
     def adicionar_produto(self, produto_id: int, quantidade: int = 1) -> bool:
         """
         Adiciona um produto ao carrinho ou incrementa sua quantidade se já existir.
         
-        Busca o produto no banco de dados para obter preço e estoque,
-        valida a disponibilidade e adiciona ao carrinho.
+        Busca o produto (cache do catálogo ou banco de dados) para obter
+        preço e estoque, reserva a quantidade (estoque menos as reservas de
+        outros carrinhos) e adiciona ao carrinho. Sem conexão, valida com o
+        estoque do catálogo.
         
         Args:
             produto_id: ID do produto a ser adicionado
@@ -70,50 +98,50 @@ class Carrinho:
         
         Validates Requirements: 1.2, 1.3, 1.4
         """
-        from database import supabase
+        from cache_catalogo import catalogo
         
         try:
-            # Buscar produto no banco para obter preço e estoque
-            response = supabase.table("produtos").select("*").eq("id", produto_id).execute()
+            # Buscar produto para obter preço e estoque
+            produto = catalogo.obter(produto_id)
             
-            if not response.data or len(response.data) == 0:
+            if not produto:
                 return False
             
-            produto = response.data[0]
             preco_unitario = float(produto.get('preco', 0))
             estoque_disponivel = int(produto.get('quantidade', 0))
             descricao = produto.get('descricao', '')
             
             # Verificar se produto já existe no carrinho
-            item_existente = None
-            for item in self.itens:
-                if item.produto_id == produto_id:
-                    item_existente = item
-                    break
+            item_existente = self._itens.get(produto_id)
+            nova_quantidade = quantidade + (item_existente.quantidade if item_existente else 0)
+            
+            # Reservar a quantidade total do produto no carrinho
+            reservado, disponivel = reservas.reservar(self.id, produto_id, nova_quantidade)
+            if disponivel is not None:
+                estoque_disponivel = disponivel
             
             if item_existente:
-                # Produto já existe - incrementar quantidade
-                nova_quantidade = item_existente.quantidade + quantidade
+                item_existente.estoque_disponivel = estoque_disponivel
                 
                 # Validar disponibilidade de estoque
-                if nova_quantidade > estoque_disponivel:
+                if not reservado or nova_quantidade > estoque_disponivel:
                     return False
                 
-                item_existente.quantidade = nova_quantidade
+                # Produto já existe - incrementar quantidade
+                self._alterar_quantidade(item_existente, nova_quantidade)
             else:
                 # Produto novo - validar estoque e adicionar
-                if quantidade > estoque_disponivel:
+                if not reservado or quantidade > estoque_disponivel:
                     return False
                 
-                # Criar novo ItemCarrinho e adicionar à lista
-                novo_item = ItemCarrinho(
+                # Criar novo ItemCarrinho e adicionar ao carrinho
+                self._incluir_item(ItemCarrinho(
                     produto_id=produto_id,
                     descricao=descricao,
                     quantidade=quantidade,
                     preco_unitario=preco_unitario,
                     estoque_disponivel=estoque_disponivel
-                )
-                self.itens.append(novo_item)
+                ))
             
             return True
             
@@ -121,6 +149,53 @@ class Carrinho:
             # Em caso de erro (conexão, etc), retornar False
             return False
 
+    def adicionar_leitura(self, produto: Dict, quantidade: int = 1) -> Optional[ItemCarrinho]:
+        """
+        Adiciona ao carrinho um produto já resolvido pelo leitor de código de barras.
+        
+        Usa os dados do próprio produto (índice de códigos em memória), sem
+        consultar o catálogo no banco. A leitura é recusada se a reserva for
+        negada (unidades reservadas por outros carrinhos); sem conexão não há
+        bloqueio por estoque e a conferência definitiva é feita uma única vez na
+        finalização da venda (registrar_venda_completa). Leituras repetidas do
+        mesmo produto incrementam a quantidade.
+        
+        Args:
+            produto: Dicionário do produto (id, descricao, preco, quantidade)
+            quantidade: Quantidade lida (padrão: 1)
+        
+        Returns:
+            ItemCarrinho criado ou atualizado, ou None se a reserva foi negada
+        """
+        produto_id = produto['id']
+        estoque_disponivel = int(produto.get('quantidade', 0))
+        
+        item = self._itens.get(produto_id)
+        reservado, disponivel = reservas.reservar(self.id, produto_id, quantidade + (item.quantidade if item else 0))
+        if disponivel is not None:
+            estoque_disponivel = disponivel
+        
+        if not reservado:
+            # Mesma regra de adicionar_produto: sem reserva, a leitura não entra no carrinho
+            if item is not None:
+                item.estoque_disponivel = estoque_disponivel
+            return None
+        
+        if item is not None:
+            self._alterar_quantidade(item, item.quantidade + quantidade)
+            item.estoque_disponivel = estoque_disponivel
+            return item
+        
+        novo_item = ItemCarrinho(
+            produto_id=produto_id,
+            descricao=produto.get('descricao', ''),
+            quantidade=quantidade,
+            preco_unitario=float(produto.get('preco', 0)),
+            estoque_disponivel=estoque_disponivel
+        )
+        self._incluir_item(novo_item)
+        return novo_item
+
     def remover_produto(self, produto_id: int) -> bool:
         """
         Remove um produto do carrinho.
@@ -133,15 +208,18 @@ class Carrinho:
         
         Validates Requirement: 1.6
         """
-        # Procurar o item no carrinho
-        for i, item in enumerate(self.itens):
-            if item.produto_id == produto_id:
-                # Item encontrado - remover da lista
-                self.itens.pop(i)
-                return True
-        
-        # Item não encontrado no carrinho
-        return False
+        item = self._itens.pop(produto_id, None)
+        if item is None:
+            # Item não encontrado no carrinho
+            return False
+        
+        reservas.liberar(self.id, produto_id)
+        if self._itens:
+            self._subtotal -= item.calcular_subtotal()
+        else:
+            # Carrinho vazio: zerar para não acumular arredondamentos
+            self._subtotal = 0.0
+        return True
     
     def atualizar_quantidade(self, produto_id: int, quantidade: int) -> bool:
         """
@@ -160,38 +238,45 @@ class Carrinho:
         
         Validates Requirements: 1.4, 1.5
         """
-        # Procurar o item no carrinho
-        for item in self.itens:
-            if item.produto_id == produto_id:
-                # Item encontrado - validar disponibilidade de estoque
-                if quantidade > item.estoque_disponivel:
-                    # Estoque insuficiente - manter quantidade anterior
-                    return False
-                
-                # Validar que quantidade é positiva
-                if quantidade <= 0:
-                    return False
-                
-                # Atualizar quantidade
-                item.quantidade = quantidade
-                return True
+        item = self._itens.get(produto_id)
+        if item is None:
+            # Item não encontrado no carrinho
+            return False
         
-        # Item não encontrado no carrinho
-        return False
+        # Validar que quantidade é positiva
+        if quantidade <= 0:
+            return False
+        
+        # Ajustar a reserva (reduzir a própria reserva é sempre permitido)
+        reservado, disponivel = reservas.reservar(self.id, produto_id, quantidade)
+        if disponivel is not None:
+            item.estoque_disponivel = disponivel
+        
+        # Validar disponibilidade de estoque
+        # (apenas aumentos: itens lidos pelo leitor podem estar acima do estoque em cache)
+        if not reservado or (quantidade > item.estoque_disponivel and quantidade > item.quantidade):
+            # Estoque insuficiente - manter quantidade anterior
+            return False
+        
+        # Atualizar quantidade
+        self._alterar_quantidade(item, quantidade)
+        return True
     
     def calcular_subtotal(self) -> float:
         """
-        Calcula o subtotal do carrinho somando os subtotais de todos os itens.
+        Retorna o subtotal do carrinho (soma dos subtotais de todos os itens).
+        
+        O valor é mantido a cada inclusão, remoção ou alteração de quantidade.
         
         Returns:
             float: Subtotal do carrinho (soma de todos os itens)
         
         Validates Requirement: 1.8
         """
-        if not self.itens:
+        if not self._itens:
             return 0.0
         
-        return sum(item.calcular_subtotal() for item in self.itens)
+        return self._subtotal
     
     def calcular_desconto(self) -> float:
         """
@@ -323,87 +408,25 @@ class Carrinho:
         self.desconto_percentual = 0.0
         self.desconto_valor = 0.0
     
-    def limpar(self) -> None:
+    def limpar(self, liberar_reservas: bool = True) -> None:
         """
         Limpa o carrinho removendo todos os itens e descontos.
         
-        Remove todos os itens do carrinho e zera os descontos,
-        preparando o carrinho para uma nova venda.
+        Remove todos os itens do carrinho, libera as reservas e zera os
+        descontos, preparando o carrinho para uma nova venda.
+        
+        Args:
+            liberar_reservas: False quando as reservas já foram apagadas
+                              (venda registrada com o carrinho)
         
         Validates Requirement: 5.10
         """
-        self.itens.clear()
+        if self._itens and liberar_reservas:
+            reservas.liberar(self.id)
+        self._itens.clear()
+        self._subtotal = 0.0
         self.desconto_percentual = 0.0
         self.desconto_valor = 0.0
-    
-    def validar_disponibilidade(self) -> tuple[bool, List[str]]:
-        """
-        Valida a disponibilidade de estoque para todos os itens do carrinho.
-        
-        Para cada item no carrinho, consulta o estoque atual no banco de dados
-        e verifica se a quantidade solicitada está disponível. Retorna uma tupla
-        com um booleano indicando se todos os itens estão disponíveis e uma lista
-        de mensagens de erro descritivas para itens com estoque insuficiente.
-        
-        Returns:
-            tuple[bool, List[str]]: Tupla contendo:
-                - bool: True se todos os itens têm estoque disponível, False caso contrário
-                - List[str]: Lista de mensagens de erro para itens com estoque insuficiente
-                             (vazia se todos os itens estão disponíveis)
-        
-        Validates Requirements: 12.1, 12.2, 12.3, 12.4, 12.5, 12.6
-        """
-        from database import supabase
-        
-        mensagens_erro: List[str] = []
-        
-        # Se carrinho está vazio, considerar válido
-        if not self.itens:
-            return True, []
-        
-        try:
-            # Para cada item no carrinho, consultar estoque atual
-            for item in self.itens:
-                # Consultar estoque atual no banco de dados
-                response = supabase.table("produtos").select("quantidade, descricao").eq("id", item.produto_id).execute()
-                
-                if not response.data or len(response.data) == 0:
-                    # Produto não encontrado no banco
-                    mensagens_erro.append(
-                        f"Produto {item.descricao}: não encontrado no banco de dados"
-                    )
-                    continue
-                
-                produto = response.data[0]
-                estoque_atual = int(produto.get('quantidade', 0))
-                descricao = produto.get('descricao', item.descricao)
-                
-                # Verificar se quantidade solicitada está disponível
-                if item.quantidade > estoque_atual:
-                    # Estoque insuficiente - adicionar mensagem de erro descritiva
-                    mensagens_erro.append(
-                        f"Produto {descricao}: estoque insuficiente. Disponível: {estoque_atual}, Solicitado: {item.quantidade}"
-                    )
-                    
-                    # Atualizar o estoque_disponivel do item para refletir o valor atual
-                    item.estoque_disponivel = estoque_atual
-                elif estoque_atual == 0:
-                    # Produto sem estoque
-                    mensagens_erro.append(
-                        f"Produto {descricao}: sem estoque disponível"
-                    )
-                    item.estoque_disponivel = 0
-            
-            # Retornar resultado da validação
-            if mensagens_erro:
-                return False, mensagens_erro
-            else:
-                return True, []
-                
-        except Exception as e:
-            # Em caso de erro de conexão ou outro erro, retornar falha
-            mensagens_erro.append(f"Erro ao validar disponibilidade: {str(e)}")
-            return False, mensagens_erro
 
 
 
@@ -417,8 +440,10 @@ def buscar_produtos_venda(termo: str, apenas_disponiveis: bool = True) -> List[d
     """
     Busca produtos por código de barras, referência ou descrição.
     
-    Realiza busca case-insensitive e parcial nos campos codigo_barras, referencia
-    e descricao. Opcionalmente filtra apenas produtos com estoque disponível.
+    Realiza busca parcial, sem diferença de maiúsculas e acentos, nos campos
+    codigo_barras, referencia e descricao, pelo índice de busca do
+    cache_catalogo (resultados por relevância). Opcionalmente filtra apenas
+    produtos com estoque disponível.
     
     Args:
         termo: Termo de busca (código de barras, referência ou descrição)
@@ -431,33 +456,16 @@ def buscar_produtos_venda(termo: str, apenas_disponiveis: bool = True) -> List[d
     
     Validates Requirement: 1.1
     """
-    from database import supabase
+    from cache_catalogo import catalogo
     
     try:
-        # Construir query base
-        query = supabase.table("produtos").select("*")
-        
-        # Aplicar filtro de busca em múltiplos campos usando OR
-        # ILIKE para busca case-insensitive e parcial
-        termo_busca = f"%{termo}%"
-        query = query.or_(
-            f"codigo_barras.ilike.{termo_busca},"
-            f"referencia.ilike.{termo_busca},"
-            f"descricao.ilike.{termo_busca}"
-        )
+        produtos = catalogo.buscar(termo, ("codigo_barras", "referencia", "descricao"))
         
         # Filtrar apenas produtos disponíveis se solicitado
         if apenas_disponiveis:
-            query = query.gt("quantidade", 0)
-        
-        # Executar query
-        response = query.execute()
+            produtos = [p for p in produtos if (p.get("quantidade") or 0) > 0]
         
-        # Retornar lista de produtos (vazia se nenhum encontrado)
-        if response.data:
-            return response.data
-        else:
-            return []
+        return produtos
             
     except Exception as e:
         # Em caso de erro (conexão, etc), retornar lista vazia
@@ -465,6 +473,53 @@ def buscar_produtos_venda(termo: str, apenas_disponiveis: bool = True) -> List[d
 
 
 
+def _reenviar_venda(dados: Dict, salvar_progresso: Optional[Callable[[Dict], None]] = None) -> None:
+    """
+    Processador do diário offline para vendas concluídas sem conexão.
+    
+    A venda já aconteceu no caixa, por isso o estoque não é conferido
+    novamente (a baixa pode deixar o estoque negativo).
+    
+    Raises:
+        diario_offline.EnvioAdiado: se o backend continuar indisponível
+        ValueError: se o banco rejeitar a venda
+    """
+    from database import registrar_venda_completa
+    
+    venda_id, _ = registrar_venda_completa(
+        dados['venda'], dados['itens'], dados['pagamentos'], validar_estoque=False
+    )
+    if venda_id is not None:
+        return
+    if falha_de_disponibilidade():
+        raise diario_offline.EnvioAdiado("Backend indisponível")
+    raise ValueError("Venda offline rejeitada pelo banco de dados")
+
+
+def _mensagens_estoque_insuficiente(carrinho: Carrinho, faltas: List[Dict]) -> List[str]:
+    """Monta as mensagens de estoque insuficiente e atualiza o estoque dos itens do carrinho."""
+    itens_por_produto = {item.produto_id: item for item in carrinho.itens}
+    mensagens = []
+    for falta in faltas:
+        item = itens_por_produto.get(falta.get('produto_id'))
+        descricao = falta.get('descricao') or (item.descricao if item else f"ID {falta.get('produto_id')}")
+        disponivel = falta.get('disponivel')
+        
+        if disponivel is None:
+            mensagens.append(f"Produto {descricao}: não encontrado no banco de dados")
+            continue
+        
+        if item is not None:
+            item.estoque_disponivel = int(disponivel)
+        if int(disponivel) <= 0:
+            mensagens.append(f"Produto {descricao}: sem estoque disponível")
+        else:
+            mensagens.append(
+                f"Produto {descricao}: estoque insuficiente. Disponível: {disponivel}, Solicitado: {falta.get('solicitado')}"
+            )
+    return mensagens
+
+
 def finalizar_venda(
     carrinho: Carrinho,
     pagamentos: List[Dict],
@@ -474,9 +529,14 @@ def finalizar_venda(
     """
     Finaliza uma venda com transação atômica.
     
-    Valida disponibilidade de estoque, valida pagamentos, insere venda no banco,
-    insere itens e pagamentos, executa baixa de estoque via registrar_movimentacao(),
-    e limpa o carrinho após sucesso.
+    Valida os pagamentos e envia a venda em uma única chamada ao banco
+    (registrar_venda_completa), que confere o estoque com os produtos
+    bloqueados, insere venda, itens e pagamentos e dá baixa no estoque na
+    mesma transação. Limpa o carrinho após sucesso.
+    
+    Se o backend estiver indisponível, a venda é gravada no diário offline e
+    enviada automaticamente quando a conexão voltar; nesse caso a venda é
+    aceita e o venda_id retornado é None.
     
     Args:
         carrinho: Instância do Carrinho com os produtos da venda
@@ -488,54 +548,46 @@ def finalizar_venda(
         Tupla (sucesso, mensagem, venda_id)
         - sucesso: bool indicando se a venda foi finalizada com sucesso
         - mensagem: str com mensagem descritiva do resultado
-        - venda_id: int com ID da venda criada ou None em caso de erro
+        - venda_id: int com ID da venda criada ou None em caso de erro ou venda offline
     
     Validates Requirements: 5.1, 5.2, 5.3, 5.4, 5.5, 5.6, 5.7, 5.8, 5.10
     """
-    from database import inserir_venda, inserir_itens_venda, inserir_pagamentos, registrar_movimentacao
+    from database import registrar_venda_completa
     from validacao_vendas import validar_pagamentos_venda
     
     # Validar que o carrinho não está vazio
     if not carrinho.itens or len(carrinho.itens) == 0:
         return False, "Carrinho está vazio. Adicione produtos antes de finalizar a venda.", None
     
-    # 1. Validar disponibilidade de estoque (fail fast)
-    disponivel, mensagens_erro = carrinho.validar_disponibilidade()
-    if not disponivel:
-        mensagem_erro = "Estoque insuficiente:\n" + "\n".join(mensagens_erro)
-        return False, mensagem_erro, None
-    
-    # 2. Calcular totais do carrinho
+    # 1. Calcular totais do carrinho
     valor_total = carrinho.calcular_subtotal()
     valor_desconto = carrinho.calcular_desconto()
     valor_final = carrinho.calcular_total()
     
-    # 3. Validar que pagamentos correspondem ao total da venda
+    # 2. Validar que pagamentos correspondem ao total da venda
     valido, mensagem_validacao = validar_pagamentos_venda(pagamentos, valor_final)
     if not valido:
         return False, f"Erro na validação de pagamentos: {mensagem_validacao}", None
     
     try:
-        # 4. Preparar dados da venda
+        # 3. Preparar dados da venda
         dados_venda = {
             'valor_total': valor_total,
             'desconto_percentual': carrinho.desconto_percentual,
             'desconto_valor': carrinho.desconto_valor,
             'valor_final': valor_final,
             'usuario_id': usuario_id,
-            'status': 'finalizada'
+            'status': 'finalizada',
+            # Mesma chave na tentativa online e no reenvio do diário: a venda nunca é gravada duas vezes
+            'chave_idempotencia': str(uuid.uuid4()),
+            # A venda confere o estoque descontando as reservas dos outros carrinhos e apaga as deste
+            'carrinho': carrinho.id
         }
         
         # Adicionar cliente_id apenas se fornecido (venda não avulsa)
         if cliente_id is not None:
             dados_venda['cliente_id'] = cliente_id
         
-        # 5. Inserir venda no banco (início da "transação")
-        venda_id = inserir_venda(dados_venda)
-        if venda_id is None:
-            return False, "Erro ao registrar venda no banco de dados. Tente novamente.", None
-        
-        # 6. Preparar e inserir itens da venda
         itens_venda = []
         for item in carrinho.itens:
             itens_venda.append({
@@ -545,36 +597,34 @@ def finalizar_venda(
                 'subtotal': item.calcular_subtotal()
             })
         
-        sucesso_itens = inserir_itens_venda(venda_id, itens_venda)
-        if not sucesso_itens:
-            # Falha ao inserir itens - idealmente deveria fazer rollback da venda
-            return False, f"Erro ao registrar itens da venda. Venda ID {venda_id} pode estar incompleta.", venda_id
-        
-        # 7. Inserir pagamentos
-        sucesso_pagamentos = inserir_pagamentos(venda_id, pagamentos)
-        if not sucesso_pagamentos:
-            # Falha ao inserir pagamentos - idealmente deveria fazer rollback
-            return False, f"Erro ao registrar pagamentos da venda. Venda ID {venda_id} pode estar incompleta.", venda_id
-        
-        # 8. Executar baixa de estoque para cada item (registrar movimentação tipo='saida')
-        for item in carrinho.itens:
-            sucesso_movimentacao = registrar_movimentacao(
-                produto_id=item.produto_id,
-                tipo='saida',
-                quantidade=item.quantidade,
-                observacao=f'Venda #{venda_id}',
-                usuario_id=usuario_id
-            )
+        # 4. Registrar venda, itens, pagamentos e baixa de estoque (uma transação)
+        offline = not backend_disponivel()
+        if not offline:
+            venda_id, faltas = registrar_venda_completa(dados_venda, itens_venda, pagamentos)
             
-            if not sucesso_movimentacao:
-                # Falha na baixa de estoque - situação crítica
-                # Idealmente deveria fazer rollback de toda a transação
-                return False, f"Erro ao dar baixa no estoque do produto {item.descricao}. Venda ID {venda_id} registrada mas estoque não atualizado.", venda_id
+            if venda_id is None:
+                if faltas:
+                    mensagens_erro = _mensagens_estoque_insuficiente(carrinho, faltas)
+                    return False, "Estoque insuficiente:\n" + "\n".join(mensagens_erro), None
+                if not falha_de_disponibilidade():
+                    return False, "Erro ao registrar venda no banco de dados. Tente novamente.", None
+                offline = True
+        
+        if offline:
+            # Sem conexão o estoque não pode ser conferido: a venda segue para o diário
+            diario_offline.registrar("venda", {
+                'venda': dados_venda,
+                'itens': itens_venda,
+                'pagamentos': pagamentos,
+                'usuario_id': usuario_id
+            })
+            carrinho.limpar()
+            return True, "Sem conexão: venda registrada offline e será enviada automaticamente.", None
         
-        # 9. Limpar carrinho após sucesso completo
-        carrinho.limpar()
+        # 5. Limpar carrinho após sucesso completo (as reservas já foram apagadas pela venda)
+        carrinho.limpar(liberar_reservas=False)
         
-        # 10. Retornar sucesso
+        # 6. Retornar sucesso
         return True, f"Venda finalizada com sucesso! ID da venda: {venda_id}", venda_id
         
     except Exception as e:
@@ -1023,7 +1073,7 @@ def listar_vendas(
     
     Validates Requirements: 7.1, 8.1
     """
-    from database import supabase, reconectar_supabase
+    from database import supabase, executar_operacao
     
     if not supabase:
         return False, "Erro: Conexão com Supabase não estabelecida", []
@@ -1052,7 +1102,7 @@ def listar_vendas(
         query = query.order('data_hora', desc=True)
         
         # Executar query
-        response = query.execute()
+        response = executar_operacao("listar_vendas", query.execute)
         
         vendas = response.data if response.data else []
         
@@ -1070,50 +1120,6 @@ def listar_vendas(
         return True, "Vendas encontradas", vendas
         
     except Exception as e:
-        # Tentar reconectar em caso de erro de conexão
-        if "connection" in str(e).lower() or "network" in str(e).lower():
-            if reconectar_supabase():
-                try:
-                    # Repetir query após reconexão
-                    query = supabase.table('vendas').select('*')
-                    
-                    if data_inicio:
-                        query = query.gte('data_hora', data_inicio)
-                    
-                    if data_fim:
-                        query = query.lte('data_hora', data_fim)
-                    
-                    if usuario_id:
-                        query = query.eq('usuario_id', usuario_id)
-                    
-                    if cliente_id:
-                        query = query.eq('cliente_id', cliente_id)
-                    
-                    if status:
-                        query = query.eq('status', status)
-                    
-                    query = query.order('data_hora', desc=True)
-                    
-                    response = query.execute()
-                    
-                    vendas = response.data if response.data else []
-                    
-                    # Converter valores decimais para float
-                    for venda in vendas:
-                        if 'valor_total' in venda:
-                            venda['valor_total'] = float(venda['valor_total'])
-                        if 'desconto_percentual' in venda:
-                            venda['desconto_percentual'] = float(venda['desconto_percentual'])
-                        if 'desconto_valor' in venda:
-                            venda['desconto_valor'] = float(venda['desconto_valor'])
-                        if 'valor_final' in venda:
-                            venda['valor_final'] = float(venda['valor_final'])
-                    
-                    return True, "Vendas encontradas", vendas
-                    
-                except Exception as e2:
-                    return False, "Erro ao listar vendas", []
-        
         return False, "Erro ao listar vendas", []
 
 
@@ -1124,8 +1130,8 @@ def cancelar_venda(venda_id: int, motivo: str, usuario_id: int) -> Tuple[bool, s
     
     Busca a venda usando buscar_venda_completa(), valida que a venda existe
     e não está cancelada, marca a venda como cancelada usando marcar_venda_cancelada(),
-    e para cada item da venda executa registrar_movimentacao(tipo='entrada') para
-    restaurar o estoque.
+    e restaura o estoque de todos os itens com um único registrar_movimentacoes_lote()
+    (tipo='entrada').
     
     Args:
         venda_id: ID da venda a ser cancelada
@@ -1139,7 +1145,7 @@ def cancelar_venda(venda_id: int, motivo: str, usuario_id: int) -> Tuple[bool, s
     
     Validates Requirements: 7.1, 7.2, 7.3, 7.4, 7.5, 7.6, 7.7, 7.8
     """
-    from database import buscar_venda_completa, marcar_venda_cancelada, registrar_movimentacao
+    from database import buscar_venda_completa, marcar_venda_cancelada, registrar_movimentacoes_lote
     
     try:
         # 1. Buscar venda completa
@@ -1166,34 +1172,30 @@ def cancelar_venda(venda_id: int, motivo: str, usuario_id: int) -> Tuple[bool, s
             # Venda sem itens - situação incomum mas não é erro crítico
             return True, f"Venda #{venda_id} cancelada com sucesso (sem itens para estornar)."
         
-        # Lista para rastrear itens que falharam no estorno
+        # Estornar todos os itens em um único lote (todos ou nenhum)
+        itens_estorno = [
+            item for item in itens
+            if item.get('produto_id') and item.get('quantidade')  # Itens sem dados completos são ignorados
+        ]
+        sucesso_estorno, _ = registrar_movimentacoes_lote([
+            {
+                'produto_id': item['produto_id'],
+                'tipo': 'entrada',
+                'quantidade': item['quantidade'],
+                'observacao': f'Estorno de venda #{venda_id}',
+                'usuario_id': usuario_id
+            }
+            for item in itens_estorno
+        ])
+        
+        # Lista de itens que ficaram sem estorno
         itens_com_erro = []
-        
-        for item in itens:
-            produto_id = item.get('produto_id')
-            quantidade = item.get('quantidade')
-            
-            if not produto_id or not quantidade:
-                # Item sem dados completos - pular
-                continue
-            
-            # Executar registrar_movimentacao com tipo='entrada' para estornar
-            sucesso_estorno = registrar_movimentacao(
-                produto_id=produto_id,
-                tipo='entrada',
-                quantidade=quantidade,
-                observacao=f'Estorno de venda #{venda_id}',
-                usuario_id=usuario_id
-            )
-            
-            if not sucesso_estorno:
-                # Falha no estorno - registrar item com erro
-                descricao = ''
+        if not sucesso_estorno:
+            for item in itens_estorno:
                 if item.get('produto'):
-                    descricao = item['produto'].get('descricao', f'Produto ID {produto_id}')
+                    descricao = item['produto'].get('descricao', f"Produto ID {item['produto_id']}")
                 else:
-                    descricao = f'Produto ID {produto_id}'
-                
+                    descricao = f"Produto ID {item['produto_id']}"
                 itens_com_erro.append(descricao)
         
         # 6. Verificar se houve erros no estorno
@@ -1213,3 +1215,7 @@ def cancelar_venda(venda_id: int, motivo: str, usuario_id: int) -> Tuple[bool, s
         # Capturar qualquer exceção não tratada
         mensagem_erro = f"Erro inesperado ao cancelar venda #{venda_id}: {str(e)}"
         return False, mensagem_erro
+
+
+# Vendas gravadas offline são retomadas pelo reenviador do diário
+diario_offline.registrar_processador("venda", _reenviar_venda)